@@ -0,0 +1,54 @@
+"""add_rag_evaluations_table
+
+Revision ID: c4d2a7e19b36
+Revises: ad8e8ea04628
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d2a7e19b36'
+down_revision: Union[str, None] = 'ad8e8ea04628'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Создаем таблицу оценок RAGAS (для графиков качества ответов)
+    op.create_table(
+        'rag_evaluations',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('user_id', sa.BigInteger(), nullable=True),
+        sa.Column('platform', sa.String(length=50), nullable=True),
+        sa.Column('question', sa.Text(), nullable=False),
+        sa.Column('answer', sa.Text(), nullable=False),
+        sa.Column('contexts_count', sa.Integer(), nullable=True),
+        sa.Column('faithfulness', sa.Float(), nullable=True),
+        sa.Column('answer_relevancy', sa.Float(), nullable=True),
+        sa.Column('context_precision', sa.Float(), nullable=True),
+        sa.Column('context_recall', sa.Float(), nullable=True),
+        sa.Column('average_score', sa.Float(), nullable=True),
+        sa.Column('details_json', sa.JSON(), nullable=True),
+        sa.Column('evaluation_ms', sa.Integer(), nullable=True),
+        sa.Column('answered_at', sa.DateTime(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.PrimaryKeyConstraint('id')
+    )
+    # Индексы для выборок по периоду
+    op.create_index('ix_rag_evaluations_user_id', 'rag_evaluations', ['user_id'], unique=False)
+    op.create_index('ix_rag_evaluations_answered_at', 'rag_evaluations', ['answered_at'], unique=False)
+    op.create_index('idx_rag_evaluations_platform_answered', 'rag_evaluations', ['platform', 'answered_at'], unique=False)
+
+
+def downgrade() -> None:
+    # Удаляем индексы
+    op.drop_index('idx_rag_evaluations_platform_answered', table_name='rag_evaluations')
+    op.drop_index('ix_rag_evaluations_answered_at', table_name='rag_evaluations')
+    op.drop_index('ix_rag_evaluations_user_id', table_name='rag_evaluations')
+    # Удаляем таблицу
+    op.drop_table('rag_evaluations')
@@ -5,12 +5,36 @@ from .langgraph_conversation_workflow import (
     LangGraphConversationWorkflow,
     get_conversation_workflow,
     query_with_conversation_workflow,
+    stream_with_conversation_workflow,
     LANGGRAPH_AVAILABLE
 )
+from .conversation_state_store import (
+    ConversationStateStore,
+    InMemoryConversationStore,
+    RedisConversationStore,
+    create_conversation_store
+)
+from .notification_store import (
+    NotificationStore,
+    InMemoryNotificationStore,
+    RedisNotificationStore,
+    create_notification_store,
+    get_notification_store
+)
 
 __all__ = [
     'LangGraphConversationWorkflow',
     'get_conversation_workflow', 
     'query_with_conversation_workflow',
-    'LANGGRAPH_AVAILABLE'
+    'stream_with_conversation_workflow',
+    'LANGGRAPH_AVAILABLE',
+    'ConversationStateStore',
+    'InMemoryConversationStore',
+    'RedisConversationStore',
+    'create_conversation_store',
+    'NotificationStore',
+    'InMemoryNotificationStore',
+    'RedisNotificationStore',
+    'create_notification_store',
+    'get_notification_store'
 ]
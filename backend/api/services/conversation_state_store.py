@@ -0,0 +1,195 @@
+"""
+Хранилище состояний диалогов для LangGraph Conversation Workflow
+
+Сообщения хранятся в компактном виде ({"role", "content"}) и дополняются
+по одному (append), без пересборки всей истории на каждом ходе:
+- memory: LRU по потокам + TTL с момента последнего обращения
+- redis: список на поток (RPUSH + LTRIM + EXPIRE), общий для всех воркеров
+
+Выбор хранилища: CONVERSATION_STATE_BACKEND (memory | redis).
+"""
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+STATE_BACKEND = os.getenv("CONVERSATION_STATE_BACKEND", "memory").lower()
+STATE_MAX_THREADS = int(os.getenv("CONVERSATION_STATE_MAX_THREADS", "10000"))
+STATE_TTL = int(os.getenv("CONVERSATION_STATE_TTL", "86400"))  # Секунды без активности
+REDIS_KEY_PREFIX = "conversation_state:"
+
+BACKEND_MEMORY = "memory"
+BACKEND_REDIS = "redis"
+
+
+def to_compact(message: Any) -> Optional[Dict[str, str]]:
+    """
+    Сообщение (dict или LangChain message) в компактном виде
+
+    Returns:
+        {"role": "user" | "assistant", "content": str} или None для пустых/системных
+    """
+    if isinstance(message, dict):
+        role = message.get("role", "user")
+        content = message.get("content", message.get("text", ""))
+    else:
+        message_type = getattr(message, "type", "")
+        role = {"human": "user", "ai": "assistant"}.get(message_type, message_type)
+        content = getattr(message, "content", "")
+    if role not in ("user", "assistant") or not content:
+        return None
+    return {"role": role, "content": str(content)}
+
+
+def to_compact_list(messages: Iterable[Any]) -> List[Dict[str, str]]:
+    return [compact for compact in (to_compact(m) for m in messages or []) if compact]
+
+
+class ConversationStateStore:
+    """Базовый интерфейс хранилища истории диалогов"""
+
+    backend = ""
+
+    def __init__(self, max_messages: int = 50, ttl: int = STATE_TTL):
+        self.max_messages = max_messages
+        self.ttl = ttl
+
+    def get_messages(self, thread_key: str) -> List[Dict[str, str]]:
+        raise NotImplementedError
+
+    def append(self, thread_key: str, messages: List[Dict[str, str]]) -> None:
+        """Дописывает сообщения в конец истории (история ограничена max_messages)"""
+        raise NotImplementedError
+
+    def clear(self, thread_key: str) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.backend, "max_messages": self.max_messages, "ttl": self.ttl}
+
+
+class InMemoryConversationStore(ConversationStateStore):
+    """История в памяти процесса: LRU по потокам и TTL с последнего обращения"""
+
+    backend = BACKEND_MEMORY
+
+    def __init__(self, max_messages: int = 50, ttl: int = STATE_TTL, max_threads: int = STATE_MAX_THREADS):
+        super().__init__(max_messages, ttl)
+        self.max_threads = max_threads
+        # thread_key -> (время последнего обращения, сообщения)
+        self._threads: "OrderedDict[str, Tuple[float, Deque[Dict[str, str]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _touch(self, thread_key: str, create: bool = False) -> Optional[Deque[Dict[str, str]]]:
+        now = time.time()
+        entry = self._threads.get(thread_key)
+        if entry is not None and now - entry[0] >= self.ttl:
+            del self._threads[thread_key]
+            entry = None
+        if entry is None:
+            if not create:
+                return None
+            messages: Deque[Dict[str, str]] = deque(maxlen=self.max_messages)
+        else:
+            messages = entry[1]
+        self._threads[thread_key] = (now, messages)
+        self._threads.move_to_end(thread_key)
+        return messages
+
+    def _evict(self) -> None:
+        now = time.time()
+        # Просроченные потоки находятся в начале (давно не использовались)
+        while self._threads:
+            oldest_key, (last_access, _) = next(iter(self._threads.items()))
+            if now - last_access < self.ttl and len(self._threads) <= self.max_threads:
+                break
+            del self._threads[oldest_key]
+
+    def get_messages(self, thread_key: str) -> List[Dict[str, str]]:
+        with self._lock:
+            messages = self._touch(thread_key)
+            return list(messages) if messages else []
+
+    def append(self, thread_key: str, messages: List[Dict[str, str]]) -> None:
+        if not messages:
+            return
+        with self._lock:
+            self._touch(thread_key, create=True).extend(messages)
+            self._evict()
+
+    def clear(self, thread_key: str) -> None:
+        with self._lock:
+            self._threads.pop(thread_key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**super().stats(), "threads": len(self._threads), "max_threads": self.max_threads}
+
+
+class RedisConversationStore(ConversationStateStore):
+    """История в Redis: общий список на поток для всех воркеров backend"""
+
+    backend = BACKEND_REDIS
+
+    def __init__(self, redis_client, max_messages: int = 50, ttl: int = STATE_TTL):
+        super().__init__(max_messages, ttl)
+        self.redis = redis_client
+
+    def _key(self, thread_key: str) -> str:
+        return f"{REDIS_KEY_PREFIX}{thread_key}"
+
+    def get_messages(self, thread_key: str) -> List[Dict[str, str]]:
+        key = self._key(thread_key)
+        pipe = self.redis.pipeline()
+        pipe.lrange(key, -self.max_messages, -1)
+        pipe.expire(key, self.ttl)
+        raw_messages, _ = pipe.execute()
+        messages = []
+        for raw in raw_messages or []:
+            try:
+                messages.append(json.loads(raw))
+            except (TypeError, ValueError):
+                continue
+        return messages
+
+    def append(self, thread_key: str, messages: List[Dict[str, str]]) -> None:
+        if not messages:
+            return
+        key = self._key(thread_key)
+        pipe = self.redis.pipeline()
+        pipe.rpush(key, *(json.dumps(m, ensure_ascii=False) for m in messages))
+        pipe.ltrim(key, -self.max_messages, -1)
+        pipe.expire(key, self.ttl)
+        pipe.execute()
+
+    def clear(self, thread_key: str) -> None:
+        self.redis.delete(self._key(thread_key))
+
+
+def create_conversation_store(max_messages: int = 50, backend: str = STATE_BACKEND) -> ConversationStateStore:
+    """
+    Создать хранилище истории диалогов
+
+    Args:
+        max_messages: Максимум сообщений на поток
+        backend: "memory" или "redis" (при недоступном Redis используется memory)
+    """
+    if backend == BACKEND_REDIS:
+        try:
+            from services.helpers.redis_helper import get_redis_client
+
+            redis_client = get_redis_client()
+            if redis_client is not None:
+                log.info("✅ История диалогов LangGraph хранится в Redis")
+                return RedisConversationStore(redis_client, max_messages=max_messages)
+        except Exception as e:
+            log.warning(f"⚠️ Redis для истории диалогов недоступен: {e}")
+        log.warning("⚠️ История диалогов LangGraph хранится в памяти процесса")
+    elif backend != BACKEND_MEMORY:
+        log.warning(f"⚠️ Неизвестное хранилище истории '{backend}', используется {BACKEND_MEMORY}")
+    return InMemoryConversationStore(max_messages=max_messages)
@@ -5,7 +5,8 @@ LangGraph Conversation Workflow для генерации ответов с ис
 import os
 import sys
 import logging
-from typing import Dict, Any, Optional, List, TypedDict
+from contextlib import aclosing
+from typing import Dict, Any, Optional, List, TypedDict, AsyncIterator, Tuple
 from datetime import datetime
 
 # Добавляем корневую директорию проекта в sys.path
@@ -27,8 +28,18 @@ except ImportError:
     add_messages = None
     Annotated = None
 
+from backend.api.services.conversation_state_store import (
+    ConversationStateStore,
+    create_conversation_store,
+    to_compact_list
+)
+from services.helpers.graph_runtime import add_timed_node
+from services.helpers.blocking_io import run_blocking
+
 log = logging.getLogger(__name__)
 
+CONVERSATION_GRAPH_NAME = "conversation"
+
 
 class ConversationState(TypedDict):
     """Состояние для LangGraph conversation workflow с поддержкой add_messages"""
@@ -53,14 +64,57 @@ class ConversationState(TypedDict):
 class LangGraphConversationWorkflow:
     """
     LangGraph workflow для генерации ответов HR бота
-    Использует in-memory хранилище состояний по user_id
+    История хранится по потокам {user_id}_{platform} в ConversationStateStore
+    (память с LRU+TTL или Redis)
     """
     
-    def __init__(self, max_history_messages: int = 50):
+    def __init__(self, max_history_messages: int = 50, state_store: Optional[ConversationStateStore] = None):
         self.graph = None
+        self.prepare_graph = None
+        self._llm_client = None
         self._initialized = False
-        self._thread_states: Dict[str, Dict[str, Any]] = {}
         self.max_history_messages = max_history_messages
+        self.state_store = state_store or create_conversation_store(max_messages=max_history_messages)
+    
+    @staticmethod
+    def _thread_key(state: ConversationState) -> Optional[str]:
+        user_id = state.get("user_id")
+        if not user_id:
+            return None
+        return f"{user_id}_{state.get('platform') or 'telegram'}"
+    
+    def _save_message(self, state: ConversationState, role: str, content: str) -> None:
+        """Дописывает одно сообщение в историю потока"""
+        thread_key = self._thread_key(state)
+        if not thread_key or not content:
+            return
+        try:
+            self.state_store.append(thread_key, [{"role": role, "content": content}])
+        except Exception as e:
+            log.debug(f"Не удалось сохранить в хранилище: {e}")
+    
+    def _build_graph(self, with_generation: bool = True):
+        """Граф workflow (with_generation=False - только подготовка: история, классификация, RAG)"""
+        workflow = StateGraph(ConversationState)
+        
+        # Добавляем узлы (время узлов пишется в метрики graph_runtime)
+        add_timed_node(workflow, CONVERSATION_GRAPH_NAME, "trim_history", self._trim_history_node)
+        add_timed_node(workflow, CONVERSATION_GRAPH_NAME, "classify_query", self._classify_query_node)
+        add_timed_node(workflow, CONVERSATION_GRAPH_NAME, "search_rag", self._search_rag_node)
+        add_timed_node(workflow, CONVERSATION_GRAPH_NAME, "format_messages", self._format_messages_node)
+        
+        # Определяем поток выполнения
+        workflow.set_entry_point("trim_history")
+        workflow.add_edge("trim_history", "classify_query")
+        workflow.add_edge("classify_query", "search_rag")
+        workflow.add_edge("search_rag", "format_messages")
+        if with_generation:
+            add_timed_node(workflow, CONVERSATION_GRAPH_NAME, "generate_response", self._generate_response_node)
+            workflow.add_edge("format_messages", "generate_response")
+            workflow.add_edge("generate_response", END)
+        else:
+            workflow.add_edge("format_messages", END)
+        return workflow.compile()
     
     def initialize(self):
         """Инициализация LangGraph workflow"""
@@ -72,24 +126,10 @@ class LangGraphConversationWorkflow:
             return True
         
         try:
-            workflow = StateGraph(ConversationState)
-            
-            # Добавляем узлы
-            workflow.add_node("trim_history", self._trim_history_node)
-            workflow.add_node("classify_query", self._classify_query_node)
-            workflow.add_node("search_rag", self._search_rag_node)
-            workflow.add_node("format_messages", self._format_messages_node)
-            workflow.add_node("generate_response", self._generate_response_node)
-            
-            # Определяем поток выполнения
-            workflow.set_entry_point("trim_history")
-            workflow.add_edge("trim_history", "classify_query")
-            workflow.add_edge("classify_query", "search_rag")
-            workflow.add_edge("search_rag", "format_messages")
-            workflow.add_edge("format_messages", "generate_response")
-            workflow.add_edge("generate_response", END)
-            
-            self.graph = workflow.compile()
+            self.graph = self._build_graph(with_generation=True)
+            # Для потокового ответа граф останавливается перед генерацией,
+            # ответ LLM передается клиенту по мере получения (run_stream)
+            self.prepare_graph = self._build_graph(with_generation=False)
             self._initialized = True
             log.info("✅ LangGraph Conversation Workflow инициализирован")
             return True
@@ -100,37 +140,17 @@ class LangGraphConversationWorkflow:
     async def _trim_history_node(self, state: ConversationState) -> Dict[str, Any]:
         """Обрезает историю до последних N сообщений"""
         try:
-            user_id = state.get("user_id")
-            platform = state.get("platform", "telegram")
-            msgs = state.get("messages", [])
+            msgs = to_compact_list(state.get("messages", []))
+            thread_key = self._thread_key(state)
             
-            if user_id:
-                thread_key = f"{user_id}_{platform}"
-                prev_state = self._thread_states.get(thread_key, {})
-                prev_messages = prev_state.get("messages", [])
-                
-                if prev_messages:
-                    if isinstance(prev_messages[0], dict):
-                        if LANGCHAIN_MESSAGES_AVAILABLE:
-                            converted = []
-                            for msg in prev_messages:
-                                role = msg.get("role", "user")
-                                content = msg.get("content", "")
-                                if role == "user":
-                                    converted.append(HumanMessage(content=content))
-                                elif role == "assistant":
-                                    converted.append(AIMessage(content=content))
-                            prev_messages = converted
-                    msgs = list(prev_messages) + msgs
-                
-                msgs = msgs[-self.max_history_messages:] if len(msgs) > self.max_history_messages else msgs
-                self._thread_states[thread_key] = {"messages": msgs}
-                state["messages"] = msgs
-                log.debug(f"✅ История обрезана до {len(msgs)} сообщений")
-            else:
-                msgs = msgs[-self.max_history_messages:] if len(msgs) > self.max_history_messages else msgs
-                state["messages"] = msgs
+            if thread_key:
+                # Переданная история дописывается к сохраненной
+                self.state_store.append(thread_key, msgs)
+                msgs = self.state_store.get_messages(thread_key)
             
+            msgs = msgs[-self.max_history_messages:] if len(msgs) > self.max_history_messages else msgs
+            state["messages"] = msgs
+            log.debug(f"✅ История обрезана до {len(msgs)} сообщений")
             return state
         except Exception as e:
             log.error(f"❌ Ошибка обрезки истории: {e}")
@@ -139,24 +159,12 @@ class LangGraphConversationWorkflow:
     async def _classify_query_node(self, state: ConversationState) -> Dict[str, Any]:
         """Классификация запроса пользователя"""
         try:
-            current_message = state.get("current_message", "").lower()
-            
-            # Определяем тип запроса
-            pricing_keywords = ["цена", "стоимость", "стоит", "рублей", "руб", "прайс", 
-                               "сколько", "купить", "расценки", "тарифы", "от 90"]
-            booking_keywords = ["записаться", "запись", "бронь", "забронировать", 
-                               "хочу записаться", "назначить"]
-            service_keywords = ["услуга", "услуги", "что делаете", "что предлагаете",
-                               "форсайт", "коучинг", "консультация"]
+            current_message = state.get("current_message", "")
             
-            if any(kw in current_message for kw in pricing_keywords):
-                state["task_type"] = "pricing"
-            elif any(kw in current_message for kw in booking_keywords):
-                state["task_type"] = "booking"
-            elif any(kw in current_message for kw in service_keywords):
-                state["task_type"] = "service_info"
-            else:
-                state["task_type"] = "general"
+            # Определяем тип запроса по правилам из config/rag.yaml
+            from services.helpers.intent_rules import get_intent_rules
+            match = get_intent_rules().first(current_message, ("pricing", "booking", "service_info"))
+            state["task_type"] = match.intent if match else "general"
             
             log.info(f"📊 Тип запроса: {state['task_type']}")
             return state
@@ -177,7 +185,8 @@ class LangGraphConversationWorkflow:
                 
                 # Выполняем поиск
                 limit = 5 if task_type == "pricing" else 3
-                results = search_service(current_message, limit=limit)
+                # search_service синхронный - выполняем в пуле (общий лимит группы qdrant)
+                results = await run_blocking("qdrant", search_service, current_message, limit=limit)
                 
                 if results:
                     state["search_results"] = results
@@ -238,8 +247,6 @@ class LangGraphConversationWorkflow:
         try:
             messages = state.get("messages", [])
             current_message = state.get("current_message", "")
-            user_id = state.get("user_id")
-            platform = state.get("platform", "telegram")
             
             formatted_messages = []
             
@@ -249,39 +256,12 @@ class LangGraphConversationWorkflow:
                 formatted_messages.append({"role": "system", "content": system_prompt})
             
             # Добавляем историю сообщений
-            if messages:
-                for msg in messages:
-                    if LANGCHAIN_MESSAGES_AVAILABLE and (isinstance(msg, HumanMessage) or isinstance(msg, AIMessage)):
-                        role = "user" if isinstance(msg, HumanMessage) else "assistant"
-                        content = msg.content if hasattr(msg, 'content') else str(msg)
-                        if content:
-                            formatted_messages.append({"role": role, "content": content})
-                    elif isinstance(msg, dict):
-                        role = msg.get("role", "user")
-                        content = msg.get("content", msg.get("text", ""))
-                        if content:
-                            formatted_messages.append({"role": role, "content": content})
+            formatted_messages.extend(to_compact_list(messages))
             
             # Добавляем текущее сообщение
             if current_message:
                 formatted_messages.append({"role": "user", "content": current_message})
-                
-                # Сохраняем в in-memory хранилище
-                if user_id:
-                    try:
-                        thread_key = f"{user_id}_{platform}"
-                        prev_state = self._thread_states.get(thread_key, {})
-                        prev_messages = prev_state.get("messages", [])
-                        
-                        if LANGCHAIN_MESSAGES_AVAILABLE:
-                            prev_messages.append(HumanMessage(content=current_message))
-                        else:
-                            prev_messages.append({"role": "user", "content": current_message})
-                        
-                        prev_messages = prev_messages[-self.max_history_messages:]
-                        self._thread_states[thread_key] = {"messages": prev_messages}
-                    except Exception as e:
-                        log.debug(f"Не удалось сохранить в хранилище: {e}")
+                self._save_message(state, "user", current_message)
             
             state["formatted_messages"] = formatted_messages
             return state
@@ -289,19 +269,18 @@ class LangGraphConversationWorkflow:
             log.error(f"❌ Ошибка форматирования: {e}")
             return {"error": str(e)}
     
-    async def _generate_response_node(self, state: ConversationState) -> Dict[str, Any]:
-        """Генерация ответа через LLM"""
-        try:
-            formatted_messages = state.get("formatted_messages", [])
-            current_message = state.get("current_message", "")
-            task_type = state.get("task_type", "general")
-            rag_context = state.get("rag_context", "")
-            pricing_info = state.get("pricing_info", {})
-            
-            # Загружаем system prompt
-            system_prompt = state.get("system_prompt", "")
-            if not system_prompt:
-                system_prompt = """Ты — профессиональный HR ассистент Анастасии Новосёловой.
+    def _generation_prompts(self, state: ConversationState) -> Optional[Tuple[str, str, float]]:
+        """System prompt, промпт с контекстом RAG и температура для LLM (None - нечего отправлять)"""
+        formatted_messages = state.get("formatted_messages", [])
+        current_message = state.get("current_message", "")
+        task_type = state.get("task_type", "general")
+        rag_context = state.get("rag_context", "")
+        pricing_info = state.get("pricing_info", {})
+        
+        # Загружаем system prompt
+        system_prompt = state.get("system_prompt", "")
+        if not system_prompt:
+            system_prompt = """Ты — профессиональный HR ассистент Анастасии Новосёловой.
 КРИТИЧЕСКИ ВАЖНО - ПРЕДСТАВЛЕНИЕ:
 - ВСЕГДА представляйся как "Анастасия Новосёлова" (не "AI-ассистент", не "бот", а именно "Анастасия Новосёлова")
 - При приветствии говори: "Здравствуйте! Я Анастасия Новосёлова. Чем могу помочь?"
@@ -318,26 +297,26 @@ class LangGraphConversationWorkflow:
 - Если цена указана как "от X рублей" - используй ТОЧНО этот формат
 - Если цены нет в базе - скажи "уточнить цену"
 """
-            
-            if not formatted_messages:
-                if current_message:
-                    formatted_messages = [{"role": "user", "content": current_message}]
-                else:
-                    return {"response": "Не удалось сформировать сообщения.", "error": "Empty messages"}
-            
-            # Формируем промпт с контекстом
-            prompt_parts = []
-            
-            # Добавляем RAG контекст
-            if rag_context:
-                prompt_parts.append(f"Информация из базы знаний:\n{rag_context}")
-            
-            # Для ценовых запросов добавляем строгие инструкции
-            if task_type == "pricing" and pricing_info:
-                services = pricing_info.get("services", [])
-                if services:
-                    prices_text = "\n".join([f"- {s['title']}: {s['price']}" for s in services])
-                    prompt_parts.append(f"""
+        
+        if not formatted_messages:
+            if current_message:
+                formatted_messages = [{"role": "user", "content": current_message}]
+            else:
+                return None
+        
+        # Формируем промпт с контекстом
+        prompt_parts = []
+        
+        # Добавляем RAG контекст
+        if rag_context:
+            prompt_parts.append(f"Информация из базы знаний:\n{rag_context}")
+        
+        # Для ценовых запросов добавляем строгие инструкции
+        if task_type == "pricing" and pricing_info:
+            services = pricing_info.get("services", [])
+            if services:
+                prices_text = "\n".join([f"- {s['title']}: {s['price']}" for s in services])
+                prompt_parts.append(f"""
 ТОЧНЫЕ ЦЕНЫ ИЗ БАЗЫ ДАННЫХ:
 {prices_text}
 
@@ -350,26 +329,39 @@ class LangGraphConversationWorkflow:
 - Используй ТОЧНО указанные цены
 - Формат: "от X рублей" или "X рублей"
 """)
+        
+        # Добавляем текущее сообщение
+        prompt_parts.append(f"Сообщение пользователя: {current_message}")
+        
+        user_prompt = "\n\n".join(prompt_parts) if prompt_parts else current_message
+        
+        # Для ценовых запросов используем низкую температуру
+        temperature = 0.3 if task_type == "pricing" else 0.7
+        return system_prompt, user_prompt, temperature
+    
+    def _get_llm_client(self):
+        """LLM клиент workflow (создается один раз)"""
+        if self._llm_client is None:
+            from services.helpers.llm_api import LLMClient
             
-            # Добавляем текущее сообщение
-            prompt_parts.append(f"Сообщение пользователя: {current_message}")
-            
-            user_prompt = "\n\n".join(prompt_parts) if prompt_parts else current_message
+            self._llm_client = LLMClient(
+                primary_provider="openrouter",
+                primary_model="deepseek/deepseek-chat",
+                timeout=30
+            )
+        return self._llm_client
+    
+    async def _generate_response_node(self, state: ConversationState) -> Dict[str, Any]:
+        """Генерация ответа через LLM"""
+        try:
+            prompts = self._generation_prompts(state)
+            if prompts is None:
+                return {"response": "Не удалось сформировать сообщения.", "error": "Empty messages"}
+            system_prompt, user_prompt, temperature = prompts
             
             # Генерируем ответ через LLM
             try:
-                from llm_api import LLMClient
-                
-                llm_client = LLMClient(
-                    primary_provider="openrouter",
-                    primary_model="deepseek/deepseek-chat",
-                    timeout=30
-                )
-                
-                # Для ценовых запросов используем низкую температуру
-                temperature = 0.3 if task_type == "pricing" else 0.7
-                
-                response = await llm_client.generate(
+                response = await self._get_llm_client().generate(
                     prompt=user_prompt,
                     system_prompt=system_prompt,
                     temperature=temperature,
@@ -394,24 +386,8 @@ class LangGraphConversationWorkflow:
                     return {"response": "Извините, сервис временно недоступен.", "error": str(fallback_error)}
             
             # Сохраняем ответ в хранилище
-            user_id = state.get("user_id")
-            platform = state.get("platform", "telegram")
-            
-            if user_id and answer:
-                try:
-                    thread_key = f"{user_id}_{platform}"
-                    prev_state = self._thread_states.get(thread_key, {})
-                    prev_messages = prev_state.get("messages", [])
-                    
-                    if LANGCHAIN_MESSAGES_AVAILABLE:
-                        prev_messages.append(AIMessage(content=answer))
-                    else:
-                        prev_messages.append({"role": "assistant", "content": answer})
-                    
-                    prev_messages = prev_messages[-self.max_history_messages:]
-                    self._thread_states[thread_key] = {"messages": prev_messages}
-                except Exception as e:
-                    log.debug(f"Не удалось сохранить ответ: {e}")
+            if answer:
+                self._save_message(state, "assistant", answer)
             
             return {"response": answer}
             
@@ -419,6 +395,51 @@ class LangGraphConversationWorkflow:
             log.error(f"❌ Ошибка генерации: {e}", exc_info=True)
             return {"response": "Извините, произошла ошибка.", "error": str(e)}
     
+    @staticmethod
+    def _initial_state(
+        message: str,
+        message_history: Optional[List[Dict[str, str]]],
+        system_prompt: Optional[str],
+        task_type: str,
+        user_name: Optional[str],
+        bot_already_introduced: bool,
+        needs_user_name: bool,
+        user_id: Optional[str],
+        platform: str
+    ) -> ConversationState:
+        """Начальное состояние workflow"""
+        # Загружаем system prompt если не передан
+        if not system_prompt:
+            system_prompt = """Ты — профессиональный HR ассистент.
+Отвечай ТОЛЬКО НА РУССКОМ ЯЗЫКЕ.
+Будь вежливым и профессиональным.
+Помогай клиентам с вопросами об услугах, ценах и записи.
+
+КРИТИЧНО:
+- Используй ТОЛЬКО точные цены из базы данных
+- НЕ выдумывай цены
+- Если цены нет - скажи "уточнить цену"
+"""
+        
+        # Формируем начальное состояние
+        initial_state: ConversationState = {
+            "messages": message_history or [],
+            "current_message": message,
+            "system_prompt": system_prompt,
+            "task_type": task_type,
+            "response": None,
+            "error": None,
+            "user_name": user_name,
+            "user_id": user_id,
+            "platform": platform,
+            "bot_already_introduced": bot_already_introduced,
+            "needs_user_name": needs_user_name,
+            "rag_context": None,
+            "search_results": None,
+            "pricing_info": None
+        }
+        return initial_state
+    
     async def run(
         self,
         message: str,
@@ -459,36 +480,10 @@ class LangGraphConversationWorkflow:
                 }
         
         try:
-            # Загружаем system prompt если не передан
-            if not system_prompt:
-                system_prompt = """Ты — профессиональный HR ассистент.
-Отвечай ТОЛЬКО НА РУССКОМ ЯЗЫКЕ.
-Будь вежливым и профессиональным.
-Помогай клиентам с вопросами об услугах, ценах и записи.
-
-КРИТИЧНО:
-- Используй ТОЛЬКО точные цены из базы данных
-- НЕ выдумывай цены
-- Если цены нет - скажи "уточнить цену"
-"""
-            
-            # Формируем начальное состояние
-            initial_state: ConversationState = {
-                "messages": message_history or [],
-                "current_message": message,
-                "system_prompt": system_prompt,
-                "task_type": task_type,
-                "response": None,
-                "error": None,
-                "user_name": user_name,
-                "user_id": user_id,
-                "platform": platform,
-                "bot_already_introduced": bot_already_introduced,
-                "needs_user_name": needs_user_name,
-                "rag_context": None,
-                "search_results": None,
-                "pricing_info": None
-            }
+            initial_state = self._initial_state(
+                message, message_history, system_prompt, task_type, user_name,
+                bot_already_introduced, needs_user_name, user_id, platform
+            )
             
             # Запускаем workflow
             result = await self.graph.ainvoke(initial_state)
@@ -512,6 +507,85 @@ class LangGraphConversationWorkflow:
                 "status": "error"
             }
 
+    
+    async def run_stream(
+        self,
+        message: str,
+        message_history: Optional[List[Dict[str, str]]] = None,
+        system_prompt: Optional[str] = None,
+        task_type: str = "general",
+        user_name: Optional[str] = None,
+        bot_already_introduced: bool = False,
+        needs_user_name: bool = False,
+        user_id: Optional[str] = None,
+        platform: str = "telegram"
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Потоковый вариант run: события (имя, данные)
+        
+        - "retrieval": тип запроса, результаты RAG и цены (после графа подготовки)
+        - "delta": фрагмент ответа {"content": str}
+        - "done": итог в формате результата run
+        
+        Если клиент закрывает поток, генерация LLM прерывается, а неполный
+        ответ не сохраняется в историю.
+        """
+        log.info(f"📨 LangGraph Conversation Workflow (stream) запущен, task_type={task_type}")
+        
+        if not self._initialized and not self.initialize():
+            yield "done", {
+                "response": "LangGraph недоступен",
+                "error": "LangGraph не инициализирован",
+                "status": "error"
+            }
+            return
+        
+        state = await self.prepare_graph.ainvoke(self._initial_state(
+            message, message_history, system_prompt, task_type, user_name,
+            bot_already_introduced, needs_user_name, user_id, platform
+        ))
+        task_type = state.get("task_type", task_type)
+        yield "retrieval", {
+            "task_type": task_type,
+            "search_results": state.get("search_results") or [],
+            "pricing_info": state.get("pricing_info")
+        }
+        
+        prompts = self._generation_prompts(state)
+        response = None
+        if prompts is not None:
+            system_prompt, user_prompt, temperature = prompts
+            async with aclosing(self._get_llm_client().generate_stream(
+                prompt=user_prompt,
+                system_prompt=system_prompt,
+                temperature=temperature,
+                max_tokens=2048
+            )) as chunks:
+                async for chunk in chunks:
+                    if chunk.response is None:
+                        yield "delta", {"content": chunk.delta}
+                    else:
+                        response = chunk.response
+        
+        error = "Empty messages" if response is None else response.error
+        answer = response.content.strip() if response is not None and response.content else ""
+        if error:
+            log.error(f"❌ Ошибка LLM: {error}")
+            if not answer:
+                answer = "Извините, произошла ошибка."
+                yield "delta", {"content": answer}
+        else:
+            self._save_message(state, "assistant", answer)
+        log.info(f"✅ LangGraph завершил потоковую генерацию, length={len(answer)}")
+        
+        yield "done", {
+            "response": answer,
+            "error": error,
+            "status": "success" if not error else "error",
+            "task_type": task_type,
+            "pricing_info": state.get("pricing_info"),
+            "search_results": state.get("search_results")
+        }
 
 # Глобальный экземпляр workflow
 _conversation_workflow: Optional[LangGraphConversationWorkflow] = None
@@ -551,3 +625,24 @@ async def query_with_conversation_workflow(
         platform=platform,
         message_history=message_history
     )
+
+
+def stream_with_conversation_workflow(
+    message: str,
+    user_id: str = None,
+    platform: str = "telegram",
+    message_history: List[Dict[str, str]] = None
+) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Потоковый вариант query_with_conversation_workflow
+    
+    Returns:
+        Асинхронный генератор событий retrieval / delta / done
+    """
+    workflow = get_conversation_workflow()
+    return workflow.run_stream(
+        message=message,
+        user_id=user_id,
+        platform=platform,
+        message_history=message_history
+    )
@@ -0,0 +1,459 @@
+"""
+Хранилище уведомлений Mini App и веб-интерфейса
+
+Уведомления пользователя индексируются по времени создания, непрочитанные -
+отдельным индексом, поэтому страница списка и счетчик непрочитанных не
+требуют сортировки и пересчета всего списка на каждом запросе:
+- memory: отсортированный список (bisect) и множество непрочитанных в процессе
+- redis: sorted set на пользователя (score = timestamp), sorted set
+  непрочитанных (ZCARD - счетчик) и hash с JSON уведомлений; изменения
+  (вместе с удалением старых уведомлений) выполняются в одном MULTI,
+  данные общие для всех воркеров и переживают рестарт
+
+Каждое изменение увеличивает версию пользователя - по ней notification_events
+отдает SSE поток счетчика непрочитанных вместо периодического опроса. В Redis
+об изменении сообщает pub/sub (канал notifications:changes), версия
+перечитывается раз в NOTIFICATIONS_POLL_INTERVAL только как запасной вариант.
+
+Вызовы Redis синхронные: из event loop они выполняются через store.call()
+(пул потоков blocking_io), а не напрямую.
+
+Выбор хранилища: NOTIFICATIONS_BACKEND (redis | memory, при недоступном
+Redis используется memory).
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from bisect import insort
+from datetime import datetime
+from typing import Any, Awaitable, AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
+
+from services.helpers.sse import sse_event
+
+log = logging.getLogger(__name__)
+
+NOTIFICATIONS_BACKEND = os.getenv("NOTIFICATIONS_BACKEND", "redis").lower()
+NOTIFICATIONS_MAX_PER_USER = int(os.getenv("NOTIFICATIONS_MAX_PER_USER", "50"))
+NOTIFICATIONS_TTL = int(os.getenv("NOTIFICATIONS_TTL", str(30 * 86400)))  # Секунды без новых уведомлений
+NOTIFICATIONS_POLL_INTERVAL = float(os.getenv("NOTIFICATIONS_POLL_INTERVAL", "1"))  # Проверка версии без pub/sub
+NOTIFICATIONS_PUBSUB_POLL_INTERVAL = float(os.getenv("NOTIFICATIONS_PUBSUB_POLL_INTERVAL", "30"))  # С pub/sub
+NOTIFICATIONS_STREAM_HEARTBEAT = float(os.getenv("NOTIFICATIONS_STREAM_HEARTBEAT", "25"))
+REDIS_KEY_PREFIX = "notifications:"
+REDIS_CHANGES_CHANNEL = "notifications:changes"
+
+# Удаление уведомлений сверх лимита внутри MULTI вместе с добавлением
+# KEYS: index, unread, items, read; ARGV: max_per_user
+TRIM_SCRIPT = """
+local overflow = redis.call('ZRANGE', KEYS[1], 0, -(tonumber(ARGV[1]) + 1))
+if #overflow > 0 then
+    redis.call('ZREM', KEYS[1], unpack(overflow))
+    redis.call('ZREM', KEYS[2], unpack(overflow))
+    redis.call('HDEL', KEYS[3], unpack(overflow))
+    redis.call('HDEL', KEYS[4], unpack(overflow))
+end
+return #overflow
+"""
+
+BACKEND_MEMORY = "memory"
+BACKEND_REDIS = "redis"
+
+
+def _score(created_at: str) -> float:
+    try:
+        return datetime.fromisoformat(created_at).timestamp()
+    except (TypeError, ValueError):
+        return time.time()
+
+
+def prepare_notification(user_id: str, notification: Dict[str, Any]) -> Tuple[Dict[str, Any], float]:
+    """Дополняет уведомление id, created_at и read (как раньше _add_notification)"""
+    now = datetime.now()
+    if "id" not in notification:
+        notification["id"] = f"{user_id}_{now.timestamp()}"
+    if "created_at" not in notification:
+        notification["created_at"] = now.isoformat()
+    if "read" not in notification:
+        notification["read"] = False
+    return notification, _score(notification["created_at"])
+
+
+class NotificationStore:
+    """Базовый интерфейс хранилища уведомлений"""
+
+    backend = ""
+    # Как часто ожидающие проверяют версию сами (изменения из других процессов)
+    poll_interval: Optional[float] = None
+    # Группа blocking_io для синхронных вызовов из event loop (None - вызов в памяти, без пула)
+    blocking_route: Optional[str] = None
+
+    def __init__(self, max_per_user: int = NOTIFICATIONS_MAX_PER_USER):
+        self.max_per_user = max_per_user
+        self._waiters: Dict[str, Set[asyncio.Future]] = {}
+        self._waiters_lock = threading.Lock()
+
+    def add(self, user_id: str, notification: Dict[str, Any]) -> Dict[str, Any]:
+        """Добавляет уведомление (хранятся последние max_per_user)"""
+        raise NotImplementedError
+
+    def list(self, user_id: str, limit: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
+        """Страница уведомлений, новые первыми"""
+        raise NotImplementedError
+
+    def total(self, user_id: str) -> int:
+        raise NotImplementedError
+
+    def unread_count(self, user_id: str) -> int:
+        raise NotImplementedError
+
+    def mark_read(self, user_id: str, notification_id: Optional[str] = None) -> int:
+        """Отмечает уведомление (или все при notification_id=None) прочитанным, возвращает число отмеченных"""
+        raise NotImplementedError
+
+    def version(self, user_id: str) -> int:
+        """Номер изменения уведомлений пользователя"""
+        raise NotImplementedError
+
+    def summary(self, user_id: str) -> Dict[str, int]:
+        """Число непрочитанных и всех уведомлений"""
+        return {"unread_count": self.unread_count(user_id), "total": self.total(user_id)}
+
+    async def call(self, method: str, *args, **kwargs) -> Any:
+        """Вызов метода хранилища из event loop (Redis - в пуле потоков, loop не блокируется)"""
+        func = getattr(self, method)
+        if self.blocking_route is None:
+            return func(*args, **kwargs)
+        from services.helpers.blocking_io import run_blocking
+        return await run_blocking(self.blocking_route, func, *args, **kwargs)
+
+    def _on_wait(self) -> None:
+        """Перед ожиданием изменений (Redis запускает подписку pub/sub)"""
+
+    def stats(self) -> Dict[str, Any]:
+        with self._waiters_lock:
+            waiters = sum(len(futures) for futures in self._waiters.values())
+        return {"backend": self.backend, "max_per_user": self.max_per_user, "waiters": waiters}
+
+    # ===================== ОЖИДАНИЕ ИЗМЕНЕНИЙ =====================
+
+    def _notify(self, user_id: str) -> None:
+        with self._waiters_lock:
+            futures = self._waiters.pop(user_id, set())
+        for future in futures:
+            future.get_loop().call_soon_threadsafe(_resolve, future)
+
+    async def wait_for_change(self, user_id: str, version: Optional[int], timeout: float) -> int:
+        """
+        Ждет изменения уведомлений пользователя
+
+        Args:
+            version: Известная клиенту версия (None - вернуть текущую сразу)
+            timeout: Максимальное ожидание в секундах
+
+        Returns:
+            Текущая версия (равна version, если за timeout ничего не изменилось)
+        """
+        self._on_wait()
+        deadline = time.monotonic() + timeout
+        loop = asyncio.get_running_loop()
+        while True:
+            current = await self.call("version", user_id)
+            remaining = deadline - time.monotonic()
+            if current != version or remaining <= 0:
+                return current
+            future = loop.create_future()
+            with self._waiters_lock:
+                self._waiters.setdefault(user_id, set()).add(future)
+            try:
+                wait = remaining if self.poll_interval is None else min(remaining, self.poll_interval)
+                await asyncio.wait_for(future, wait)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self._waiters_lock:
+                    futures = self._waiters.get(user_id)
+                    if futures is not None:
+                        futures.discard(future)
+                        if not futures:
+                            del self._waiters[user_id]
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class InMemoryNotificationStore(NotificationStore):
+    """Уведомления в памяти процесса (без Redis)"""
+
+    backend = BACKEND_MEMORY
+
+    def __init__(self, max_per_user: int = NOTIFICATIONS_MAX_PER_USER):
+        super().__init__(max_per_user)
+        self._items: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._index: Dict[str, List[Tuple[float, str]]] = {}  # По возрастанию времени
+        self._unread: Dict[str, Set[str]] = {}
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _changed(self, user_id: str) -> None:
+        self._versions[user_id] = self._versions.get(user_id, 0) + 1
+
+    def add(self, user_id: str, notification: Dict[str, Any]) -> Dict[str, Any]:
+        notification, score = prepare_notification(user_id, notification)
+        notification_id = notification["id"]
+        with self._lock:
+            items = self._items.setdefault(user_id, {})
+            index = self._index.setdefault(user_id, [])
+            unread = self._unread.setdefault(user_id, set())
+            if notification_id in items:
+                index.remove(next(entry for entry in index if entry[1] == notification_id))
+                unread.discard(notification_id)
+            items[notification_id] = notification
+            insort(index, (score, notification_id))
+            if not notification["read"]:
+                unread.add(notification_id)
+            while len(index) > self.max_per_user:
+                _, old_id = index.pop(0)
+                items.pop(old_id, None)
+                unread.discard(old_id)
+            self._changed(user_id)
+        self._notify(user_id)
+        return notification
+
+    def list(self, user_id: str, limit: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
+        with self._lock:
+            index = self._index.get(user_id, [])
+            end = len(index) - max(offset, 0)
+            page = index[max(end - limit, 0):max(end, 0)]
+            items = self._items.get(user_id, {})
+            return [dict(items[notification_id]) for _, notification_id in reversed(page)]
+
+    def total(self, user_id: str) -> int:
+        with self._lock:
+            return len(self._index.get(user_id, []))
+
+    def unread_count(self, user_id: str) -> int:
+        with self._lock:
+            return len(self._unread.get(user_id, ()))
+
+    def mark_read(self, user_id: str, notification_id: Optional[str] = None) -> int:
+        read_at = datetime.now().isoformat()
+        with self._lock:
+            unread = self._unread.get(user_id, set())
+            ids = [notification_id] if notification_id else list(unread)
+            marked = [i for i in ids if i in unread]
+            items = self._items.get(user_id, {})
+            for i in marked:
+                unread.discard(i)
+                items[i]["read"] = True
+                items[i]["read_at"] = read_at
+            if marked:
+                self._changed(user_id)
+        if marked:
+            self._notify(user_id)
+        return len(marked)
+
+    def version(self, user_id: str) -> int:
+        with self._lock:
+            return self._versions.get(user_id, 0)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            users = len(self._index)
+        return {**super().stats(), "users": users}
+
+
+class RedisNotificationStore(NotificationStore):
+    """Уведомления в Redis: общие для всех воркеров backend и веб-интерфейса"""
+
+    backend = BACKEND_REDIS
+    blocking_route = "redis"
+
+    def __init__(self, redis_client, max_per_user: int = NOTIFICATIONS_MAX_PER_USER, ttl: int = NOTIFICATIONS_TTL):
+        super().__init__(max_per_user)
+        self.redis = redis_client
+        self.ttl = ttl
+        self._listener: Optional[threading.Thread] = None
+        self._listener_lock = threading.Lock()
+        self._subscribed = False
+
+    @property
+    def poll_interval(self) -> float:
+        return NOTIFICATIONS_PUBSUB_POLL_INTERVAL if self._subscribed else NOTIFICATIONS_POLL_INTERVAL
+
+    def _on_wait(self) -> None:
+        if self._listener is None:
+            with self._listener_lock:
+                if self._listener is None:
+                    self._listener = threading.Thread(target=self._listen, daemon=True, name="notifications-pubsub")
+                    self._listener.start()
+
+    def _listen(self) -> None:
+        """Будит ожидающих этого процесса при изменениях из любого воркера"""
+        while True:
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(REDIS_CHANGES_CHANNEL)
+                self._subscribed = True
+                for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self._notify(str(message["data"]))
+            except Exception as e:
+                log.warning(f"⚠️ Подписка на изменения уведомлений прервана: {e}, опрос раз в {NOTIFICATIONS_POLL_INTERVAL} с")
+            self._subscribed = False
+            time.sleep(NOTIFICATIONS_PUBSUB_POLL_INTERVAL)
+
+    def _keys(self, user_id: str) -> Dict[str, str]:
+        prefix = f"{REDIS_KEY_PREFIX}{user_id}:"
+        return {name: prefix + name for name in ("index", "unread", "items", "read", "version")}
+
+    def add(self, user_id: str, notification: Dict[str, Any]) -> Dict[str, Any]:
+        notification, score = prepare_notification(user_id, notification)
+        notification_id = notification["id"]
+        keys = self._keys(user_id)
+        stored = {key: value for key, value in notification.items() if key not in ("read", "read_at")}
+
+        pipe = self.redis.pipeline()
+        pipe.hset(keys["items"], notification_id, json.dumps(stored, ensure_ascii=False))
+        pipe.zadd(keys["index"], {notification_id: score})
+        if notification["read"]:
+            pipe.zrem(keys["unread"], notification_id)
+            pipe.hset(keys["read"], notification_id, notification.get("read_at") or notification["created_at"])
+        else:
+            pipe.zadd(keys["unread"], {notification_id: score})
+            pipe.hdel(keys["read"], notification_id)
+        pipe.incr(keys["version"])
+        for key in keys.values():
+            pipe.expire(key, self.ttl)
+        pipe.eval(TRIM_SCRIPT, 4, keys["index"], keys["unread"], keys["items"], keys["read"], self.max_per_user)
+        pipe.publish(REDIS_CHANGES_CHANNEL, user_id)
+        pipe.execute()
+        self._notify(user_id)
+        return notification
+
+    def list(self, user_id: str, limit: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
+        if limit <= 0:
+            return []
+        keys = self._keys(user_id)
+        start = max(offset, 0)
+        ids = self.redis.zrevrange(keys["index"], start, start + limit - 1)
+        if not ids:
+            return []
+        pipe = self.redis.pipeline()
+        pipe.hmget(keys["items"], ids)
+        pipe.hmget(keys["read"], ids)
+        raw_items, read_at = pipe.execute()
+
+        notifications = []
+        for raw, read in zip(raw_items, read_at):
+            try:
+                notification = json.loads(raw)
+            except (TypeError, ValueError):
+                continue
+            notification["read"] = read is not None
+            if read is not None:
+                notification["read_at"] = read
+            notifications.append(notification)
+        return notifications
+
+    def total(self, user_id: str) -> int:
+        return self.redis.zcard(self._keys(user_id)["index"])
+
+    def unread_count(self, user_id: str) -> int:
+        return self.redis.zcard(self._keys(user_id)["unread"])
+
+    def mark_read(self, user_id: str, notification_id: Optional[str] = None) -> int:
+        keys = self._keys(user_id)
+        if notification_id:
+            ids = [notification_id] if self.redis.zscore(keys["unread"], notification_id) is not None else []
+        else:
+            ids = self.redis.zrange(keys["unread"], 0, -1)
+        if not ids:
+            return 0
+        read_at = datetime.now().isoformat()
+        pipe = self.redis.pipeline()
+        pipe.zrem(keys["unread"], *ids)
+        pipe.hset(keys["read"], mapping={i: read_at for i in ids})
+        pipe.incr(keys["version"])
+        pipe.publish(REDIS_CHANGES_CHANNEL, user_id)
+        marked = pipe.execute()[0]
+        self._notify(user_id)
+        return marked
+
+    def version(self, user_id: str) -> int:
+        return int(self.redis.get(self._keys(user_id)["version"]) or 0)
+
+    def summary(self, user_id: str) -> Dict[str, int]:
+        keys = self._keys(user_id)
+        pipe = self.redis.pipeline()
+        pipe.zcard(keys["unread"])
+        pipe.zcard(keys["index"])
+        unread_count, total = pipe.execute()
+        return {"unread_count": unread_count, "total": total}
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "pubsub": self._subscribed}
+
+
+def create_notification_store(backend: str = NOTIFICATIONS_BACKEND) -> NotificationStore:
+    """
+    Создать хранилище уведомлений
+
+    Args:
+        backend: "redis" или "memory" (при недоступном Redis используется memory)
+    """
+    if backend == BACKEND_REDIS:
+        try:
+            from services.helpers.redis_helper import get_redis_client
+
+            redis_client = get_redis_client()
+            if redis_client is not None:
+                log.info("✅ Уведомления хранятся в Redis")
+                return RedisNotificationStore(redis_client)
+        except Exception as e:
+            log.warning(f"⚠️ Redis для уведомлений недоступен: {e}")
+        log.warning("⚠️ Уведомления хранятся в памяти процесса")
+    elif backend != BACKEND_MEMORY:
+        log.warning(f"⚠️ Неизвестное хранилище уведомлений '{backend}', используется {BACKEND_MEMORY}")
+    return InMemoryNotificationStore()
+
+
+_notification_store: Optional[NotificationStore] = None
+_notification_store_lock = threading.Lock()
+
+
+def get_notification_store() -> NotificationStore:
+    """Общее хранилище уведомлений процесса (Singleton)"""
+    global _notification_store
+    if _notification_store is None:
+        with _notification_store_lock:
+            if _notification_store is None:
+                _notification_store = create_notification_store()
+    return _notification_store
+
+
+async def notification_events(
+    store: NotificationStore,
+    user_id: str,
+    is_disconnected: Callable[[], Awaitable[bool]],
+    heartbeat: float = NOTIFICATIONS_STREAM_HEARTBEAT
+) -> AsyncIterator[str]:
+    """
+    SSE поток счетчика непрочитанных уведомлений
+
+    Первое событие unread отправляется сразу, следующие - при каждом
+    изменении; без изменений раз в heartbeat секунд идет комментарий,
+    чтобы прокси не закрывали соединение.
+    """
+    version = None
+    while not await is_disconnected():
+        current = await store.wait_for_change(user_id, version, heartbeat)
+        if current == version:
+            yield ": keepalive\n\n"
+            continue
+        version = current
+        payload = {**await store.call("summary", user_id), "version": version}
+        yield sse_event("unread", payload)
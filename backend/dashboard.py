@@ -24,6 +24,7 @@ from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
 # Импорты RAG сервисов
 from services.rag.qdrant_loader import QdrantLoader
 from services.rag.rag_chain import RAGChain
+from services.helpers.blocking_io import run_blocking
 
 load_dotenv()
 
@@ -257,7 +258,7 @@ async def get_vectordb_info() -> VectorDBInfo:
     """Получает информацию о векторной БД"""
     try:
         loader = get_qdrant_loader()
-        info = loader.get_collection_info()
+        info = await run_blocking("qdrant", loader.get_collection_info)
         # Преобразуем name в collection_name для модели
         if "name" in info:
             info["collection_name"] = info.pop("name")
@@ -273,7 +274,9 @@ async def get_sources() -> List[Dict[str, Any]]:
     try:
         loader = get_qdrant_loader()
         # Получаем все точки для анализа источников
-        scroll_result = loader.client.scroll(
+        scroll_result = await run_blocking(
+            "qdrant",
+            loader.client.scroll,
             collection_name=loader.collection_name,
             limit=10000,
             with_payload=True,
@@ -631,8 +634,8 @@ async def delete_source(source_url: str):
             points_selector=point_ids
         )
         
-        # Помечаем BM25 индекс для перестроения
-        loader._bm25_needs_rebuild = True
+        # Помечаем BM25 индекс для перестроения и сбрасываем кэш поиска
+        loader.mark_index_changed()
         
         logger.info(f"Deleted {points_count} points with source_url: {source_url}")
         
@@ -667,6 +670,15 @@ async def test_query(query: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/test/query/stream")
+async def test_query_stream(query: str, request: Request):
+    """Тестовый запрос к RAG системе с потоковым ответом (SSE: retrieval, delta, done)"""
+    from services.helpers.sse import sse_response
+    
+    chain = get_rag_chain()
+    return sse_response(chain.query_stream(query), request, name="/api/test/query/stream")
+
+
 @app.get("/api/parameters")
 async def get_parameters():
     """Получает текущие параметры RAG"""
@@ -0,0 +1,128 @@
+"""
+Хранение оценок RAGAS в PostgreSQL (таблица rag_evaluations)
+"""
+import math
+import numbers
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import sessionmaker
+
+from backend.database.models_sqlalchemy import RAGEvaluation, get_engine
+
+log = logging.getLogger(__name__)
+
+_session_factory = None
+_session_factory_lock = threading.Lock()
+
+
+def _get_session():
+    # Один engine (и пул соединений) на процесс: оценки пишутся из фонового воркера
+    global _session_factory
+    if _session_factory is None:
+        with _session_factory_lock:
+            if _session_factory is None:
+                _session_factory = sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+    return _session_factory()
+
+
+SCORE_COLUMNS = ("faithfulness", "answer_relevancy", "context_precision", "context_recall", "average_score")
+
+
+def _score(value: Any) -> Optional[float]:
+    # NaN (метрика не посчитана) и numpy значения не сериализуются в JSON и не нужны в колонках
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) or math.isinf(value) else value
+
+
+def save_rag_evaluation(
+    question: str,
+    answer: str,
+    scores: Dict[str, Any],
+    answered_at: datetime,
+    contexts_count: int = 0,
+    user_id: Optional[int] = None,
+    platform: str = "telegram",
+    evaluation_ms: Optional[int] = None
+) -> Optional[int]:
+    """
+    Сохранить оценку RAG ответа
+
+    Args:
+        scores: faithfulness, answer_relevancy, context_precision, context_recall,
+            average_score и details (метрики RAGAS); NaN сохраняется как NULL,
+            в details остаются только числовые значения
+
+    Returns:
+        ID записи или None при ошибке
+    """
+    columns = {name: _score(scores.get(name)) for name in SCORE_COLUMNS}
+    details = {
+        name: _score(value) for name, value in (scores.get("details") or {}).items()
+        if isinstance(value, numbers.Real)
+    }
+    session = _get_session()
+    try:
+        evaluation = RAGEvaluation(
+            user_id=user_id,
+            platform=platform,
+            question=question,
+            answer=answer,
+            contexts_count=contexts_count,
+            **columns,
+            details_json=details or None,
+            evaluation_ms=evaluation_ms,
+            answered_at=answered_at
+        )
+        session.add(evaluation)
+        session.commit()
+        return evaluation.id
+    except SQLAlchemyError as e:
+        session.rollback()
+        log.error(f"❌ Ошибка сохранения оценки RAGAS в PostgreSQL: {e}")
+        return None
+    finally:
+        session.close()
+
+
+def get_rag_evaluation_trend(days: int = 30, platform: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Средние оценки RAGAS по дням (для графиков качества)
+
+    Returns:
+        [{"day": "2026-01-01", "count": int, "faithfulness": float, ...}] от старых к новым
+    """
+    session = _get_session()
+    try:
+        day = func.date(RAGEvaluation.answered_at)
+        query = session.query(
+            day.label("day"),
+            func.count(RAGEvaluation.id),
+            func.avg(RAGEvaluation.faithfulness),
+            func.avg(RAGEvaluation.answer_relevancy),
+            func.avg(RAGEvaluation.context_precision),
+            func.avg(RAGEvaluation.average_score)
+        ).filter(RAGEvaluation.answered_at >= datetime.utcnow() - timedelta(days=days))
+        if platform:
+            query = query.filter(RAGEvaluation.platform == platform)
+        rows = query.group_by(day).order_by(day).all()
+        return [
+            {
+                "day": str(row[0]),
+                "count": row[1],
+                "faithfulness": round(float(row[2]), 3) if row[2] is not None else None,
+                "answer_relevancy": round(float(row[3]), 3) if row[3] is not None else None,
+                "context_precision": round(float(row[4]), 3) if row[4] is not None else None,
+                "average_score": round(float(row[5]), 3) if row[5] is not None else None
+            }
+            for row in rows
+        ]
+    finally:
+        session.close()
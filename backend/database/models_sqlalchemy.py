@@ -1,7 +1,7 @@
 """
 SQLAlchemy модели для базы данных
 """
-from sqlalchemy import create_engine, Column, Integer, BigInteger, String, Text, DateTime, Boolean, JSON, ForeignKey, Index
+from sqlalchemy import create_engine, Column, Integer, BigInteger, String, Text, DateTime, Boolean, Float, JSON, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
@@ -110,6 +110,38 @@ class EmailSubscriber(Base):
         return f"<EmailSubscriber(user_id={self.user_id}, subscribed_at={self.subscribed_at})>"
 
 
+class RAGEvaluation(Base):
+    """Оценка RAG ответа метриками RAGAS (выборка ответов, оценивается в фоне)"""
+    __tablename__ = "rag_evaluations"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(BigInteger, nullable=True, index=True)
+    platform = Column(String(50), default="telegram")
+    
+    question = Column(Text, nullable=False)
+    answer = Column(Text, nullable=False)
+    contexts_count = Column(Integer, default=0)
+    
+    # Метрики RAGAS (0-1); context_recall только при наличии ground truth
+    faithfulness = Column(Float, nullable=True)
+    answer_relevancy = Column(Float, nullable=True)
+    context_precision = Column(Float, nullable=True)
+    context_recall = Column(Float, nullable=True)
+    average_score = Column(Float, nullable=True)
+    details_json = Column(JSON, nullable=True)
+    
+    evaluation_ms = Column(Integer, nullable=True)  # Время оценки
+    answered_at = Column(DateTime, nullable=False, index=True)  # Когда был отправлен ответ
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    __table_args__ = (
+        Index('idx_rag_evaluations_platform_answered', 'platform', 'answered_at'),
+    )
+    
+    def __repr__(self):
+        return f"<RAGEvaluation(id={self.id}, average_score={self.average_score})>"
+
+
 # Функция для получения engine
 def get_engine():
     """Получить SQLAlchemy engine"""
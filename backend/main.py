@@ -12,7 +12,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from datetime import datetime
 
 # CollectorApi: проверка здоровья сервиса коллектора на 127.0.0.1 (избегаем IPv6)
@@ -77,6 +77,15 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         log.warning(f"⚠️ PostgreSQL недоступен: {e}")
     
+    # Коллекция Qdrant: метаданные (размерность, индексы, source_type) кэшируются для поиска
+    try:
+        from services.rag.qdrant_helper import ensure_collection
+        from services.helpers.blocking_io import run_blocking
+        if await run_blocking("qdrant", ensure_collection):
+            log.info("✅ Метаданные коллекции Qdrant загружены")
+    except Exception as e:
+        log.warning(f"⚠️ Qdrant недоступен при запуске: {e}")
+    
     # Инициализация LangGraph
     try:
         from backend.api.services import get_conversation_workflow
@@ -151,9 +160,55 @@ async def health_check():
     except:
         health["services"]["langgraph"] = "unavailable"
     
+    # Статистика кэша поиска RAG (hit rate)
+    try:
+        from services.rag.retrieval_cache import get_retrieval_cache
+        health["retrieval_cache"] = get_retrieval_cache().get_stats()
+    except Exception:
+        health["retrieval_cache"] = None
+    
+    try:
+        from services.rag.collection_metadata import get_collection_metadata_cache
+        health["qdrant_metadata"] = get_collection_metadata_cache().get_stats()
+    except Exception:
+        health["qdrant_metadata"] = None
+    
+    # Загрузка пула синхронных вызовов по группам (sheets, qdrant)
+    try:
+        from services.helpers.blocking_io import get_blocking_stats
+        health["blocking_io"] = get_blocking_stats()
+    except Exception:
+        health["blocking_io"] = None
+    
     return health
 
 
+@app.get("/api/metrics/graphs")
+async def graph_metrics(format: str = "json"):
+    """Время выполнения узлов графов LangGraph (гистограммы по узлам)"""
+    from services.helpers.graph_runtime import get_graph_metrics_snapshot, render_prometheus
+
+    if format == "prometheus":
+        return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+    return get_graph_metrics_snapshot()
+
+
+@app.get("/api/metrics/rag-evaluations")
+async def rag_evaluation_trend(days: int = 30, platform: str = None):
+    """Средние оценки RAGAS по дням (выборка ответов бота, оценивается в фоне)"""
+    try:
+        from backend.database.evaluation_storage import get_rag_evaluation_trend
+        from services.helpers.blocking_io import run_blocking
+        trend = await run_blocking("postgres", get_rag_evaluation_trend, days, platform)
+        return {"days": days, "trend": trend}
+    except Exception as e:
+        log.error(f"❌ Ошибка в /api/metrics/rag-evaluations: {e}")
+        return JSONResponse(
+            status_code=500,
+            content={"error": str(e)}
+        )
+
+
 @app.post("/api/chat")
 async def chat(request: Request):
     """Эндпоинт для чата"""
@@ -191,6 +246,41 @@ async def chat(request: Request):
         )
 
 
+@app.post("/api/chat/stream")
+async def chat_stream(request: Request):
+    """Эндпоинт для чата с потоковым ответом (SSE: retrieval, delta, done)"""
+    try:
+        data = await request.json()
+    except Exception as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    
+    message = data.get("message", "")
+    if not message:
+        return JSONResponse(
+            status_code=400,
+            content={"error": "Сообщение не может быть пустым"}
+        )
+    
+    from backend.api.services import stream_with_conversation_workflow
+    from services.helpers.sse import sse_response
+    
+    events = stream_with_conversation_workflow(
+        message=message,
+        user_id=str(data.get("user_id", "anonymous")),
+        platform=data.get("platform", "api")
+    )
+    return sse_response(events, request, name="/api/chat/stream")
+
+
+def _blocking_timeout_response(route: str, error: Exception) -> JSONResponse:
+    """504: синхронный сервис (Sheets, Qdrant) не ответил за таймаут пула"""
+    log.warning(f"⏱️ Таймаут в {route}: {error}")
+    return JSONResponse(
+        status_code=504,
+        content={"error": f"Сервис не ответил вовремя: {error}"}
+    )
+
+
 @app.post("/api/rag/search")
 async def rag_search(request: Request):
     """Поиск в RAG базе знаний"""
@@ -207,8 +297,10 @@ async def rag_search(request: Request):
         
         # Импортируем qdrant_helper
         from services.rag.qdrant_helper import search_service
+        from services.helpers.blocking_io import run_blocking
         
-        results = search_service(query, limit=limit)
+        # search_service синхронный (HTTP к Qdrant + эмбеддинг) - выполняем в пуле
+        results = await run_blocking("qdrant", search_service, query, limit=limit)
         
         formatted_results = []
         for result in results:
@@ -226,6 +318,8 @@ async def rag_search(request: Request):
             "results": formatted_results,
             "count": len(formatted_results)
         }
+    except TimeoutError as e:
+        return _blocking_timeout_response("/api/rag/search", e)
     except Exception as e:
         log.error(f"❌ Ошибка в /api/rag/search: {e}")
         return JSONResponse(
@@ -238,12 +332,15 @@ async def rag_search(request: Request):
 async def get_services():
     """Получить список услуг"""
     try:
-        from app import get_services as app_get_services
-        services = app_get_services()
+        from services.helpers.google_sheets_helper import get_services as sheets_get_services
+        from services.helpers.blocking_io import run_blocking
+        services = await run_blocking("sheets", sheets_get_services)
         return {
             "services": services,
             "count": len(services)
         }
+    except TimeoutError as e:
+        return _blocking_timeout_response("/api/services", e)
     except Exception as e:
         log.error(f"❌ Ошибка в /api/services: {e}")
         return JSONResponse(
@@ -256,12 +353,15 @@ async def get_services():
 async def get_masters():
     """Получить список мастеров"""
     try:
-        from app import get_masters as app_get_masters
-        masters = app_get_masters()
+        from services.helpers.google_sheets_helper import get_masters as sheets_get_masters
+        from services.helpers.blocking_io import run_blocking
+        masters = await run_blocking("sheets", sheets_get_masters)
         return {
             "masters": masters,
             "count": len(masters)
         }
+    except TimeoutError as e:
+        return _blocking_timeout_response("/api/masters", e)
     except Exception as e:
         log.error(f"❌ Ошибка в /api/masters: {e}")
         return JSONResponse(
@@ -468,34 +568,18 @@ async def check_admin(user_id: str):
 
 # ==================== NOTIFICATIONS API ====================
 
-# In-memory хранилище уведомлений (можно заменить на Redis или БД)
-_notifications_store: dict = {}  # {user_id: [notifications]}
+def _notification_store():
+    """Общее хранилище уведомлений (Redis или память процесса)"""
+    from backend.api.services.notification_store import get_notification_store
+    return get_notification_store()
 
-def _get_user_notifications(user_id: str) -> list:
-    """Получить уведомления пользователя"""
-    return _notifications_store.get(user_id, [])
-
-def _add_notification(user_id: str, notification: dict):
+async def _add_notification(user_id: str, notification: dict):
     """Добавить уведомление"""
-    if user_id not in _notifications_store:
-        _notifications_store[user_id] = []
-    
-    # Добавляем ID и timestamp если их нет
-    if "id" not in notification:
-        notification["id"] = f"{user_id}_{datetime.now().timestamp()}"
-    if "created_at" not in notification:
-        notification["created_at"] = datetime.now().isoformat()
-    if "read" not in notification:
-        notification["read"] = False
-    
-    _notifications_store[user_id].append(notification)
-    # Ограничиваем количество уведомлений (последние 50)
-    if len(_notifications_store[user_id]) > 50:
-        _notifications_store[user_id] = _notifications_store[user_id][-50:]
+    return await _notification_store().call("add", user_id, notification)
 
 @app.get("/api/notifications")
-async def get_notifications(user_id: str = None, limit: int = 20):
-    """Получить список уведомлений для пользователя"""
+async def get_notifications(user_id: str = None, limit: int = 20, offset: int = 0):
+    """Получить список уведомлений для пользователя (новые первыми)"""
     try:
         if not user_id:
             return JSONResponse(
@@ -503,20 +587,10 @@ async def get_notifications(user_id: str = None, limit: int = 20):
                 content={"error": "user_id обязателен"}
             )
         
-        notifications = _get_user_notifications(user_id)
-        unread_count = sum(1 for n in notifications if not n.get("read", False))
-        
-        # Сортируем по дате (новые первыми) и ограничиваем
-        sorted_notifications = sorted(
-            notifications,
-            key=lambda x: x.get("created_at", ""),
-            reverse=True
-        )[:limit]
-        
+        store = _notification_store()
         return {
-            "notifications": sorted_notifications,
-            "unread_count": unread_count,
-            "total": len(notifications)
+            "notifications": await store.call("list", user_id, limit=limit, offset=offset),
+            **await store.call("summary", user_id)
         }
     except Exception as e:
         log.error(f"❌ Ошибка в /api/notifications: {e}")
@@ -535,11 +609,8 @@ async def get_unread_notification_count(user_id: str = None):
                 content={"error": "user_id обязателен"}
             )
         
-        notifications = _get_user_notifications(user_id)
-        unread_count = sum(1 for n in notifications if not n.get("read", False))
-        
         return {
-            "unread_count": unread_count,
+            "unread_count": await _notification_store().call("unread_count", user_id),
             "user_id": user_id
         }
     except Exception as e:
@@ -549,6 +620,24 @@ async def get_unread_notification_count(user_id: str = None):
             content={"error": str(e)}
         )
 
+@app.get("/api/notifications/stream")
+async def stream_notifications(request: Request, user_id: str = None):
+    """SSE поток счетчика непрочитанных уведомлений (вместо опроса /unread-count)"""
+    if not user_id:
+        return JSONResponse(
+            status_code=400,
+            content={"error": "user_id обязателен"}
+        )
+    
+    from backend.api.services.notification_store import notification_events
+    from services.helpers.sse import SSE_HEADERS
+    
+    return StreamingResponse(
+        notification_events(_notification_store(), user_id, request.is_disconnected),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
 @app.post("/api/notifications/mark-read")
 async def mark_notification_read(request: Request):
     """Отметить уведомление как прочитанное"""
@@ -563,24 +652,15 @@ async def mark_notification_read(request: Request):
                 content={"error": "user_id обязателен"}
             )
         
-        notifications = _get_user_notifications(user_id)
-        
-        if notification_id:
-            # Отмечаем конкретное уведомление
-            for notification in notifications:
-                if notification.get("id") == notification_id:
-                    notification["read"] = True
-                    notification["read_at"] = datetime.now().isoformat()
-                    break
-        else:
-            # Отмечаем все уведомления как прочитанные
-            for notification in notifications:
-                notification["read"] = True
-                notification["read_at"] = datetime.now().isoformat()
+        # Без notification_id отмечаются все уведомления
+        store = _notification_store()
+        marked = await store.call("mark_read", user_id, notification_id)
         
         return {
             "success": True,
-            "message": "Уведомление отмечено как прочитанное"
+            "message": "Уведомление отмечено как прочитанное",
+            "marked": marked,
+            "unread_count": await store.call("unread_count", user_id)
         }
     except Exception as e:
         log.error(f"❌ Ошибка в /api/notifications/mark-read: {e}")
@@ -645,7 +725,7 @@ async def get_recent_emails(user_id: str = None, limit: int = 10):
         # Создаем уведомления для новых писем (если user_id указан)
         if user_id and formatted_emails:
             for email in formatted_emails[:3]:  # Только последние 3 письма
-                _add_notification(user_id, {
+                await _add_notification(user_id, {
                     "type": "email",
                     "title": f"Новое письмо: {email['subject']}",
                     "message": f"От: {email['from']}",
@@ -5,6 +5,7 @@ FastAPI веб-интерфейс для демонстрации функцио
 import os
 import sys
 import logging
+from contextlib import aclosing
 from typing import Optional, TYPE_CHECKING
 from datetime import datetime
 from pathlib import Path
@@ -18,7 +19,7 @@ if TYPE_CHECKING:
     from services.rag.rag_chain import RAGChain
 
 from fastapi import FastAPI, Request, Form, HTTPException, UploadFile, File, status
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
@@ -469,16 +470,13 @@ async def rag_search(query: str, limit: int = 5):
         log.error(f"❌ Ошибка поиска в RAG: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/rag/query")
-async def rag_query(request_data: dict):
-    """Полноценный RAG запрос с генерацией ответа через LLM"""
-    if not RAG_AVAILABLE:
-        raise HTTPException(status_code=503, detail="RAG система недоступна")
-    
-    user_query = request_data.get("query", "")
-    if not user_query:
-        raise HTTPException(status_code=400, detail="Поле 'query' обязательно")
+async def _rag_query_special(request_data: dict, user_query: str) -> Optional[dict]:
+    """
+    Ответ LangGraph (запросы о ценах) или AnythingLLM (при включенном флаге)
     
+    Returns:
+        Ответ для /rag/query или None - использовать стандартный RAGChain
+    """
     # Проверяем, является ли запрос запросом о ценах
     is_pricing_query = any(kw in user_query.lower() for kw in [
         "цена", "стоимость", "стоит", "рублей", "руб", "прайс", "сколько",
@@ -494,7 +492,7 @@ async def rag_query(request_data: dict):
             thread_id = request_data.get("thread_id", "default")
             result = await query_with_langgraph(user_query, thread_id=thread_id)
             
-            return JSONResponse({
+            return {
                 "status": "success",
                 "query": user_query,
                 "answer": result.get("answer", ""),
@@ -507,17 +505,13 @@ async def rag_query(request_data: dict):
                 "metadata": result.get("metadata", {}),
                 "method": "langgraph",
                 "timestamp": datetime.now().isoformat()
-            })
+            }
         except ImportError:
             log.warning("⚠️ LangGraph не установлен, используем стандартный RAG")
         except Exception as e:
             log.error(f"❌ Ошибка LangGraph RAG: {e}")
             # Fallback на стандартный RAG
     
-    # Стандартный RAG для не-ценовых запросов или fallback
-    top_k = request_data.get("top_k", 5)
-    min_score = request_data.get("min_score", None)
-    
     # AnythingLLM: при включённом флаге — запрос к workspace API вместо RAGChain
     try:
         from services.integrations.anythingllm_client import (
@@ -533,7 +527,7 @@ async def rag_query(request_data: dict):
                 for s in (sources_list or [])
                 if isinstance(s, dict)
             ]
-            return JSONResponse({
+            return {
                 "status": "success",
                 "query": user_query,
                 "answer": answer or "",
@@ -546,10 +540,31 @@ async def rag_query(request_data: dict):
                 "error": None,
                 "method": "anythingllm",
                 "timestamp": datetime.now().isoformat()
-            })
+            }
     except Exception as anythingllm_err:
         log.warning("⚠️ [AnythingLLM] /rag/query ошибка: %s, fallback на RAGChain", anythingllm_err)
     
+    return None
+
+
+@app.post("/rag/query")
+async def rag_query(request_data: dict):
+    """Полноценный RAG запрос с генерацией ответа через LLM"""
+    if not RAG_AVAILABLE:
+        raise HTTPException(status_code=503, detail="RAG система недоступна")
+    
+    user_query = request_data.get("query", "")
+    if not user_query:
+        raise HTTPException(status_code=400, detail="Поле 'query' обязательно")
+    
+    special = await _rag_query_special(request_data, user_query)
+    if special is not None:
+        return JSONResponse(special)
+    
+    # Стандартный RAG для не-ценовых запросов или fallback
+    top_k = request_data.get("top_k", 5)
+    min_score = request_data.get("min_score", None)
+    
     try:
         rag = get_rag_chain()
         if not rag:
@@ -580,6 +595,51 @@ async def rag_query(request_data: dict):
         log.error(f"❌ Ошибка RAG запроса: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/rag/query/stream")
+async def rag_query_stream(request: Request):
+    """RAG запрос с потоковым ответом (SSE: retrieval, delta, done)"""
+    if not RAG_AVAILABLE:
+        raise HTTPException(status_code=503, detail="RAG система недоступна")
+    
+    request_data = await request.json()
+    user_query = request_data.get("query", "")
+    if not user_query:
+        raise HTTPException(status_code=400, detail="Поле 'query' обязательно")
+    
+    from services.helpers.sse import sse_response
+    
+    async def events():
+        special = await _rag_query_special(request_data, user_query)
+        if special is not None:
+            # LangGraph и AnythingLLM отвечают целиком - один фрагмент
+            yield "retrieval", {"sources": special.get("sources", []), "context_count": len(special.get("sources", []))}
+            yield "delta", {"content": special.get("answer", "")}
+            yield "done", special
+            return
+        
+        rag = get_rag_chain()
+        if not rag:
+            yield "error", {"error": "Не удалось инициализировать RAG"}
+            return
+        async with aclosing(rag.query_stream(
+            user_query=user_query,
+            use_rag=True,
+            top_k=request_data.get("top_k", 5),
+            min_score=request_data.get("min_score", None)
+        )) as rag_events:
+            async for event, data in rag_events:
+                if event == "done":
+                    data = {
+                        "status": "success",
+                        "query": user_query,
+                        **data,
+                        "method": "standard",
+                        "timestamp": datetime.now().isoformat()
+                    }
+                yield event, data
+    
+    return sse_response(events(), request, name="/rag/query/stream")
+
 @app.get("/rag/test")
 async def rag_test(query: str = "Что такое HR консалтинг?", top_k: int = 5):
     """Тестовый RAG запрос через GET (для удобства)"""
@@ -621,8 +681,9 @@ async def rag_stats():
         # Используем новый QdrantLoader для получения статистики
         if RAG_AVAILABLE:
             try:
+                from services.helpers.blocking_io import run_blocking
                 loader = QdrantLoader()
-                info = loader.get_collection_info()
+                info = await run_blocking("qdrant", loader.get_collection_info)
                 return JSONResponse({
                     "collection_name": info.get("name", ""),
                     "points_count": info.get("points_count", 0),
@@ -746,59 +807,44 @@ async def health():
         except:
             rag_status = "error"
     
+    retrieval_cache_stats = None
+    try:
+        from services.rag.retrieval_cache import get_retrieval_cache
+        retrieval_cache_stats = get_retrieval_cache().get_stats()
+    except Exception as e:
+        log.warning(f"⚠️ Не удалось получить статистику кэша поиска: {e}")
+    
     return JSONResponse({
         "status": "ok",
         "timestamp": datetime.now().isoformat(),
         "integrations_available": INTEGRATIONS_AVAILABLE,
-        "rag_system": rag_status
+        "rag_system": rag_status,
+        "retrieval_cache": retrieval_cache_stats
     })
 
 
 # ==================== NOTIFICATIONS API ====================
 
-# In-memory хранилище уведомлений (можно заменить на Redis или БД)
-_notifications_store: dict = {}  # {user_id: [notifications]}
-
-def _get_user_notifications(user_id: str) -> list:
-    """Получить уведомления пользователя"""
-    return _notifications_store.get(user_id, [])
+def _notification_store():
+    """Общее хранилище уведомлений (Redis или память процесса)"""
+    from backend.api.services.notification_store import get_notification_store
+    return get_notification_store()
 
-def _add_notification(user_id: str, notification: dict):
+async def _add_notification(user_id: str, notification: dict):
     """Добавить уведомление"""
-    if user_id not in _notifications_store:
-        _notifications_store[user_id] = []
-    
-    if "id" not in notification:
-        notification["id"] = f"{user_id}_{datetime.now().timestamp()}"
-    if "created_at" not in notification:
-        notification["created_at"] = datetime.now().isoformat()
-    if "read" not in notification:
-        notification["read"] = False
-    
-    _notifications_store[user_id].append(notification)
-    if len(_notifications_store[user_id]) > 50:
-        _notifications_store[user_id] = _notifications_store[user_id][-50:]
+    return await _notification_store().call("add", user_id, notification)
 
 @app.get("/notifications")
-async def get_notifications(user_id: str = None, limit: int = 20):
-    """Получить список уведомлений для пользователя"""
+async def get_notifications(user_id: str = None, limit: int = 20, offset: int = 0):
+    """Получить список уведомлений для пользователя (новые первыми)"""
     try:
         if not user_id:
             raise HTTPException(status_code=400, detail="user_id обязателен")
         
-        notifications = _get_user_notifications(user_id)
-        unread_count = sum(1 for n in notifications if not n.get("read", False))
-        
-        sorted_notifications = sorted(
-            notifications,
-            key=lambda x: x.get("created_at", ""),
-            reverse=True
-        )[:limit]
-        
+        store = _notification_store()
         return JSONResponse({
-            "notifications": sorted_notifications,
-            "unread_count": unread_count,
-            "total": len(notifications)
+            "notifications": await store.call("list", user_id, limit=limit, offset=offset),
+            **await store.call("summary", user_id)
         })
     except Exception as e:
         log.error(f"❌ Ошибка в /notifications: {e}")
@@ -811,17 +857,29 @@ async def get_unread_notification_count(user_id: str = None):
         if not user_id:
             raise HTTPException(status_code=400, detail="user_id обязателен")
         
-        notifications = _get_user_notifications(user_id)
-        unread_count = sum(1 for n in notifications if not n.get("read", False))
-        
         return JSONResponse({
-            "unread_count": unread_count,
+            "unread_count": await _notification_store().call("unread_count", user_id),
             "user_id": user_id
         })
     except Exception as e:
         log.error(f"❌ Ошибка в /notifications/unread-count: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/notifications/stream")
+async def stream_notifications(request: Request, user_id: str = None):
+    """SSE поток счетчика непрочитанных уведомлений (вместо опроса /unread-count)"""
+    if not user_id:
+        raise HTTPException(status_code=400, detail="user_id обязателен")
+    
+    from backend.api.services.notification_store import notification_events
+    from services.helpers.sse import SSE_HEADERS
+    
+    return StreamingResponse(
+        notification_events(_notification_store(), user_id, request.is_disconnected),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
 @app.post("/notifications/mark-read")
 async def mark_notification_read(request_data: dict):
     """Отметить уведомление как прочитанное"""
@@ -832,22 +890,15 @@ async def mark_notification_read(request_data: dict):
         if not user_id:
             raise HTTPException(status_code=400, detail="user_id обязателен")
         
-        notifications = _get_user_notifications(user_id)
-        
-        if notification_id:
-            for notification in notifications:
-                if notification.get("id") == notification_id:
-                    notification["read"] = True
-                    notification["read_at"] = datetime.now().isoformat()
-                    break
-        else:
-            for notification in notifications:
-                notification["read"] = True
-                notification["read_at"] = datetime.now().isoformat()
+        # Без notification_id отмечаются все уведомления
+        store = _notification_store()
+        marked = await store.call("mark_read", user_id, notification_id)
         
         return JSONResponse({
             "success": True,
-            "message": "Уведомление отмечено как прочитанное"
+            "message": "Уведомление отмечено как прочитанное",
+            "marked": marked,
+            "unread_count": await store.call("unread_count", user_id)
         })
     except Exception as e:
         log.error(f"❌ Ошибка в /notifications/mark-read: {e}")
@@ -885,7 +936,7 @@ async def create_hrtime_notification(request_data: dict):
             }
         }
         
-        _add_notification(user_id, notification)
+        await _add_notification(user_id, notification)
         log.info(f"✅ Создано уведомление HRTime для пользователя {user_id}, заказ {order_id}")
         
         return JSONResponse({
@@ -903,17 +954,13 @@ async def get_hrtime_notifications(user_id: str = None, limit: int = 20):
         if not user_id:
             raise HTTPException(status_code=400, detail="user_id обязателен")
         
-        notifications = _get_user_notifications(user_id)
+        store = _notification_store()
+        # Список уже отсортирован (новые первыми) и ограничен последними max_per_user
         hrtime_notifications = [
-            n for n in notifications 
+            n for n in await store.call("list", user_id, limit=store.max_per_user)
             if n.get("type") == "hrtime"
         ]
-        
-        sorted_notifications = sorted(
-            hrtime_notifications,
-            key=lambda x: x.get("created_at", ""),
-            reverse=True
-        )[:limit]
+        sorted_notifications = hrtime_notifications[:limit]
         
         return JSONResponse({
             "notifications": sorted_notifications,
@@ -945,7 +992,7 @@ async def sync_notifications_from_telegram(request_data: dict):
                 "metadata": tg_notification.get("metadata", {})
             }
             
-            _add_notification(user_id, notification)
+            await _add_notification(user_id, notification)
             synced_count += 1
         
         log.info(f"✅ Синхронизировано {synced_count} уведомлений для пользователя {user_id}")
@@ -1003,7 +1050,7 @@ async def get_recent_emails(user_id: str = None, limit: int = 10):
         # Создаем уведомления для новых писем
         if user_id and formatted_emails:
             for email in formatted_emails[:3]:
-                _add_notification(user_id, {
+                await _add_notification(user_id, {
                     "type": "email",
                     "title": f"Новое письмо: {email['subject']}",
                     "message": f"От: {email['from']}",
@@ -1021,12 +1068,31 @@ async def get_recent_emails(user_id: str = None, limit: int = 10):
 
 # ==================== CHAT SYNC API ====================
 
+def _chat_user_id(user_id) -> Optional[int]:
+    """Числовой user_id для сохранения сообщений (anonymous и не-числовые - None)"""
+    return int(user_id) if user_id != "anonymous" and str(user_id).isdigit() else None
+
+def _save_chat_message(user_id_int: int, role: str, content: str, platform: str):
+    """Сохранить сообщение чата mini app (Redis + PostgreSQL, вопросы пользователя - и в Qdrant)"""
+    from backend.database.message_storage import save_telegram_message
+    
+    save_telegram_message(
+        user_id=user_id_int,
+        chat_id=user_id_int,
+        message_id=None,
+        role=role,
+        content=content,
+        message_type="text",
+        metadata={"platform": platform},
+        save_to_redis=True,
+        save_to_postgres=True,
+        save_to_qdrant=role == "user"
+    )
+
 @app.post("/chat")
 async def chat_sync(request_data: dict):
     """Синхронизировать сообщение из mini app с базой данных"""
     try:
-        from backend.database.message_storage import save_telegram_message
-        
         message = request_data.get("message", "")
         user_id = request_data.get("user_id", "anonymous")
         platform = request_data.get("platform", "miniapp")
@@ -1035,21 +1101,11 @@ async def chat_sync(request_data: dict):
             raise HTTPException(status_code=400, detail="Сообщение не может быть пустым")
         
         # Сохраняем сообщение в базу данных
+        user_id_int = None
         try:
-            user_id_int = int(user_id) if user_id != "anonymous" and str(user_id).isdigit() else None
+            user_id_int = _chat_user_id(user_id)
             if user_id_int:
-                save_telegram_message(
-                    user_id=user_id_int,
-                    chat_id=user_id_int,
-                    message_id=None,
-                    role="user",
-                    content=message,
-                    message_type="text",
-                    metadata={"platform": platform},
-                    save_to_redis=True,
-                    save_to_postgres=True,
-                    save_to_qdrant=True
-                )
+                _save_chat_message(user_id_int, "user", message, platform)
         except Exception as e:
             log.warning(f"⚠️ Ошибка сохранения сообщения: {e}")
         
@@ -1065,18 +1121,7 @@ async def chat_sync(request_data: dict):
         # Сохраняем ответ ассистента
         if user_id_int and result.get("response"):
             try:
-                save_telegram_message(
-                    user_id=user_id_int,
-                    chat_id=user_id_int,
-                    message_id=None,
-                    role="assistant",
-                    content=result.get("response", ""),
-                    message_type="text",
-                    metadata={"platform": platform},
-                    save_to_redis=True,
-                    save_to_postgres=True,
-                    save_to_qdrant=False
-                )
+                _save_chat_message(user_id_int, "assistant", result.get("response", ""), platform)
             except Exception as e:
                 log.warning(f"⚠️ Ошибка сохранения ответа: {e}")
         
@@ -1089,6 +1134,45 @@ async def chat_sync(request_data: dict):
         log.error(f"❌ Ошибка в /chat: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/chat/stream")
+async def chat_stream(request: Request):
+    """Сообщение из mini app с потоковым ответом (SSE: retrieval, delta, done)"""
+    request_data = await request.json()
+    message = request_data.get("message", "")
+    user_id = request_data.get("user_id", "anonymous")
+    platform = request_data.get("platform", "miniapp")
+    
+    if not message:
+        raise HTTPException(status_code=400, detail="Сообщение не может быть пустым")
+    
+    from backend.api.services import stream_with_conversation_workflow
+    from services.helpers.sse import sse_response
+    
+    async def events():
+        user_id_int = None
+        try:
+            user_id_int = _chat_user_id(user_id)
+            if user_id_int:
+                _save_chat_message(user_id_int, "user", message, platform)
+        except Exception as e:
+            log.warning(f"⚠️ Ошибка сохранения сообщения: {e}")
+        
+        async with aclosing(stream_with_conversation_workflow(
+            message=message,
+            user_id=str(user_id),
+            platform=platform
+        )) as chat_events:
+            async for event, data in chat_events:
+                # Ответ сохраняется, только если поток дошел до конца
+                if event == "done" and user_id_int and data.get("response") and not data.get("error"):
+                    try:
+                        _save_chat_message(user_id_int, "assistant", data["response"], platform)
+                    except Exception as e:
+                        log.warning(f"⚠️ Ошибка сохранения ответа: {e}")
+                yield event, data
+    
+    return sse_response(events(), request, name="/chat/stream")
+
 @app.get("/chat/history")
 async def get_chat_history(user_id: str, limit: int = 20):
     """Получить историю чата пользователя (синхронизированную между Telegram и mini app)"""
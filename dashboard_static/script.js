@@ -450,6 +450,36 @@ async function refreshAllData() {
     }
 }
 
+let activeQuerySource = null;
+
+function renderQueryResult(resultEl, result) {
+    resultEl.innerHTML = `
+        <div class="result-answer">${escapeHtml(result.answer)}</div>
+        ${result.sources && result.sources.length > 0 ? `
+            <div class="result-sources">
+                <strong>Источники:</strong>
+                ${result.sources.map(s => `<div class="result-source">${escapeHtml(s)}</div>`).join('')}
+            </div>
+        ` : ''}
+        <div class="result-meta">
+            Provider: ${result.provider} | Model: ${result.model}<br>
+            Confidence: ${result.confidence?.toFixed(3) || 'N/A'} | 
+            Context docs: ${result.context_count || 0}
+        </div>
+    `;
+}
+
+async function testQueryOnce(query, resultEl) {
+    try {
+        const response = await fetch(`${API_BASE}/test/query?query=${encodeURIComponent(query)}`);
+        const result = await response.json();
+        renderQueryResult(resultEl, result);
+    } catch (error) {
+        console.error('Error testing query:', error);
+        resultEl.innerHTML = '<div class="loading">Ошибка при выполнении запроса</div>';
+    }
+}
+
 async function testQuery() {
     const query = document.getElementById('test-query-input').value.trim();
     if (!query) {
@@ -460,28 +490,46 @@ async function testQuery() {
     const resultEl = document.getElementById('test-result');
     resultEl.innerHTML = '<div class="loading">Выполнение запроса...</div>';
     
-    try {
-        const response = await fetch(`${API_BASE}/test/query?query=${encodeURIComponent(query)}`);
-        const result = await response.json();
-        
+    if (typeof EventSource === 'undefined') {
+        return testQueryOnce(query, resultEl);
+    }
+    
+    // Потоковый ответ: сначала найденные документы, затем текст по мере генерации
+    if (activeQuerySource) {
+        activeQuerySource.close();
+    }
+    const source = new EventSource(`${API_BASE}/test/query/stream?query=${encodeURIComponent(query)}`);
+    activeQuerySource = source;
+    let answer = '';
+    
+    source.addEventListener('retrieval', (event) => {
+        const data = JSON.parse(event.data);
         resultEl.innerHTML = `
-            <div class="result-answer">${escapeHtml(result.answer)}</div>
-            ${result.sources && result.sources.length > 0 ? `
-                <div class="result-sources">
-                    <strong>Источники:</strong>
-                    ${result.sources.map(s => `<div class="result-source">${escapeHtml(s)}</div>`).join('')}
-                </div>
-            ` : ''}
-            <div class="result-meta">
-                Provider: ${result.provider} | Model: ${result.model}<br>
-                Confidence: ${result.confidence?.toFixed(3) || 'N/A'} | 
-                Context docs: ${result.context_count || 0}
-            </div>
+            <div class="result-answer"></div>
+            <div class="result-meta">Context docs: ${data.context_count || 0} | Генерация ответа...</div>
         `;
-    } catch (error) {
-        console.error('Error testing query:', error);
-        resultEl.innerHTML = '<div class="loading">Ошибка при выполнении запроса</div>';
-    }
+    });
+    
+    source.addEventListener('delta', (event) => {
+        answer += JSON.parse(event.data).content;
+        const answerEl = resultEl.querySelector('.result-answer');
+        if (answerEl) {
+            answerEl.textContent = answer;
+        }
+    });
+    
+    source.addEventListener('done', (event) => {
+        source.close();
+        renderQueryResult(resultEl, JSON.parse(event.data));
+    });
+    
+    source.addEventListener('error', (event) => {
+        source.close();
+        console.error('Error testing query:', event.data || event);
+        if (!answer) {
+            resultEl.innerHTML = '<div class="loading">Ошибка при выполнении запроса</div>';
+        }
+    });
 }
 
 function exportResults() {
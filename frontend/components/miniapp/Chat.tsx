@@ -20,13 +20,30 @@ export default function Chat({ onBack }: ChatProps) {
     setMessages(prev => [...prev, { role: 'user', text: userMessage }])
     setLoading(true)
 
+    // Ответ показывается по мере генерации: первый фрагмент добавляет сообщение, следующие - дописывают его
+    let streamed = ''
+    const replaceLastText = (text: string) => {
+      setMessages(prev => [...prev.slice(0, -1), { role: 'assistant', text }])
+    }
+
     try {
-      const { sendChatMessage } = await import('@/lib/api')
-      const result = await sendChatMessage(userMessage)
-      setMessages(prev => [...prev, { 
-        role: 'assistant', 
-        text: result.response || result.text || 'Извините, не удалось получить ответ.' 
-      }])
+      const { streamChatMessage } = await import('@/lib/api')
+      const result = await streamChatMessage(userMessage, (delta) => {
+        const first = !streamed
+        streamed += delta
+        if (first) {
+          setLoading(false)
+          setMessages(prev => [...prev, { role: 'assistant', text: streamed }])
+        } else {
+          replaceLastText(streamed)
+        }
+      })
+      const text = result.response || streamed || 'Извините, не удалось получить ответ.'
+      if (streamed) {
+        replaceLastText(text)
+      } else {
+        setMessages(prev => [...prev, { role: 'assistant', text }])
+      }
     } catch (error: any) {
       setMessages(prev => [...prev, { 
         role: 'assistant', 
@@ -2,7 +2,7 @@
 
 import { useState, useEffect, useRef } from 'react'
 import { useWebApp } from '@/lib/useWebApp'
-import { getNotifications, getUnreadNotificationCount, markNotificationAsRead } from '@/lib/api'
+import { getNotifications, getUnreadNotificationCount, markNotificationAsRead, subscribeToNotifications } from '@/lib/api'
 import styles from './Notifications.module.css'
 
 interface Notification {
@@ -35,6 +35,7 @@ export default function Notifications({ userId }: NotificationsProps) {
   const [loading, setLoading] = useState(false)
   const [previousUnreadCount, setPreviousUnreadCount] = useState(0)
   const dropdownRef = useRef<HTMLDivElement>(null)
+  const versionRef = useRef<number | null>(null)
 
   const loadNotifications = async () => {
     if (!userId) return
@@ -75,7 +76,18 @@ export default function Notifications({ userId }: NotificationsProps) {
   useEffect(() => {
     if (userId) {
       loadNotifications()
-      // Polling каждые 20 секунд
+      // Сервер сообщает об изменениях через SSE; список перечитываем только при изменении
+      const source = subscribeToNotifications(userId, (data) => {
+        // Первое событие - текущая версия (список уже загружен)
+        if (versionRef.current !== null && data.version !== versionRef.current) {
+          loadNotifications()
+        }
+        versionRef.current = data.version
+      })
+      if (source) {
+        return () => source.close()
+      }
+      // Без EventSource - polling каждые 20 секунд
       const interval = setInterval(loadNotifications, 20000)
       return () => clearInterval(interval)
     }
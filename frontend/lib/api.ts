@@ -314,6 +314,61 @@ export async function sendChatMessage(message: string, userId?: string) {
   return response.json();
 }
 
+// Потоковый ответ чата (SSE): onDelta получает текст по мере генерации, результат - событие done
+export async function streamChatMessage(
+  message: string,
+  onDelta: (text: string) => void,
+  userId?: string,
+  signal?: AbortSignal
+) {
+  const response = await fetch(`${API_BASE}/chat/stream`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ 
+      message,
+      user_id: userId || 'miniapp_user',
+      platform: 'miniapp'
+    }),
+    signal,
+  });
+
+  if (!response.ok || !response.body) {
+    throw new Error(`HTTP error! status: ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let result: any = null;
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    // События разделены пустой строкой: "event: <имя>\ndata: <json>"
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const raw = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      const event = raw.match(/^event: (.*)$/m)?.[1];
+      const data = raw.match(/^data: (.*)$/m)?.[1];
+      if (!event || !data) continue;
+
+      const payload = JSON.parse(data);
+      if (event === 'delta') {
+        onDelta(payload.content);
+      } else if (event === 'done') {
+        result = payload;
+      } else if (event === 'error') {
+        throw new Error(payload.error);
+      }
+    }
+  }
+
+  return result || { response: '', status: 'error' };
+}
+
 export async function getChatHistory(userId: string, limit: number = 20) {
   const response = await fetch(`${API_BASE}/chat/history?user_id=${encodeURIComponent(userId)}&limit=${limit}`);
 
@@ -429,6 +484,26 @@ export async function getUnreadNotificationCount(userId: string) {
   return response.json();
 }
 
+// SSE поток счетчика непрочитанных уведомлений (вместо опроса unread-count)
+export function subscribeToNotifications(
+  userId: string,
+  onUpdate: (data: { unread_count: number; total: number; version: number }) => void
+): EventSource | null {
+  if (typeof EventSource === 'undefined') {
+    return null;
+  }
+
+  const source = new EventSource(`${API_BASE}/notifications/stream?user_id=${encodeURIComponent(userId)}`);
+  source.addEventListener('unread', (event) => {
+    try {
+      onUpdate(JSON.parse((event as MessageEvent).data));
+    } catch (error) {
+      console.error('Ошибка разбора события уведомлений:', error);
+    }
+  });
+  return source;
+}
+
 export async function markNotificationAsRead(userId: string, notificationId?: string) {
   const response = await fetch(`${API_BASE}/notifications/mark-read`, {
     method: 'POST',
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк профилей хранения Qdrant: recall@k и латентность поиска.
+
+В качестве запросов берутся векторы из исходной коллекции, эталон - точный
+поиск (exact=True) по исходной коллекции. Для каждого профиля измеряется
+recall@k относительно эталона и латентность p50/p95.
+
+Коллекции профилей создаются scripts/migrate_collection_profile.py
+(имя <collection>__<profile>).
+
+Использование:
+    python3 scripts/benchmark_collection_profiles.py --profiles scalar binary --queries 100 --top-k 10
+"""
+import sys
+import time
+import random
+import logging
+import argparse
+from pathlib import Path
+from typing import Dict, List
+
+# Добавляем корневую директорию проекта в sys.path
+project_root = Path(__file__).parent.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from qdrant_client.models import SearchParams
+
+from services.rag.qdrant_helper import get_qdrant_client, COLLECTION_NAME, QDRANT_URL
+from services.rag.collection_profiles import get_collection_profile, build_search_params
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+log = logging.getLogger(__name__)
+
+
+def percentile(values: List[float], p: float) -> float:
+    """Перцентиль p (0..100) без numpy"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def sample_query_vectors(client, collection: str, count: int, seed: int) -> List[List[float]]:
+    """Берет случайную выборку векторов из коллекции в качестве запросов"""
+    vectors = []
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection,
+            limit=256,
+            offset=offset,
+            with_payload=False,
+            with_vectors=True
+        )
+        vectors.extend(point.vector for point in points)
+        if offset is None or not points:
+            break
+
+    random.Random(seed).shuffle(vectors)
+    return vectors[:count]
+
+
+def run_queries(client, collection: str, queries: List[List[float]], top_k: int, search_params) -> Dict:
+    """Выполняет запросы и возвращает найденные id и латентности (мс)"""
+    ids, latencies = [], []
+    for vector in queries:
+        start = time.perf_counter()
+        response = client.query_points(
+            collection_name=collection,
+            query=vector,
+            limit=top_k,
+            with_payload=False,
+            search_params=search_params
+        )
+        latencies.append((time.perf_counter() - start) * 1000)
+        ids.append([point.id for point in response.points])
+    return {"ids": ids, "latencies": latencies}
+
+
+def recall_at_k(found: List[List], truth: List[List]) -> float:
+    """Средний recall@k относительно эталона"""
+    if not truth:
+        return 0.0
+    total = 0.0
+    for found_ids, truth_ids in zip(found, truth):
+        if truth_ids:
+            total += len(set(found_ids) & set(truth_ids)) / len(truth_ids)
+    return total / len(truth)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарк профилей хранения Qdrant")
+    parser.add_argument("--collection", default=COLLECTION_NAME, help="Исходная коллекция (эталон)")
+    parser.add_argument("--profiles", nargs="+", required=True, help="Профили для сравнения")
+    parser.add_argument("--queries", type=int, default=100, help="Количество запросов")
+    parser.add_argument("--top-k", type=int, default=10, help="k для recall@k")
+    parser.add_argument("--seed", type=int, default=42, help="Seed выборки запросов")
+    args = parser.parse_args()
+
+    client = get_qdrant_client()
+    if not client:
+        log.error(f"❌ Qdrant недоступен: {QDRANT_URL}")
+        return 1
+
+    queries = sample_query_vectors(client, args.collection, args.queries, args.seed)
+    if not queries:
+        log.error(f"❌ В коллекции '{args.collection}' нет векторов")
+        return 1
+    log.info(f"🔍 {len(queries)} запросов, top_k={args.top_k}")
+
+    truth = run_queries(client, args.collection, queries, args.top_k, SearchParams(exact=True))
+    baseline = run_queries(client, args.collection, queries, args.top_k, None)
+
+    rows = [("baseline (HNSW)", args.collection, recall_at_k(baseline["ids"], truth["ids"]), baseline["latencies"])]
+    for profile_name in args.profiles:
+        collection = f"{args.collection}__{profile_name}"
+        if not client.collection_exists(collection):
+            log.warning(f"⚠️ Коллекция '{collection}' не найдена, запустите migrate_collection_profile.py --profile {profile_name}")
+            continue
+        result = run_queries(
+            client, collection, queries, args.top_k,
+            build_search_params(get_collection_profile(profile_name))
+        )
+        rows.append((profile_name, collection, recall_at_k(result["ids"], truth["ids"]), result["latencies"]))
+
+    print()
+    print(f"{'Профиль':<20} {'Коллекция':<40} {'recall@' + str(args.top_k):>10} {'p50, мс':>10} {'p95, мс':>10}")
+    print("-" * 94)
+    for name, collection, recall, latencies in rows:
+        print(f"{name:<20} {collection:<40} {recall:>10.4f} {percentile(latencies, 50):>10.2f} {percentile(latencies, 95):>10.2f}")
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк разбора и оценки новостей HR Time: прежняя реализация (проверки `in`
+и отдельные re.search по каждому шаблону) против скомпилированного движка
+(services/services/hrtime_news_engine.py) и HRTimeNewsScorer.score_batch.
+
+Посты берутся из экспорта канала Telegram Desktop (result.json) или JSONL
+({"text": ...} в каждой строке). Без --input генерируется синтетический архив.
+Дополнительно проверяется, что результаты обеих реализаций совпадают.
+
+Использование:
+    python3 scripts/benchmark_news_scoring.py --input export/result.json
+    python3 scripts/benchmark_news_scoring.py --synthetic 5000
+"""
+import re
+import sys
+import json
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List
+
+# Добавляем корневую директорию проекта в sys.path
+project_root = Path(__file__).parent.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from services.services.hrtime_news_engine import (
+    HR_KEYWORDS,
+    STATUS_KEYWORDS,
+    CATEGORY_KEYWORDS,
+    CONTENT_TYPE_KEYWORDS,
+    METRIC_PATTERNS,
+    AUTHOR_PATTERNS,
+    QUESTION_PATTERNS
+)
+from services.services.hrtime_news_parser import HRTimeNewsParser
+from services.services.hrtime_news_scorer import HRTimeNewsScorer
+
+
+# ===================== ПРЕЖНЯЯ РЕАЛИЗАЦИЯ =====================
+
+def legacy_parse(text: str, chat_username: str) -> Dict:
+    """Разбор как до скомпилированного движка: отдельный проход на каждый шаблон"""
+    text_lower = text.lower()
+
+    author_name = chat_username
+    for pattern in AUTHOR_PATTERNS:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            author_name = match.group(1).strip()
+            break
+    author_lower = author_name.lower()
+    status = next(
+        (s for s, keywords in STATUS_KEYWORDS.items()
+         if any(k in text_lower or k in author_lower for k in keywords)),
+        ""
+    )
+    category = next(
+        (c for c, keywords in CATEGORY_KEYWORDS.items() if any(k in text_lower for k in keywords)),
+        "Общее"
+    )
+    content_type = next(
+        (t for t, keywords in CONTENT_TYPE_KEYWORDS.items() if any(k in text_lower for k in keywords)),
+        "general"
+    )
+    metrics = {"views": 0, "comments": 0, "rating": 0}
+    for group, convert in (("views", int), ("comments", int), ("rating", float)):
+        for pattern in METRIC_PATTERNS[group]:
+            match = re.search(pattern, text, re.IGNORECASE)
+            if match:
+                try:
+                    metrics[group] = convert(match.group(1))
+                    break
+                except ValueError:
+                    pass
+    return {"author": author_name, "status": status, "category": category, "type": content_type, "metrics": metrics}
+
+
+def legacy_text_features(text: str, title: str):
+    full_text = f"{title} {text}".lower()
+    keyword_count = sum(1 for keyword in HR_KEYWORDS if keyword in full_text)
+    has_questions = any(re.search(pattern, text.lower()) for pattern in QUESTION_PATTERNS)
+    return keyword_count, has_questions
+
+
+# ===================== КОРПУС =====================
+
+SYNTHETIC_LINES = [
+    "Ищем HR-бизнес-партнера для подбора персонала в IT-компанию",
+    "Запрос на проект по оценке персонала и развитию сотрудников",
+    "Как выстроить систему мотивации и KPI для отдела продаж?",
+    "Материал HR-клуба: адаптация новых сотрудников за 30 дней",
+    "Отзыв о работе консультанта, рейтинг: 4.8",
+    "Автор: Мария Иванова, ТОП-30 HR Time",
+    "👤 Алексей Петров (СПЕЦНАЗ)",
+    "Просмотров: 1250 💬 34 ⭐ 4.5",
+    "views: 320, comments: 12",
+    "Подскажите, где найти обучение по компенсациям и бонусам?",
+    "Заказ: автоматизация HR-процессов, бюджет 500 000 ₽",
+    "Нужна помощь с интервью и отбором кандидатов",
+    "Новости рынка труда за неделю",
+    "Статья о целях и управлении командой",
+    "Вопрос от PRO участника: сроки найма выросли",
+    "https://hr-time.ru/news/12345",
+]
+
+
+def synthetic_posts(count: int, seed: int = 42) -> List[Dict]:
+    rng = random.Random(seed)
+    now = datetime.now()
+    posts = []
+    for i in range(count):
+        lines = rng.sample(SYNTHETIC_LINES, rng.randint(2, 7))
+        posts.append({
+            "message_id": i + 1,
+            "text": "\n".join(lines) + "\n" + " ".join(rng.choice(SYNTHETIC_LINES).split()[:5]) * rng.randint(1, 6),
+            "date": now - timedelta(hours=rng.randint(0, 200)),
+            "chat_username": "HRTime_bot"
+        })
+    return posts
+
+
+def load_posts(path: str) -> List[Dict]:
+    """Посты из экспорта Telegram Desktop (result.json) или JSONL"""
+    content = Path(path).read_text(encoding="utf-8")
+    if path.endswith(".jsonl"):
+        items = [json.loads(line) for line in content.splitlines() if line.strip()]
+    else:
+        items = json.loads(content).get("messages", [])
+
+    posts = []
+    for item in items:
+        text = item.get("text", "")
+        if isinstance(text, list):
+            # В экспорте Telegram Desktop форматированный текст - список фрагментов
+            text = "".join(part if isinstance(part, str) else part.get("text", "") for part in text)
+        if text:
+            posts.append({
+                "message_id": item.get("id", len(posts) + 1),
+                "text": text,
+                "date": item.get("date"),
+                "chat_username": "HRTime_bot"
+            })
+    return posts
+
+
+# ===================== BENCHMARK =====================
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарк разбора и оценки новостей HR Time")
+    parser.add_argument("--input", help="Экспорт канала (result.json) или JSONL")
+    parser.add_argument("--synthetic", type=int, default=5000, help="Размер синтетического архива")
+    parser.add_argument("--repeat", type=int, default=3, help="Количество повторов (берется лучшее время)")
+    args = parser.parse_args()
+
+    posts = load_posts(args.input) if args.input else synthetic_posts(args.synthetic)
+    if not posts:
+        print("❌ Нет постов для бенчмарка")
+        return 1
+
+    news_parser = HRTimeNewsParser()
+    scorer = HRTimeNewsScorer()
+    engine = news_parser.engine
+
+    def run_legacy_features():
+        for post in posts:
+            legacy_parse(post["text"], post["chat_username"])
+            legacy_text_features(post["text"], post["text"].split("\n", 1)[0])
+
+    def run_engine_features():
+        for post in posts:
+            hits = engine.scan(post["text"])
+            author_name = engine.extract_author_name(hits) or post["chat_username"]
+            engine.extract_author_status(hits, author_name)
+            engine.extract_category(hits)
+            engine.extract_content_type(hits)
+            engine.extract_metrics(hits)
+            engine.text_features(post["text"], post["text"].split("\n", 1)[0])
+
+    parsed_list = [{**news_parser.parse_news(post["text"], post), "text": post["text"]} for post in posts]
+
+    def run_pipeline():
+        parsed = [{**news_parser.parse_news(post["text"], post), "text": post["text"]} for post in posts]
+        scorer.score_batch(parsed)
+
+    stages = (
+        ("признаки: прежняя", run_legacy_features),
+        ("признаки: движок", run_engine_features),
+        ("оценка: по одной", lambda: [scorer.calculate_total_score(news) for news in parsed_list]),
+        ("оценка: score_batch", lambda: scorer.score_batch(parsed_list)),
+        ("parse_news + score_batch", run_pipeline),
+    )
+    timings = {}
+    for name, func in stages:
+        best = float("inf")
+        for _ in range(args.repeat):
+            # Каждый повтор - с холодным кэшем разбора
+            engine.clear_cache()
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best
+
+    mismatches = 0
+    for post in posts:
+        legacy = legacy_parse(post["text"], post["chat_username"])
+        parsed = news_parser.parse_news(post["text"], post)
+        compiled = {
+            "author": parsed["author"]["name"], "status": parsed["author"]["status"],
+            "category": parsed["category"], "type": parsed["type"], "metrics": parsed["metrics"]
+        }
+        title = parsed["title"]
+        if legacy != compiled or legacy_text_features(post["text"], title) != engine.text_features(post["text"], title):
+            mismatches += 1
+
+    print()
+    print(f"Постов: {len(posts)} ({'экспорт ' + args.input if args.input else 'синтетический архив'})")
+    print(f"{'Этап':<26} {'всего, мс':>12} {'на пост, мкс':>14}")
+    print("-" * 54)
+    for name, seconds in timings.items():
+        print(f"{name:<26} {seconds * 1000:>12.1f} {seconds / len(posts) * 1e6:>14.1f}")
+    print(f"Расхождений с прежней реализацией: {mismatches}")
+    print()
+    return 0 if mismatches == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
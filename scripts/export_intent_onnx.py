@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Экспорт легкой модели классификатора намерений (cointegrated/rubert-tiny2) в ONNX.
+
+Если в INTENT_ONNX_MODEL_DIR (по умолчанию models/rubert-tiny2-onnx) есть
+model.onnx и установлен onnxruntime, services/agents/intent_classifier.py
+использует ONNX Runtime вместо sentence-transformers.
+
+Для экспорта нужны sentence-transformers и torch, для инференса - onnxruntime
+и transformers (токенизатор).
+
+Использование:
+    python3 scripts/export_intent_onnx.py
+    python3 scripts/export_intent_onnx.py --output models/rubert-tiny2-onnx
+"""
+import sys
+import logging
+import argparse
+from pathlib import Path
+
+# Добавляем корневую директорию проекта в sys.path
+project_root = Path(__file__).parent.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from services.agents.intent_classifier import export_light_model_to_onnx, ONNX_MODEL_DIR
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Экспорт rubert-tiny2 в ONNX")
+    parser.add_argument("--output", default=ONNX_MODEL_DIR, help="Каталог для model.onnx и токенизатора")
+    args = parser.parse_args()
+
+    try:
+        onnx_path = export_light_model_to_onnx(args.output)
+    except Exception as e:
+        print(f"❌ Ошибка экспорта: {e}")
+        return 1
+    print(f"✅ Готово: {onnx_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
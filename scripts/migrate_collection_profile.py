@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Миграция коллекции Qdrant на другой профиль хранения
+(квантование, векторы на диске, параметры HNSW - см. config/qdrant.yaml).
+
+Qdrant не позволяет переименовать коллекцию, поэтому миграция выполняется так:
+1. Создается временная коллекция <source>__<profile> с новым профилем
+2. В нее копируются все точки (векторы + payload)
+3. С флагом --in-place исходная коллекция пересоздается с новым профилем,
+   точки копируются обратно, временная коллекция удаляется
+
+Использование:
+    python3 scripts/migrate_collection_profile.py --profile scalar
+    python3 scripts/migrate_collection_profile.py --profile scalar --in-place
+"""
+import sys
+import logging
+import argparse
+from pathlib import Path
+
+# Добавляем корневую директорию проекта в sys.path
+project_root = Path(__file__).parent.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from services.rag.qdrant_helper import get_qdrant_client, COLLECTION_NAME, QDRANT_URL
+from services.rag.collection_profiles import (
+    get_collection_profile,
+    get_collection_dimension,
+    copy_points,
+    recreate_collection
+)
+from services.rag.retrieval_cache import invalidate_collection
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+log = logging.getLogger(__name__)
+
+
+def migrate(source: str, profile_name: str, in_place: bool, batch_size: int) -> int:
+    """Выполняет миграцию. Возвращает код выхода."""
+    client = get_qdrant_client()
+    if not client:
+        log.error(f"❌ Qdrant недоступен: {QDRANT_URL}")
+        return 1
+
+    if not client.collection_exists(source):
+        log.error(f"❌ Коллекция '{source}' не найдена")
+        return 1
+
+    profile = get_collection_profile(profile_name)
+    if profile["name"] != profile_name:
+        log.error(f"❌ Профиль '{profile_name}' не найден в config/qdrant.yaml")
+        return 1
+
+    dimension = get_collection_dimension(client, source)
+    metadata = client.get_collection(source).config.metadata
+    source_count = client.count(source, exact=True).count
+    target = f"{source}__{profile_name}"
+
+    log.info(f"🚀 Миграция '{source}' ({source_count} точек, размерность {dimension}) на профиль '{profile_name}'")
+
+    recreate_collection(client, target, profile, dimension, metadata)
+    copied = copy_points(client, source, target, batch_size=batch_size)
+    target_count = client.count(target, exact=True).count
+    if target_count != source_count:
+        log.error(f"❌ Количество точек не совпадает: {source}={source_count}, {target}={target_count}")
+        return 1
+    log.info(f"✅ Скопировано {copied} точек в '{target}'")
+
+    if not in_place:
+        log.info(f"ℹ️ Исходная коллекция не изменена. Проверьте '{target}' (scripts/benchmark_collection_profiles.py)")
+        log.info(f"   и повторите с --in-place, чтобы перевести '{source}' на профиль '{profile_name}'")
+        return 0
+
+    log.info(f"🔄 Пересоздание '{source}' с профилем '{profile_name}'...")
+    recreate_collection(client, source, profile, dimension, metadata)
+    copy_points(client, target, source, batch_size=batch_size)
+    invalidate_collection(source)
+
+    final_count = client.count(source, exact=True).count
+    if final_count != source_count:
+        log.error(f"❌ После миграции в '{source}' {final_count} точек вместо {source_count}. Копия сохранена в '{target}'")
+        return 1
+
+    client.delete_collection(target)
+    log.info(f"🎉 Коллекция '{source}' переведена на профиль '{profile_name}' ({final_count} точек)")
+    log.info(f"   Установите QDRANT_COLLECTION_PROFILE={profile_name}, чтобы поиск использовал параметры профиля")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Миграция коллекции Qdrant на другой профиль хранения")
+    parser.add_argument("--profile", required=True, help="Имя профиля из qdrant.collection_profiles")
+    parser.add_argument("--collection", default=COLLECTION_NAME, help="Исходная коллекция")
+    parser.add_argument("--in-place", action="store_true", help="Пересоздать исходную коллекцию с новым профилем")
+    parser.add_argument("--batch-size", type=int, default=256, help="Размер батча копирования")
+    args = parser.parse_args()
+
+    return migrate(args.collection, args.profile, args.in_place, args.batch_size)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
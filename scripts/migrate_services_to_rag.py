@@ -31,6 +31,10 @@ import requests  # pip install requests
 from qdrant_client import QdrantClient
 from qdrant_client.http.models import PointStruct
 
+from services.rag.embedding_dimensions import (
+    EmbeddingDimensionError, reduce_dimension, get_recorded_dimension, validate_points
+)
+
 # =============================================================================
 # КОНФИГ
 # =============================================================================
@@ -300,7 +304,8 @@ def generate_service_id(service: Dict) -> str:
 def generate_embedding(text: str, target_dimension: int = 1536) -> List[float]:
     """
     Генерирует эмбеддинг через OpenRouter (Qwen3-Embedding-8B) используя прямой HTTP запрос.
-    Автоматически обрезает или дополняет эмбеддинг до target_dimension.
+    Вектор усекается до target_dimension (Matryoshka) и нормализуется.
+    Вектор короче target_dimension - ошибка (EmbeddingDimensionError), дополнение нулями не выполняется.
     """
     if not OPENROUTER_API_KEY:
         raise ValueError("OPENROUTER_API_KEY не установлен")
@@ -329,17 +334,10 @@ def generate_embedding(text: str, target_dimension: int = 1536) -> List[float]:
         embedding = result["data"][0]["embedding"]
         embedding_size = len(embedding)
         
-        # Адаптируем размерность к целевой
+        # Matryoshka-усечение до размерности коллекции с повторной нормализацией
+        embedding = reduce_dimension(embedding, target_dimension)
         if embedding_size != target_dimension:
-            if embedding_size > target_dimension:
-                # Обрезаем до нужной размерности
-                embedding = embedding[:target_dimension]
-                log.debug(f"✂️ Эмбеддинг обрезан: {embedding_size} → {target_dimension}")
-            else:
-                # Дополняем нулями если меньше
-                padding_size = target_dimension - embedding_size
-                embedding = embedding + [0.0] * padding_size
-                log.debug(f"📌 Эмбеддинг дополнен: {embedding_size} → {target_dimension} (+{padding_size} нулей)")
+            log.debug(f"✂️ Эмбеддинг усечен: {embedding_size} → {target_dimension}")
         
         return embedding
     except requests.exceptions.RequestException as e:
@@ -424,7 +422,11 @@ def migrate_services_to_rag_http(services: List[Dict]) -> bool:
             )
             if response.status_code == 200:
                 collection_info = response.json()
-                vector_size = collection_info["result"]["config"]["params"]["vectors"]["size"]
+                collection_config = collection_info["result"]["config"]
+                vector_size = (
+                    (collection_config.get("metadata") or {}).get("embedding_dimension")
+                    or collection_config["params"]["vectors"]["size"]
+                )
                 log.info(f"✅ Коллекция найдена, vector_size={vector_size}")
                 break
             elif response.status_code == 404:
@@ -466,7 +468,15 @@ def migrate_services_to_rag_http(services: List[Dict]) -> bool:
             )
             
             embedding_start = datetime.now()
-            embedding = generate_embedding(service_text, target_dimension=vector_size)
+            try:
+                embedding = generate_embedding(service_text, target_dimension=vector_size)
+            except EmbeddingDimensionError as e:
+                # Модель вернула вектор короче коллекции - услугу пропускаем, остальные индексируем
+                log.warning(
+                    f"⚠️ [{idx}/{len(services)}] Пропущена услуга '{service['title']}': {e}"
+                )
+                failed += 1
+                continue
             embedding_time = (datetime.now() - embedding_start).total_seconds()
             
             if embedding is None:
@@ -680,8 +690,8 @@ def migrate_services_to_rag(services: List[Dict]) -> bool:
     
     for attempt in range(QDRANT_MAX_RETRIES):
         try:
-            info = client.get_collection(COLLECTION_NAME)
-            vector_size = info.config.params.vectors.size
+            client.get_collection(COLLECTION_NAME)
+            vector_size = get_recorded_dimension(client, COLLECTION_NAME)
             log.info(f"✅ Коллекция готова, vector_size={vector_size}")
             break
         except Exception as e:
@@ -729,7 +739,15 @@ def migrate_services_to_rag(services: List[Dict]) -> bool:
             )
 
             embedding_start = datetime.now()
-            embedding = generate_embedding(service_text, target_dimension=vector_size)
+            try:
+                embedding = generate_embedding(service_text, target_dimension=vector_size)
+            except EmbeddingDimensionError as e:
+                # Модель вернула вектор короче коллекции - услугу пропускаем, остальные индексируем
+                log.warning(
+                    f"⚠️ [{idx}/{len(services)}] Пропущена услуга '{service['title']}': {e}"
+                )
+                failed += 1
+                continue
             embedding_time = (datetime.now() - embedding_start).total_seconds()
 
             if embedding is None:
@@ -806,6 +824,9 @@ def migrate_services_to_rag(services: List[Dict]) -> bool:
     upload_start = datetime.now()
     result = None
     
+    # Векторы другой размерности отклоняются до обращения к Qdrant
+    validate_points(points, vector_size, COLLECTION_NAME)
+    
     for attempt in range(QDRANT_MAX_RETRIES):
         try:
             result = client.upsert(
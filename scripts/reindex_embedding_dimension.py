@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Уменьшение размерности коллекции Qdrant (Matryoshka-усечение), например 1536 → 512.
+
+Векторы существующей коллекции усекаются до первых N координат и нормализуются,
+повторная генерация эмбеддингов не требуется. Порядок работы:
+1. Создается коллекция <source>__<N>d с новой размерностью (метаданные: embedding_dimension)
+2. В нее копируются усеченные векторы и payload
+3. Строится отчет recall@k: эталон - точный поиск полными векторами по исходной коллекции
+4. С флагом --in-place исходная коллекция пересоздается с новой размерностью
+
+После --in-place установите EMBEDDING_DIMENSION=N, чтобы новые эмбеддинги
+усекались до той же размерности.
+
+Использование:
+    python3 scripts/reindex_embedding_dimension.py --dimension 512
+    python3 scripts/reindex_embedding_dimension.py --dimension 512 --in-place
+"""
+import sys
+import logging
+import argparse
+from pathlib import Path
+
+# Добавляем корневую директорию проекта в sys.path
+project_root = Path(__file__).parent.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from qdrant_client.models import SearchParams
+
+from services.rag.qdrant_helper import get_qdrant_client, COLLECTION_NAME, QDRANT_URL
+from services.rag.collection_profiles import (
+    get_collection_profile,
+    build_search_params,
+    copy_points,
+    recreate_collection
+)
+from services.rag.embedding_dimensions import (
+    reduce_dimension,
+    get_recorded_dimension,
+    get_embedding_settings,
+    build_collection_metadata
+)
+from services.rag.retrieval_cache import invalidate_collection
+from scripts.benchmark_collection_profiles import (
+    sample_query_vectors,
+    run_queries,
+    recall_at_k,
+    percentile
+)
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+log = logging.getLogger(__name__)
+
+
+def recall_report(client, source: str, target: str, dimension: int, queries: int, top_k: int, profile) -> None:
+    """Печатает recall@k усеченной коллекции относительно точного поиска по исходной"""
+    full_queries = sample_query_vectors(client, source, queries, seed=42)
+    if not full_queries:
+        log.warning(f"⚠️ В коллекции '{source}' нет векторов, отчет не построен")
+        return
+    short_queries = [reduce_dimension(vector, dimension) for vector in full_queries]
+
+    truth = run_queries(client, source, full_queries, top_k, SearchParams(exact=True))
+    source_ann = run_queries(client, source, full_queries, top_k, None)
+    target_exact = run_queries(client, target, short_queries, top_k, SearchParams(exact=True))
+    target_ann = run_queries(client, target, short_queries, top_k, build_search_params(profile))
+
+    source_dimension = len(full_queries[0])
+    points = client.count(source, exact=True).count
+    rows = [
+        (f"{source_dimension}d HNSW", recall_at_k(source_ann["ids"], truth["ids"]), source_ann["latencies"], source_dimension),
+        (f"{dimension}d exact", recall_at_k(target_exact["ids"], truth["ids"]), target_exact["latencies"], dimension),
+        (f"{dimension}d HNSW", recall_at_k(target_ann["ids"], truth["ids"]), target_ann["latencies"], dimension),
+    ]
+
+    print()
+    print(f"Отчет: {len(full_queries)} запросов, эталон - точный поиск {source_dimension}d по '{source}'")
+    print(f"{'Вариант':<16} {'recall@' + str(top_k):>10} {'p50, мс':>10} {'p95, мс':>10} {'векторы, МБ':>12}")
+    print("-" * 62)
+    for name, recall, latencies, dim in rows:
+        size_mb = points * dim * 4 / 1024 / 1024
+        print(f"{name:<16} {recall:>10.4f} {percentile(latencies, 50):>10.2f} {percentile(latencies, 95):>10.2f} {size_mb:>12.1f}")
+    print()
+
+
+def reindex(args) -> int:
+    """Выполняет переиндексацию. Возвращает код выхода."""
+    client = get_qdrant_client()
+    if not client:
+        log.error(f"❌ Qdrant недоступен: {QDRANT_URL}")
+        return 1
+
+    source = args.collection
+    source_dimension = get_recorded_dimension(client, source)
+    if source_dimension is None:
+        log.error(f"❌ Коллекция '{source}' не найдена")
+        return 1
+    if args.dimension >= source_dimension:
+        log.error(f"❌ Новая размерность ({args.dimension}) должна быть меньше текущей ({source_dimension})")
+        return 1
+
+    profile = get_collection_profile(args.profile)
+    source_metadata = client.get_collection(source).config.metadata or {}
+    model = source_metadata.get("embedding_model") or get_embedding_settings()["model"]
+    metadata = build_collection_metadata(args.dimension, model)
+    metadata["reduced_from"] = source_dimension
+
+    target = f"{source}__{args.dimension}d"
+    source_count = client.count(source, exact=True).count
+    log.info(f"🚀 Переиндексация '{source}': {source_dimension} → {args.dimension} ({source_count} точек)")
+
+    def transform(vector):
+        return reduce_dimension(vector, args.dimension)
+
+    recreate_collection(client, target, profile, args.dimension, metadata)
+    copy_points(client, source, target, batch_size=args.batch_size, transform_vector=transform)
+    target_count = client.count(target, exact=True).count
+    if target_count != source_count:
+        log.error(f"❌ Количество точек не совпадает: {source}={source_count}, {target}={target_count}")
+        return 1
+
+    recall_report(client, source, target, args.dimension, args.queries, args.top_k, profile)
+
+    if not args.in_place:
+        log.info(f"ℹ️ Исходная коллекция не изменена. Проверьте отчет и повторите с --in-place")
+        return 0
+
+    log.info(f"🔄 Пересоздание '{source}' с размерностью {args.dimension}...")
+    recreate_collection(client, source, profile, args.dimension, metadata)
+    copy_points(client, target, source, batch_size=args.batch_size)
+    invalidate_collection(source)
+
+    final_count = client.count(source, exact=True).count
+    if final_count != source_count:
+        log.error(f"❌ После переиндексации в '{source}' {final_count} точек вместо {source_count}. Копия сохранена в '{target}'")
+        return 1
+
+    client.delete_collection(target)
+    log.info(f"🎉 Коллекция '{source}' переведена на размерность {args.dimension}")
+    log.info(f"   Установите EMBEDDING_DIMENSION={args.dimension} и перезапустите сервисы")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Уменьшение размерности коллекции Qdrant (Matryoshka)")
+    parser.add_argument("--dimension", type=int, required=True, help="Новая размерность (например, 512)")
+    parser.add_argument("--collection", default=COLLECTION_NAME, help="Исходная коллекция")
+    parser.add_argument("--profile", default=None, help="Профиль хранения новой коллекции (по умолчанию - активный)")
+    parser.add_argument("--queries", type=int, default=100, help="Количество запросов для отчета recall")
+    parser.add_argument("--top-k", type=int, default=10, help="k для recall@k")
+    parser.add_argument("--in-place", action="store_true", help="Пересоздать исходную коллекцию с новой размерностью")
+    parser.add_argument("--batch-size", type=int, default=256, help="Размер батча копирования")
+    args = parser.parse_args()
+
+    return reindex(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,302 @@
+"""
+Channel Ingestion
+Прием сообщений из Telegram канала @HRTime_bot пачками для парсера и оценщика новостей.
+
+Два режима (HRTIME_CHANNEL_INGESTION):
+- queue (по умолчанию): channel_post, которые уже получает основной Application
+  (webhook или polling), передаются во внутреннюю очередь через submit().
+  Дополнительных запросов к Bot API нет, конфликта с основным getUpdates нет.
+- polling: отдельный long-polling getUpdates с сохраненным offset и
+  экспоненциальным back-off при ошибках. Только для бота, у которого нет
+  webhook и основного polling (например, отдельный токен).
+
+Offset getUpdates и последний обработанный message_id канала сохраняются
+в Redis (или в JSON файле, если Redis недоступен), поэтому после перезапуска
+уже обработанные сообщения не обрабатываются повторно. Оба значения
+сохраняются только в commit() - после обработки пачки. Пачка, которую
+не подтвердили (ошибка обработки), возвращается next_batch() повторно.
+"""
+import os
+import json
+import random
+import asyncio
+import logging
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+log = logging.getLogger()
+
+try:
+    from services.helpers.redis_helper import get_redis_client
+    REDIS_HELPER_AVAILABLE = True
+except ImportError:
+    REDIS_HELPER_AVAILABLE = False
+
+
+# ===================== CONFIGURATION =====================
+
+INGESTION_MODE = os.getenv("HRTIME_CHANNEL_INGESTION", "queue").lower()
+POLL_TIMEOUT = int(os.getenv("HRTIME_CHANNEL_POLL_TIMEOUT", "25"))  # Long-polling, секунды
+BATCH_SIZE = int(os.getenv("HRTIME_CHANNEL_BATCH_SIZE", "20"))
+BATCH_WAIT = float(os.getenv("HRTIME_CHANNEL_BATCH_WAIT", "2"))  # Сколько ждать добора пачки
+MAX_BACKOFF = float(os.getenv("HRTIME_CHANNEL_MAX_BACKOFF", "300"))
+QUEUE_MAX_SIZE = int(os.getenv("HRTIME_CHANNEL_QUEUE_SIZE", "1000"))
+MAX_BATCH_ATTEMPTS = int(os.getenv("HRTIME_CHANNEL_MAX_BATCH_ATTEMPTS", "5"))  # Потом пачка пропускается
+STATE_FILE = os.getenv("HRTIME_CHANNEL_STATE_FILE", "data/hrtime_channel_state.json")
+
+REDIS_STATE_KEY = "hrtime_channel:state"
+
+MODE_QUEUE = "queue"
+MODE_POLLING = "polling"
+
+
+# ===================== OFFSET STORE =====================
+
+class ChannelOffsetStore:
+    """Хранилище offset getUpdates и последних обработанных message_id по каналам"""
+
+    def __init__(self, redis_client=None, state_file: str = STATE_FILE):
+        self.redis = redis_client
+        self.state_file = Path(state_file)
+        self._state: Dict[str, Any] = self._load()
+
+    def _load(self) -> Dict[str, Any]:
+        state: Dict[str, Any] = {}
+        try:
+            raw = None
+            if self.redis is not None:
+                raw = self.redis.get(REDIS_STATE_KEY)
+            elif self.state_file.exists():
+                raw = self.state_file.read_text(encoding="utf-8")
+            if raw:
+                state = json.loads(raw)
+        except Exception as e:
+            log.warning(f"⚠️ [Channel Ingestion] Не удалось загрузить состояние: {e}")
+        state.setdefault("update_offset", None)
+        state.setdefault("last_message_ids", {})
+        return state
+
+    def _save(self) -> None:
+        payload = json.dumps(self._state)
+        try:
+            if self.redis is not None:
+                self.redis.set(REDIS_STATE_KEY, payload)
+                return
+            self.state_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.state_file.with_suffix(".tmp")
+            tmp_file.write_text(payload, encoding="utf-8")
+            tmp_file.replace(self.state_file)
+        except Exception as e:
+            log.warning(f"⚠️ [Channel Ingestion] Не удалось сохранить состояние: {e}")
+
+    @property
+    def update_offset(self) -> Optional[int]:
+        return self._state["update_offset"]
+
+    def set_update_offset(self, offset: int) -> None:
+        if offset != self._state["update_offset"]:
+            self._state["update_offset"] = offset
+            self._save()
+
+    def last_message_id(self, chat_id: Any) -> int:
+        return int(self._state["last_message_ids"].get(str(chat_id), 0))
+
+    def commit_messages(self, messages: List[Dict]) -> None:
+        """Запоминает максимальный обработанный message_id каждого канала"""
+        changed = False
+        last_ids = self._state["last_message_ids"]
+        for message in messages:
+            chat_id = str(message.get("chat_id", ""))
+            message_id = int(message.get("message_id") or 0)
+            if message_id > int(last_ids.get(chat_id, 0)):
+                last_ids[chat_id] = message_id
+                changed = True
+        if changed:
+            self._save()
+
+
+# ===================== INGESTOR =====================
+
+class ChannelIngestor:
+    """Источник пачек новых сообщений канала (очередь или long-polling)"""
+
+    def __init__(
+        self,
+        adapter=None,
+        store: Optional[ChannelOffsetStore] = None,
+        mode: str = INGESTION_MODE,
+        batch_size: int = BATCH_SIZE,
+        batch_wait: float = BATCH_WAIT,
+        poll_timeout: int = POLL_TIMEOUT,
+        max_backoff: float = MAX_BACKOFF
+    ):
+        """
+        Args:
+            adapter: TelegramChannelAdapter (нужен только для режима polling)
+            store: Хранилище offset (по умолчанию Redis или JSON файл)
+            mode: "queue" или "polling"
+            batch_size: Максимальный размер пачки
+            batch_wait: Сколько секунд ждать добора пачки после первого сообщения
+            poll_timeout: Таймаут long-polling getUpdates в секундах
+            max_backoff: Максимальная пауза между попытками при ошибках
+        """
+        if mode not in (MODE_QUEUE, MODE_POLLING):
+            log.warning(f"⚠️ [Channel Ingestion] Неизвестный режим '{mode}', используется {MODE_QUEUE}")
+            mode = MODE_QUEUE
+        if store is None:
+            redis_client = get_redis_client() if REDIS_HELPER_AVAILABLE else None
+            store = ChannelOffsetStore(redis_client)
+
+        self.adapter = adapter
+        self.store = store
+        self.mode = mode
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.poll_timeout = poll_timeout
+        self.max_backoff = max_backoff
+        self._queue: Optional[asyncio.Queue] = None
+        self._failures = 0
+        # Выданная, но еще не подтвержденная пачка и offset, который сохраняется после commit
+        self._pending: Optional[List[Dict]] = None
+        self._pending_offset: Optional[int] = None
+        self._pending_attempts = 0
+
+    @property
+    def queue(self) -> asyncio.Queue:
+        # Очередь создается лениво внутри работающего event loop
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=QUEUE_MAX_SIZE)
+        return self._queue
+
+    def submit(self, message: Dict) -> bool:
+        """
+        Передает сообщение канала, полученное основным Application (режим queue)
+
+        Returns:
+            True если сообщение поставлено в очередь
+        """
+        if not self.is_new(message):
+            log.debug(f"ℹ️ [Channel Ingestion] Сообщение {message.get('message_id')} уже обработано")
+            return False
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            log.warning(f"⚠️ [Channel Ingestion] Очередь переполнена, сообщение {message.get('message_id')} пропущено")
+            return False
+
+    def is_new(self, message: Dict) -> bool:
+        message_id = int(message.get("message_id") or 0)
+        return message_id > self.store.last_message_id(message.get("chat_id", ""))
+
+    def commit(self, batch: List[Dict]) -> None:
+        """Подтверждает обработку пачки (сохраняет последний message_id и offset getUpdates)"""
+        self.store.commit_messages(batch)
+        if self._pending_offset is not None:
+            self.store.set_update_offset(self._pending_offset)
+        self._pending = None
+        self._pending_offset = None
+        self._pending_attempts = 0
+
+    def _backoff_delay(self) -> float:
+        delay = min(self.max_backoff, 2 ** min(self._failures, 10))
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _next_queue_batch(self) -> List[Dict]:
+        batch = [await self.queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _next_polling_batch(self) -> Tuple[List[Dict], Optional[int]]:
+        while True:
+            try:
+                messages, next_offset = await self.adapter.fetch_channel_updates(
+                    offset=self.store.update_offset,
+                    limit=self.batch_size,
+                    timeout=self.poll_timeout
+                )
+            except Exception as e:
+                self._failures += 1
+                delay = self._backoff_delay()
+                log.warning(f"⚠️ [Channel Ingestion] Ошибка getUpdates ({e}), повтор через {delay:.1f}с")
+                await asyncio.sleep(delay)
+                continue
+
+            self._failures = 0
+            if messages:
+                # Offset сохраняется только после commit(): при сбое пачка будет получена снова
+                return messages, next_offset
+            if next_offset is not None:
+                self.store.set_update_offset(next_offset)
+
+    async def next_batch(self) -> List[Dict]:
+        """
+        Ждет следующую пачку новых сообщений канала
+
+        Если предыдущая пачка не подтверждена через commit(), она возвращается
+        повторно (не более MAX_BATCH_ATTEMPTS раз, затем пропускается).
+        """
+        if self._pending is not None:
+            if self._pending_attempts < MAX_BATCH_ATTEMPTS:
+                self._pending_attempts += 1
+                log.warning(
+                    f"⚠️ [Channel Ingestion] Повторная обработка пачки из {len(self._pending)} сообщений "
+                    f"(попытка {self._pending_attempts + 1})"
+                )
+                return self._pending
+            log.error(
+                f"❌ [Channel Ingestion] Пачка из {len(self._pending)} сообщений не обработана "
+                f"после {MAX_BATCH_ATTEMPTS + 1} попыток, пропускаем"
+            )
+            self.commit(self._pending)
+
+        while True:
+            next_offset = None
+            if self.mode == MODE_POLLING:
+                batch, next_offset = await self._next_polling_batch()
+            else:
+                batch = await self._next_queue_batch()
+
+            # Дубликаты внутри пачки и уже обработанные до перезапуска
+            seen = set()
+            fresh = []
+            for message in sorted(batch, key=lambda m: int(m.get("message_id") or 0)):
+                key = (str(message.get("chat_id", "")), message.get("message_id"))
+                if key not in seen and self.is_new(message):
+                    seen.add(key)
+                    fresh.append(message)
+            if fresh:
+                self._pending = fresh
+                self._pending_offset = next_offset
+                self._pending_attempts = 0
+                return fresh
+            if next_offset is not None:
+                # Только дубликаты - подтверждать нечего
+                self.store.set_update_offset(next_offset)
+
+    async def batches(self) -> AsyncIterator[List[Dict]]:
+        """Бесконечный поток пачек. Вызывающий подтверждает обработку через commit()"""
+        while True:
+            yield await self.next_batch()
+
+
+_ingestor: Optional[ChannelIngestor] = None
+
+
+def get_channel_ingestor(adapter=None) -> ChannelIngestor:
+    """Получить экземпляр ChannelIngestor (Singleton)"""
+    global _ingestor
+    if _ingestor is None:
+        _ingestor = ChannelIngestor(adapter=adapter)
+    elif adapter is not None and _ingestor.adapter is None:
+        _ingestor.adapter = adapter
+    return _ingestor
@@ -4,7 +4,7 @@ Telegram Channel Adapter
 """
 import os
 import logging
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 
 log = logging.getLogger()
@@ -28,6 +28,18 @@ HRTIME_CHANNEL_ID = os.getenv("HRTIME_CHANNEL_ID")  # Опционально, м
 
 # ===================== ADAPTER CLASS =====================
 
+def channel_post_to_message(post) -> Dict:
+    """Словарь сообщения канала из telegram.Message (channel_post)"""
+    return {
+        "message_id": post.message_id,
+        "text": post.text or post.caption or "",
+        "date": post.date,
+        "chat_id": post.chat.id,
+        "chat_username": post.chat.username,
+        "raw": post.to_dict() if hasattr(post, 'to_dict') else {}
+    }
+
+
 class TelegramChannelAdapter:
     """Адаптер для получения сообщений из Telegram канала"""
     
@@ -102,6 +114,49 @@ class TelegramChannelAdapter:
             log.error(f"❌ Traceback: {traceback.format_exc()}")
             return []
     
+    def is_own_channel_post(self, post) -> bool:
+        """Проверить, что channel_post пришел из канала @HRTime_bot"""
+        return post.chat.username == self.channel_username.lstrip('@') or \
+            str(post.chat.id) == str(self.channel_id)
+    
+    async def fetch_channel_updates(
+        self,
+        offset: Optional[int] = None,
+        limit: int = 100,
+        timeout: int = 25
+    ) -> Tuple[List[Dict], Optional[int]]:
+        """
+        Long-polling getUpdates только для channel_post
+        
+        Args:
+            offset: Offset (update_id последнего обработанного обновления + 1)
+            limit: Максимальное количество обновлений
+            timeout: Таймаут long-polling в секундах
+        
+        Returns:
+            Кортеж (сообщения канала, следующий offset или None если обновлений нет)
+        
+        Raises:
+            TelegramError: ошибки Bot API пробрасываются для back-off
+        """
+        if not self.bot:
+            raise RuntimeError("Telegram Bot недоступен")
+        
+        updates = await self.bot.get_updates(
+            offset=offset,
+            limit=limit,
+            timeout=timeout,
+            allowed_updates=["channel_post"]
+        )
+        
+        channel_messages = [
+            channel_post_to_message(update.channel_post)
+            for update in updates
+            if update.channel_post and self.is_own_channel_post(update.channel_post)
+        ]
+        next_offset = updates[-1].update_id + 1 if updates else None
+        return channel_messages, next_offset
+    
     async def get_channel_updates(
         self,
         offset: Optional[int] = None,
@@ -121,25 +176,7 @@ class TelegramChannelAdapter:
             return []
         
         try:
-            updates = await self.bot.get_updates(offset=offset, limit=limit, timeout=10)
-            
-            channel_messages = []
-            for update in updates:
-                # Проверяем, что это сообщение из нужного канала
-                if update.channel_post:
-                    post = update.channel_post
-                    # Проверяем, что это наш канал
-                    if post.chat.username == self.channel_username.lstrip('@') or \
-                       str(post.chat.id) == str(self.channel_id):
-                        channel_messages.append({
-                            "message_id": post.message_id,
-                            "text": post.text or post.caption or "",
-                            "date": post.date,
-                            "chat_id": post.chat.id,
-                            "chat_username": post.chat.username,
-                            "raw": post.to_dict()
-                        })
-            
+            channel_messages, _ = await self.fetch_channel_updates(offset=offset, limit=limit, timeout=10)
             log.info(f"✅ [Telegram Channel] Получено {len(channel_messages)} сообщений из канала через getUpdates")
             return channel_messages
             
@@ -119,9 +119,12 @@ async def monitor_hrtime_orders(telegram_bot, interval_minutes: int = 30):
                                 consultant_chat_id = os.getenv("TELEGRAM_CONSULTANT_CHAT_ID")
                                 if consultant_chat_id:
                                     try:
-                                        await telegram_bot.send_message(
-                                            chat_id=int(consultant_chat_id),
-                                            text=result["notification_text"],
+                                        from services.helpers.telegram_outbox import PRIORITY_LEAD, queue_message
+                                        await queue_message(
+                                            telegram_bot,
+                                            int(consultant_chat_id),
+                                            result["notification_text"],
+                                            priority=PRIORITY_LEAD,
                                             parse_mode="Markdown"
                                         )
                                         log.info(f"✅ [Мониторинг] Консультант уведомлен о заказе {order_id}")
@@ -3,10 +3,15 @@
 Использует русскоязычные модели BERT для лучшего понимания намерений пользователя
 """
 import os
+import json
 import logging
-from typing import Dict, Tuple, Optional
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple, Optional
 import re
 
+import numpy as np
+
 log = logging.getLogger(__name__)
 
 # Попытка импорта библиотек для классификации
@@ -25,10 +30,20 @@ try:
 except ImportError:
     SENTENCE_TRANSFORMERS_AVAILABLE = False
 
+# ONNX Runtime для быстрого инференса легкой модели на CPU (опционально)
+try:
+    import onnxruntime
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    ONNXRUNTIME_AVAILABLE = False
+
 # Глобальные переменные
 _intent_model = None
 _intent_tokenizer = None
 _embedding_model_light = None
+_onnx_encoder = None
+_reference_store = None
+_reference_store_lock = threading.Lock()
 
 # Легкая русскоязычная модель для эмбеддингов (быстрее и меньше)
 LIGHT_EMBEDDING_MODEL = "cointegrated/rubert-tiny2"  # Очень легкая модель для русского
@@ -36,6 +51,30 @@ LIGHT_EMBEDDING_MODEL = "cointegrated/rubert-tiny2"  # Очень легкая 
 # "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"  # Мультиязычная, легкая
 # "intfloat/multilingual-e5-small"  # Мультиязычная, средняя
 
+# Каталог с ONNX экспортом легкой модели (см. export_light_model_to_onnx)
+ONNX_MODEL_DIR = os.getenv("INTENT_ONNX_MODEL_DIR", "models/rubert-tiny2-onnx")
+ONNX_MAX_LENGTH = 512
+
+# Эталонные запросы на запись
+BOOKING_EXAMPLES = (
+    "хочу записаться",
+    "записаться на услугу",
+    "нужна запись",
+    "когда можно записаться",
+    "забронировать время",
+    "хочу записаться к мастеру",
+    "запись на завтра",
+    "записаться на консультацию",
+    "нужна запись на собеседование",
+    "когда свободно",
+    "можно записаться",
+    "хочу записаться на бритье",
+    "запись на сегодня",
+    "записаться на завтра в 8 утра"
+)
+MAX_SERVICE_TITLES = 20  # Сравниваем с первыми 20 услугами
+SERVICE_SIMILARITY_WEIGHT = 0.8
+
 def get_light_embedding_model():
     """Получить легкую модель для эмбеддингов"""
     global _embedding_model_light
@@ -55,83 +94,257 @@ def get_light_embedding_model():
         log.error(f"❌ Ошибка загрузки легкой модели: {e}")
         return None
 
-def classify_intent_with_embeddings(text: str, services: list, masters: list) -> Tuple[float, Dict]:
-    """
-    Классификация намерения с использованием эмбеддингов
-    Возвращает (confidence_score, details)
+def _as_matrix(vectors) -> np.ndarray:
+    """Непрерывная float32 матрица с нормированными строками"""
+    matrix = np.ascontiguousarray(np.asarray(vectors, dtype=np.float32))
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+class OnnxEmbeddingEncoder:
+    """Инференс легкой модели через ONNX Runtime (без torch и sentence-transformers)"""
+    
+    def __init__(self, model_dir: str = ONNX_MODEL_DIR):
+        from transformers import AutoTokenizer
+        
+        model_dir = Path(model_dir)
+        self.tokenizer = AutoTokenizer.from_pretrained(str(model_dir))
+        self.session = onnxruntime.InferenceSession(
+            str(model_dir / "model.onnx"),
+            providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        pooling_file = model_dir / "pooling.json"
+        self.pooling = json.loads(pooling_file.read_text())["mode"] if pooling_file.exists() else "cls"
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        inputs = self.tokenizer(
+            list(texts), padding=True, truncation=True,
+            max_length=ONNX_MAX_LENGTH, return_tensors="np"
+        )
+        feed = {name: value.astype(np.int64) for name, value in inputs.items() if name in self.input_names}
+        hidden = self.session.run(None, feed)[0]
+        if self.pooling == "mean":
+            mask = inputs["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        else:
+            pooled = hidden[:, 0]
+        return _as_matrix(pooled)
+
+def get_onnx_encoder() -> Optional[OnnxEmbeddingEncoder]:
+    """ONNX энкодер, если есть экспортированная модель и onnxruntime"""
+    global _onnx_encoder
+    
+    if _onnx_encoder is not None:
+        return _onnx_encoder
+    if not (ONNXRUNTIME_AVAILABLE and TRANSFORMERS_AVAILABLE) or not (Path(ONNX_MODEL_DIR) / "model.onnx").exists():
+        return None
+    
+    try:
+        _onnx_encoder = OnnxEmbeddingEncoder(ONNX_MODEL_DIR)
+        log.info(f"✅ ONNX модель для эмбеддингов загружена: {ONNX_MODEL_DIR}")
+        return _onnx_encoder
+    except Exception as e:
+        log.error(f"❌ Ошибка загрузки ONNX модели: {e}")
+        return None
+
+def export_light_model_to_onnx(output_dir: str = ONNX_MODEL_DIR) -> Path:
     """
-    if not SENTENCE_TRANSFORMERS_AVAILABLE:
-        return 0.0, {"method": "fallback", "reason": "sentence-transformers недоступен"}
+    Экспорт легкой модели (rubert-tiny2) в ONNX для быстрого инференса на CPU
     
+    Args:
+        output_dir: Каталог для model.onnx, токенизатора и pooling.json
+    
+    Returns:
+        Путь к model.onnx
+    """
     model = get_light_embedding_model()
-    if not model:
-        return 0.0, {"method": "fallback", "reason": "модель не загружена"}
+    if model is None or not TRANSFORMERS_AVAILABLE:
+        raise RuntimeError("Для экспорта нужны sentence-transformers и torch")
     
-    try:
-        # Генерируем эмбеддинг для текста пользователя
-        text_embedding = model.encode(text, normalize_embeddings=True)
-        
-        # Создаем эталонные эмбеддинги для запросов на запись
-        booking_examples = [
-            "хочу записаться",
-            "записаться на услугу",
-            "нужна запись",
-            "когда можно записаться",
-            "забронировать время",
-            "хочу записаться к мастеру",
-            "запись на завтра",
-            "записаться на консультацию",
-            "нужна запись на собеседование",
-            "когда свободно",
-            "можно записаться",
-            "хочу записаться на бритье",
-            "запись на сегодня",
-            "записаться на завтра в 8 утра"
-        ]
-        
-        booking_embeddings = model.encode(booking_examples, normalize_embeddings=True)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    transformer = model[0].auto_model.eval()
+    pooling = "mean" if getattr(model[1], "pooling_mode_mean_tokens", False) else "cls"
+    
+    class _HiddenStates(torch.nn.Module):
+        def __init__(self, encoder):
+            super().__init__()
+            self.encoder = encoder
         
-        # Вычисляем косинусное сходство с эталонными запросами
-        import numpy as np
-        similarities = np.dot(booking_embeddings, text_embedding)
-        max_similarity = float(np.max(similarities))
+        def forward(self, input_ids, attention_mask):
+            return self.encoder(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+    
+    sample = model.tokenizer(["хочу записаться"], return_tensors="pt")
+    onnx_path = output_dir / "model.onnx"
+    torch.onnx.export(
+        _HiddenStates(transformer),
+        (sample["input_ids"], sample["attention_mask"]),
+        str(onnx_path),
+        input_names=["input_ids", "attention_mask"],
+        output_names=["last_hidden_state"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "last_hidden_state": {0: "batch", 1: "sequence"}
+        },
+        opset_version=14
+    )
+    model.tokenizer.save_pretrained(str(output_dir))
+    (output_dir / "pooling.json").write_text(json.dumps({"mode": pooling}))
+    log.info(f"✅ Модель {LIGHT_EMBEDDING_MODEL} экспортирована в ONNX: {onnx_path}")
+    return onnx_path
+
+def _get_encoder() -> Optional[Callable[[List[str]], np.ndarray]]:
+    """Функция кодирования текстов: ONNX, если доступен, иначе sentence-transformers"""
+    onnx_encoder = get_onnx_encoder()
+    if onnx_encoder is not None:
+        return onnx_encoder.encode
+    model = get_light_embedding_model()
+    if model is None:
+        return None
+    return lambda texts: model.encode(list(texts), normalize_embeddings=True)
+
+def encode_texts(texts: List[str]) -> Optional[np.ndarray]:
+    """Нормированные эмбеддинги текстов легкой моделью (None, если модель недоступна)"""
+    encoder = _get_encoder()
+    if encoder is None:
+        return None
+    return _as_matrix(encoder(list(texts)))
+
+class ReferenceEmbeddingStore:
+    """
+    Эталонные эмбеддинги для классификации намерений
+    
+    Примеры запросов на запись кодируются один раз при создании,
+    названия услуг - только при изменении списка услуг. Все эталоны хранятся
+    непрерывными нормированными float32 матрицами, поэтому на каждое сообщение
+    кодируется только текст пользователя.
+    """
+    
+    def __init__(self, encoder: Callable[[List[str]], np.ndarray]):
+        self.encoder = encoder
+        self.examples = _as_matrix(encoder(list(BOOKING_EXAMPLES)))
+        self._lock = threading.Lock()
+        self._service_titles: Optional[Tuple[str, ...]] = None
+        self._service_vectors: Dict[str, np.ndarray] = {}
+        self._services_matrix: Optional[np.ndarray] = None
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return _as_matrix(self.encoder(list(texts)))
+    
+    def services_matrix(self, services: list) -> Optional[np.ndarray]:
+        """Матрица эмбеддингов названий услуг (пересчитывается при изменении услуг)"""
+        titles = tuple(s.get("title", "") for s in services[:MAX_SERVICE_TITLES])
+        if not titles:
+            return None
         
-        # Проверяем сходство с услугами
-        if services:
-            service_titles = [s.get("title", "") for s in services[:20]]  # Берем первые 20
-            service_embeddings = model.encode(service_titles, normalize_embeddings=True)
-            service_similarities = np.dot(service_embeddings, text_embedding)
-            max_service_similarity = float(np.max(service_similarities))
+        with self._lock:
+            if titles != self._service_titles:
+                # Кодируем только новые названия, остальные берем из прошлого списка
+                missing = [t for t in dict.fromkeys(titles) if t not in self._service_vectors]
+                if missing:
+                    self._service_vectors.update(zip(missing, self.encode(missing)))
+                    log.info(f"🔄 Эмбеддинги услуг пересчитаны: {len(missing)} новых из {len(titles)}")
+                self._service_vectors = {t: self._service_vectors[t] for t in titles}
+                self._services_matrix = np.ascontiguousarray(np.stack([self._service_vectors[t] for t in titles]))
+                self._service_titles = titles
+            return self._services_matrix
+
+def get_reference_store() -> Optional[ReferenceEmbeddingStore]:
+    """Получить хранилище эталонных эмбеддингов (создается при первой загрузке модели)"""
+    global _reference_store
+    
+    if _reference_store is not None:
+        return _reference_store
+    
+    with _reference_store_lock:
+        if _reference_store is None:
+            encoder = _get_encoder()
+            if encoder is None:
+                return None
+            try:
+                _reference_store = ReferenceEmbeddingStore(encoder)
+                log.info(f"✅ Эталонные эмбеддинги рассчитаны: {len(BOOKING_EXAMPLES)} примеров")
+            except Exception as e:
+                log.error(f"❌ Ошибка расчета эталонных эмбеддингов: {e}")
+                return None
+    return _reference_store
+
+def classify_many_with_embeddings(texts: List[str], services: list, masters: list) -> List[Tuple[float, Dict]]:
+    """
+    Классификация намерений списка текстов с использованием эмбеддингов
+    
+    Все тексты кодируются одним вызовом модели и сравниваются с эталонами
+    одним матричным умножением.
+    
+    Returns:
+        Список (confidence_score, details) в порядке texts
+    """
+    if not texts:
+        return []
+    
+    store = get_reference_store()
+    if store is None:
+        if not (SENTENCE_TRANSFORMERS_AVAILABLE or get_onnx_encoder()):
+            reason = "sentence-transformers недоступен"
         else:
-            max_service_similarity = 0.0
-        
-        # Комбинируем результаты
-        confidence = max(max_similarity, max_service_similarity * 0.8)
+            reason = "модель не загружена"
+        return [(0.0, {"method": "fallback", "reason": reason}) for _ in texts]
+    
+    try:
+        text_embeddings = store.encode(texts)
         
-        details = {
-            "method": "embedding",
-            "booking_similarity": max_similarity,
-            "service_similarity": max_service_similarity,
-            "confidence": confidence
-        }
+        # Косинусное сходство с эталонными запросами и услугами
+        booking_similarity = (text_embeddings @ store.examples.T).max(axis=1)
+        services_matrix = store.services_matrix(services) if services else None
+        if services_matrix is not None:
+            service_similarity = (text_embeddings @ services_matrix.T).max(axis=1)
+        else:
+            service_similarity = np.zeros(len(texts), dtype=np.float32)
         
-        return confidence, details
+        results = []
+        for max_similarity, max_service_similarity in zip(booking_similarity.tolist(), service_similarity.tolist()):
+            # Комбинируем результаты
+            confidence = max(max_similarity, max_service_similarity * SERVICE_SIMILARITY_WEIGHT)
+            results.append((confidence, {
+                "method": "embedding",
+                "booking_similarity": max_similarity,
+                "service_similarity": max_service_similarity,
+                "confidence": confidence
+            }))
+        return results
         
     except Exception as e:
         log.error(f"❌ Ошибка классификации с эмбеддингами: {e}")
-        return 0.0, {"method": "error", "error": str(e)}
+        return [(0.0, {"method": "error", "error": str(e)}) for _ in texts]
 
-def classify_intent_hybrid(text: str, services: list, masters: list) -> Tuple[float, Dict]:
+def classify_intent_with_embeddings(text: str, services: list, masters: list) -> Tuple[float, Dict]:
+    """
+    Классификация намерения с использованием эмбеддингов
+    Возвращает (confidence_score, details)
+    """
+    return classify_many_with_embeddings([text], services, masters)[0]
+
+def classify_intent_hybrid(text: str, services: list, masters: list,
+                           embedding_result: Optional[Tuple[float, Dict]] = None) -> Tuple[float, Dict]:
     """
     Гибридная классификация намерения:
     1. Использует эмбеддинги для семантического понимания
     2. Использует ключевые слова как fallback
     3. Учитывает контекст (услуги, мастера, время)
+    
+    embedding_result - уже рассчитанный результат classify_intent_with_embeddings
+    (например, из classify_many)
     """
     text_lower = text.lower().strip()
     
     # 1. Попытка классификации с эмбеддингами
-    embedding_score, embedding_details = classify_intent_with_embeddings(text, services, masters)
+    if embedding_result is None:
+        embedding_result = classify_intent_with_embeddings(text, services, masters)
+    embedding_score, embedding_details = embedding_result
     
     # 2. Проверка ключевых слов (fallback)
     keyword_score = 0.0
@@ -310,13 +523,46 @@ def is_booking_intent(text: str, services: list = None, masters: list = None, th
     
     return is_booking, details
 
+def classify_many(texts: List[str], services: list = None, masters: list = None,
+                  threshold: float = 0.5) -> List[Tuple[bool, Dict]]:
+    """
+    Пакетная версия is_booking_intent (без LLM)
+    
+    Эмбеддинги всех текстов рассчитываются одним вызовом модели.
+    
+    Args:
+        texts: Тексты сообщений
+        services: Список услуг (опционально)
+        masters: Список мастеров (опционально)
+        threshold: Порог уверенности (по умолчанию 0.5)
+    
+    Returns:
+        Список (is_booking, details) в порядке texts
+    """
+    services = services or []
+    masters = masters or []
+    
+    embedding_results = classify_many_with_embeddings(texts, services, masters)
+    results = []
+    for text, embedding_result in zip(texts, embedding_results):
+        final_score, details = classify_intent_hybrid(text, services, masters, embedding_result=embedding_result)
+        details["final_score"] = final_score
+        results.append((final_score >= threshold, details))
+    return results
+
 # Экспорт для использования в других модулях
 __all__ = [
     'is_booking_intent',
+    'classify_many',
     'classify_intent_hybrid',
     'classify_intent_with_embeddings',
+    'classify_many_with_embeddings',
+    'get_reference_store',
+    'encode_texts',
+    'export_light_model_to_onnx',
     'get_light_embedding_model',
     'TRANSFORMERS_AVAILABLE',
-    'SENTENCE_TRANSFORMERS_AVAILABLE'
+    'SENTENCE_TRANSFORMERS_AVAILABLE',
+    'ONNXRUNTIME_AVAILABLE'
 ]
 
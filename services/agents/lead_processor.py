@@ -2,10 +2,19 @@
 Proposal Generator Module
 Генерация коммерческих предложений, классификация запросов и гипотез
 """
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
 import logging
-from typing import Dict, List, Optional
+from collections import OrderedDict
+from typing import Any, Dict, List, Literal, Optional
 from datetime import datetime
 
+from pydantic import BaseModel, Field, ValidationError, field_validator
+
 log = logging.getLogger()
 
 # Импорты для LLM и RAG
@@ -19,24 +28,6 @@ except ImportError:
 
 # ===================== PROMPTS =====================
 
-CLASSIFICATION_PROMPT = """
-Ты AI-ассистент для консалтинговой практики. Классифицируй запрос клиента по категориям.
-
-Категории:
-- "автоматизация" - автоматизация HR-процессов, внедрение систем
-- "бизнес-анализ" - анализ бизнес-процессов, консалтинг
-- "другое" - не подходит под основные категории
-
-Ответь ТОЛЬКО в формате JSON:
-{
-    "category": "автоматизация" | "бизнес-анализ" | "другое",
-    "confidence": 0.0-1.0,
-    "keywords": ["ключевое слово 1", "ключевое слово 2"]
-}
-
-Запрос: {{request}}
-"""
-
 PROPOSAL_GENERATION_PROMPT = """
 Ты — опытный HR‑консультант и руководитель HR‑проектов.
 Твоя задача — писать коммерческие предложения (КП) в ответ на описание запроса заказчика по HR/оценке/развитию, в деловом, но живом и понятном стиле.
@@ -198,6 +189,270 @@ HYPOTHESIS_GENERATION_PROMPT = """
 {{rag_context}}
 """
 
+# ===================== LEAD ANALYSIS =====================
+# Один запрос к LLM возвращает всё, что нужно сценариям о лиде: категорию,
+# оценку, контакты, бюджет, сроки и тип письма. classify_request, extract_lead_info
+# и классификаторы писем в scenario_workflows - представления этого результата.
+
+LEAD_ANALYSIS_CACHE_TTL = int(os.getenv("LEAD_ANALYSIS_CACHE_TTL", "3600"))
+LEAD_ANALYSIS_CACHE_SIZE = int(os.getenv("LEAD_ANALYSIS_CACHE_SIZE", "512"))
+LEAD_ANALYSIS_MAX_CHARS = 4000
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class LeadContacts(BaseModel):
+    """Контакты клиента из текста запроса"""
+    full_name: str = ""
+    email: str = ""
+    phone: str = ""
+    company: str = ""
+
+    @field_validator("*", mode="before")
+    @classmethod
+    def _none_to_empty(cls, value):
+        return "" if value is None else value
+
+
+class LeadAnalysis(BaseModel):
+    """Результат анализа лида (JSON-схема передается в промпт)"""
+    # Классификация по направлениям экспертизы
+    category: str = "другое"
+    confidence: float = 0.0
+    keywords: List[str] = Field(default_factory=list)
+    # Оценка лида
+    is_lead: bool = False
+    score: float = 0.0
+    status: Literal["warm", "cold"] = "cold"
+    reason: str = ""
+    # Тип письма (для email)
+    email_type: Literal["new_lead", "followup", "service"] = "service"
+    email_type_confidence: float = 0.0
+    email_type_reason: str = ""
+    # Извлеченная информация для КП
+    contacts: LeadContacts = Field(default_factory=LeadContacts)
+    service_type: str = ""
+    industry: str = ""
+    company_size: str = ""
+    business_spec: str = ""
+    deadline: str = ""
+    budget: str = ""
+    additional_info: str = ""
+    summary: str = ""
+
+    @field_validator(
+        "category", "reason", "email_type_reason", "service_type", "industry", "company_size",
+        "business_spec", "deadline", "budget", "additional_info", "summary", mode="before"
+    )
+    @classmethod
+    def _none_to_empty(cls, value):
+        return "" if value is None else value
+
+    @field_validator("confidence", "score", "email_type_confidence", mode="before")
+    @classmethod
+    def _clamp(cls, value):
+        if value is None:
+            return 0.0
+        return max(0.0, min(1.0, float(value)))
+
+    @field_validator("status", "email_type", mode="before")
+    @classmethod
+    def _lower(cls, value):
+        return value.strip().lower() if isinstance(value, str) else value
+
+    @field_validator("contacts", mode="before")
+    @classmethod
+    def _none_to_contacts(cls, value):
+        return {} if value is None else value
+
+
+LEAD_ANALYSIS_PROMPT = """
+Ты AI-ассистент для консалтинговой практики по HR. Проанализируй запрос клиента (сообщение, письмо или заказ) и заполни ВСЕ поля за один ответ.
+
+Поля:
+- category: направление экспертизы - "автоматизация" (автоматизация HR-процессов, внедрение систем), "бизнес-анализ" (анализ бизнес-процессов, консалтинг) или "другое"; confidence - уверенность 0.0-1.0; keywords - ключевые слова
+- is_lead: это запрос потенциального клиента на услуги (а не спам, рассылка, уведомление); score - качество лида 0.0-1.0 (ясность задачи, бюджет, релевантность); status - "warm" если score > 0.6, иначе "cold"; reason - краткое объяснение
+- email_type: "new_lead" - новый запрос на сотрудничество, "followup" - продолжение диалога или переписка по текущему проекту, "service" - счета, договоры, уведомления, рассылки, спам; email_type_confidence и email_type_reason - уверенность и объяснение
+- contacts: имя, email, телефон и компания клиента, если указаны
+- service_type, industry, company_size, business_spec, deadline, budget, additional_info: информация из запроса ("" если не указано)
+- summary: краткое summary запроса (2-3 предложения) для коммерческого предложения
+
+Ответь ТОЛЬКО JSON-объектом, соответствующим схеме:
+{{schema}}
+
+Запрос клиента:
+{{request}}
+"""
+
+LEAD_ANALYSIS_REPAIR_PROMPT = """
+Ответ ниже не соответствует JSON-схеме. Исправь его и верни ТОЛЬКО валидный JSON-объект по схеме, без пояснений.
+
+Схема:
+{{schema}}
+
+Ошибки:
+{{errors}}
+
+Ответ:
+{{response}}
+"""
+
+LEAD_ANALYSIS_SYSTEM = "Ты помощник для анализа запросов клиентов. Отвечай только в формате JSON."
+
+
+class LeadAnalysisError(ValueError):
+    """Ответ LLM не удалось привести к схеме LeadAnalysis"""
+
+
+_analysis_cache: "OrderedDict[str, tuple]" = OrderedDict()
+_analysis_inflight: Dict[str, asyncio.Future] = {}
+
+
+def _analysis_key(text: str) -> str:
+    normalized = _WHITESPACE_RE.sub(" ", text or "").strip().lower()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def _schema_json() -> str:
+    return json.dumps(LeadAnalysis.model_json_schema(), ensure_ascii=False)
+
+
+def _extract_json(response: str) -> Dict[str, Any]:
+    """Достает JSON-объект из ответа (может быть обернут в markdown)"""
+    start = response.find("{")
+    end = response.rfind("}") + 1
+    if start < 0 or end <= start:
+        raise ValueError("в ответе нет JSON-объекта")
+    data = json.loads(response[start:end])
+    if not isinstance(data, dict):
+        raise ValueError("JSON не является объектом")
+    return data
+
+
+def _parse_analysis(response: str) -> LeadAnalysis:
+    try:
+        return LeadAnalysis.model_validate(_extract_json(response))
+    except (ValueError, ValidationError) as e:
+        raise LeadAnalysisError(str(e)) from e
+
+
+def _coerce_analysis(response: str) -> LeadAnalysis:
+    """Последний шанс: берем поля, которые по отдельности проходят валидацию"""
+    try:
+        data = _extract_json(response)
+    except ValueError as e:
+        raise LeadAnalysisError(f"ответ не содержит JSON: {e}") from e
+
+    valid = {}
+    for name, value in data.items():
+        if name not in LeadAnalysis.model_fields:
+            continue
+        try:
+            LeadAnalysis.model_validate({name: value})
+            valid[name] = value
+        except ValidationError:
+            log.debug(f"Поле '{name}' отброшено: не соответствует схеме")
+    return LeadAnalysis.model_validate(valid)
+
+
+async def _request_analysis(text: str) -> LeadAnalysis:
+    schema = _schema_json()
+    prompt = (
+        LEAD_ANALYSIS_PROMPT
+        .replace("{{schema}}", schema)
+        .replace("{{request}}", text[:LEAD_ANALYSIS_MAX_CHARS])
+    )
+    response = await generate_with_fallback(
+        [{"role": "user", "content": prompt}],
+        use_system_message=True,
+        system_content=LEAD_ANALYSIS_SYSTEM,
+        max_tokens=800,
+        temperature=0.3
+    )
+    try:
+        return _parse_analysis(response)
+    except LeadAnalysisError as e:
+        log.warning(f"⚠️ Ответ анализа лида не прошел валидацию, запрашиваем исправление: {e}")
+        errors = str(e)
+
+    repair_prompt = (
+        LEAD_ANALYSIS_REPAIR_PROMPT
+        .replace("{{schema}}", schema)
+        .replace("{{errors}}", errors[:1000])
+        .replace("{{response}}", response[:LEAD_ANALYSIS_MAX_CHARS])
+    )
+    repaired = await generate_with_fallback(
+        [{"role": "user", "content": repair_prompt}],
+        use_system_message=True,
+        system_content=LEAD_ANALYSIS_SYSTEM,
+        max_tokens=800,
+        temperature=0.0
+    )
+    try:
+        return _parse_analysis(repaired)
+    except LeadAnalysisError as e:
+        log.warning(f"⚠️ Исправленный ответ тоже не прошел валидацию ({e}), берем валидные поля")
+        return _coerce_analysis(repaired if "{" in repaired else response)
+
+
+async def analyze_lead(text: str) -> LeadAnalysis:
+    """
+    Анализ лида за один запрос к LLM с кэшем по хэшу содержимого
+    
+    Одновременные вызовы с одним текстом (параллельные шаги сценария) ждут
+    один и тот же запрос. Ошибки не кэшируются.
+    
+    Args:
+        text: Текст запроса (для писем - "тема\n\nтело")
+    
+    Returns:
+        LeadAnalysis
+    
+    Raises:
+        LeadAnalysisError: если ответ LLM не удалось привести к схеме
+        Exception: ошибки LLM пробрасываются вызывающему
+    """
+    key = _analysis_key(text)
+
+    entry = _analysis_cache.get(key)
+    if entry is not None:
+        created_at, analysis = entry
+        if time.time() - created_at < LEAD_ANALYSIS_CACHE_TTL:
+            _analysis_cache.move_to_end(key)
+            return analysis
+        del _analysis_cache[key]
+
+    inflight = _analysis_inflight.get(key)
+    if inflight is not None:
+        return await asyncio.shield(inflight)
+
+    future = asyncio.get_running_loop().create_future()
+    _analysis_inflight[key] = future
+    try:
+        analysis = await _request_analysis(text)
+        _analysis_cache[key] = (time.time(), analysis)
+        while len(_analysis_cache) > LEAD_ANALYSIS_CACHE_SIZE:
+            _analysis_cache.popitem(last=False)
+        log.info(
+            f"✅ Лид проанализирован: category={analysis.category}, score={analysis.score}, "
+            f"email_type={analysis.email_type}"
+        )
+        future.set_result(analysis)
+        return analysis
+    except BaseException as e:
+        future.set_exception(e)
+        # Исключение получит вызывающий, ожидающих может не быть
+        future.exception()
+        raise
+    finally:
+        _analysis_inflight.pop(key, None)
+
+
+def clear_lead_analysis_cache() -> None:
+    """Очищает кэш анализа лидов"""
+    _analysis_cache.clear()
+
+
 # ===================== VALIDATION =====================
 
 async def validate_lead(lead_request: str) -> Dict:
@@ -243,25 +498,12 @@ async def classify_request(request: str) -> Dict:
         }
     
     try:
-        prompt = CLASSIFICATION_PROMPT.replace("{{request}}", request)
-        
-        messages = [{"role": "user", "content": prompt}]
-        response = await generate_with_fallback(messages, use_system_message=True, system_content="Ты помощник для классификации запросов. Отвечай только в формате JSON.")
-        
-        # Парсинг JSON ответа
-        import json
-        if "{" in response and "}" in response:
-            json_start = response.find("{")
-            json_end = response.rfind("}") + 1
-            json_str = response[json_start:json_end]
-            result = json.loads(json_str)
-        else:
-            result = {
-                "category": "другое",
-                "confidence": 0.0,
-                "keywords": []
-            }
-        
+        analysis = await analyze_lead(request)
+        result = {
+            "category": analysis.category or "другое",
+            "confidence": analysis.confidence,
+            "keywords": list(analysis.keywords)
+        }
         log.info(f"✅ Запрос классифицирован: {result.get('category')} (confidence: {result.get('confidence')})")
         return result
     except Exception as e:
@@ -274,32 +516,11 @@ async def classify_request(request: str) -> Dict:
 
 # ===================== LEAD INFORMATION EXTRACTION =====================
 
-LEAD_EXTRACTION_PROMPT = """
-Ты AI-ассистент для извлечения информации из запроса клиента. Твоя задача - извлечь ВСЮ доступную информацию из запроса и сформировать краткое summary для использования в коммерческом предложении.
-
-Извлеки следующую информацию:
-- Тип услуги/проекта (организационная диагностика, проектирование, оценка и т.д.)
-- Отрасль клиента (инжиниринг, IT, логистика, производство и т.д.)
-- Размер компании (количество сотрудников, если указано)
-- Специфика бизнеса (чем занимается компания)
-- Дедлайны или сроки (если указаны)
-- Бюджет (если указан)
-- Дополнительные детали или требования
-
-Ответь ТОЛЬКО в формате JSON:
-{
-    "service_type": "тип услуги",
-    "industry": "отрасль",
-    "company_size": "размер компании",
-    "business_spec": "специфика бизнеса",
-    "deadline": "дедлайн или сроки",
-    "budget": "бюджет",
-    "additional_info": "дополнительная информация",
-    "summary": "краткое summary запроса (2-3 предложения) для использования в КП"
-}
-
-Запрос клиента: {{request}}
-"""
+# Поля LeadAnalysis, которые возвращает extract_lead_info
+LEAD_INFO_FIELDS = (
+    "service_type", "industry", "company_size", "business_spec",
+    "deadline", "budget", "additional_info", "summary"
+)
 
 async def extract_lead_info(lead_request: str) -> Dict:
     """
@@ -325,36 +546,10 @@ async def extract_lead_info(lead_request: str) -> Dict:
         }
     
     try:
-        prompt = LEAD_EXTRACTION_PROMPT.replace("{{request}}", lead_request)
-        messages = [{"role": "user", "content": prompt}]
-        
-        response = await generate_with_fallback(
-            messages,
-            use_system_message=True,
-            system_content="Ты помощник для извлечения информации из запросов. Отвечай только в формате JSON.",
-            max_tokens=500,
-            temperature=0.3
-        )
-        
-        # Парсинг JSON ответа
-        import json
-        if "{" in response and "}" in response:
-            json_start = response.find("{")
-            json_end = response.rfind("}") + 1
-            json_str = response[json_start:json_end]
-            result = json.loads(json_str)
-        else:
-            # Fallback - простое извлечение
-            result = {
-                "service_type": "",
-                "industry": "",
-                "company_size": "",
-                "business_spec": "",
-                "deadline": "",
-                "budget": "",
-                "additional_info": "",
-                "summary": lead_request[:200]
-            }
+        analysis = await analyze_lead(lead_request)
+        result = analysis.model_dump(include=set(LEAD_INFO_FIELDS))
+        if not result["summary"]:
+            result["summary"] = lead_request[:200]
         
         log.info(f"✅ Информация из запроса извлечена: service_type={result.get('service_type')}, industry={result.get('industry')}")
         return result
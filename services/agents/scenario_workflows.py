@@ -5,8 +5,6 @@ Scenario Workflows Module
 import os
 import logging
 import asyncio
-import json
-import re
 from typing import Dict, List, Optional
 from datetime import datetime, timedelta
 
@@ -15,13 +13,13 @@ log = logging.getLogger()
 # Импорты модулей
 try:
     from services.helpers.hrtime_helper import get_new_orders, send_proposal, send_message, get_order_details
-    from services.agents.lead_processor import classify_request, validate_lead, generate_proposal
+    from services.agents.lead_processor import classify_request, validate_lead, generate_proposal, analyze_lead
     from services.helpers.email_helper import check_new_emails, classify_email, send_email
     from services.helpers.weeek_helper import create_project, create_task, get_project_deadlines
     from services.rag.rag_chain import RAGChain
     from services.services.hrtime_order_parser import HRTimeOrderParser
     from services.services.hrtime_lead_validator import HRTimeLeadValidator
-    from services.helpers.llm_api import LLMClient
+    from services.rag.qdrant_helper import search_service
     HRTIME_AVAILABLE = True
     EMAIL_AVAILABLE = True
     WEEEK_AVAILABLE = True
@@ -39,6 +37,9 @@ except ImportError as e:
     VALIDATOR_AVAILABLE = False
     LLM_AVAILABLE = False
 
+from config import load_config
+from services.agents.step_graph import StepGraph
+
 # Telegram bot для отправки уведомлений консультанту
 TELEGRAM_CONSULTANT_CHAT_ID = os.getenv("TELEGRAM_CONSULTANT_CHAT_ID")  # ID чата консультанта для уведомлений
 TELEGRAM_LEADS_CHANNEL_ID = os.getenv("TELEGRAM_LEADS_CHANNEL_ID")  # ID канала для лидов (HRAI_ANovoselova_Лиды)
@@ -60,9 +61,102 @@ def get_rag_chain():
     return _rag_chain
 
 
+# ===================== Граф шагов обработки лида =====================
+
+# Таймауты шагов по умолчанию (секунды), переопределяются llm.scenario_step_timeouts в config/llm.yaml
+DEFAULT_STEP_TIMEOUTS = {
+    "rag": 60,
+    "retrieval": 20,
+    "classification": 30,
+    "validation": 45,
+    "proposal": 120,
+    "weeek": 30,
+    "notify": 15
+}
+
+DEFAULT_CLASSIFICATION = {"category": "другое", "confidence": 0.0, "keywords": []}
+DEFAULT_VALIDATION = {"score": 0, "status": "cold", "reason": "Валидация не выполнена"}
+
+
+def get_step_timeouts() -> Dict[str, float]:
+    """Таймауты шагов сценариев из config/llm.yaml"""
+    try:
+        configured = load_config("llm").get("llm", {}).get("scenario_step_timeouts", {}) or {}
+    except Exception as e:
+        log.warning(f"⚠️ Не удалось загрузить таймауты шагов сценариев: {e}")
+        configured = {}
+    return {**DEFAULT_STEP_TIMEOUTS, **{name: float(value) for name, value in configured.items() if value}}
+
+
+def is_warm_lead(validation: Dict) -> bool:
+    """Теплый лид: score > 0.6 или статус warm"""
+    return validation.get("score", 0) > 0.6 or validation.get("status") == "warm"
+
+
+async def _rag_answer(text: str, scenario: str) -> str:
+    """Ответ RAG по тексту запроса (пустая строка, если RAG недоступен)"""
+    rag_chain = get_rag_chain()
+    if not rag_chain:
+        return ""
+    rag_result = await rag_chain.query(text, use_rag=True, top_k=5)
+    log.info(f"✅ [{scenario}] RAG анализ завершен")
+    return rag_result.get("answer", "")
+
+
+def _retrieve_documents(text: str) -> List[Dict]:
+    """Поиск в базе знаний - один результат используется всеми шагами сценария"""
+    return search_service(text, limit=5) or []
+
+
+async def _create_weeek_project(
+    name: str,
+    description: str,
+    scenario: str,
+    task: Optional[Dict] = None
+) -> Optional[Dict]:
+    """
+    Создает проект в WEEEK, устанавливает статус "new" и (опционально) задачу.
+    
+    Статус и задача создаются одним пакетом weeek_bulk параллельно после
+    создания проекта (с ограничением частоты и повтором при 429/5xx).
+    
+    Returns:
+        Данные проекта от WEEEK или None
+    """
+    from services.helpers.weeek_helper import update_project_status
+    from services.helpers.weeek_bulk import WeeekOperation, WeeekRef, run_bulk
+    
+    operations = [
+        WeeekOperation(create_project, kwargs={"name": name, "description": description}, key="project"),
+        WeeekOperation(update_project_status, args=(WeeekRef("project"), "new"), key="status", after="project")
+    ]
+    if task:
+        operations.append(
+            WeeekOperation(create_task, kwargs={"project_id": WeeekRef("project"), **task}, key="task", after="project")
+        )
+    results = {result.key: result for result in await run_bulk(operations)}
+    
+    weeek_project = results["project"].result
+    if not results["project"].ok:
+        return None
+    
+    project_id = weeek_project.get("id") if isinstance(weeek_project, dict) else None
+    if not project_id:  # Проверяем, что project_id не None
+        log.warning(f"⚠️ [{scenario}] Проект создан, но ID не получен")
+        return weeek_project
+    
+    log.info(f"✅ [{scenario}] Проект создан в WEEEK: {project_id}")
+    if results["status"].ok:
+        log.info(f"✅ [{scenario}] Статус проекта установлен на 'new'")
+    if task and results["task"].ok:
+        log.info(f"✅ [{scenario}] Задача создана в WEEEK")
+    
+    return weeek_project
+
+
 async def classify_email_as_lead(email_subject: str, email_body: str) -> Dict[str, str]:
     """
-    Классифицировать email как lead или non_lead используя Open Router LLM
+    Классифицировать email как lead или non_lead (представление analyze_lead)
     
     Args:
         email_subject: Тема письма
@@ -83,96 +177,17 @@ async def classify_email_as_lead(email_subject: str, email_body: str) -> Dict[st
         }
     
     try:
-        # Формируем промпт для классификации
-        classification_prompt = f"""Проанализируй следующее email сообщение и определи, является ли оно потенциальным лидом (запросом на услуги HR-консалтинга) или нет.
-
-Тема письма: "{email_subject}"
-
-Текст письма:
-{email_body[:2000]}
-
-Определи, является ли это письмо:
-- **lead** - потенциальный клиент, который интересуется услугами HR-консалтинга, запрашивает консультацию, хочет получить предложение, интересуется ценами, просит информацию об услугах
-- **non_lead** - спам, рассылки, уведомления, автоматические сообщения, личная переписка не связанная с бизнесом, реклама, технические уведомления
-
-Ответь ТОЛЬКО в формате JSON:
-{{
-    "label": "lead" или "non_lead",
-    "confidence": число от 0.0 до 1.0 (уверенность в классификации),
-    "reason": "краткое объяснение причины классификации на русском языке"
-}}
-
-Важно: Отвечай ТОЛЬКО валидным JSON, без дополнительного текста."""
-
-        # Используем LLMClient для классификации
-        llm_client = LLMClient()
-        response = await llm_client.generate(
-            prompt=classification_prompt,
-            system_prompt="Ты помощник для классификации email сообщений. Отвечай только в формате JSON.",
-            temperature=0.3,  # Низкая температура для более детерминированных ответов
-            max_tokens=200
-        )
-        
-        if response.error:
-            log.error(f"❌ Ошибка LLM при классификации email: {response.error}")
-            return {
-                "label": "non_lead",
-                "confidence": 0.5,
-                "reason": f"Ошибка LLM: {response.error}"
-            }
-        
-        # Парсим JSON ответ
-        content = response.content.strip()
-        
-        # Извлекаем JSON из ответа (может быть обернут в markdown код блоки)
-        json_match = re.search(r'\{[^{}]*"label"[^{}]*\}', content, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(0)
-        else:
-            # Пробуем найти JSON между фигурными скобками
-            json_start = content.find('{')
-            json_end = content.rfind('}') + 1
-            if json_start >= 0 and json_end > json_start:
-                json_str = content[json_start:json_end]
-            else:
-                json_str = content
-        
-        try:
-            result = json.loads(json_str)
-            label = result.get("label", "non_lead").lower()
-            confidence = float(result.get("confidence", 0.5))
-            reason = result.get("reason", "Классификация выполнена")
-            
-            # Валидация label
-            if label not in ["lead", "non_lead"]:
-                log.warning(f"⚠️ Неожиданный label от LLM: {label}, используем non_lead")
-                label = "non_lead"
-            
-            log.info(f"✅ Email классифицирован как {label} (confidence: {confidence:.2f}, reason: {reason})")
-            return {
-                "label": label,
-                "confidence": max(0.0, min(1.0, confidence)),  # Ограничиваем от 0 до 1
-                "reason": reason
-            }
-        except json.JSONDecodeError as e:
-            log.error(f"❌ Ошибка парсинга JSON от LLM: {e}, ответ: {content[:200]}")
-            # Пробуем извлечь label из текста напрямую
-            if "lead" in content.lower() and "non_lead" not in content.lower():
-                return {
-                    "label": "lead",
-                    "confidence": 0.6,
-                    "reason": "Классификация по ключевым словам (JSON не распарсился)"
-                }
-            return {
-                "label": "non_lead",
-                "confidence": 0.5,
-                "reason": f"Ошибка парсинга JSON: {str(e)}"
-            }
-            
+        # Тот же текст, что и в process_lead_email - анализ берется из кэша analyze_lead
+        analysis = await analyze_lead(f"{email_subject}\n\n{email_body}")
+        label = "lead" if analysis.is_lead else "non_lead"
+        log.info(f"✅ Email классифицирован как {label} (score: {analysis.score:.2f}, reason: {analysis.reason})")
+        return {
+            "label": label,
+            "confidence": analysis.score if analysis.is_lead else 1.0 - analysis.score,
+            "reason": analysis.reason or "Классификация выполнена"
+        }
     except Exception as e:
         log.error(f"❌ Исключение при классификации email: {e}")
-        import traceback
-        log.error(traceback.format_exc())
         return {
             "label": "non_lead",
             "confidence": 0.5,
@@ -182,7 +197,7 @@ async def classify_email_as_lead(email_subject: str, email_body: str) -> Dict[st
 
 async def classify_email_type(email_subject: str, email_body: str) -> Dict[str, str]:
     """
-    Классифицировать email на три категории используя Open Router LLM:
+    Классифицировать email на три категории (представление analyze_lead):
     - новый лид
     - продолжение диалога
     - служебная информация
@@ -206,105 +221,18 @@ async def classify_email_type(email_subject: str, email_body: str) -> Dict[str,
         }
     
     try:
-        # Формируем промпт для классификации на три категории
-        classification_prompt = f"""Проанализируй следующее email сообщение и определи его тип.
-
-Тема письма: "{email_subject}"
-
-Текст письма:
-{email_body[:2000]}
-
-Определи тип письма (выбери ОДНУ категорию):
-- **new_lead** - новый потенциальный клиент, который впервые обращается за услугами HR-консалтинга, запрашивает консультацию, хочет получить предложение, интересуется ценами, просит информацию об услугах, новый запрос на сотрудничество
-- **followup** - продолжение диалога, ответ на предыдущее письмо, переписка по существующему проекту, уточняющие вопросы по текущему запросу, ответы на вопросы клиента, обсуждение деталей проекта
-- **service** - служебная информация: счета, договоры, технические уведомления, автоматические сообщения, рассылки, спам, реклама, уведомления от систем, отчеты, документы без запроса
-
-Ответь ТОЛЬКО в формате JSON:
-{{
-    "category": "new_lead", "followup" или "service",
-    "confidence": число от 0.0 до 1.0 (уверенность в классификации),
-    "reason": "краткое объяснение причины классификации на русском языке"
-}}
-
-Важно: Отвечай ТОЛЬКО валидным JSON, без дополнительного текста."""
-
-        # Используем LLMClient для классификации
-        llm_client = LLMClient()
-        response = await llm_client.generate(
-            prompt=classification_prompt,
-            system_prompt="Ты помощник для классификации email сообщений на три категории. Отвечай только в формате JSON.",
-            temperature=0.3,  # Низкая температура для более детерминированных ответов
-            max_tokens=200
+        analysis = await analyze_lead(f"{email_subject}\n\n{email_body}")
+        log.info(
+            f"✅ Email классифицирован как {analysis.email_type} "
+            f"(confidence: {analysis.email_type_confidence:.2f}, reason: {analysis.email_type_reason})"
         )
-        
-        if response.error:
-            log.error(f"❌ Ошибка LLM при классификации email: {response.error}")
-            return {
-                "category": "service",
-                "confidence": 0.5,
-                "reason": f"Ошибка LLM: {response.error}"
-            }
-        
-        # Парсим JSON ответ
-        content = response.content.strip()
-        
-        # Извлекаем JSON из ответа (может быть обернут в markdown код блоки)
-        json_match = re.search(r'\{[^{}]*"category"[^{}]*\}', content, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(0)
-        else:
-            # Пробуем найти JSON между фигурными скобками
-            json_start = content.find('{')
-            json_end = content.rfind('}') + 1
-            if json_start >= 0 and json_end > json_start:
-                json_str = content[json_start:json_end]
-            else:
-                json_str = content
-        
-        try:
-            result = json.loads(json_str)
-            category = result.get("category", "service").lower()
-            confidence = float(result.get("confidence", 0.5))
-            reason = result.get("reason", "Классификация выполнена")
-            
-            # Валидация category
-            valid_categories = ["new_lead", "followup", "service"]
-            if category not in valid_categories:
-                log.warning(f"⚠️ Неожиданная категория от LLM: {category}, используем service")
-                category = "service"
-            
-            log.info(f"✅ Email классифицирован как {category} (confidence: {confidence:.2f}, reason: {reason})")
-            return {
-                "category": category,
-                "confidence": max(0.0, min(1.0, confidence)),  # Ограничиваем от 0 до 1
-                "reason": reason
-            }
-        except json.JSONDecodeError as e:
-            log.error(f"❌ Ошибка парсинга JSON от LLM: {e}, ответ: {content[:200]}")
-            # Пробуем извлечь category из текста напрямую
-            content_lower = content.lower()
-            if "new_lead" in content_lower or ("новый" in content_lower and "лид" in content_lower):
-                return {
-                    "category": "new_lead",
-                    "confidence": 0.6,
-                    "reason": "Классификация по ключевым словам (JSON не распарсился)"
-                }
-            elif "followup" in content_lower or "продолжение" in content_lower:
-                return {
-                    "category": "followup",
-                    "confidence": 0.6,
-                    "reason": "Классификация по ключевым словам (JSON не распарсился)"
-                }
-            return {
-                "category": "service",
-                "confidence": 0.5,
-                "reason": f"Ошибка парсинга JSON: {str(e)}"
-            }
-            
+        return {
+            "category": analysis.email_type,
+            "confidence": analysis.email_type_confidence,
+            "reason": analysis.email_type_reason or "Классификация выполнена"
+        }
     except Exception as e:
         log.error(f"❌ Исключение при классификации email: {e}")
-        import traceback
-        log.error(traceback.format_exc())
         return {
             "category": "service",
             "confidence": 0.5,
@@ -312,7 +240,7 @@ async def classify_email_type(email_subject: str, email_body: str) -> Dict[str,
         }
 
 
-async def send_lead_to_channel(telegram_bot, lead_info: Dict) -> bool:
+async def send_lead_to_channel(telegram_bot, lead_info: Dict) -> Optional[str]:
     """
     Отправить информацию о лиде в канал HRAI_ANovoselova_Лиды
     
@@ -322,10 +250,12 @@ async def send_lead_to_channel(telegram_bot, lead_info: Dict) -> bool:
                    email_category: "new_lead", "followup", "service" (опционально, если не указан, будет определён через LLM для email)
     
     Returns:
-        True если сообщение отправлено успешно, False в противном случае
+        "queued" - сообщение поставлено в очередь отправки (доставка позже),
+        "sent" - отправлено сразу (планировщик не запущен),
+        None - дубликат или ошибка
     """
     if not telegram_bot or not TELEGRAM_LEADS_CHANNEL_ID:
-        return False
+        return None
     
     # Проверяем на дубликаты
     try:
@@ -333,7 +263,7 @@ async def send_lead_to_channel(telegram_bot, lead_info: Dict) -> bool:
         is_dup, reason = is_duplicate(lead_info, check_content=True)
         if is_dup:
             log.info(f"⏭️  Пропуск дубликата: {reason}")
-            return False
+            return None
     except ImportError:
         log.warning("⚠️ Модуль channel_deduplicator недоступен, проверка дубликатов отключена")
     except Exception as e:
@@ -417,26 +347,40 @@ async def send_lead_to_channel(telegram_bot, lead_info: Dict) -> bool:
         
         lead_message = "\n".join(lead_message_parts)
         
-        await telegram_bot.send_message(
-            chat_id=TELEGRAM_LEADS_CHANNEL_ID,
-            text=lead_message,
+        def mark_sent():
+            # Помечаем как отправленное после доставки
+            try:
+                from services.helpers.channel_deduplicator import mark_as_sent
+                mark_as_sent(lead_info)
+            except Exception as e:
+                log.warning(f"⚠️ Ошибка пометки сообщения как отправленного: {e}")
+        
+        # Отправка через очередь с приоритетом лидов (без ожидания доставки).
+        # Пока лид ждет отправки, повторный такой же в очередь не попадет
+        from services.helpers.channel_deduplicator import generate_message_id
+        from services.helpers.telegram_outbox import PRIORITY_LEAD, SEND_QUEUED, queue_message
+        status = await queue_message(
+            telegram_bot,
+            TELEGRAM_LEADS_CHANNEL_ID,
+            lead_message,
+            priority=PRIORITY_LEAD,
+            on_sent=mark_sent,
+            dedup_key=generate_message_id(lead_info),
             parse_mode="Markdown"
         )
-        log.info(f"✅ {category_text} отправлен в канал HRAI_ANovoselova_Лиды")
-        
-        # Помечаем как отправленное
-        try:
-            from services.helpers.channel_deduplicator import mark_as_sent
-            mark_as_sent(lead_info)
-        except Exception as e:
-            log.warning(f"⚠️ Ошибка пометки сообщения как отправленного: {e}")
+        if status is None:
+            log.info(f"⏭️  Пропуск дубликата: {category_text} уже в очереди отправки")
+        elif status == SEND_QUEUED:
+            log.info(f"✅ {category_text} поставлен в очередь канала HRAI_ANovoselova_Лиды")
+        else:
+            log.info(f"✅ {category_text} отправлен в канал HRAI_ANovoselova_Лиды")
         
-        return True
+        return status
     except Exception as e:
         log.error(f"❌ Ошибка отправки лида в канал: {e}")
         import traceback
         log.error(traceback.format_exc())
-        return False
+        return None
 
 
 # ===================== СЦЕНАРИЙ 1: Новый лид с HR Time =====================
@@ -517,63 +461,99 @@ async def process_hrtime_order(order_id: str, order_data: Optional[Dict] = None,
         if deadline_text:
             request_text += f"\nСрок: {deadline_text}"
         
-        # Шаг 2: RAG + Классификация
+        # Шаги 2-4: RAG, поиск, классификация и валидация выполняются параллельно,
+        # КП и проект в WEEEK - параллельно после валидации теплого лида
         log.info(f"🔍 [Сценарий 1] Анализ заказа {order_id}: {title}")
+        timeouts = get_step_timeouts()
         
-        rag_chain = get_rag_chain()
-        rag_context = ""
-        if rag_chain:
-            try:
-                rag_result = await rag_chain.query(request_text, use_rag=True, top_k=5)
-                rag_context = rag_result.get("answer", "")
-                log.info(f"✅ [Сценарий 1] RAG анализ завершен")
-            except Exception as e:
-                log.error(f"❌ [Сценарий 1] Ошибка RAG анализа: {e}")
+        async def run_rag(_):
+            return await _rag_answer(request_text, "Сценарий 1")
         
-        classification = await classify_request(request_text)
-        category = classification.get("category", "другое")
-        log.info(f"✅ [Сценарий 1] Заказ классифицирован как: {category}")
+        async def run_classification(_):
+            return await classify_request(request_text)
         
-        # Шаг 3: Валидация лида с уточняющими вопросами
-        validation_result = None
-        if VALIDATOR_AVAILABLE:
-            try:
-                validator = HRTimeLeadValidator()
-                validation_result = await validator.validate_lead_with_questions(
-                    lead_request=request_text,
-                    parsed_order=parsed_order
-                )
-                validation = validation_result.get("validation", {})
-                
-                # Если нужны уточняющие вопросы, пытаемся их задать
-                if validation_result.get("needs_clarification") and validation_result.get("questions"):
-                    questions = validation_result.get("questions", [])
-                    log.info(f"💬 [Сценарий 1] Нужны уточняющие вопросы: {len(questions)}")
-                    
-                    # Пытаемся задать вопросы (placeholder)
-                    questions_result = await validator.ask_clarification_questions(
-                        order_id=order_id,
-                        questions=questions,
-                        client_email=client_email
+        async def run_validation(_):
+            # Валидация лида с уточняющими вопросами
+            if VALIDATOR_AVAILABLE:
+                try:
+                    validator = HRTimeLeadValidator()
+                    validation_result = await validator.validate_lead_with_questions(
+                        lead_request=request_text,
+                        parsed_order=parsed_order
                     )
                     
-                    if questions_result.get("success"):
-                        log.info(f"✅ [Сценарий 1] Вопросы отправлены через {questions_result.get('method')}")
-                    else:
-                        log.warning(f"⚠️ [Сценарий 1] Не удалось отправить вопросы автоматически")
-                        # Сохраняем вопросы для ручной отправки
-                        validation_result["questions_for_manual"] = questions_result.get("questions_text", "")
-            except Exception as e:
-                log.error(f"❌ [Сценарий 1] Ошибка валидатора: {e}")
-                validation = await validate_lead(request_text)
-        else:
-            validation = await validate_lead(request_text)
+                    # Если нужны уточняющие вопросы, пытаемся их задать
+                    if validation_result.get("needs_clarification") and validation_result.get("questions"):
+                        questions = validation_result.get("questions", [])
+                        log.info(f"💬 [Сценарий 1] Нужны уточняющие вопросы: {len(questions)}")
+                        
+                        # Пытаемся задать вопросы (placeholder)
+                        questions_result = await validator.ask_clarification_questions(
+                            order_id=order_id,
+                            questions=questions,
+                            client_email=client_email
+                        )
+                        
+                        if questions_result.get("success"):
+                            log.info(f"✅ [Сценарий 1] Вопросы отправлены через {questions_result.get('method')}")
+                        else:
+                            log.warning(f"⚠️ [Сценарий 1] Не удалось отправить вопросы автоматически")
+                            # Сохраняем вопросы для ручной отправки
+                            validation_result["questions_for_manual"] = questions_result.get("questions_text", "")
+                    
+                    if validation_result:
+                        return validation_result.get("validation", {}), validation_result
+                except Exception as e:
+                    log.error(f"❌ [Сценарий 1] Ошибка валидатора: {e}")
+            
+            return await validate_lead(request_text), None
         
-        if not validation_result:
-            validation = await validate_lead(request_text)
-        else:
-            validation = validation_result.get("validation", {})
+        def warm(results):
+            return is_warm_lead(results["validation"][0])
+        
+        async def run_proposal(results):
+            return await generate_proposal(
+                lead_request=request_text,
+                lead_contact={
+                    "name": client_name,
+                    "email": client_email,
+                    "phone": client_phone
+                },
+                rag_results=results["retrieval"]  # Один поиск на весь сценарий
+            )
+        
+        async def run_send_proposal(results):
+            return await send_proposal(order_id, results["proposal"])
+        
+        async def run_weeek(_):
+            return await _create_weeek_project(
+                name=f"{title} — HR Time",
+                description=f"Заказ с HR Time\n\n{description}\n\nКлиент: {client_name}\nEmail: {client_email}\nТелефон: {client_phone}",
+                scenario="Сценарий 1",
+                task={
+                    "title": "Согласовать КП",
+                    "description": "Проверить и согласовать черновик коммерческого предложения"
+                }
+            )
         
+        graph = StepGraph(name="Сценарий 1")
+        graph.add("rag", run_rag, timeout=timeouts["rag"], default="")
+        graph.add("retrieval", lambda _: _retrieve_documents(request_text), timeout=timeouts["retrieval"], default=None)
+        graph.add("classification", run_classification, timeout=timeouts["classification"], default=DEFAULT_CLASSIFICATION)
+        graph.add("validation", run_validation, timeout=timeouts["validation"], default=(DEFAULT_VALIDATION, None))
+        graph.add("proposal", run_proposal, deps=("validation", "retrieval"), timeout=timeouts["proposal"], when=warm)
+        graph.add("send_proposal", run_send_proposal, deps=("proposal",), timeout=timeouts["notify"], default=False,
+                  when=lambda results: results["proposal"] is not None)
+        graph.add("weeek", run_weeek, deps=("validation",), timeout=timeouts["weeek"],
+                  when=lambda results: WEEEK_AVAILABLE and warm(results))
+        outcome = await graph.run()
+        log.info(f"⏱️ [Сценарий 1] Заказ {order_id}: {outcome.format_latency()}")
+        
+        classification = outcome.get("classification")
+        category = classification.get("category", "другое")
+        log.info(f"✅ [Сценарий 1] Заказ классифицирован как: {category}")
+        
+        validation, validation_result = outcome.get("validation")
         score = validation.get("score", 0)
         status = validation.get("status", "cold")
         
@@ -586,32 +566,24 @@ async def process_hrtime_order(order_id: str, order_data: Optional[Dict] = None,
             "classification": classification,
             "validation": validation,
             "validation_result": validation_result,
+            "rag_context": outcome.get("rag"),
             "proposal_sent": False,
             "weeek_project_created": False,
-            "notification_sent": False
+            "notification_sent": False,
+            "latency": outcome.latency_breakdown()
         }
         
         # Определяем источник данных (нужно для всех лидов)
         source = order_data.get("source", "api")
         source_text = "📢 Канал: @HRTime_bot" if source == "telegram_channel" else "🌐 Источник: HR Time API"
         
-        # Шаг 4: Действия для теплого лида (score > 0.6 или status == "warm")
-        if score > 0.6 or status == "warm":
+        # Действия для теплого лида (score > 0.6 или status == "warm")
+        if is_warm_lead(validation):
             log.info(f"🔥 [Сценарий 1] Теплый лид! Выполняем действия...")
             
-            # 4a. Генерация КП
-            proposal = await generate_proposal(
-                lead_request=request_text,
-                lead_contact={
-                    "name": client_name,
-                    "email": client_email,
-                    "phone": client_phone
-                },
-                rag_results=None  # RAG уже использован выше
-            )
-            
-            # 4b. Отправка отклика на HR Time
-            proposal_sent = await send_proposal(order_id, proposal)
+            # 4a-4b. КП сгенерировано и отклик отправлен на HR Time
+            proposal = outcome.get("proposal")
+            proposal_sent = bool(outcome.get("send_proposal"))
             result["proposal_sent"] = proposal_sent
             
             if proposal_sent:
@@ -628,39 +600,11 @@ async def process_hrtime_order(order_id: str, order_data: Optional[Dict] = None,
                 result["proposal_email"] = client_email
                 result["proposal_subject"] = f"Коммерческое предложение: {title}"
             
-            # 4d. Создание проекта в WEEEK
-            if WEEEK_AVAILABLE:
-                project_name = f"{title} — HR Time"
-                project_description = f"Заказ с HR Time\n\n{description}\n\nКлиент: {client_name}\nEmail: {client_email}\nТелефон: {client_phone}"
-                
-                weeek_project = await create_project(
-                    name=project_name,
-                    description=project_description
-                )
-                
-                if weeek_project:
-                    project_id = weeek_project.get("id")
-                    if project_id:  # Проверяем, что project_id не None
-                        result["weeek_project_id"] = project_id
-                        result["weeek_project_created"] = True
-                        log.info(f"✅ [Сценарий 1] Проект создан в WEEEK: {project_id}")
-                        
-                        # Автоматически устанавливаем статус "new" для нового проекта
-                        from services.helpers.weeek_helper import update_project_status
-                        status_updated = await update_project_status(str(project_id), "new")
-                        if status_updated:
-                            log.info(f"✅ [Сценарий 1] Статус проекта установлен на 'new'")
-                        
-                        # Создаем задачу "Согласовать КП"
-                        await create_task(
-                            project_id=str(project_id),
-                            title="Согласовать КП",
-                            description="Проверить и согласовать черновик коммерческого предложения"
-                        )
-                        log.info(f"✅ [Сценарий 1] Задача создана в WEEEK")
-                    else:
-                        log.warning(f"⚠️ [Сценарий 1] Проект создан, но ID не получен")
-                        result["weeek_project_created"] = False
+            # 4d. Проект в WEEEK
+            weeek_project = outcome.get("weeek")
+            if weeek_project and weeek_project.get("id"):
+                result["weeek_project_id"] = weeek_project.get("id")
+                result["weeek_project_created"] = True
             
             # 4e. Уведомление консультанта в Telegram
             
@@ -803,32 +747,52 @@ async def process_lead_email(email_data: Dict, require_approval: bool = True, te
         return {"success": False, "error": "Email модуль недоступен", "sent_to_channel": True}
     
     try:
-        # Шаг 1: Классификация письма
-        email_type = await classify_email(email_data)
-        log.info(f"📧 [Сценарий 2] Письмо классифицировано как: {email_type}")
+        # Шаги 1-3: классификация письма, RAG, поиск и классификация запроса выполняются
+        # параллельно; черновик ответа использует результат того же поиска
+        timeouts = get_step_timeouts()
         
-        # Шаг 2: Анализ запроса
+        async def run_email_type(_):
+            return await classify_email(email_data)
         
-        # RAG анализ
-        rag_chain = get_rag_chain()
-        rag_context = ""
-        if rag_chain:
-            try:
-                rag_result = await rag_chain.query(request_text, use_rag=True, top_k=5)
-                rag_context = rag_result.get("answer", "")
-            except Exception as e:
-                log.error(f"❌ [Сценарий 2] Ошибка RAG анализа: {e}")
+        async def run_rag(_):
+            return await _rag_answer(request_text, "Сценарий 2")
         
-        classification = await classify_request(request_text)
-        log.info(f"✅ [Сценарий 2] Запрос классифицирован: {classification.get('category')}")
+        async def run_classification(_):
+            return await classify_request(request_text)
         
-        # Шаг 3: Генерация черновика ответа с элементами КП
-        proposal = await generate_proposal(
-            lead_request=request_text,
-            lead_contact={"email": from_addr, "name": from_addr.split("@")[0]},
-            rag_results=None
-        )
+        async def run_proposal(results):
+            return await generate_proposal(
+                lead_request=request_text,
+                lead_contact={"email": from_addr, "name": from_addr.split("@")[0]},
+                rag_results=results["retrieval"]
+            )
+        
+        def is_new_lead(results):
+            # Эвристическая классификация мгновенная - LLM шаги выполняются только для новых лидов
+            return results["email_type"] == "new_lead"
+        
+        graph = StepGraph(name="Сценарий 2")
+        graph.add("email_type", run_email_type, timeout=timeouts["classification"], default="unknown")
+        graph.add("rag", run_rag, deps=("email_type",), timeout=timeouts["rag"], default="", when=is_new_lead)
+        graph.add("retrieval", lambda _: _retrieve_documents(request_text), deps=("email_type",),
+                  timeout=timeouts["retrieval"], default=None, when=is_new_lead)
+        graph.add("classification", run_classification, deps=("email_type",), timeout=timeouts["classification"],
+                  default=DEFAULT_CLASSIFICATION, when=is_new_lead)
+        graph.add("proposal", run_proposal, deps=("retrieval",), timeout=timeouts["proposal"], default="", when=is_new_lead)
+        outcome = await graph.run()
+        log.info(f"⏱️ [Сценарий 2] Письмо от {from_addr}: {outcome.format_latency()}")
+        
+        email_type = outcome.get("email_type")
+        log.info(f"📧 [Сценарий 2] Письмо классифицировано как: {email_type}")
+        
+        # Если письмо не является новым лидом, возвращаем результат (письмо уже отправлено в канал выше)
+        if email_type != "new_lead":
+            return {"success": False, "error": "Письмо не является новым лидом", "type": email_type, "sent_to_channel": True}
+        
+        classification = outcome.get("classification")
+        log.info(f"✅ [Сценарий 2] Запрос классифицирован: {classification.get('category')}")
         
+        proposal = outcome.get("proposal")
         log.info(f"✅ [Сценарий 2] Черновик ответа сгенерирован")
         
         result = {
@@ -840,7 +804,8 @@ async def process_lead_email(email_data: Dict, require_approval: bool = True, te
             "requires_approval": require_approval,
             "approved": False,
             "email_sent": False,
-            "weeek_project_created": False
+            "weeek_project_created": False,
+            "latency": outcome.latency_breakdown()
         }
         
         # Шаг 4: Подтверждение консультанта (если требуется)
@@ -905,10 +870,6 @@ async def process_lead_email(email_data: Dict, require_approval: bool = True, te
                     log.warning(f"⚠️ [Сценарий 2] Проект создан, но ID не получен")
                     result["weeek_project_created"] = False
         
-        # Если письмо не является новым лидом, возвращаем результат (письмо уже отправлено в канал выше)
-        if email_type != "new_lead":
-            return {"success": False, "error": "Письмо не является новым лидом", "type": email_type, "sent_to_channel": True}
-        
         return result
         
     except Exception as e:
@@ -947,21 +908,53 @@ async def process_telegram_lead(
     try:
         # Шаг 1: Приветствие и анализ
         log.info(f"💬 [Сценарий 3] Обработка запроса от пользователя {user_id}: {user_name}")
+        timeouts = get_step_timeouts()
         
-        # RAG анализ
-        rag_chain = get_rag_chain()
-        rag_response = ""
-        if rag_chain:
-            try:
-                rag_result = await rag_chain.query(user_message, use_rag=True, top_k=5)
-                rag_response = rag_result.get("answer", "")
-                log.info(f"✅ [Сценарий 3] RAG анализ завершен")
-            except Exception as e:
-                log.error(f"❌ [Сценарий 3] Ошибка RAG анализа: {e}")
+        async def run_rag(_):
+            return await _rag_answer(user_message, "Сценарий 3")
+        
+        async def run_classification(_):
+            return await classify_request(user_message)
+        
+        async def run_validation(_):
+            return await validate_lead(user_message)
         
-        # Классификация и валидация
-        classification = await classify_request(user_message)
-        validation = await validate_lead(user_message)
+        async def run_auto_reply(_):
+            # Немедленный автоматический ответ с подтверждением получения заявки
+            auto_reply_text = (
+                f"✅ Спасибо за вашу заявку, {user_name}!\n\n"
+                f"Мы получили ваш запрос и уже обрабатываем его. "
+                f"Наш консультант свяжется с вами в ближайшее время.\n\n"
+                f"Ваш запрос: {user_message[:100]}{'...' if len(user_message) > 100 else ''}"
+            )
+            await telegram_bot.send_message(
+                chat_id=user_id,
+                text=auto_reply_text
+            )
+            log.info(f"✅ [Сценарий 3] Автоматический ответ отправлен пользователю {user_id}")
+            return True
+        
+        async def run_weeek(_):
+            return await _create_weeek_project(
+                name=f"{user_name} — Telegram запрос",
+                description=f"Запрос через Telegram бота\n\n{user_message}\n\nПользователь: {user_name} (ID: {user_id})",
+                scenario="Сценарий 3"
+            )
+        
+        # RAG, классификация, валидация и автоответ независимы и выполняются параллельно
+        graph = StepGraph(name="Сценарий 3")
+        graph.add("rag", run_rag, timeout=timeouts["rag"], default="")
+        graph.add("classification", run_classification, timeout=timeouts["classification"], default=DEFAULT_CLASSIFICATION)
+        graph.add("validation", run_validation, timeout=timeouts["validation"], default=DEFAULT_VALIDATION)
+        graph.add("auto_reply", run_auto_reply, timeout=timeouts["notify"], default=False,
+                  when=lambda _: telegram_bot is not None)
+        graph.add("weeek", run_weeek, deps=("validation",), timeout=timeouts["weeek"],
+                  when=lambda results: WEEEK_AVAILABLE and is_warm_lead(results["validation"]))
+        outcome = await graph.run()
+        log.info(f"⏱️ [Сценарий 3] Запрос {user_id}: {outcome.format_latency()}")
+        
+        classification = outcome.get("classification")
+        validation = outcome.get("validation")
         
         score = validation.get("score", 0)
         status = validation.get("status", "cold")
@@ -974,59 +967,24 @@ async def process_telegram_lead(
             "user_id": user_id,
             "user_name": user_name,
             "user_message": user_message,
-            "rag_response": rag_response,
+            "rag_response": outcome.get("rag"),
             "classification": classification,
             "validation": validation,
             "weeek_project_created": False,
-            "auto_reply_sent": False
+            "auto_reply_sent": bool(outcome.get("auto_reply")),
+            "latency": outcome.latency_breakdown()
         }
         
-        # Шаг 2: Немедленный автоматический ответ с подтверждением получения заявки
-        if telegram_bot:
-            auto_reply_text = (
-                f"✅ Спасибо за вашу заявку, {user_name}!\n\n"
-                f"Мы получили ваш запрос и уже обрабатываем его. "
-                f"Наш консультант свяжется с вами в ближайшее время.\n\n"
-                f"Ваш запрос: {user_message[:100]}{'...' if len(user_message) > 100 else ''}"
-            )
-            try:
-                await telegram_bot.send_message(
-                    chat_id=user_id,
-                    text=auto_reply_text
-                )
-                result["auto_reply_sent"] = True
-                log.info(f"✅ [Сценарий 3] Автоматический ответ отправлен пользователю {user_id}")
-            except Exception as e:
-                log.error(f"❌ [Сценарий 3] Ошибка отправки автоответа: {e}")
-        
-        # Шаг 3: Обработка по стандартной цепочке (RAG + классификация + валидация)
         # Ответ пользователю с деталями будет отправлен через основной обработчик бота
         
-        # Шаг 4: При положительной валидации создаем проект в WEEEK
-        if (score > 0.6 or status == "warm") and WEEEK_AVAILABLE:
-            project_name = f"{user_name} — Telegram запрос"
-            project_description = f"Запрос через Telegram бота\n\n{user_message}\n\nПользователь: {user_name} (ID: {user_id})"
-            
-            weeek_project = await create_project(
-                name=project_name,
-                description=project_description
-            )
-            
+        # Шаг 4: При положительной валидации проект в WEEEK создан параллельно с автоответом
+        if is_warm_lead(validation) and WEEEK_AVAILABLE:
+            weeek_project = outcome.get("weeek")
             if weeek_project:
                 project_id = weeek_project.get("id")
-                if project_id:  # Проверяем, что project_id не None
+                if project_id:
                     result["weeek_project_id"] = project_id
                     result["weeek_project_created"] = True
-                    log.info(f"✅ [Сценарий 3] Проект создан в WEEEK: {project_id}")
-                    
-                    # Автоматически устанавливаем статус "new" для нового проекта
-                    from services.helpers.weeek_helper import update_project_status
-                    status_updated = await update_project_status(str(project_id), "new")
-                    if status_updated:
-                        log.info(f"✅ [Сценарий 3] Статус проекта установлен на 'new'")
-                else:
-                    log.warning(f"⚠️ [Сценарий 3] Проект создан, но ID не получен")
-                    result["weeek_project_created"] = False
                 
                 # Уведомление консультанта
                 if telegram_bot and TELEGRAM_CONSULTANT_CHAT_ID:
@@ -1169,9 +1127,11 @@ async def check_upcoming_deadlines(telegram_bot=None, days_ahead: int = 1) -> Li
             reminder_text += "\nСвяжитесь с клиентом для обновления статуса."
             
             try:
-                await telegram_bot.send_message(
-                    chat_id=TELEGRAM_CONSULTANT_CHAT_ID,
-                    text=reminder_text,
+                from services.helpers.telegram_outbox import queue_message
+                await queue_message(
+                    telegram_bot,
+                    TELEGRAM_CONSULTANT_CHAT_ID,
+                    reminder_text,
                     parse_mode="Markdown"
                 )
                 log.info(f"✅ [Сценарий 4] Напоминания отправлены: {len(urgent_tasks)} задач")
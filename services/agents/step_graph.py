@@ -0,0 +1,187 @@
+"""
+Step Graph Module
+Исполнитель графа зависимостей для сценариев обработки лидов.
+
+Шаг запускается, как только завершены все его зависимости, поэтому
+независимые шаги (RAG, классификация, валидация, создание проекта) выполняются
+параллельно. Для каждого шага задается таймаут и значение по умолчанию,
+которое используется при ошибке, таймауте или невыполненном условии.
+Для каждого запуска сохраняется разбивка латентности по шагам.
+"""
+import asyncio
+import inspect
+import logging
+import time
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Optional, Sequence, Union
+
+log = logging.getLogger()
+
+StepFunc = Callable[[Dict[str, Any]], Union[Any, Awaitable[Any]]]
+
+STATUS_OK = "ok"
+STATUS_TIMEOUT = "timeout"
+STATUS_ERROR = "error"
+STATUS_SKIPPED = "skipped"
+
+
+@dataclass
+class Step:
+    """Шаг графа"""
+    name: str
+    func: StepFunc
+    deps: Sequence[str] = ()
+    timeout: Optional[float] = None
+    default: Any = None
+    when: Optional[Callable[[Dict[str, Any]], bool]] = None
+
+
+@dataclass
+class StepGraphResult:
+    """Результат выполнения графа"""
+    results: Dict[str, Any] = field(default_factory=dict)
+    statuses: Dict[str, str] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)
+    timings: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    total_ms: float = 0.0
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return self.results.get(name, default)
+
+    def latency_breakdown(self) -> Dict[str, Any]:
+        """Разбивка латентности: общее время и время каждого шага (мс)"""
+        return {
+            "total_ms": round(self.total_ms, 1),
+            "steps": {
+                name: {
+                    "start_ms": round(timing["start_ms"], 1),
+                    "duration_ms": round(timing["duration_ms"], 1),
+                    "status": self.statuses.get(name, STATUS_OK)
+                }
+                for name, timing in self.timings.items()
+            }
+        }
+
+    def format_latency(self) -> str:
+        """Однострочная сводка латентности для логов"""
+        parts = [
+            f"{name}={timing['duration_ms']:.0f}ms"
+            + ("" if self.statuses.get(name) == STATUS_OK else f"({self.statuses.get(name)})")
+            for name, timing in self.timings.items()
+        ]
+        return f"total={self.total_ms:.0f}ms " + " ".join(parts)
+
+
+class StepGraph:
+    """Граф шагов с зависимостями, выполняемый в asyncio"""
+
+    def __init__(self, name: str = "graph", default_timeout: Optional[float] = None):
+        """
+        Args:
+            name: Имя графа (для логов)
+            default_timeout: Таймаут шага по умолчанию в секундах (None - без таймаута)
+        """
+        self.name = name
+        self.default_timeout = default_timeout
+        self.steps: Dict[str, Step] = {}
+
+    def add(
+        self,
+        name: str,
+        func: StepFunc,
+        deps: Sequence[str] = (),
+        timeout: Optional[float] = None,
+        default: Any = None,
+        when: Optional[Callable[[Dict[str, Any]], bool]] = None
+    ) -> "StepGraph":
+        """
+        Добавляет шаг. Зависимости должны быть добавлены раньше - так граф всегда ацикличен.
+
+        Args:
+            name: Имя шага (ключ результата)
+            func: Функция шага, получает словарь результатов завершенных шагов (sync или async)
+            deps: Имена шагов, результаты которых нужны этому шагу
+            timeout: Таймаут в секундах (по умолчанию default_timeout графа)
+            default: Результат при ошибке, таймауте или невыполненном условии
+            when: Условие запуска (вызывается с результатами зависимостей)
+        """
+        if name in self.steps:
+            raise ValueError(f"Шаг '{name}' уже добавлен в граф '{self.name}'")
+        missing = [dep for dep in deps if dep not in self.steps]
+        if missing:
+            raise ValueError(f"Шаг '{name}' зависит от неизвестных шагов: {', '.join(missing)}")
+
+        self.steps[name] = Step(
+            name=name,
+            func=func,
+            deps=tuple(deps),
+            timeout=timeout if timeout is not None else self.default_timeout,
+            default=default,
+            when=when
+        )
+        return self
+
+    async def _call(self, step: Step, results: Dict[str, Any]) -> Any:
+        async def invoke():
+            if inspect.iscoroutinefunction(step.func):
+                return await step.func(results)
+            # Синхронные шаги (HTTP клиенты, поиск в Qdrant) выполняются в общем
+            # ограниченном пуле узлов графов и не блокируют event loop
+            from services.helpers.graph_runtime import get_graph_executor
+            loop = asyncio.get_running_loop()
+            value = await loop.run_in_executor(get_graph_executor(), partial(step.func, results))
+            if inspect.isawaitable(value):
+                value = await value
+            return value
+
+        if step.timeout:
+            return await asyncio.wait_for(invoke(), timeout=step.timeout)
+        return await invoke()
+
+    async def run(self) -> StepGraphResult:
+        """
+        Выполняет граф. Ошибки шагов не прерывают выполнение остальных шагов.
+
+        Returns:
+            StepGraphResult с результатами, статусами и латентностью шагов
+        """
+        outcome = StepGraphResult()
+        started = time.perf_counter()
+        done: Dict[str, asyncio.Event] = {name: asyncio.Event() for name in self.steps}
+
+        async def execute(step: Step) -> None:
+            try:
+                for dep in step.deps:
+                    await done[dep].wait()
+
+                step_start = time.perf_counter()
+                try:
+                    # Ошибка в условии - ошибка этого шага, остальные шаги продолжают работу
+                    if step.when is not None and not step.when(outcome.results):
+                        outcome.results[step.name] = step.default
+                        outcome.statuses[step.name] = STATUS_SKIPPED
+                        return
+                    outcome.results[step.name] = await self._call(step, outcome.results)
+                    outcome.statuses[step.name] = STATUS_OK
+                except asyncio.TimeoutError:
+                    log.warning(f"⏱️ [{self.name}] Шаг '{step.name}' превысил таймаут {step.timeout}с")
+                    outcome.results[step.name] = step.default
+                    outcome.statuses[step.name] = STATUS_TIMEOUT
+                    outcome.errors[step.name] = f"timeout {step.timeout}s"
+                except Exception as e:
+                    log.error(f"❌ [{self.name}] Ошибка шага '{step.name}': {e}")
+                    outcome.results[step.name] = step.default
+                    outcome.statuses[step.name] = STATUS_ERROR
+                    outcome.errors[step.name] = str(e)
+                finally:
+                    outcome.timings[step.name] = {
+                        "start_ms": (step_start - started) * 1000,
+                        "duration_ms": (time.perf_counter() - step_start) * 1000
+                    }
+            finally:
+                done[step.name].set()
+
+        await asyncio.gather(*(execute(step) for step in self.steps.values()))
+        outcome.total_ms = (time.perf_counter() - started) * 1000
+        return outcome
@@ -0,0 +1,186 @@
+"""
+Blocking IO
+Выполнение синхронных вызовов (gspread, Qdrant, эмбеддинги) из async кода
+без блокировки event loop.
+
+- общий ограниченный пул потоков (BLOCKING_EXECUTOR_WORKERS)
+- у каждой группы маршрутов (sheets, qdrant, ...) свой лимит одновременных
+  вызовов: медленная Google Sheets не занимает весь пул и не задерживает поиск
+- таймаут ожидания: по истечении поднимается BlockingCallTimeout (обработчик
+  отвечает 504), а поток продолжает работу и держит слот группы до завершения,
+  поэтому зависший сервис не может занять больше потоков, чем лимит группы
+- статистика по группам (в работе, ожидают, вызовы, таймауты) - get_blocking_stats()
+"""
+import os
+import time
+import asyncio
+import logging
+import threading
+import contextvars
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Callable, Dict, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+BLOCKING_EXECUTOR_WORKERS = int(os.getenv("BLOCKING_EXECUTOR_WORKERS", "16"))
+BLOCKING_DEFAULT_LIMIT = int(os.getenv("BLOCKING_DEFAULT_LIMIT", "4"))
+BLOCKING_DEFAULT_TIMEOUT = float(os.getenv("BLOCKING_DEFAULT_TIMEOUT", "30"))
+
+# Лимиты групп: BLOCKING_<GROUP>_LIMIT / BLOCKING_<GROUP>_TIMEOUT переопределяют значения
+ROUTE_DEFAULTS: Dict[str, Tuple[int, float]] = {
+    "sheets": (4, 20.0),
+    "qdrant": (8, 30.0),
+    "redis": (8, 5.0),
+}
+
+
+class BlockingCallTimeout(TimeoutError):
+    """Синхронный вызов не завершился за отведенное время"""
+
+    def __init__(self, route: str, timeout: float):
+        super().__init__(f"{route}: нет ответа за {timeout:g} с")
+        self.route = route
+        self.timeout = timeout
+
+
+@dataclass
+class RouteLimit:
+    """Лимит и статистика группы маршрутов"""
+    limit: int
+    timeout: float
+    in_flight: int = 0
+    waiting: int = 0
+    calls: int = 0
+    timeouts: int = 0
+    errors: int = 0
+    total_ms: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "timeout": self.timeout,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "calls": self.calls,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "avg_ms": round(self.total_ms / self.calls, 2) if self.calls else 0.0
+        }
+
+
+def _route_config(route: str) -> Tuple[int, float]:
+    limit, timeout = ROUTE_DEFAULTS.get(route, (BLOCKING_DEFAULT_LIMIT, BLOCKING_DEFAULT_TIMEOUT))
+    prefix = f"BLOCKING_{route.upper()}"
+    return int(os.getenv(f"{prefix}_LIMIT", limit)), float(os.getenv(f"{prefix}_TIMEOUT", timeout))
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_routes: Dict[str, RouteLimit] = {}
+_routes_lock = threading.Lock()
+# Семафоры привязаны к event loop, поэтому хранятся отдельно для каждого loop
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = weakref.WeakKeyDictionary()
+
+
+def get_blocking_executor() -> ThreadPoolExecutor:
+    """Общий пул потоков для синхронных вызовов (Singleton)"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=BLOCKING_EXECUTOR_WORKERS, thread_name_prefix="blocking-io")
+    return _executor
+
+
+def configure_route(route: str, limit: Optional[int] = None, timeout: Optional[float] = None) -> RouteLimit:
+    """Задать лимит одновременных вызовов и таймаут группы"""
+    state = _get_route(route)
+    with _routes_lock:
+        if limit is not None:
+            state.limit = limit
+        if timeout is not None:
+            state.timeout = timeout
+    # Новый лимит применяется к новым семафорам
+    for semaphores in list(_semaphores.values()):
+        semaphores.pop(route, None)
+    return state
+
+
+def _get_route(route: str) -> RouteLimit:
+    state = _routes.get(route)
+    if state is None:
+        with _routes_lock:
+            state = _routes.get(route)
+            if state is None:
+                state = _routes[route] = RouteLimit(*_route_config(route))
+    return state
+
+
+def _get_semaphore(loop: asyncio.AbstractEventLoop, route: str, limit: int) -> asyncio.Semaphore:
+    semaphores = _semaphores.get(loop)
+    if semaphores is None:
+        semaphores = _semaphores[loop] = {}
+    semaphore = semaphores.get(route)
+    if semaphore is None:
+        semaphore = semaphores[route] = asyncio.Semaphore(limit)
+    return semaphore
+
+
+async def run_blocking(route: str, func: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+    """
+    Выполнить синхронную функцию в пуле потоков
+
+    Args:
+        route: Группа маршрутов (sheets, qdrant, ...) - определяет лимит и таймаут
+        func: Синхронная функция
+        timeout: Таймаут (по умолчанию - таймаут группы), включает ожидание слота
+
+    Raises:
+        BlockingCallTimeout: вызов не завершился за timeout
+    """
+    state = _get_route(route)
+    timeout = state.timeout if timeout is None else timeout
+    loop = asyncio.get_running_loop()
+    semaphore = _get_semaphore(loop, route, state.limit)
+    deadline = loop.time() + timeout
+
+    state.waiting += 1
+    try:
+        await asyncio.wait_for(semaphore.acquire(), timeout)
+    except asyncio.TimeoutError:
+        state.timeouts += 1
+        log.warning(f"⏱️ [BlockingIO] {route}: все {state.limit} слотов заняты дольше {timeout:g} с")
+        raise BlockingCallTimeout(route, timeout) from None
+    finally:
+        state.waiting -= 1
+
+    state.in_flight += 1
+    started = time.perf_counter()
+    context = contextvars.copy_context()
+    future = loop.run_in_executor(get_blocking_executor(), partial(context.run, func, *args, **kwargs))
+
+    def release(done: asyncio.Future) -> None:
+        # Слот освобождается только когда поток действительно завершился
+        state.in_flight -= 1
+        state.calls += 1
+        state.total_ms += (time.perf_counter() - started) * 1000
+        if not done.cancelled() and done.exception() is not None:
+            state.errors += 1
+        semaphore.release()
+
+    future.add_done_callback(release)
+    try:
+        return await asyncio.wait_for(asyncio.shield(future), max(deadline - loop.time(), 0))
+    except asyncio.TimeoutError:
+        state.timeouts += 1
+        log.warning(f"⏱️ [BlockingIO] {route}: {getattr(func, '__name__', func)} не ответил за {timeout:g} с")
+        raise BlockingCallTimeout(route, timeout) from None
+
+
+def get_blocking_stats() -> Dict[str, Dict[str, Any]]:
+    """Статистика групп: {route: {limit, in_flight, waiting, calls, timeouts, ...}}"""
+    with _routes_lock:
+        return {route: state.to_dict() for route, state in sorted(_routes.items())}
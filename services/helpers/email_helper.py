@@ -786,24 +786,17 @@ async def classify_email(email_data: Dict) -> str:
     Returns:
         Категория: "new_lead", "followup", "service"
     """
-    # Простая эвристическая классификация
+    # Эвристическая классификация по правилам из config/rag.yaml (email_followup, email_new_lead)
     # В реальной версии можно использовать LLM для более точной классификации
+    from services.helpers.intent_rules import get_intent_rules
     
-    subject = email_data.get("subject", "").lower()
-    body = email_data.get("body", "").lower()
-    from_addr = email_data.get("from", "").lower()
+    subject = email_data.get("subject", "")
+    body = email_data.get("body", "")
     
-    # Ключевые слова для нового лида
-    lead_keywords = ["запрос", "консультация", "помощь", "нужна помощь", "интерес", "предложение"]
-    
-    # Ключевые слова для продолжения диалога
-    followup_keywords = ["re:", "fwd:", "ответ", "продолжение", "следующий шаг"]
-    
-    if any(keyword in subject for keyword in followup_keywords) or any(keyword in body[:200] for keyword in followup_keywords):
-        return "followup"
-    
-    if any(keyword in subject for keyword in lead_keywords) or any(keyword in body[:200] for keyword in lead_keywords):
-        return "new_lead"
+    # Тема и начало письма разбираются за один проход
+    match = get_intent_rules().first(f"{subject}\n{body[:200]}", ("email_followup", "email_new_lead"))
+    if match is not None:
+        return "followup" if match.intent == "email_followup" else "new_lead"
     
     # По умолчанию служебная информация
     return "service"
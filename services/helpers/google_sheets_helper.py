@@ -7,7 +7,7 @@ import os
 import json
 import logging
 from typing import List, Dict, Optional
-from datetime import datetime, timedelta
+from datetime import datetime
 
 log = logging.getLogger()
 
@@ -39,10 +39,11 @@ GOOGLE_SHEETS_CREDENTIALS_JSON = _gs_settings.get("credentials_json") or os.gete
 # Spreadsheet ID из URL пользователя
 GOOGLE_SHEETS_SPREADSHEET_ID = _gs_settings.get("spreadsheet_id") or os.getenv("GOOGLE_SHEETS_SPREADSHEET_ID", "1NF25EWqRxjdNTKk4VFVAYZGIOlVFfaktpEvvj1bRXKU")
 
-# Кэш для данных (чтобы не читать каждый раз)
-_services_cache = None
-_services_cache_time = None
-CACHE_TIMEOUT = 300  # 5 минут кэширования
+# Кэш данных листов (SheetsRepository): свежий снимок, затем stale-while-revalidate
+CACHE_TIMEOUT = int(os.getenv("GOOGLE_SHEETS_CACHE_TTL", "300"))  # 5 минут кэширования
+
+PRICE_SHEET = "Ценник"
+BOOKING_SHEET = "Запись"
 
 # Глобальная переменная для клиента
 _sheets_client = None
@@ -135,8 +136,34 @@ PLACEHOLDER_MASTERS = [
 
 # ===================== ФУНКЦИИ РАБОТЫ С ДАННЫМИ =====================
 
+def build_masters(services: List[Dict]) -> List[Dict]:
+    """Список мастеров из услуг (уникальные имена из колонок Мастер 1 и Мастер 2)"""
+    master_names = set()
+    
+    for service in services:
+        master1 = service.get("master1", "").strip()
+        master2 = service.get("master2", "").strip()
+        if master1:
+            master_names.add(master1)
+        if master2:
+            master_names.add(master2)
+    
+    masters = []
+    for idx, name in enumerate(sorted(master_names), 1):
+        masters.append({
+            "id": idx,
+            "name": name,
+            "specialization": "HR-специалист",
+            "schedule": {
+                "daily_start": "09:00",
+                "daily_end": "20:00"
+            }
+        })
+    return masters
+
+
 def get_masters() -> List[Dict]:
-    """Получить список мастеров из Google Sheets (ТОЛЬКО из Google Sheets, без fallback)"""
+    """Получить список мастеров из Google Sheets (снимок SheetsRepository)"""
     client = get_sheets_client()
     
     if not client:
@@ -144,281 +171,155 @@ def get_masters() -> List[Dict]:
         return PLACEHOLDER_MASTERS.copy()
     
     try:
-        # Получаем мастеров из услуг (уникальные имена из колонок Мастер 1 и Мастер 2)
-        services = get_services()
-        master_names = set()
-        
-        for service in services:
-            master1 = service.get("master1", "").strip()
-            master2 = service.get("master2", "").strip()
-            if master1:
-                master_names.add(master1)
-            if master2:
-                master_names.add(master2)
-        
-        masters = []
-        for idx, name in enumerate(sorted(master_names), 1):
-            # Определяем тип зала по услугам
-            master_services = [s for s in services if s.get("master1") == name or s.get("master2") == name]
-            service_type = "HR-специалист" if any(s.get("type") == "men" for s in master_services) else "HR-специалист"
-            
-            masters.append({
-                "id": idx,
-                "name": name,
-                "specialization": service_type,
-                "schedule": {
-                    "daily_start": "09:00",
-                    "daily_end": "20:00"
-                }
-            })
-        
+        from services.helpers.sheets_repository import get_sheets_repository
+        masters = get_sheets_repository().get_snapshot_sync().masters
         if not masters:
             log.warning("⚠️ Не найдено мастеров в Google Sheets, используем placeholder данные")
-            masters = PLACEHOLDER_MASTERS.copy()
-        
-        log.info(f"✅ Получено {len(masters)} мастеров из Google Sheets")
-        return masters
+            return PLACEHOLDER_MASTERS.copy()
+        return list(masters)
     except Exception as e:
         log.warning(f"⚠️ Ошибка чтения мастеров из Google Sheets: {e}, используем placeholder данные")
         return PLACEHOLDER_MASTERS.copy()
 
 
 def get_services(master_name: Optional[str] = None) -> List[Dict]:
-    """Получить список услуг из Google Sheets 'Ценник' (ТОЛЬКО из Google Sheets, без fallback)"""
-    global _services_cache, _services_cache_time
-    
+    """Получить список услуг из Google Sheets 'Ценник' (снимок SheetsRepository)"""
     client = get_sheets_client()
     
-    # Проверяем кэш
-    if _services_cache and _services_cache_time:
-        cache_age = (datetime.now() - _services_cache_time).total_seconds()
-        if cache_age < CACHE_TIMEOUT:
-            log.debug(f"📋 Используем кэш услуг (возраст: {cache_age:.0f} сек)")
-            services = _services_cache.copy()
-            if master_name:
-                services = [s for s in services if master_name.lower() in (s.get("master1", "") + " " + s.get("master2", "")).lower()]
-            return services
-    
     if client:
         try:
-            log.info(f"🔗 Подключение к Google Sheets (ID: {GOOGLE_SHEETS_SPREADSHEET_ID})")
-            spreadsheet = client.open_by_key(GOOGLE_SHEETS_SPREADSHEET_ID)
-            worksheet = spreadsheet.worksheet("Ценник")
-            
-            # Получаем все данные - используем get_all_values() для получения всех строк
-            all_values = worksheet.get_all_values()
-            log.info(f"📋 Прочитано {len(all_values)} строк из листа 'Ценник'")
-            if len(all_values) > 0:
-                log.info(f"📋 Первая строка (заголовок): {all_values[0]}")
-                # Логируем первые 10 строк для отладки
-                log.info(f"📋 Первые 10 строк из Google Sheets:")
-                for i, row in enumerate(all_values[:10], 1):
-                    # Показываем первые 7 колонок (A-G)
-                    row_preview = row[:7] if len(row) >= 7 else row
-                    log.info(f"   Строка {i}: A='{row[0] if len(row) > 0 else ''}', B='{row[1] if len(row) > 1 else ''}', C='{row[2] if len(row) > 2 else ''}', D='{row[3] if len(row) > 3 else ''}', E='{row[4] if len(row) > 4 else ''}', F='{row[5] if len(row) > 5 else ''}', G='{row[6] if len(row) > 6 else ''}'")
-            
-            services = []
-            current_type = None
-            service_id = 1
-            
-            # КРИТИЧЕСКОЕ ИСПРАВЛЕНИЕ: В строке 1 заголовок "Мужской зал" в колонке A,
-            # но в строках 2-15 колонка A пустая! Нужно использовать заголовок из строки 1.
-            # Проверяем заголовок в строке 1
-            if len(all_values) > 0:
-                header_row = all_values[0]
-                header_col_a = header_row[0].strip() if len(header_row) > 0 else ""
-                if "Мужской" in header_col_a or "мужской" in header_col_a or "men" in header_col_a.lower():
-                    current_type = "men"
-                    log.info(f"📋 Найдена секция в заголовке: Мужской зал (строка 1)")
-                elif "Женский" in header_col_a or "женский" in header_col_a or "women" in header_col_a.lower():
-                    current_type = "women"
-                    log.info(f"📋 Найдена секция в заголовке: Женский зал (строка 1)")
-            
-            # Парсим данные (пропускаем заголовок, если есть)
-            # ВАЖНО: Строка 1 - это заголовок, строка 2+ - данные
-            for row_idx, row in enumerate(all_values[1:], start=2):  # Начинаем со 2-й строки (пропускаем заголовок)
-                if not row or len(row) < 2:
-                    continue
-                
-                # Колонка A: Тип услуги / Отдел (может быть заголовок секции)
-                col_a = row[0].strip() if len(row) > 0 else ""
-                # Колонка B: Услуга название
-                service_name = row[1].strip() if len(row) > 1 else ""
-                
-                # КРИТИЧЕСКОЕ: Если колонка A содержит заголовок секции, обновляем current_type
-                # Если колонка A пустая, используем последний установленный current_type
-                if col_a:
-                    if "Мужской" in col_a or "мужской" in col_a or "men" in col_a.lower():
-                        current_type = "men"
-                        log.debug(f"📋 Найдена секция: Мужской зал (строка {row_idx})")
-                    elif "Женский" in col_a or "женский" in col_a or "women" in col_a.lower():
-                        current_type = "women"
-                        log.debug(f"📋 Найдена секция: Женский зал (строка {row_idx})")
-                    
-                    # Если колонка A содержит заголовок секции, но услуга тоже есть в этой строке
-                    # (в колонке B), обрабатываем услугу дальше
-                    # Если услуги нет в этой строке, просто обновляем current_type и переходим к следующей строке
-                    if not service_name:
-                        continue  # Это заголовок секции без услуги, пропускаем
-                
-                # Если название услуги отсутствует, пропускаем строку
-                if not service_name:
-                    continue
-                
-                # КРИТИЧЕСКОЕ ИСПРАВЛЕНИЕ: Если current_type не установлен, НЕ пропускаем!
-                # Используем последний установленный current_type (из заголовка или предыдущей строки)
-                if not current_type:
-                    log.warning(f"⚠️ Пропущена услуга '{service_name}' (строка {row_idx}) - секция не определена (col_a='{col_a}')")
-                    continue
-                
-                # КРИТИЧЕСКОЕ: Структура Google Sheets (согласно таблице):
-                # Строка 1 (заголовок): A="Мужской зал", B="Услуга название", C="Мастер 1", D="Мастер 2", E="Цена", F="Время", G="Доп. услуги"
-                # Строка 2 (данные): A="Мужской зал", B="Бритье головы", C="Анастасия Новосёлова", D=пусто, E="1700", F="60", G="Камуфляж..."
-                # Значит: row[0]=A, row[1]=B, row[2]=C, row[3]=D, row[4]=E, row[5]=F, row[6]=G
-                
-                # Колонка C: Мастер 1 (row[2])
-                master1 = row[2].strip() if len(row) > 2 else ""
-                # Колонка D: Мастер 2 (может быть пусто) (row[3])
-                master2 = row[3].strip() if len(row) > 3 else ""
-                
-                # Колонка E: Цена (может быть диапазон "1000–2500") (row[4]) - ВАЖНО: это row[4], не row[3]!
-                price_str = row[4].strip() if len(row) > 4 else "0"
-                price = parse_price(price_str)
-                
-                # Колонка F: Время оказания (в мин.) (row[5]) - ВАЖНО: это row[5], не row[4]!
-                duration_str = row[5].strip() if len(row) > 5 else "0"
-                try:
-                    duration = int(duration_str) if duration_str else 0
-                except ValueError:
-                    duration = 0
-                
-                # Колонка G: Доп. услуги (row[6])
-                additional_services = row[6].strip() if len(row) > 6 else ""
-                
-                # ДЕТАЛЬНОЕ ЛОГИРОВАНИЕ для "Бритье головы" для отладки
-                if "бритье" in service_name.lower() and "голов" in service_name.lower():
-                    log.info(f"🔍🔍🔍 ОБРАБОТКА 'Бритье головы' (строка {row_idx}):")
-                    log.info(f"   row[0] (A, col_a): '{col_a}'")
-                    log.info(f"   row[1] (B, service_name): '{service_name}'")
-                    log.info(f"   row[2] (C, master1): '{master1}'")
-                    log.info(f"   row[3] (D, master2): '{master2}'")
-                    log.info(f"   row[4] (E, price_str): '{price_str}' -> parse_price() -> {price}₽")
-                    log.info(f"   row[5] (F, duration_str): '{duration_str}' -> int() -> {duration} мин")
-                    log.info(f"   row[6] (G, additional_services): '{additional_services}'")
-                    log.info(f"   current_type: '{current_type}'")
-                    log.info(f"   ОЖИДАЕТСЯ: price=1700, duration=60, master='Анастасия Новосёлова'")
-                    if price != 1700:
-                        log.error(f"   ❌❌❌ КРИТИЧЕСКАЯ ОШИБКА: price={price}, ожидается 1700! Проверьте row[4]!")
-                    if duration != 60:
-                        log.error(f"   ❌❌❌ КРИТИЧЕСКАЯ ОШИБКА: duration={duration}, ожидается 60! Проверьте row[5]!")
-                    if "анастасия" not in master1.lower() and "новосёлова" not in master1.lower():
-                        log.error(f"   ❌❌❌ КРИТИЧЕСКАЯ ОШИБКА: master1='{master1}', ожидается 'Анастасия Новосёлова'! Проверьте row[2]!")
-                    else:
-                        log.info(f"   ✅✅✅ ВСЕ ПРАВИЛЬНО: price={price}₽, duration={duration} мин, master='{master1}'")
-                
-                service = {
-                    "id": service_id,
-                    "title": service_name,
-                    "price": price,
-                    "price_str": price_str,  # Сохраняем оригинальную строку для отображения
-                    "duration": duration,
-                    "master1": master1,
-                    "master2": master2,
-                    "master": master1 or master2,  # Основной мастер
-                    "type": current_type,
-                    "additional_services": additional_services,
-                    "row_number": row_idx
-                }
-                
-                services.append(service)
-                service_id += 1
-            
-            if not services:
-                log.warning("⚠️ Не найдено услуг в Google Sheets, используем placeholder данные")
-                services = PLACEHOLDER_SERVICES.copy()
-            
-            # Обновляем кэш
-            _services_cache = services
-            _services_cache_time = datetime.now()
-            log.info(f"✅ Получено {len(services)} услуг из Google Sheets")
-            
-            # Логируем статистику по типам услуг
-            men_services = [s for s in services if s.get('type') == 'men']
-            women_services = [s for s in services if s.get('type') == 'women']
-            log.info(f"📊 Статистика: Мужской зал - {len(men_services)} услуг, Женский зал - {len(women_services)} услуг")
-            
-            # КРИТИЧЕСКОЕ: Логируем ВСЕ услуги для диагностики
-            log.info(f"📋 ВСЕ НАЙДЕННЫЕ УСЛУГИ ({len(services)} шт.):")
-            for s in services:
-                log.info(f"  Строка {s.get('row_number')}: '{s.get('title')}' ({s.get('type')}) - {s.get('price_str')}₽ - {s.get('duration')} мин - мастер: '{s.get('master')}'")
-            
-            # Логируем первые несколько услуг для проверки
-            log.info("📋 Первые услуги из Мужского зала:")
-            for s in men_services[:5]:
-                log.info(f"  📋 {s.get('title')} - цена: '{s.get('price_str')}' ({s.get('price')}₽) - {s.get('duration')} мин - мастер: {s.get('master')}")
-            
-            log.info("📋 Первые услуги из Женского зала:")
-            for s in women_services[:5]:
-                log.info(f"  📋 {s.get('title')} - цена: '{s.get('price_str')}' ({s.get('price')}₽) - {s.get('duration')} мин - мастер: {s.get('master')}")
-            
-            # Проверяем конкретно "Бритье головы" и логируем ВСЕ услуги для отладки
-            briтье_услуги = [s for s in services if "бритье" in s.get('title', '').lower() and "голов" in s.get('title', '').lower()]
-            if briтье_услуги:
-                for s in briтье_услуги:
-                    log.info(f"  🔍 НАЙДЕНО 'Бритье головы': {s.get('title')} - цена: '{s.get('price_str')}' ({s.get('price')}₽) - строка {s.get('row_number')}")
-            else:
-                log.warning("⚠️ Услуга 'Бритье головы' не найдена!")
-                log.warning(f"⚠️ Всего найдено услуг: {len(services)}")
-                log.warning(f"⚠️ Услуги с 'бритье': {[s.get('title') for s in services if 'бритье' in s.get('title', '').lower()]}")
-            
-            # Логируем ВСЕ названия услуг для проверки (первые 30)
-            log.info(f"📋 ВСЕ НАЙДЕННЫЕ УСЛУГИ ({len(services)} шт., показываю первые 30):")
-            for s in services[:30]:
-                log.info(f"  Строка {s.get('row_number')}: '{s.get('title')}' ({s.get('type')}) - {s.get('price_str')}₽")
-            if len(services) > 30:
-                log.info(f"  ... и еще {len(services) - 30} услуг")
-            
-            # Автоматически обновляем индекс в Qdrant в фоне (не блокируем чтение данных)
-            try:
-                import threading
-                def update_qdrant_index():
-                    try:
-                        from services.rag.qdrant_helper import index_services as qdrant_index
-                        if qdrant_index(services):
-                            log.info(f"✅ Индекс Qdrant обновлен автоматически ({len(services)} услуг)")
-                    except Exception as e:
-                        log.warning(f"⚠️ Не удалось обновить индекс Qdrant: {e}")
-                
-                # Запускаем обновление индекса в фоне
-                index_thread = threading.Thread(target=update_qdrant_index, daemon=True)
-                index_thread.start()
-            except Exception as e:
-                log.warning(f"⚠️ Не удалось запустить обновление индекса Qdrant: {e}")
-            
-            if master_name:
-                filtered_services = [s for s in services if master_name.lower() in (s.get("master1", "") + " " + s.get("master2", "")).lower()]
-                if not filtered_services:
-                    log.warning(f"⚠️ Не найдено услуг для мастера '{master_name}' в Google Sheets")
-                return filtered_services
-            
-            return services
-            
+            from services.helpers.sheets_repository import get_sheets_repository
+            return get_sheets_repository().get_snapshot_sync().services_for_master(master_name)
         except Exception as e:
             log.warning(f"⚠️ Ошибка чтения услуг из Google Sheets: {e}, используем placeholder данные")
-            services = PLACEHOLDER_SERVICES.copy()
-            if master_name:
-                services = [s for s in services if master_name.lower() in (s.get("master1", "") + " " + s.get("master2", "")).lower()]
-            _services_cache = services
-            _services_cache_time = datetime.now()
-            return services
+    else:
+        # Google Sheets не настроены - используем placeholder
+        log.warning("⚠️ Google Sheets недоступны, используем placeholder данные для услуг")
     
-    # Google Sheets не настроены - используем placeholder
-    log.warning("⚠️ Google Sheets недоступны, используем placeholder данные для услуг")
     services = PLACEHOLDER_SERVICES.copy()
     if master_name:
         services = [s for s in services if master_name.lower() in (s.get("master1", "") + " " + s.get("master2", "")).lower()]
-    _services_cache = services
-    _services_cache_time = datetime.now()
+    return services
+
+
+def parse_services_rows(all_values: List[List[str]]) -> List[Dict]:
+    """Разбор значений листа 'Ценник' в список услуг"""
+    services = []
+    current_type = None
+    service_id = 1
+    
+    # КРИТИЧЕСКОЕ ИСПРАВЛЕНИЕ: В строке 1 заголовок "Мужской зал" в колонке A,
+    # но в строках 2-15 колонка A пустая! Нужно использовать заголовок из строки 1.
+    # Проверяем заголовок в строке 1
+    if len(all_values) > 0:
+        header_row = all_values[0]
+        header_col_a = header_row[0].strip() if len(header_row) > 0 else ""
+        if "Мужской" in header_col_a or "мужской" in header_col_a or "men" in header_col_a.lower():
+            current_type = "men"
+            log.info(f"📋 Найдена секция в заголовке: Мужской зал (строка 1)")
+        elif "Женский" in header_col_a or "женский" in header_col_a or "women" in header_col_a.lower():
+            current_type = "women"
+            log.info(f"📋 Найдена секция в заголовке: Женский зал (строка 1)")
+    
+    # Парсим данные (пропускаем заголовок, если есть)
+    # ВАЖНО: Строка 1 - это заголовок, строка 2+ - данные
+    for row_idx, row in enumerate(all_values[1:], start=2):  # Начинаем со 2-й строки (пропускаем заголовок)
+        if not row or len(row) < 2:
+            continue
+        
+        # Колонка A: Тип услуги / Отдел (может быть заголовок секции)
+        col_a = row[0].strip() if len(row) > 0 else ""
+        # Колонка B: Услуга название
+        service_name = row[1].strip() if len(row) > 1 else ""
+        
+        # КРИТИЧЕСКОЕ: Если колонка A содержит заголовок секции, обновляем current_type
+        # Если колонка A пустая, используем последний установленный current_type
+        if col_a:
+            if "Мужской" in col_a or "мужской" in col_a or "men" in col_a.lower():
+                current_type = "men"
+                log.debug(f"📋 Найдена секция: Мужской зал (строка {row_idx})")
+            elif "Женский" in col_a or "женский" in col_a or "women" in col_a.lower():
+                current_type = "women"
+                log.debug(f"📋 Найдена секция: Женский зал (строка {row_idx})")
+            
+            # Если колонка A содержит заголовок секции, но услуга тоже есть в этой строке
+            # (в колонке B), обрабатываем услугу дальше
+            # Если услуги нет в этой строке, просто обновляем current_type и переходим к следующей строке
+            if not service_name:
+                continue  # Это заголовок секции без услуги, пропускаем
+        
+        # Если название услуги отсутствует, пропускаем строку
+        if not service_name:
+            continue
+        
+        # КРИТИЧЕСКОЕ ИСПРАВЛЕНИЕ: Если current_type не установлен, НЕ пропускаем!
+        # Используем последний установленный current_type (из заголовка или предыдущей строки)
+        if not current_type:
+            log.warning(f"⚠️ Пропущена услуга '{service_name}' (строка {row_idx}) - секция не определена (col_a='{col_a}')")
+            continue
+        
+        # КРИТИЧЕСКОЕ: Структура Google Sheets (согласно таблице):
+        # Строка 1 (заголовок): A="Мужской зал", B="Услуга название", C="Мастер 1", D="Мастер 2", E="Цена", F="Время", G="Доп. услуги"
+        # Строка 2 (данные): A="Мужской зал", B="Бритье головы", C="Анастасия Новосёлова", D=пусто, E="1700", F="60", G="Камуфляж..."
+        # Значит: row[0]=A, row[1]=B, row[2]=C, row[3]=D, row[4]=E, row[5]=F, row[6]=G
+        
+        # Колонка C: Мастер 1 (row[2])
+        master1 = row[2].strip() if len(row) > 2 else ""
+        # Колонка D: Мастер 2 (может быть пусто) (row[3])
+        master2 = row[3].strip() if len(row) > 3 else ""
+        
+        # Колонка E: Цена (может быть диапазон "1000–2500") (row[4]) - ВАЖНО: это row[4], не row[3]!
+        price_str = row[4].strip() if len(row) > 4 else "0"
+        price = parse_price(price_str)
+        
+        # Колонка F: Время оказания (в мин.) (row[5]) - ВАЖНО: это row[5], не row[4]!
+        duration_str = row[5].strip() if len(row) > 5 else "0"
+        try:
+            duration = int(duration_str) if duration_str else 0
+        except ValueError:
+            duration = 0
+        
+        # Колонка G: Доп. услуги (row[6])
+        additional_services = row[6].strip() if len(row) > 6 else ""
+        
+        # ДЕТАЛЬНОЕ ЛОГИРОВАНИЕ для "Бритье головы" для отладки
+        if "бритье" in service_name.lower() and "голов" in service_name.lower():
+            log.info(f"🔍🔍🔍 ОБРАБОТКА 'Бритье головы' (строка {row_idx}):")
+            log.info(f"   row[0] (A, col_a): '{col_a}'")
+            log.info(f"   row[1] (B, service_name): '{service_name}'")
+            log.info(f"   row[2] (C, master1): '{master1}'")
+            log.info(f"   row[3] (D, master2): '{master2}'")
+            log.info(f"   row[4] (E, price_str): '{price_str}' -> parse_price() -> {price}₽")
+            log.info(f"   row[5] (F, duration_str): '{duration_str}' -> int() -> {duration} мин")
+            log.info(f"   row[6] (G, additional_services): '{additional_services}'")
+            log.info(f"   current_type: '{current_type}'")
+            log.info(f"   ОЖИДАЕТСЯ: price=1700, duration=60, master='Анастасия Новосёлова'")
+            if price != 1700:
+                log.error(f"   ❌❌❌ КРИТИЧЕСКАЯ ОШИБКА: price={price}, ожидается 1700! Проверьте row[4]!")
+            if duration != 60:
+                log.error(f"   ❌❌❌ КРИТИЧЕСКАЯ ОШИБКА: duration={duration}, ожидается 60! Проверьте row[5]!")
+            if "анастасия" not in master1.lower() and "новосёлова" not in master1.lower():
+                log.error(f"   ❌❌❌ КРИТИЧЕСКАЯ ОШИБКА: master1='{master1}', ожидается 'Анастасия Новосёлова'! Проверьте row[2]!")
+            else:
+                log.info(f"   ✅✅✅ ВСЕ ПРАВИЛЬНО: price={price}₽, duration={duration} мин, master='{master1}'")
+        
+        service = {
+            "id": service_id,
+            "title": service_name,
+            "price": price,
+            "price_str": price_str,  # Сохраняем оригинальную строку для отображения
+            "duration": duration,
+            "master1": master1,
+            "master2": master2,
+            "master": master1 or master2,  # Основной мастер
+            "type": current_type,
+            "additional_services": additional_services,
+            "row_number": row_idx
+        }
+        
+        services.append(service)
+        service_id += 1
+    
     return services
 
 
@@ -451,7 +352,7 @@ def parse_price(price_str: str) -> int:
 
 
 def get_available_slots(master_name: str, date: str) -> List[str]:
-    """Получить доступные слоты времени для мастера на дату (из Google Sheets)"""
+    """Получить свободные слоты времени для мастера на дату (расписание минус занятые интервалы)"""
     client = get_sheets_client()
     
     if not client:
@@ -460,26 +361,12 @@ def get_available_slots(master_name: str, date: str) -> List[str]:
         return ["09:00", "10:00", "11:00", "12:00", "13:00", "14:00", "15:00", "16:00", "17:00", "18:00", "19:00", "20:00"]
     
     try:
-        # Получаем расписание мастера из реальных данных
-        masters = get_masters()
-        master = next((m for m in masters if m.get("name", "").lower() == master_name.lower()), None)
-        
-        if not master:
-            error_msg = f"❌ ОШИБКА: Мастер '{master_name}' не найден в Google Sheets!"
-            log.error(error_msg)
-            raise Exception(error_msg)
-        
-        schedule = master.get("schedule", {})
-        start_time = datetime.strptime(schedule.get("daily_start", "09:00"), "%H:%M")
-        end_time = datetime.strptime(schedule.get("daily_end", "20:00"), "%H:%M")
-        
-        slots = []
-        current = start_time
-        while current < end_time:
-            slots.append(current.strftime("%H:%M"))
-            current += timedelta(hours=1)
-        
-        return slots
+        from services.helpers.sheets_repository import get_sheets_repository
+        return get_sheets_repository().free_slots_sync(master_name, date)
+    except ValueError as e:
+        error_msg = f"❌ ОШИБКА: {e}"
+        log.error(error_msg)
+        raise Exception(error_msg)
     except Exception as e:
         log.error(f"❌ Ошибка получения расписания из Google Sheets: {e}")
         raise
@@ -533,9 +420,9 @@ def create_booking(booking_data: Dict) -> Dict:
             worksheet.append_row(row_data)
             log.info(f"✅ Запись {booking_id} успешно создана в Google Sheets (лист 'Запись')")
             
-            # Инвалидируем кэш услуг при необходимости
-            global _services_cache
-            _services_cache = None
+            # Новая запись сразу видна в проверках слотов (без перечитывания листа)
+            from services.helpers.sheets_repository import get_sheets_repository
+            get_sheets_repository().record_booking(row_data, duration=booking_data.get("duration"))
             
         except Exception as e:
             log.warning(f"⚠️ Ошибка записи в Google Sheets: {e}, запись не сохранена")
@@ -573,62 +460,81 @@ def create_booking(booking_data: Dict) -> Dict:
     return booking_record
 
 
-def check_slot_available(master_name: str, date: str, time: str) -> bool:
-    """Проверить доступность слота времени в Google Sheets листе 'Запись' (ТОЛЬКО из Google Sheets)"""
+def check_slot_available(master_name: str, date: str, time: str, duration: Optional[int] = None) -> bool:
+    """
+    Проверить доступность слота времени (индекс занятости по листу 'Запись')
+
+    Args:
+        duration: Длительность услуги в минутах (по умолчанию 60)
+    """
     client = get_sheets_client()
     
     if not client:
         log.warning("⚠️ Google Sheets недоступны для проверки доступности, считаем слот доступным")
         return True  # По умолчанию считаем слот доступным
     
-    if client:
-        try:
-            spreadsheet = client.open_by_key(GOOGLE_SHEETS_SPREADSHEET_ID)
-            try:
-                worksheet = spreadsheet.worksheet("Запись")
-            except gspread.exceptions.WorksheetNotFound:
-                # Листа еще нет - значит свободно
-                return True
-            
-            # Получаем все записи (пропускаем заголовок)
-            all_values = worksheet.get_all_values()
-            if len(all_values) <= 1:
-                return True
-            
-            # Проверяем конфликты по мастеру, дате и времени
-            for row in all_values[1:]:  # Пропускаем заголовок
-                if len(row) < 5:
-                    continue
-                row_master = row[4].strip() if len(row) > 4 else ""  # Колонка E - Мастер
-                row_date = row[2].strip() if len(row) > 2 else ""  # Колонка C - Дата
-                row_time = row[3].strip() if len(row) > 3 else ""  # Колонка D - Время
-                row_status = row[9].strip() if len(row) > 9 else "confirmed"  # Колонка J - Статус
-                
-                # Пропускаем отмененные записи
-                if "отмен" in row_status.lower() or "cancel" in row_status.lower():
-                    continue
-                
-                if (row_master.lower() == master_name.lower() and
-                    row_date == date and
-                    row_time == time):
-                    log.info(f"⚠️ Слот занят: {master_name} {date} {time}")
-                    return False
-            
-            return True
-            
-        except Exception as e:
-            log.warning(f"⚠️ Ошибка проверки слота в Google Sheets: {e}, считаем слот доступным")
-            return True  # По умолчанию считаем слот доступным
+    try:
+        from services.helpers.sheets_repository import get_sheets_repository
+        from services.helpers.slot_availability import DEFAULT_DURATION
+        if not get_sheets_repository().is_slot_available_sync(master_name, date, time, int(duration or DEFAULT_DURATION)):
+            log.info(f"⚠️ Слот занят: {master_name} {date} {time}")
+            return False
+        return True
+    except Exception as e:
+        log.warning(f"⚠️ Ошибка проверки слота в Google Sheets: {e}, считаем слот доступным")
+        return True  # По умолчанию считаем слот доступным
 
 
 def refresh_services_cache():
     """Принудительно обновить кэш услуг (вызывать при необходимости)"""
-    global _services_cache, _services_cache_time
-    _services_cache = None
-    _services_cache_time = None
+    from services.helpers.sheets_repository import get_sheets_repository
+    get_sheets_repository().invalidate()
     log.info("🔄 Кэш услуг очищен")
 
 
+def parse_booking_rows(all_values: List[List[str]]) -> List[Dict]:
+    """
+    Разбор значений листа 'Запись'
+    
+    Структура: ["Дата создания", "ID записи", "Дата", "Время", "Мастер", "Услуга",
+               "Имя клиента", "Телефон", "Цена", "Статус", "Комментарий"]
+    """
+    bookings = []
+    for row_idx, row in enumerate(all_values[1:], start=2):  # Пропускаем заголовок
+        if len(row) < 5:
+            continue
+        
+        # Извлекаем user_id из комментария (формат: "Запись через Telegram бот (user_id: 123456)")
+        comment = row[10].strip() if len(row) > 10 else ""
+        row_user_id = None
+        if "user_id:" in comment.lower():
+            try:
+                user_id_part = comment.split("user_id:")[1].split(")")[0].strip()
+                row_user_id = int(user_id_part)
+            except (ValueError, IndexError):
+                pass
+        
+        status = row[9].strip() if len(row) > 9 else "confirmed"
+        price = str(row[8]).strip() if len(row) > 8 else ""
+        bookings.append({
+            "id": row[1].strip(),
+            "date": row[2].strip(),
+            "time": row[3].strip(),
+            "datetime": f"{row[2].strip()} {row[3].strip()}",
+            "master": row[4].strip(),
+            "service": row[5].strip() if len(row) > 5 else "",
+            "client_name": row[6].strip() if len(row) > 6 else "",
+            "client_phone": row[7].strip() if len(row) > 7 else "",
+            "price": int(price) if price.isdigit() else 0,
+            "status": status,
+            "cancelled": "отмен" in status.lower() or "cancel" in status.lower(),
+            "created_at": row[0].strip(),
+            "user_id": row_user_id,
+            "row_number": row_idx  # Номер строки в Google Sheets для удаления
+        })
+    return bookings
+
+
 def get_user_bookings(user_id: int) -> List[Dict]:
     """Получить все записи пользователя из Google Sheets"""
     client = get_sheets_client()
@@ -638,65 +544,10 @@ def get_user_bookings(user_id: int) -> List[Dict]:
         return []
     
     try:
-        spreadsheet = client.open_by_key(GOOGLE_SHEETS_SPREADSHEET_ID)
-        try:
-            worksheet = spreadsheet.worksheet("Запись")
-        except gspread.exceptions.WorksheetNotFound:
-            log.info("📝 Лист 'Запись' не найден, записей нет")
-            return []
-        
-        # Получаем все записи (пропускаем заголовок)
-        all_values = worksheet.get_all_values()
-        if len(all_values) <= 1:
-            return []
-        
-        user_bookings = []
-        # Структура: ["Дата создания", "ID записи", "Дата", "Время", "Мастер", "Услуга", 
-        #            "Имя клиента", "Телефон", "Цена", "Статус", "Комментарий"]
-        for row_idx, row in enumerate(all_values[1:], start=2):  # Пропускаем заголовок
-            if len(row) < 11:
-                continue
-            
-            # Извлекаем user_id из комментария (формат: "Запись через Telegram бот (user_id: 123456)")
-            comment = row[10].strip() if len(row) > 10 else ""
-            row_user_id = None
-            if "user_id:" in comment.lower():
-                try:
-                    user_id_part = comment.split("user_id:")[1].split(")")[0].strip()
-                    row_user_id = int(user_id_part)
-                except (ValueError, IndexError):
-                    pass
-            
-            # Проверяем, что запись принадлежит пользователю
-            if row_user_id == user_id:
-                booking_id = row[1].strip() if len(row) > 1 else ""
-                status = row[9].strip() if len(row) > 9 else "confirmed"
-                
-                # Пропускаем отмененные записи
-                if "отмен" in status.lower() or "cancel" in status.lower():
-                    continue
-                
-                booking = {
-                    "id": booking_id,
-                    "date": row[2].strip() if len(row) > 2 else "",
-                    "time": row[3].strip() if len(row) > 3 else "",
-                    "datetime": f"{row[2].strip()} {row[3].strip()}" if len(row) > 3 else row[2].strip(),
-                    "master": row[4].strip() if len(row) > 4 else "",
-                    "service": row[5].strip() if len(row) > 5 else "",
-                    "client_name": row[6].strip() if len(row) > 6 else "",
-                    "client_phone": row[7].strip() if len(row) > 7 else "",
-                    "price": int(row[8]) if len(row) > 8 and row[8].strip().isdigit() else 0,
-                    "status": status,
-                    "created_at": row[0].strip() if len(row) > 0 else "",
-                    "row_number": row_idx  # Номер строки в Google Sheets для удаления
-                }
-                user_bookings.append(booking)
-        
-        # Сортируем по дате (новые сначала)
-        user_bookings.sort(key=lambda x: x.get("created_at", ""), reverse=True)
+        from services.helpers.sheets_repository import get_sheets_repository
+        user_bookings = get_sheets_repository().get_snapshot_sync().user_bookings(user_id)
         log.info(f"✅ Найдено {len(user_bookings)} записей для user_id={user_id}")
         return user_bookings
-        
     except Exception as e:
         log.error(f"❌ Ошибка получения записей пользователя из Google Sheets: {e}")
         import traceback
@@ -751,6 +602,9 @@ def delete_user_booking(user_id: int, booking_id: str) -> bool:
             # Удаляем строку (используем delete_rows, индексация с 1)
             worksheet.delete_rows(row_idx)
             log.info(f"✅ Запись {booking_id} успешно удалена из Google Sheets (строка {row_idx})")
+            # Слот освобождается сразу, лист перечитывается при следующем обращении
+            from services.helpers.sheets_repository import get_sheets_repository
+            get_sheets_repository().cancel_booking(booking_id)
             return True
         
         log.warning(f"⚠️ Запись {booking_id} не найдена")
@@ -0,0 +1,246 @@
+"""
+Graph Runtime
+Выполнение графов LangGraph с замером времени узлов.
+
+- compile_graph: граф компилируется один раз на процесс (по имени)
+- add_timed_node: синхронный узел (search_service, QdrantLoader.search, LLM
+  через asyncio.run) выполняется в общем ограниченном пуле потоков и не
+  блокирует event loop; асинхронный узел выполняется как есть
+- время каждого узла попадает в гистограмму (graph, node), доступную через
+  get_graph_metrics / render_prometheus и /api/metrics/graphs в backend
+- при установленном opentelemetry узлы оборачиваются в спаны; экспорт в
+  файл (GRAPH_OTEL_FILE) или коллектор (OTEL_EXPORTER_OTLP_ENDPOINT)
+  настраивается, если доступен opentelemetry-sdk
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import partial, wraps
+from typing import Any, Callable, Dict, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+GRAPH_EXECUTOR_WORKERS = int(os.getenv("GRAPH_EXECUTOR_WORKERS", "8"))
+GRAPH_OTEL_FILE = os.getenv("GRAPH_OTEL_FILE")
+OTEL_EXPORTER_OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")
+
+# Границы корзин гистограммы (мс)
+LATENCY_BUCKETS_MS: Tuple[float, ...] = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+try:
+    from opentelemetry import trace
+    OTEL_AVAILABLE = True
+except ImportError:
+    OTEL_AVAILABLE = False
+
+
+class LatencyHistogram:
+    """Гистограмма времени выполнения узла"""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Последняя корзина - +Inf
+        self.count = 0
+        self.errors = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, duration_ms: float, error: bool = False) -> None:
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if duration_ms <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.errors += int(error)
+        self.sum_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+
+    def to_dict(self) -> Dict[str, Any]:
+        labels = [str(bound) for bound in self.buckets] + ["+Inf"]
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": round(self.sum_ms / self.count, 2) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 2),
+            "sum_ms": round(self.sum_ms, 2),
+            "buckets": dict(zip(labels, self.counts))
+        }
+
+
+class GraphMetrics:
+    """Гистограммы времени узлов по (graph, node)"""
+
+    def __init__(self):
+        self._histograms: Dict[Tuple[str, str], LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, graph: str, node: str, duration_ms: float, error: bool = False) -> None:
+        with self._lock:
+            histogram = self._histograms.get((graph, node))
+            if histogram is None:
+                histogram = self._histograms[(graph, node)] = LatencyHistogram()
+            histogram.observe(duration_ms, error)
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """{graph: {node: гистограмма}}"""
+        with self._lock:
+            result: Dict[str, Dict[str, Dict[str, Any]]] = {}
+            for (graph, node), histogram in sorted(self._histograms.items()):
+                result.setdefault(graph, {})[node] = histogram.to_dict()
+            return result
+
+    def render_prometheus(self) -> str:
+        """Гистограммы в текстовом формате Prometheus"""
+        name = "langgraph_node_duration_ms"
+        lines = [f"# HELP {name} LangGraph node wall time in milliseconds", f"# TYPE {name} histogram"]
+        with self._lock:
+            for (graph, node), histogram in sorted(self._histograms.items()):
+                labels = f'graph="{graph}",node="{node}"'
+                cumulative = 0
+                for bound, count in zip(list(histogram.buckets) + ["+Inf"], histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f"{name}_sum{{{labels}}} {histogram.sum_ms:.3f}")
+                lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+
+_metrics = GraphMetrics()
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_compiled: Dict[str, Any] = {}
+_compile_lock = threading.Lock()
+_tracer = None
+
+
+def get_graph_metrics() -> GraphMetrics:
+    return _metrics
+
+
+def get_graph_executor() -> ThreadPoolExecutor:
+    """Общий ограниченный пул потоков для синхронных узлов (Singleton)"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=GRAPH_EXECUTOR_WORKERS, thread_name_prefix="graph-node")
+    return _executor
+
+
+def _setup_otel_exporter() -> None:
+    """Экспорт спанов в файл или коллектор (нужен opentelemetry-sdk)"""
+    if not (GRAPH_OTEL_FILE or OTEL_EXPORTER_OTLP_ENDPOINT):
+        return
+    try:
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    except ImportError:
+        log.warning("⚠️ opentelemetry-sdk не установлен, спаны графов не экспортируются")
+        return
+
+    provider = TracerProvider()
+    if GRAPH_OTEL_FILE:
+        span_file = open(GRAPH_OTEL_FILE, "a", encoding="utf-8")
+        exporter = ConsoleSpanExporter(
+            out=span_file,
+            formatter=lambda span: json.dumps(json.loads(span.to_json()), ensure_ascii=False) + "\n"
+        )
+        provider.add_span_processor(BatchSpanProcessor(exporter))
+        log.info(f"✅ Спаны графов пишутся в {GRAPH_OTEL_FILE}")
+    if OTEL_EXPORTER_OTLP_ENDPOINT:
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+            provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+            log.info(f"✅ Спаны графов отправляются в {OTEL_EXPORTER_OTLP_ENDPOINT}")
+        except ImportError:
+            log.warning("⚠️ opentelemetry-exporter-otlp не установлен")
+    trace.set_tracer_provider(provider)
+
+
+def _get_tracer():
+    global _tracer
+    if _tracer is None and OTEL_AVAILABLE:
+        _setup_otel_exporter()
+        _tracer = trace.get_tracer("hr_bot.langgraph")
+    return _tracer
+
+
+def timed_node(graph_name: str, node_name: str, func: Callable) -> Callable:
+    """
+    Обертка узла графа с замером времени
+
+    Синхронная функция выполняется в get_graph_executor(), асинхронная - в
+    текущем event loop. Время (в т.ч. при ошибке) пишется в гистограмму.
+    """
+    is_async = asyncio.iscoroutinefunction(func)
+
+    @wraps(func)
+    async def wrapper(state):
+        tracer = _get_tracer()
+        span = tracer.start_as_current_span(f"{graph_name}.{node_name}") if tracer else nullcontext()
+        started = time.perf_counter()
+        error = False
+        with span:
+            try:
+                if is_async:
+                    return await func(state)
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(get_graph_executor(), partial(func, state))
+            except BaseException:
+                error = True
+                raise
+            finally:
+                _metrics.observe(graph_name, node_name, (time.perf_counter() - started) * 1000, error)
+
+    return wrapper
+
+
+def add_timed_node(workflow, graph_name: str, node_name: str, func: Callable) -> None:
+    """workflow.add_node с замером времени узла"""
+    workflow.add_node(node_name, timed_node(graph_name, node_name, func))
+
+
+def compile_graph(graph_name: str, build: Callable[[], Any]) -> Any:
+    """
+    Скомпилированный граф (один раз на процесс)
+
+    Args:
+        graph_name: Имя графа (ключ кэша и метка в метриках)
+        build: Функция, собирающая и компилирующая граф
+    """
+    app = _compiled.get(graph_name)
+    if app is None:
+        with _compile_lock:
+            app = _compiled.get(graph_name)
+            if app is None:
+                started = time.perf_counter()
+                app = build()
+                _compiled[graph_name] = app
+                log.info(f"✅ Граф {graph_name} скомпилирован за {(time.perf_counter() - started) * 1000:.0f} мс")
+    return app
+
+
+def get_graph_metrics_snapshot() -> Dict[str, Any]:
+    """Метрики для /api/metrics/graphs"""
+    return {
+        "graphs": _metrics.snapshot(),
+        "compiled": sorted(_compiled),
+        "executor_workers": GRAPH_EXECUTOR_WORKERS,
+        "buckets_ms": list(LATENCY_BUCKETS_MS),
+        "otel": OTEL_AVAILABLE
+    }
+
+
+def render_prometheus() -> str:
+    return _metrics.render_prometheus()
@@ -0,0 +1,171 @@
+"""
+Intent Rules
+Предклассификатор намерений по правилам из config/rag.yaml (rag.intent_rules).
+
+Ключевые слова всех правил собираются в один автомат (Aho–Corasick через
+pyahocorasick, если пакет установлен, иначе - проверка подстрок по словарю
+без повторов). Один проход по тексту возвращает все сработавшие намерения
+с уверенностью, а бот (RAGIntentClassifier), RAG цепочки, backend workflow
+и email pipeline выбирают из них свое решение без запроса к LLM.
+"""
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from config import load_config, reload_config
+
+log = logging.getLogger(__name__)
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+
+@dataclass(frozen=True)
+class IntentRule:
+    """Правило намерения из конфигурации"""
+    intent: str
+    keywords: Tuple[str, ...]
+    confidence: float = 0.8
+    max_words: Optional[int] = None
+    use_rag: Optional[bool] = None
+    reason: str = ""
+
+
+@dataclass
+class IntentMatch:
+    """Сработавшее правило"""
+    intent: str
+    confidence: float
+    keywords: List[str] = field(default_factory=list)
+    rule: Optional[IntentRule] = None
+
+    def as_rag_decision(self) -> Dict[str, Any]:
+        """Решение о RAG поиске в формате RAGIntentClassifier.should_use_rag"""
+        return {
+            "use_rag": bool(self.rule.use_rag) if self.rule else False,
+            "confidence": self.confidence,
+            "reason": self.rule.reason if self.rule and self.rule.reason else f"Правило {self.intent}",
+            "intent": self.intent
+        }
+
+
+class IntentRuleEngine:
+    """Все правила намерений в одном автомате"""
+
+    def __init__(self, rules: Iterable[IntentRule]):
+        self.rules: List[IntentRule] = list(rules)
+        # Ключевое слово -> индексы правил (слово может входить в несколько правил)
+        self._keyword_rules: Dict[str, List[int]] = {}
+        for index, rule in enumerate(self.rules):
+            for keyword in rule.keywords:
+                self._keyword_rules.setdefault(keyword.lower(), []).append(index)
+        self._keywords = tuple(self._keyword_rules)
+
+        self._automaton = None
+        if AHOCORASICK_AVAILABLE and self._keywords:
+            self._automaton = ahocorasick.Automaton()
+            for keyword in self._keywords:
+                self._automaton.add_word(keyword, keyword)
+            self._automaton.make_automaton()
+
+    @classmethod
+    def from_config(cls, rules_config: List[Dict]) -> "IntentRuleEngine":
+        rules = []
+        for item in rules_config or []:
+            try:
+                rules.append(IntentRule(
+                    intent=str(item["intent"]),
+                    keywords=tuple(str(k) for k in item.get("keywords") or []),
+                    confidence=float(item.get("confidence", 0.8)),
+                    max_words=int(item["max_words"]) if item.get("max_words") is not None else None,
+                    use_rag=item.get("use_rag"),
+                    reason=item.get("reason") or ""
+                ))
+            except (KeyError, TypeError, ValueError) as e:
+                log.warning(f"⚠️ [Intent Rules] Некорректное правило {item}: {e}")
+        return cls(rules)
+
+    def _find_keywords(self, text_lower: str) -> Set[str]:
+        if self._automaton is not None:
+            return {keyword for _, keyword in self._automaton.iter(text_lower)}
+        return {keyword for keyword in self._keywords if keyword in text_lower}
+
+    def classify(self, text: str) -> List[IntentMatch]:
+        """
+        Все сработавшие намерения за один проход
+
+        Args:
+            text: Текст сообщения
+
+        Returns:
+            Список IntentMatch в порядке правил в конфигурации
+        """
+        text_lower = (text or "").lower().strip()
+        if not text_lower:
+            return []
+
+        word_count = len(text_lower.split())
+        found: Dict[int, List[str]] = {}
+        for keyword in self._find_keywords(text_lower):
+            for index in self._keyword_rules[keyword]:
+                found.setdefault(index, []).append(keyword)
+
+        matches = []
+        for index in sorted(found):
+            rule = self.rules[index]
+            if rule.max_words is not None and word_count > rule.max_words:
+                continue
+            matches.append(IntentMatch(
+                intent=rule.intent,
+                confidence=rule.confidence,
+                keywords=sorted(found[index]),
+                rule=rule
+            ))
+        return matches
+
+    def first(self, text: str, intents: Iterable[str]) -> Optional[IntentMatch]:
+        """
+        Первое сработавшее намерение в порядке приоритета потребителя
+
+        Args:
+            text: Текст сообщения
+            intents: Намерения потребителя в порядке приоритета
+
+        Returns:
+            IntentMatch или None, если ни одно правило не сработало
+        """
+        matches = {match.intent: match for match in self.classify(text)}
+        for intent in intents:
+            if intent in matches:
+                return matches[intent]
+        return None
+
+    def matches(self, text: str, intent: str) -> bool:
+        return self.first(text, (intent,)) is not None
+
+
+_engine: Optional[IntentRuleEngine] = None
+
+
+def get_intent_rules() -> IntentRuleEngine:
+    """Получить движок правил из config/rag.yaml (Singleton)"""
+    global _engine
+    if _engine is None:
+        rules_config = load_config("rag").get("rag", {}).get("intent_rules") or []
+        _engine = IntentRuleEngine.from_config(rules_config)
+        if not _engine.rules:
+            log.warning("⚠️ [Intent Rules] Правила намерений не найдены в config/rag.yaml")
+        else:
+            log.info(f"✅ [Intent Rules] Загружено правил: {len(_engine.rules)}")
+    return _engine
+
+
+def reload_intent_rules() -> IntentRuleEngine:
+    """Перечитать правила (после изменения конфигурации)"""
+    global _engine
+    reload_config("rag")
+    _engine = None
+    return get_intent_rules()
@@ -4,10 +4,12 @@
 """
 
 import os
+import json
 import httpx
 import time
 import asyncio
-from typing import Optional, Dict, Any, List
+from contextlib import aclosing
+from typing import Optional, Dict, Any, List, AsyncIterator, Tuple
 from dataclasses import dataclass
 import logging
 
@@ -25,6 +27,13 @@ class LLMResponse:
     error: Optional[str] = None
 
 
+@dataclass
+class LLMStreamChunk:
+    """Фрагмент потокового ответа: delta - новый текст, response - итог (только в последнем фрагменте)"""
+    delta: str = ""
+    response: Optional[LLMResponse] = None
+
+
 class LLMClient:
     """Универсальный клиент для работы с LLM API"""
     
@@ -121,16 +130,15 @@ class LLMClient:
         
         return client
     
-    async def _call_api(
+    def _prepare_request(
         self,
         provider: str,
         model: str,
         messages: List[Dict[str, str]],
-        temperature: float = 0.7,
-        max_tokens: int = 2048
-    ) -> LLMResponse:
-        """Выполняет запрос к LLM API"""
-        
+        temperature: float,
+        max_tokens: int
+    ) -> Tuple[str, Dict[str, str], Dict[str, Any]]:
+        """Возвращает URL, заголовки и тело запроса к LLM API"""
         if provider == "openrouter":
             api_key = self.openrouter_api_key
             api_url = self.openrouter_api_url
@@ -176,6 +184,19 @@ class LLMClient:
             "temperature": float(temperature),
             "max_tokens": int(max_tokens)
         }
+        return api_url, headers, payload
+    
+    async def _call_api(
+        self,
+        provider: str,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: int = 2048
+    ) -> LLMResponse:
+        """Выполняет запрос к LLM API"""
+        api_url, headers, payload = self._prepare_request(provider, model, messages, temperature, max_tokens)
+        cleaned_messages = payload["messages"]
         
         try:
             logger.info(f"🔵 [LLM API] Вызов {provider} API с моделью {model}")
@@ -290,6 +311,21 @@ class LLMClient:
                 error=str(e)
             )
     
+    @staticmethod
+    def _build_messages(prompt: str, system_prompt: Optional[str] = None) -> List[Dict[str, str]]:
+        """Сообщения чата из промптов (переносы строк внутри content сохраняются)"""
+        cleaned_prompt = prompt.strip() if prompt else ""
+        cleaned_system_prompt = system_prompt.strip() if system_prompt else None
+        
+        if not cleaned_prompt:
+            raise ValueError("Prompt cannot be empty")
+        
+        messages = []
+        if cleaned_system_prompt:
+            messages.append({"role": "system", "content": cleaned_system_prompt})
+        messages.append({"role": "user", "content": cleaned_prompt})
+        return messages
+    
     async def generate(
         self,
         prompt: str,
@@ -313,17 +349,9 @@ class LLMClient:
         Returns:
             LLMResponse с ответом или ошибкой
         """
-        # Очищаем промпты от возможных проблем (но сохраняем переносы строк в content)
-        cleaned_prompt = prompt.strip() if prompt else ""
-        cleaned_system_prompt = system_prompt.strip() if system_prompt else None
-        
-        if not cleaned_prompt:
-            raise ValueError("Prompt cannot be empty")
-        
-        messages = []
-        if cleaned_system_prompt:
-            messages.append({"role": "system", "content": cleaned_system_prompt})
-        messages.append({"role": "user", "content": cleaned_prompt})
+        messages = self._build_messages(prompt, system_prompt)
+        cleaned_prompt = messages[-1]["content"]
+        cleaned_system_prompt = messages[0]["content"] if len(messages) > 1 else None
         
         # Определяем модель для основного провайдера
         primary_model = model or self.primary_model
@@ -394,6 +422,119 @@ class LLMClient:
         logger.error(f"❌ [LLM GENERATE] Все провайдеры и fallback модели не сработали. Возвращаю последний ответ (ошибка: {response.error})")
         return response
     
+    async def _stream_api(
+        self,
+        provider: str,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: int = 2048
+    ) -> AsyncIterator[LLMStreamChunk]:
+        """
+        Потоковый запрос к LLM API (stream=True, ответ в формате SSE)
+        
+        Последний фрагмент содержит итоговый LLMResponse. Если потребитель
+        перестает читать (закрывает генератор), HTTP соединение закрывается
+        и генерация у провайдера прекращается.
+        """
+        api_url, headers, payload = self._prepare_request(provider, model, messages, temperature, max_tokens)
+        payload["stream"] = True
+        
+        logger.info(f"🔵 [LLM STREAM] Вызов {provider} API с моделью {model}")
+        start_time = time.time()
+        parts: List[str] = []
+        tokens_used = None
+        error = None
+        
+        try:
+            client = await self._ensure_client()
+            async with client.stream("POST", api_url, headers=headers, json=payload) as response:
+                if response.status_code >= 400:
+                    body = (await response.aread()).decode("utf-8", errors="replace")[:200]
+                    error = f"HTTP {response.status_code}: {body}"
+                else:
+                    async for line in response.aiter_lines():
+                        # Строки-комментарии (": OPENROUTER PROCESSING") и пустые пропускаем
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[5:].strip()
+                        if data == "[DONE]":
+                            break
+                        try:
+                            chunk = json.loads(data)
+                        except ValueError:
+                            continue
+                        if chunk.get("error"):
+                            error = str(chunk["error"].get("message", chunk["error"]) if isinstance(chunk["error"], dict) else chunk["error"])
+                            break
+                        usage = chunk.get("usage")
+                        if usage:
+                            tokens_used = usage.get("total_tokens", tokens_used)
+                        for choice in chunk.get("choices") or []:
+                            delta = (choice.get("delta") or {}).get("content")
+                            if delta:
+                                parts.append(delta)
+                                yield LLMStreamChunk(delta=delta)
+        except httpx.TimeoutException:
+            error = "Timeout"
+        except httpx.HTTPError as e:
+            error = str(e)
+        
+        content = "".join(parts)
+        if error:
+            logger.error(f"❌ [LLM STREAM] Ошибка {provider}/{model}: {error}")
+        else:
+            logger.info(f"✅ [LLM STREAM] Ответ от {provider}/{model} за {time.time() - start_time:.2f}s, символов: {len(content)}")
+        yield LLMStreamChunk(response=LLMResponse(
+            content=content,
+            provider=provider,
+            model=model,
+            confidence=0.0 if error else (1.0 if len(content) > 50 else 0.5),
+            tokens_used=tokens_used,
+            error=error
+        ))
+    
+    async def generate_stream(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        model: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 2048,
+        use_fallback: bool = True
+    ) -> AsyncIterator[LLMStreamChunk]:
+        """
+        Потоковая генерация ответа: фрагменты текста по мере получения,
+        в последнем фрагменте - итоговый LLMResponse.
+        
+        Fallback модели пробуются, только если ошибка случилась до первого
+        фрагмента текста; проверка уверенности (confidence_threshold) не
+        применяется - отправленный клиенту текст уже не отозвать.
+        """
+        messages = self._build_messages(prompt, system_prompt)
+        candidates = [(self.primary_provider, model or self.primary_model)]
+        if use_fallback:
+            candidates += [
+                (fb.get("provider", "openrouter"), fb.get("model"))
+                for fb in self.fallback_chain or [] if fb.get("model")
+            ]
+        
+        response = None
+        for idx, (provider, candidate_model) in enumerate(candidates):
+            emitted = False
+            async with aclosing(self._stream_api(provider, candidate_model, messages, temperature, max_tokens)) as chunks:
+                async for chunk in chunks:
+                    if chunk.response is None:
+                        emitted = True
+                        yield chunk
+                    else:
+                        response = chunk.response
+            if response.error is None or emitted:
+                break
+            if idx + 1 < len(candidates):
+                logger.warning(f"⚠️ [LLM STREAM] {provider}/{candidate_model} не ответила ({response.error}), пробую fallback")
+        yield LLMStreamChunk(response=response)
+    
     def _get_default_model(self, provider: str) -> str:
         """Возвращает дефолтную модель для провайдера (deprecated, используется primary_model)"""
         defaults = {
@@ -285,6 +285,9 @@ async def gigachat_chat(
 
 # ===================== UNIFIED INTERFACE WITH FALLBACK =====================
 
+# Ответ generate_with_fallback, когда оба провайдера недоступны
+LLM_UNAVAILABLE_MESSAGE = "Извините, сервис временно недоступен. Пожалуйста, попробуйте позже."
+
 async def generate_with_fallback(
     messages: List[Dict[str, str]], 
     use_system_message: bool = False, 
@@ -339,5 +342,5 @@ async def generate_with_fallback(
     
     # Если оба провайдера недоступны
     log.error("❌ Оба LLM провайдера недоступны (DeepSeek и GigaChat)")
-    return "Извините, сервис временно недоступен. Пожалуйста, попробуйте позже."
+    return LLM_UNAVAILABLE_MESSAGE
 
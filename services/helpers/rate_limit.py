@@ -0,0 +1,48 @@
+"""
+Rate Limit
+Token bucket для ограничения частоты исходящих запросов (WEEEK API,
+сообщения Telegram).
+"""
+import time
+import asyncio
+import threading
+from typing import Callable
+
+
+class TokenBucket:
+    """Ограничение частоты запросов (общее для всех event loop процесса)"""
+
+    def __init__(self, rate: float, capacity: float = 1, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self._tokens = float(capacity)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill_locked(self) -> None:
+        now = self.clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> float:
+        """Взять токен: 0, если получилось, иначе сколько секунд ждать"""
+        with self._lock:
+            self._refill_locked()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def wait_time(self) -> float:
+        """Сколько секунд ждать токен (без списания)"""
+        with self._lock:
+            self._refill_locked()
+            return 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+
+    async def acquire(self) -> None:
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
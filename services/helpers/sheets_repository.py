@@ -0,0 +1,314 @@
+"""
+Sheets Repository
+Кэшированный слой данных Google Sheets для услуг, мастеров и записей.
+
+- оба листа ("Ценник" и "Запись") читаются одним запросом values.batchGet
+- одновременные обновления объединяются (single-flight): в API уходит один запрос
+- stale-while-revalidate: в течение GOOGLE_SHEETS_STALE_TTL после истечения TTL
+  возвращается прежний снимок, а обновление идет в фоне
+- снимок содержит индексы услуг по мастеру и записей по пользователю;
+  занятость мастеров - AvailabilityIndex (интервалы по (мастер, дата),
+  проверка слота O(log n)), который сверяется с листом при каждом обновлении
+
+Синхронные функции google_sheets_helper читают снимок через get_snapshot_sync(),
+асинхронный код использует методы репозитория (get_services, check_slot_available, ...).
+"""
+import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from services.helpers import google_sheets_helper as sheets
+from services.helpers.slot_availability import AvailabilityIndex, DEFAULT_DURATION
+
+log = logging.getLogger()
+
+STALE_TTL = int(os.getenv("GOOGLE_SHEETS_STALE_TTL", "600"))  # Сколько отдавать устаревший снимок
+# Как часто сверять индекс слотов с листом 'Запись' (записи из других процессов)
+SLOT_RECONCILE_INTERVAL = int(os.getenv("GOOGLE_SHEETS_SLOT_RECONCILE_INTERVAL", "60"))
+FETCH_TIMEOUT = float(os.getenv("GOOGLE_SHEETS_FETCH_TIMEOUT", "30"))
+
+
+def _normalize(value: str) -> str:
+    return (value or "").strip().lower()
+
+
+@dataclass
+class SheetsSnapshot:
+    """Снимок листов с индексами"""
+    services: List[Dict]
+    bookings: List[Dict]
+    fetched_at: float = field(default_factory=time.time)
+    masters: List[Dict] = field(init=False)
+    _services_by_master: Dict[str, List[Dict]] = field(init=False, repr=False)
+    _bookings_by_user: Dict[int, List[Dict]] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.masters = sheets.build_masters(self.services)
+        self._services_by_master = {}
+        for service in self.services:
+            for name in {_normalize(service.get("master1", "")), _normalize(service.get("master2", ""))} - {""}:
+                self._services_by_master.setdefault(name, []).append(service)
+        self._bookings_by_user = {}
+        for booking in self.bookings:
+            self._index_booking(booking)
+
+    def _index_booking(self, booking: Dict) -> None:
+        if not booking.get("cancelled") and booking.get("user_id") is not None:
+            self._bookings_by_user.setdefault(booking["user_id"], []).append(booking)
+
+    @classmethod
+    def from_values(cls, price_values: List[List[str]], booking_values: List[List[str]]) -> "SheetsSnapshot":
+        services = sheets.parse_services_rows(price_values)
+        if not services:
+            log.warning("⚠️ Не найдено услуг в Google Sheets, используем placeholder данные")
+            services = sheets.PLACEHOLDER_SERVICES.copy()
+        return cls(services=services, bookings=sheets.parse_booking_rows(booking_values))
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+    def services_for_master(self, master_name: Optional[str] = None) -> List[Dict]:
+        if not master_name:
+            return list(self.services)
+        name = _normalize(master_name)
+        if name in self._services_by_master:
+            return list(self._services_by_master[name])
+        # Часть имени ("Анастасия") - как раньше, поиск подстроки
+        return [s for s in self.services if name in (s.get("master1", "") + " " + s.get("master2", "")).lower()]
+
+    def service_durations(self) -> Dict[str, int]:
+        return {_normalize(s.get("title", "")): int(s.get("duration") or DEFAULT_DURATION) for s in self.services}
+
+    def user_bookings(self, user_id: int) -> List[Dict]:
+        """Активные записи пользователя (новые сначала)"""
+        return sorted(self._bookings_by_user.get(user_id, []), key=lambda b: b.get("created_at", ""), reverse=True)
+
+    def add_booking(self, booking: Dict) -> None:
+        self.bookings.append(booking)
+        self._index_booking(booking)
+
+    def remove_booking(self, booking_id: str) -> None:
+        self.bookings = [b for b in self.bookings if b.get("id") != booking_id]
+        for user_id, bookings in self._bookings_by_user.items():
+            self._bookings_by_user[user_id] = [b for b in bookings if b.get("id") != booking_id]
+
+
+def fetch_sheets_values() -> Tuple[List[List[str]], List[List[str]]]:
+    """
+    Значения листов 'Ценник' и 'Запись' одним запросом values.batchGet
+
+    Returns:
+        (строки 'Ценник', строки 'Запись'); если листа 'Запись' еще нет - пустой список
+    """
+    client = sheets.get_sheets_client()
+    if not client:
+        raise RuntimeError("Google Sheets не настроены")
+
+    spreadsheet = client.open_by_key(sheets.GOOGLE_SHEETS_SPREADSHEET_ID)
+    ranges = [f"'{sheets.PRICE_SHEET}'", f"'{sheets.BOOKING_SHEET}'"]
+    try:
+        value_ranges = spreadsheet.values_batch_get(ranges).get("valueRanges", [])
+    except Exception as e:
+        # Лист 'Запись' создается при первой записи - без него batchGet возвращает ошибку диапазона
+        log.info(f"📋 Лист '{sheets.BOOKING_SHEET}' недоступен ({e}), читаем только '{sheets.PRICE_SHEET}'")
+        value_ranges = spreadsheet.values_batch_get(ranges[:1]).get("valueRanges", [])
+
+    price_values = value_ranges[0].get("values", []) if value_ranges else []
+    booking_values = value_ranges[1].get("values", []) if len(value_ranges) > 1 else []
+    log.info(f"📋 Прочитано строк: '{sheets.PRICE_SHEET}' - {len(price_values)}, '{sheets.BOOKING_SHEET}' - {len(booking_values)}")
+    return price_values, booking_values
+
+
+class SheetsRepository:
+    """Кэш листов Google Sheets с single-flight и stale-while-revalidate"""
+
+    def __init__(
+        self,
+        fetch: Callable[[], Tuple[List[List[str]], List[List[str]]]] = fetch_sheets_values,
+        ttl: float = sheets.CACHE_TIMEOUT,
+        stale_ttl: float = STALE_TTL,
+        on_services_changed: Optional[Callable[[List[Dict]], None]] = None
+    ):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.on_services_changed = on_services_changed
+        self._snapshot: Optional[SheetsSnapshot] = None
+        self.availability = AvailabilityIndex()
+        self._lock = threading.Lock()
+        self._inflight: Optional[Future] = None
+        # Один поток: обновления и так выполняются по одному
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sheets-refresh")
+        self.stats = {"hits": 0, "stale_hits": 0, "refreshes": 0, "errors": 0}
+
+    def _load(self) -> SheetsSnapshot:
+        try:
+            price_values, booking_values = self.fetch()
+            snapshot = SheetsSnapshot.from_values(price_values, booking_values)
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+        previous = self._snapshot
+        self.availability.sync(snapshot.bookings, snapshot.service_durations())
+        self._snapshot = snapshot
+        self.stats["refreshes"] += 1
+        log.info(f"✅ Google Sheets: услуг {len(snapshot.services)}, записей {len(snapshot.bookings)}")
+        if self.on_services_changed and (previous is None or previous.services != snapshot.services):
+            try:
+                self.on_services_changed(snapshot.services)
+            except Exception as e:
+                log.warning(f"⚠️ Ошибка обработчика обновления услуг: {e}")
+        return snapshot
+
+    def refresh(self) -> Future:
+        """Запустить обновление (или вернуть уже идущее)"""
+        with self._lock:
+            if self._inflight is None or self._inflight.done():
+                self._inflight = self._executor.submit(self._load)
+            return self._inflight
+
+    def _cached(self, max_age: Optional[float]) -> Tuple[Optional[SheetsSnapshot], bool]:
+        """(снимок для ответа без ожидания, нужно ли фоновое обновление)"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return None, False
+        fresh_for = self.ttl if max_age is None else min(self.ttl, max_age)
+        if snapshot.age < fresh_for:
+            self.stats["hits"] += 1
+            return snapshot, False
+        if max_age is None and snapshot.age < self.ttl + self.stale_ttl:
+            self.stats["stale_hits"] += 1
+            return snapshot, True
+        return None, False
+
+    def get_snapshot_sync(self, max_age: Optional[float] = None) -> SheetsSnapshot:
+        """
+        Снимок для синхронного кода
+
+        Args:
+            max_age: Требуемая свежесть (секунды); без нее допускается устаревший снимок
+        """
+        snapshot, revalidate = self._cached(max_age)
+        if snapshot is not None:
+            if revalidate:
+                self.refresh()
+            return snapshot
+        return self._wait_sync(self.refresh())
+
+    def _wait_sync(self, future: Future) -> SheetsSnapshot:
+        try:
+            return future.result(timeout=FETCH_TIMEOUT)
+        except Exception:
+            if self._snapshot is not None:
+                log.warning("⚠️ Google Sheets не ответили, используется прежний снимок")
+                return self._snapshot
+            raise
+
+    async def get_snapshot(self, max_age: Optional[float] = None) -> SheetsSnapshot:
+        """Снимок для асинхронного кода (event loop не блокируется)"""
+        snapshot, revalidate = self._cached(max_age)
+        if snapshot is not None:
+            if revalidate:
+                self.refresh()
+            return snapshot
+        future = self.refresh()
+        try:
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), FETCH_TIMEOUT)
+        except Exception:
+            if self._snapshot is not None:
+                log.warning("⚠️ Google Sheets не ответили, используется прежний снимок")
+                return self._snapshot
+            raise
+
+    def invalidate(self) -> None:
+        """Следующее обращение перечитает листы"""
+        snapshot = self._snapshot
+        if snapshot is not None:
+            snapshot.fetched_at = 0.0
+
+    def record_booking(self, row_data: List, duration: Optional[int] = None) -> None:
+        """Добавить только что созданную запись (строка листа 'Запись') в снимок и индекс слотов"""
+        header = [""] * len(row_data)
+        for booking in sheets.parse_booking_rows([header, [str(value) for value in row_data]]):
+            self.availability.book(booking, duration)
+            snapshot = self._snapshot
+            if snapshot is not None:
+                snapshot.add_booking(booking)
+
+    def cancel_booking(self, booking_id: str) -> None:
+        """Освободить слот удаленной записи (номера строк сдвинулись - снимок перечитывается)"""
+        self.availability.cancel(booking_id)
+        snapshot = self._snapshot
+        if snapshot is not None:
+            snapshot.remove_booking(booking_id)
+        self.invalidate()
+
+    def _reconcile_slots(self) -> None:
+        """Фоновая сверка индекса слотов, если снимок старше SLOT_RECONCILE_INTERVAL"""
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.age >= SLOT_RECONCILE_INTERVAL:
+            self.refresh()
+
+    def is_slot_available_sync(self, master_name: str, date: str, slot_time: str, duration: int = DEFAULT_DURATION) -> bool:
+        if self._snapshot is None:
+            self.get_snapshot_sync()
+        else:
+            self._reconcile_slots()
+        return self.availability.is_available(master_name, date, slot_time, duration)
+
+    def free_slots_sync(self, master_name: str, date: str, duration: int = DEFAULT_DURATION) -> List[str]:
+        snapshot = self.get_snapshot_sync()
+        self._reconcile_slots()
+        master = next((m for m in snapshot.masters if _normalize(m.get("name", "")) == _normalize(master_name)), None)
+        if not master:
+            raise ValueError(f"Мастер '{master_name}' не найден в Google Sheets")
+        schedule = master.get("schedule", {})
+        return self.availability.free_slots(
+            master_name, date, schedule.get("daily_start", "09:00"), schedule.get("daily_end", "20:00"), duration
+        )
+
+    # ===================== ASYNC API =====================
+
+    async def get_services(self, master_name: Optional[str] = None) -> List[Dict]:
+        return (await self.get_snapshot()).services_for_master(master_name)
+
+    async def get_masters(self) -> List[Dict]:
+        return list((await self.get_snapshot()).masters)
+
+    async def get_available_slots(self, master_name: str, date: str, duration: int = DEFAULT_DURATION) -> List[str]:
+        """Слоты из расписания мастера без занятых на дату"""
+        await self.get_snapshot()
+        return self.free_slots_sync(master_name, date, duration)
+
+    async def check_slot_available(self, master_name: str, date: str, slot_time: str, duration: int = DEFAULT_DURATION) -> bool:
+        await self.get_snapshot()
+        return self.is_slot_available_sync(master_name, date, slot_time, duration)
+
+    async def get_user_bookings(self, user_id: int) -> List[Dict]:
+        return (await self.get_snapshot()).user_bookings(user_id)
+
+
+def _schedule_reindex(services: List[Dict]) -> None:
+    # Обновляем индекс в Qdrant в фоне: только измененные строки, частые обновления объединяются
+    from services.rag.service_index_sync import schedule_services_reindex
+    schedule_services_reindex(services)
+
+
+_repository: Optional[SheetsRepository] = None
+_repository_lock = threading.Lock()
+
+
+def get_sheets_repository() -> SheetsRepository:
+    """Получить репозиторий Google Sheets (Singleton)"""
+    global _repository
+    if _repository is None:
+        with _repository_lock:
+            if _repository is None:
+                _repository = SheetsRepository(on_services_changed=_schedule_reindex)
+    return _repository
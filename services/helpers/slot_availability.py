@@ -0,0 +1,211 @@
+"""
+Slot Availability
+Индекс занятости мастеров для проверки слотов записи.
+
+Для каждого (мастер, дата) хранится отсортированный список интервалов
+[начало, конец) в минутах от полуночи. Проверка пересечения слота с
+записями - бинарный поиск (O(log n)), без чтения листа 'Запись'.
+
+Индекс обновляется оптимистично при создании и удалении записи и
+сверяется с листом при каждом обновлении снимка SheetsRepository
+(sync применяет только отличия: новые записи добавляются, пропавшие и
+отмененные - удаляются). Оптимистичные изменения не откатываются сверкой
+в течение OPTIMISTIC_GRACE: снимок, прочитанный до записи в лист, их еще не видит.
+"""
+import os
+import time
+import bisect
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+log = logging.getLogger()
+
+DEFAULT_DURATION = 60  # Минуты, если длительность услуги неизвестна
+SLOT_STEP = 60
+OPTIMISTIC_GRACE = int(os.getenv("SLOT_OPTIMISTIC_GRACE", "120"))  # Секунды
+
+
+def parse_time(value: str) -> Optional[int]:
+    """'10:30' -> 630 (минуты от полуночи) или None"""
+    try:
+        hours, minutes = str(value).strip().split(":")[:2]
+        return int(hours) * 60 + int(minutes)
+    except (ValueError, AttributeError):
+        return None
+
+
+def format_time(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+class IntervalSet:
+    """Интервалы записей [start, end), отсортированные по началу"""
+
+    def __init__(self):
+        self._starts: List[int] = []
+        self._intervals: List[Tuple[int, int, str]] = []
+        self._max_length = 0
+
+    def __len__(self) -> int:
+        return len(self._intervals)
+
+    def add(self, start: int, end: int, booking_id: str) -> None:
+        index = bisect.bisect_right(self._starts, start)
+        self._starts.insert(index, start)
+        self._intervals.insert(index, (start, end, booking_id))
+        self._max_length = max(self._max_length, end - start)
+
+    def remove(self, booking_id: str) -> bool:
+        for index, (_, _, interval_id) in enumerate(self._intervals):
+            if interval_id == booking_id:
+                del self._starts[index]
+                del self._intervals[index]
+                return True
+        return False
+
+    def overlaps(self, start: int, end: int) -> bool:
+        """Есть ли интервал, пересекающийся с [start, end)"""
+        # Пересечься могут только интервалы, начавшиеся не раньше start - max_length
+        index = bisect.bisect_left(self._starts, start - self._max_length)
+        while index < len(self._intervals) and self._intervals[index][0] < end:
+            if self._intervals[index][1] > start:
+                return True
+            index += 1
+        return False
+
+
+class AvailabilityIndex:
+    """Занятые интервалы по (мастер, дата)"""
+
+    def __init__(self, grace: float = OPTIMISTIC_GRACE):
+        self.grace = grace
+        self._slots: Dict[Tuple[str, str], IntervalSet] = {}
+        self._bookings: Dict[str, Tuple[Tuple[str, str], int, int]] = {}  # id -> (ключ, начало, конец)
+        # Оптимистичные изменения: id -> время (созданные и удаленные записи)
+        self._booked_at: Dict[str, float] = {}
+        self._cancelled_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(master_name: str, date: str) -> Tuple[str, str]:
+        return (master_name or "").strip().lower(), (date or "").strip()
+
+    @staticmethod
+    def _booking_id(booking: Dict) -> str:
+        return booking.get("id") or f"row:{booking.get('row_number')}"
+
+    @staticmethod
+    def _end(start: int, duration: Optional[int]) -> int:
+        return start + max(int(duration or DEFAULT_DURATION), 1)
+
+    def _add_locked(self, booking_id: str, master_name: str, date: str, start: int, duration: int) -> None:
+        key = self._key(master_name, date)
+        end = self._end(start, duration)
+        self._slots.setdefault(key, IntervalSet()).add(start, end, booking_id)
+        self._bookings[booking_id] = (key, start, end)
+
+    def _remove_locked(self, booking_id: str) -> bool:
+        entry = self._bookings.pop(booking_id, None)
+        if entry is None:
+            return False
+        key = entry[0]
+        intervals = self._slots.get(key)
+        if intervals is not None:
+            intervals.remove(booking_id)
+            if not len(intervals):
+                del self._slots[key]
+        return True
+
+    def book(self, booking: Dict, duration: Optional[int] = None) -> bool:
+        """Оптимистично занять слот (после записи в лист)"""
+        start = parse_time(booking.get("time", ""))
+        if start is None or booking.get("cancelled"):
+            return False
+        booking_id = self._booking_id(booking)
+        with self._lock:
+            self._booked_at[booking_id] = time.time()
+            self._cancelled_at.pop(booking_id, None)
+            self._remove_locked(booking_id)
+            self._add_locked(booking_id, booking.get("master", ""), booking.get("date", ""), start, duration or booking.get("duration"))
+        return True
+
+    def cancel(self, booking_id: str) -> bool:
+        with self._lock:
+            self._cancelled_at[booking_id] = time.time()
+            self._booked_at.pop(booking_id, None)
+            return self._remove_locked(booking_id)
+
+    def sync(self, bookings: Iterable[Dict], durations: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+        """
+        Сверка с листом: применяются только отличия
+
+        Args:
+            bookings: Записи из parse_booking_rows
+            durations: Длительность по названию услуги (lower)
+
+        Returns:
+            {"added": n, "removed": n}
+        """
+        durations = durations or {}
+        active: Dict[str, Tuple[Dict, int, int]] = {}
+        for booking in bookings:
+            start = parse_time(booking.get("time", ""))
+            if start is None or booking.get("cancelled"):
+                continue
+            duration = durations.get((booking.get("service") or "").strip().lower(), DEFAULT_DURATION)
+            active[self._booking_id(booking)] = (booking, start, duration)
+
+        added = removed = 0
+        now = time.time()
+        with self._lock:
+            self._booked_at = {i: t for i, t in self._booked_at.items() if now - t < self.grace and i not in active}
+            self._cancelled_at = {i: t for i, t in self._cancelled_at.items() if now - t < self.grace and i in active}
+            for booking_id in list(self._bookings):
+                if booking_id not in active and booking_id not in self._booked_at:
+                    self._remove_locked(booking_id)
+                    removed += 1
+            for booking_id, (booking, start, duration) in active.items():
+                if booking_id in self._cancelled_at:
+                    continue
+                current = self._bookings.get(booking_id)
+                key = self._key(booking.get("master", ""), booking.get("date", ""))
+                # Изменилась длительность услуги - интервал тоже обновляется
+                if current == (key, start, self._end(start, duration)):
+                    continue
+                if current is not None:
+                    self._remove_locked(booking_id)
+                self._add_locked(booking_id, booking.get("master", ""), booking.get("date", ""), start, duration)
+                added += 1
+        if added or removed:
+            log.info(f"📅 Индекс слотов: добавлено {added}, удалено {removed}, всего {len(self._bookings)}")
+        return {"added": added, "removed": removed}
+
+    def is_available(self, master_name: str, date: str, slot_time: str, duration: int = DEFAULT_DURATION) -> bool:
+        start = parse_time(slot_time)
+        if start is None:
+            return True
+        with self._lock:
+            intervals = self._slots.get(self._key(master_name, date))
+            return intervals is None or not intervals.overlaps(start, start + duration)
+
+    def free_slots(
+        self,
+        master_name: str,
+        date: str,
+        day_start: str = "09:00",
+        day_end: str = "20:00",
+        duration: int = DEFAULT_DURATION,
+        step: int = SLOT_STEP
+    ) -> List[str]:
+        """Свободные слоты рабочего дня мастера"""
+        start, end = parse_time(day_start) or 0, parse_time(day_end) or 24 * 60
+        with self._lock:
+            intervals = self._slots.get(self._key(master_name, date))
+            return [
+                format_time(slot) for slot in range(start, end, step)
+                if intervals is None or not intervals.overlaps(slot, slot + duration)
+            ]
+
+    def __len__(self) -> int:
+        return len(self._bookings)
@@ -0,0 +1,62 @@
+"""
+Server-Sent Events для потоковых эндпоинтов FastAPI
+
+Источники событий - асинхронные генераторы пар (имя события, данные).
+sse_response отдает их клиенту в формате text/event-stream и закрывает
+источник, как только клиент отключился: генерация LLM внутри источника
+прерывается вместе с HTTP соединением к провайдеру.
+"""
+import json
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi.responses import StreamingResponse
+
+log = logging.getLogger(__name__)
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+SSEEvent = Tuple[str, Dict[str, Any]]
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Одно событие SSE (data - JSON одной строкой)"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+async def sse_stream(
+    events: AsyncIterator[SSEEvent],
+    is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+    name: str = "stream"
+) -> AsyncIterator[str]:
+    """
+    Форматирует события источника в SSE
+
+    Перед отправкой каждого события проверяется подключение клиента;
+    ошибка источника отправляется событием "error".
+    """
+    sent = 0
+    try:
+        async for event, data in events:
+            if is_disconnected is not None and await is_disconnected():
+                log.info(f"⏹️ [SSE] {name}: клиент отключился после {sent} событий, поток остановлен")
+                break
+            yield sse_event(event, data)
+            sent += 1
+    except Exception as e:
+        log.error(f"❌ [SSE] {name}: {e}")
+        yield sse_event("error", {"error": str(e)})
+    finally:
+        aclose = getattr(events, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+def sse_response(events: AsyncIterator[SSEEvent], request=None, name: str = "stream") -> StreamingResponse:
+    """StreamingResponse с событиями источника (request - для проверки отключения клиента)"""
+    is_disconnected = request.is_disconnected if request is not None else None
+    return StreamingResponse(
+        sse_stream(events, is_disconnected, name),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
@@ -1,19 +1,33 @@
 """
 Summary Helper Module
 Суммаризация переписок по проектам и генерация отчетов
+
+Длинные тексты суммаризируются по схеме map-reduce: текст режется на чанки
+общим text splitter, выжимки чанков строятся параллельно (с ограничением
+конкурентности) и сводятся рекурсивно, пока не поместятся в бюджет токенов.
+Выжимки чанков кэшируются по хэшу содержимого, поэтому при повторной
+суммаризации измененного документа пересчитываются только измененные чанки.
 """
+import asyncio
+import hashlib
 import logging
+from collections import OrderedDict
 from typing import Dict, List, Optional
 from datetime import datetime
 
+from config import load_config
+from services.helpers.text_splitter import RecursiveCharacterTextSplitter
+from services.rag.context_packer import count_tokens, truncate_to_tokens
+
 log = logging.getLogger()
 
 # Импорты для LLM
 try:
-    from services.helpers.llm_helper import generate_with_fallback
+    from services.helpers.llm_helper import generate_with_fallback, LLM_UNAVAILABLE_MESSAGE
     LLM_AVAILABLE = True
 except ImportError:
     LLM_AVAILABLE = False
+    LLM_UNAVAILABLE_MESSAGE = "Извините, сервис временно недоступен. Пожалуйста, попробуйте позже."
     log.warning("⚠️ LLM модуль недоступен")
 
 # ===================== PROMPTS =====================
@@ -50,6 +64,191 @@ REPORT_PROMPT = """
 Сгенерируй структурированный отчет.
 """
 
+MAP_PROMPT = """
+Сделай выжимку фрагмента большого текста. Сохрани все факты, договоренности,
+решения, даты, суммы, имена и открытые вопросы. Не добавляй ничего от себя.
+{{focus}}
+
+Фрагмент:
+{{text}}
+"""
+
+REDUCE_PROMPT = """
+Ниже выжимки последовательных частей одного текста. Объедини их в одну выжимку,
+убери повторы, сохрани факты, договоренности, даты, суммы и открытые вопросы.
+{{focus}}
+
+Выжимки:
+{{text}}
+"""
+
+# ===================== MAP-REDUCE =====================
+
+DEFAULT_SUMMARIZATION = {
+    "single_pass_tokens": 6000,
+    "chunk_tokens": 2000,
+    "chunk_overlap_tokens": 100,
+    "chunk_summary_tokens": 400,
+    "reduce_budget_tokens": 6000,
+    "max_concurrency": 4,
+    "cache_size": 2048
+}
+
+MAX_REDUCE_DEPTH = 5
+
+_chunk_summary_cache: "OrderedDict[str, str]" = OrderedDict()
+
+
+def get_summarization_settings() -> Dict[str, int]:
+    """Настройки map-reduce суммаризации из config/llm.yaml"""
+    try:
+        configured = load_config("llm").get("llm", {}).get("summarization", {}) or {}
+    except Exception as e:
+        log.warning(f"⚠️ Не удалось загрузить настройки суммаризации: {e}")
+        configured = {}
+    return {**DEFAULT_SUMMARIZATION, **{name: int(value) for name, value in configured.items() if value}}
+
+
+def clear_summary_cache() -> None:
+    """Очищает кэш выжимок чанков"""
+    _chunk_summary_cache.clear()
+
+
+async def _summarize_part(template: str, text: str, focus: str, max_tokens: int, cache_size: int) -> str:
+    """Выжимка чанка или группы выжимок (с кэшем по хэшу содержимого)"""
+    key = hashlib.sha256(f"{template}\x00{focus}\x00{max_tokens}\x00{text}".encode("utf-8")).hexdigest()
+    cached = _chunk_summary_cache.get(key)
+    if cached is not None:
+        _chunk_summary_cache.move_to_end(key)
+        return cached
+
+    prompt = template.replace("{{focus}}", focus).replace("{{text}}", text)
+    summary = await generate_with_fallback(
+        [{"role": "user", "content": prompt}],
+        use_system_message=True,
+        system_content="Ты помощник для суммаризации. Делай точные и краткие выжимки.",
+        max_tokens=max_tokens,
+        temperature=0.3
+    )
+    if not summary or not summary.strip() or summary == LLM_UNAVAILABLE_MESSAGE:
+        # Ошибку не кэшируем: вызывающий код подставит начало текста, а повтор снова пойдет в LLM
+        raise RuntimeError("LLM недоступна")
+    _chunk_summary_cache[key] = summary
+    while len(_chunk_summary_cache) > cache_size:
+        _chunk_summary_cache.popitem(last=False)
+    return summary
+
+
+async def _summarize_parts(template: str, parts: List[str], focus: str, settings: Dict[str, int]) -> List[str]:
+    """Параллельная суммаризация частей с ограничением конкурентности"""
+    semaphore = asyncio.Semaphore(max(1, settings["max_concurrency"]))
+    max_tokens = settings["chunk_summary_tokens"]
+
+    async def summarize(part: str) -> str:
+        async with semaphore:
+            try:
+                return await _summarize_part(template, part, focus, max_tokens, settings["cache_size"])
+            except Exception as e:
+                # Часть не теряется: в свертку идет ее начало
+                log.error(f"❌ Ошибка суммаризации части ({count_tokens(part)} токенов): {e}")
+                return truncate_to_tokens(part, max_tokens)
+
+    return list(await asyncio.gather(*(summarize(part) for part in parts)))
+
+
+def _group_by_budget(summaries: List[str], budget: int) -> List[str]:
+    """Группирует выжимки подряд так, чтобы группа помещалась в бюджет токенов"""
+    # Каждая выжимка не длиннее половины бюджета - в группу всегда попадает хотя бы две
+    summaries = [truncate_to_tokens(summary, budget // 2) for summary in summaries]
+    groups, current, current_tokens = [], [], 0
+    for summary in summaries:
+        tokens = count_tokens(summary)
+        if current and current_tokens + tokens > budget:
+            groups.append("\n\n".join(current))
+            current, current_tokens = [], 0
+        current.append(summary)
+        current_tokens += tokens
+    if current:
+        groups.append("\n\n".join(current))
+    return groups
+
+
+async def map_reduce_summarize(
+    text: str,
+    final_template: str,
+    placeholder: str,
+    system_content: str,
+    max_tokens: int,
+    temperature: float = 0.5,
+    focus: str = ""
+) -> str:
+    """
+    Иерархическая суммаризация текста произвольной длины
+    
+    Короткий текст суммаризируется одним запросом. Длинный режется на чанки,
+    выжимки чанков сводятся рекурсивно (REDUCE_PROMPT), пока не поместятся
+    в reduce_budget_tokens, после чего финальный промпт строится по ним.
+    
+    Args:
+        text: Исходный текст
+        final_template: Шаблон финального промпта
+        placeholder: Плейсхолдер текста в шаблоне (например, "{{conversation}}")
+        system_content: Системный промпт финального запроса
+        max_tokens: Лимит токенов финального ответа
+        temperature: Температура финального запроса
+        focus: Что важно сохранить в выжимках (добавляется в промпты map/reduce)
+    
+    Returns:
+        Текст суммаризации
+    """
+    settings = get_summarization_settings()
+
+    if count_tokens(text) > settings["single_pass_tokens"]:
+        splitter = RecursiveCharacterTextSplitter(
+            chunk_size=settings["chunk_tokens"],
+            chunk_overlap=settings["chunk_overlap_tokens"],
+            length_function=count_tokens
+        )
+        chunks = splitter.split_text(text)
+        summaries = await _summarize_parts(MAP_PROMPT, chunks, focus, settings)
+        log.info(f"🧩 Map: {len(chunks)} чанков → {sum(count_tokens(s) for s in summaries)} токенов выжимок")
+
+        budget = settings["reduce_budget_tokens"]
+        depth = 0
+        while count_tokens("\n\n".join(summaries)) > budget and len(summaries) > 1 and depth < MAX_REDUCE_DEPTH:
+            groups = _group_by_budget(summaries, budget)
+            summaries = await _summarize_parts(REDUCE_PROMPT, groups, focus, settings)
+            depth += 1
+            log.info(f"🧩 Reduce {depth}: {len(groups)} групп")
+
+        text = "\n\n".join(summaries)
+        if count_tokens(text) > budget:
+            log.warning(f"⚠️ Выжимки не уложились в бюджет {budget} токенов, обрезаем")
+            text = truncate_to_tokens(text, budget)
+
+    prompt = final_template.replace(placeholder, text)
+    return await generate_with_fallback(
+        [{"role": "user", "content": prompt}],
+        use_system_message=True,
+        system_content=system_content,
+        max_tokens=max_tokens,
+        temperature=temperature
+    )
+
+
+def _trim_to_sentence(text: str, max_length: int) -> str:
+    """Обрезает текст до max_length символов по границе предложения (или слова)"""
+    if len(text) <= max_length:
+        return text
+    cut = text[:max_length - 3]
+    boundary = max(cut.rfind(". "), cut.rfind("! "), cut.rfind("? "), cut.rfind("\n"))
+    if boundary > len(cut) // 2:
+        return cut[:boundary + 1].rstrip()
+    space = cut.rfind(" ")
+    if space > len(cut) // 2:
+        cut = cut[:space]
+    return cut.rstrip() + "..."
+
 # ===================== SUMMARIZATION =====================
 
 async def summarize_project_conversation(
@@ -82,15 +281,14 @@ async def summarize_project_conversation(
             
             conversation_text += f"[{timestamp}] {role}: {content}\n\n"
         
-        prompt = SUMMARY_PROMPT.replace("{{conversation}}", conversation_text)
-        
-        messages = [{"role": "user", "content": prompt}]
-        summary = await generate_with_fallback(
-            messages,
-            use_system_message=True,
+        summary = await map_reduce_summarize(
+            conversation_text,
+            SUMMARY_PROMPT,
+            "{{conversation}}",
             system_content="Ты помощник для суммаризации переписок. Делай краткие, но информативные выжимки.",
             max_tokens=2000,
-            temperature=0.5
+            temperature=0.5,
+            focus="Это фрагмент переписки по проекту: сохрани кто и о чем договорился, следующие шаги."
         )
         
         log.info(f"✅ Суммаризация создана (длина: {len(summary)} символов)")
@@ -165,18 +363,32 @@ async def summarize_long_text(text: str, max_length: int = 500) -> str:
         return text[:max_length] + "..." if len(text) > max_length else text
     
     try:
-        prompt = f"Сделай краткую суммаризацию следующего текста (не более {max_length} символов):\n\n{text}"
-        
-        messages = [{"role": "user", "content": prompt}]
-        summary = await generate_with_fallback(
-            messages,
+        template = f"Сделай краткую суммаризацию следующего текста (не более {max_length} символов):\n\n{{{{text}}}}"
+        summary = await map_reduce_summarize(
+            text,
+            template,
+            "{{text}}",
+            system_content="Ты помощник для суммаризации текстов. Делай краткие, но информативные выжимки.",
             max_tokens=max_length + 100,
             temperature=0.5
         )
         
-        # Обрезаем до нужной длины
         if len(summary) > max_length:
-            summary = summary[:max_length] + "..."
+            # Модель не уложилась в лимит - просим сократить, а не обрываем текст
+            log.info(f"✂️ Суммаризация длиннее {max_length} символов ({len(summary)}), сокращаем")
+            shortened = await generate_with_fallback(
+                [{"role": "user", "content": f"Сократи текст до {max_length} символов, сохранив главное:\n\n{summary}"}],
+                max_tokens=max_length + 100,
+                temperature=0.3
+            )
+            if not shortened or not shortened.strip() or shortened == LLM_UNAVAILABLE_MESSAGE:
+                # Заглушка LLM короче лимита, но не должна заменять готовую выжимку
+                log.warning("⚠️ Не удалось сократить суммаризацию через LLM, обрезаем по границе предложения")
+                return _trim_to_sentence(summary, max_length)
+            summary = shortened
+            if len(summary) > max_length:
+                log.warning(f"⚠️ Суммаризация всё ещё длиннее {max_length} символов, обрезаем по границе предложения")
+                summary = _trim_to_sentence(summary, max_length)
         
         return summary
     except Exception as e:
@@ -0,0 +1,363 @@
+"""
+Telegram Outbox
+Планировщик исходящих сообщений Telegram.
+
+Лиды, новости и уведомления ставятся в очередь (queue_message), и
+отправитель не ждет доставки. Фоновая задача отправляет сообщения с
+учетом лимитов Telegram:
+- общий token bucket (TELEGRAM_GLOBAL_RATE сообщений/с, лимит Telegram ~30/с)
+- token bucket на чат: личный чат ~1 сообщение/с, группы и каналы
+  ~20 сообщений/мин (TELEGRAM_GROUP_RATE_PER_MIN)
+- очередь с приоритетами: лиды, затем уведомления, затем новости;
+  внутри чата порядок сохраняется
+- RetryAfter (flood control) приостанавливает чат на retry_after секунд,
+  сообщение остается в очереди; сетевые ошибки повторяются
+- dedup_key: пока сообщение с тем же ключом ждет отправки, повторное
+  не ставится (дедупликатор помечает сообщение только после доставки)
+
+Если планировщик не запущен в текущем event loop (тесты, скрипты,
+backend), queue_message отправляет сообщение сразу.
+"""
+import os
+import time
+import bisect
+import asyncio
+import logging
+import itertools
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from services.helpers.rate_limit import TokenBucket
+
+log = logging.getLogger()
+
+try:
+    from telegram.error import NetworkError
+    TRANSIENT_ERRORS: Tuple[type, ...] = (NetworkError, asyncio.TimeoutError)
+except ImportError:
+    TRANSIENT_ERRORS = (asyncio.TimeoutError, ConnectionError)
+
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", "25"))  # Сообщений в секунду
+TELEGRAM_CHAT_RATE = float(os.getenv("TELEGRAM_CHAT_RATE", "1"))  # Личный чат, сообщений в секунду
+TELEGRAM_GROUP_RATE_PER_MIN = float(os.getenv("TELEGRAM_GROUP_RATE_PER_MIN", "20"))  # Группа/канал
+TELEGRAM_GROUP_BURST = int(os.getenv("TELEGRAM_GROUP_BURST", "3"))
+TELEGRAM_SEND_ATTEMPTS = int(os.getenv("TELEGRAM_SEND_ATTEMPTS", "3"))
+TELEGRAM_MAX_IN_FLIGHT = int(os.getenv("TELEGRAM_MAX_IN_FLIGHT", "5"))
+
+PRIORITY_LEAD = 0
+PRIORITY_NOTIFICATION = 5
+PRIORITY_NEWS = 10
+
+# Результат queue_message
+SEND_QUEUED = "queued"  # В очереди, доставка позже
+SEND_SENT = "sent"  # Отправлено сразу (планировщик не запущен)
+
+
+def is_group_chat(chat_id: Any) -> bool:
+    """Группы и каналы: отрицательный id или @username"""
+    if isinstance(chat_id, str):
+        return chat_id.startswith(("@", "-"))
+    return isinstance(chat_id, int) and chat_id < 0
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Пауза из telegram.error.RetryAfter (секунды или timedelta)"""
+    value = getattr(error, "retry_after", None)
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    if isinstance(value, (int, float)):
+        return float(value)
+    return None
+
+
+@dataclass(order=True)
+class OutboundMessage:
+    priority: int
+    seq: int
+    chat_id: Any = field(compare=False)
+    text: str = field(compare=False)
+    kwargs: Dict[str, Any] = field(default_factory=dict, compare=False)
+    on_sent: Optional[Callable[[], Any]] = field(default=None, compare=False)
+    future: Optional[asyncio.Future] = field(default=None, compare=False)
+    attempts: int = field(default=0, compare=False)
+    not_before: float = field(default=0.0, compare=False)
+    dedup_key: Optional[str] = field(default=None, compare=False)
+
+
+class OutboundMessageScheduler:
+    """Очередь исходящих сообщений одного бота"""
+
+    def __init__(
+        self,
+        bot,
+        global_rate: float = TELEGRAM_GLOBAL_RATE,
+        chat_rate: float = TELEGRAM_CHAT_RATE,
+        group_rate_per_min: float = TELEGRAM_GROUP_RATE_PER_MIN,
+        group_burst: int = TELEGRAM_GROUP_BURST,
+        attempts: int = TELEGRAM_SEND_ATTEMPTS,
+        max_in_flight: int = TELEGRAM_MAX_IN_FLIGHT,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.bot = bot
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate_per_min / 60
+        self.group_burst = group_burst
+        self.attempts = max(attempts, 1)
+        self.max_in_flight = max(max_in_flight, 1)
+        self.clock = clock
+        self.global_bucket = TokenBucket(global_rate, capacity=max(global_rate, 1), clock=clock)
+        self._chat_buckets: Dict[Any, TokenBucket] = {}
+        self._paused_until: Dict[Any, float] = {}
+        self._queue: List[OutboundMessage] = []  # Отсортирована по (priority, seq)
+        self._in_flight: Set[Any] = set()
+        self._sends: Set[asyncio.Task] = set()
+        self._pending_keys: Dict[str, asyncio.Future] = {}  # dedup_key -> future ожидающего сообщения
+        self._seq = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"queued": 0, "sent": 0, "failed": 0, "retry_after": 0, "retried": 0, "deduplicated": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def loop(self) -> Optional[asyncio.AbstractEventLoop]:
+        return self._loop
+
+    def pending(self) -> int:
+        return len(self._queue) + len(self._in_flight)
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = self._loop.create_task(self._run())
+        log.info("✅ Планировщик исходящих сообщений Telegram запущен")
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Дождаться отправки очереди (не дольше timeout) и остановить"""
+        if not self.running:
+            return
+        deadline = self.clock() + timeout
+        while self.pending() and self.clock() < deadline:
+            await asyncio.sleep(0.1)
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        for message in self._queue:
+            self._resolve(message, False)
+        if self._queue:
+            log.warning(f"⚠️ Не отправлено сообщений Telegram при остановке: {len(self._queue)}")
+        self._queue.clear()
+
+    def enqueue(
+        self,
+        chat_id: Any,
+        text: str,
+        priority: int = PRIORITY_NOTIFICATION,
+        on_sent: Optional[Callable[[], Any]] = None,
+        dedup_key: Optional[str] = None,
+        **kwargs
+    ) -> Optional[asyncio.Future]:
+        """
+        Поставить сообщение в очередь
+
+        Args:
+            dedup_key: Ключ дедупликации; пока сообщение с этим ключом не доставлено
+                и не отброшено, повторное в очередь не ставится
+
+        Returns:
+            Future с True после доставки или False при окончательной ошибке;
+            None, если сообщение с тем же dedup_key уже ожидает отправки
+        """
+        if not self.running:
+            raise RuntimeError("Планировщик сообщений не запущен")
+        if dedup_key is not None and dedup_key in self._pending_keys:
+            self.stats["deduplicated"] += 1
+            log.info(f"⏭️ Сообщение '{dedup_key[:50]}' уже в очереди отправки")
+            return None
+        message = OutboundMessage(
+            priority, next(self._seq), chat_id, text, kwargs, on_sent, self._loop.create_future(),
+            dedup_key=dedup_key
+        )
+        if dedup_key is not None:
+            self._pending_keys[dedup_key] = message.future
+        self._insert(message)
+        self.stats["queued"] += 1
+        return message.future
+
+    def _resolve(self, message: OutboundMessage, delivered: bool) -> None:
+        # Ключ освобождается после доставки (дубликат отсекает on_sent) или окончательной ошибки
+        if message.dedup_key is not None:
+            self._pending_keys.pop(message.dedup_key, None)
+        if not message.future.done():
+            message.future.set_result(delivered)
+
+    def _insert(self, message: OutboundMessage) -> None:
+        bisect.insort(self._queue, message)
+        self._wakeup.set()
+
+    def _chat_bucket(self, chat_id: Any) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if is_group_chat(chat_id):
+                bucket = TokenBucket(self.group_rate, capacity=self.group_burst, clock=self.clock)
+            else:
+                bucket = TokenBucket(self.chat_rate, capacity=1, clock=self.clock)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _next_ready(self) -> Tuple[Optional[OutboundMessage], Optional[float]]:
+        """Первое по приоритету сообщение, чат которого не ограничен, или время ожидания"""
+        now = self.clock()
+        wait: Optional[float] = None
+        blocked: Set[Any] = set(self._in_flight)
+        for index, message in enumerate(self._queue):
+            if message.chat_id in blocked:
+                continue  # Порядок внутри чата сохраняется
+            delay = max(self._paused_until.get(message.chat_id, 0.0) - now, message.not_before - now, 0.0)
+            if not delay:
+                delay = self._chat_bucket(message.chat_id).try_acquire()
+                if not delay:
+                    del self._queue[index]
+                    return message, None
+            blocked.add(message.chat_id)
+            wait = delay if wait is None else min(wait, delay)
+        return None, wait
+
+    async def _run(self) -> None:
+        while True:
+            global_wait = self.global_bucket.wait_time()
+            message = None
+            wait: Optional[float] = global_wait or None
+            if not global_wait and len(self._sends) < self.max_in_flight:
+                message, wait = self._next_ready()
+            if message is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self.global_bucket.try_acquire()
+            self._in_flight.add(message.chat_id)
+            task = asyncio.ensure_future(self._send(message))
+            self._sends.add(task)
+            task.add_done_callback(self._sends.discard)
+
+    async def _send(self, message: OutboundMessage) -> None:
+        try:
+            await self.bot.send_message(chat_id=message.chat_id, text=message.text, **message.kwargs)
+        except Exception as e:
+            self._handle_error(message, e)
+            return
+        finally:
+            self._in_flight.discard(message.chat_id)
+            self._wakeup.set()
+
+        self.stats["sent"] += 1
+        if message.on_sent is not None:
+            try:
+                message.on_sent()
+            except Exception as e:
+                log.warning(f"⚠️ Ошибка обработчика после отправки в {message.chat_id}: {e}")
+        self._resolve(message, True)
+
+    def _handle_error(self, message: OutboundMessage, error: Exception) -> None:
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            # Flood control: чат ждет retry_after, сообщение остается первым в своем чате
+            self.stats["retry_after"] += 1
+            self._paused_until[message.chat_id] = self.clock() + retry_after
+            log.warning(f"⚠️ Telegram flood control для {message.chat_id}: пауза {retry_after:.0f} с")
+            self._insert(message)
+            return
+        message.attempts += 1
+        if isinstance(error, TRANSIENT_ERRORS) and message.attempts < self.attempts:
+            self.stats["retried"] += 1
+            message.not_before = self.clock() + 2 ** message.attempts
+            log.warning(f"⚠️ Ошибка сети при отправке в {message.chat_id}: {error}, повтор {message.attempts}")
+            self._insert(message)
+            return
+        self.stats["failed"] += 1
+        log.error(f"❌ Не удалось отправить сообщение в {message.chat_id}: {error}")
+        self._resolve(message, False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = self.clock()
+        paused = sum(1 for until in self._paused_until.values() if until > now)
+        return {**self.stats, "pending": self.pending(), "paused_chats": paused}
+
+
+_scheduler: Optional[OutboundMessageScheduler] = None
+
+
+def start_outbound_scheduler(bot) -> OutboundMessageScheduler:
+    """Запустить планировщик в текущем event loop (при старте бота)"""
+    global _scheduler
+    if _scheduler is None or not _scheduler.running or _scheduler.bot is not bot:
+        _scheduler = OutboundMessageScheduler(bot)
+        _scheduler.start()
+    return _scheduler
+
+
+async def stop_outbound_scheduler(timeout: float = 10.0) -> None:
+    if _scheduler is not None:
+        await _scheduler.stop(timeout)
+
+
+def get_outbound_scheduler(bot=None) -> Optional[OutboundMessageScheduler]:
+    """Работающий планировщик текущего event loop (и бота, если указан)"""
+    if _scheduler is None or not _scheduler.running:
+        return None
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+    if _scheduler.loop is not loop or (bot is not None and _scheduler.bot is not bot):
+        return None
+    return _scheduler
+
+
+async def queue_message(
+    bot,
+    chat_id: Any,
+    text: str,
+    priority: int = PRIORITY_NOTIFICATION,
+    on_sent: Optional[Callable[[], Any]] = None,
+    dedup_key: Optional[str] = None,
+    **kwargs
+) -> Optional[str]:
+    """
+    Отправить сообщение через планировщик (не дожидаясь доставки)
+
+    Если планировщик не запущен, сообщение отправляется сразу; ошибки
+    отправки в этом случае пробрасываются, как у bot.send_message.
+
+    Args:
+        bot: Telegram Bot
+        chat_id: Чат или канал
+        text: Текст сообщения
+        priority: PRIORITY_LEAD / PRIORITY_NOTIFICATION / PRIORITY_NEWS
+        on_sent: Вызывается после успешной доставки (например mark_as_sent)
+        dedup_key: Не ставить сообщение, если такое же еще ждет отправки
+        **kwargs: Параметры bot.send_message (parse_mode, disable_web_page_preview...)
+
+    Returns:
+        SEND_QUEUED (поставлено в очередь), SEND_SENT (отправлено сразу)
+        или None (такое же сообщение уже в очереди)
+    """
+    scheduler = get_outbound_scheduler(bot)
+    if scheduler is not None:
+        future = scheduler.enqueue(chat_id, text, priority=priority, on_sent=on_sent, dedup_key=dedup_key, **kwargs)
+        return SEND_QUEUED if future is not None else None
+    await bot.send_message(chat_id=chat_id, text=text, **kwargs)
+    if on_sent is not None:
+        on_sent()
+    return SEND_SENT
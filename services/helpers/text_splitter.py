@@ -58,20 +58,18 @@ class RecursiveCharacterTextSplitter:
                 self.separators
             )
             
-            if chunk:
+            if chunk and remaining != current_text:
                 chunks.append(chunk)
+                current_text = remaining
+                continue
             
-            if not remaining or remaining == current_text:
-                # Если не удалось разбить, берем chunk_size символов
-                if self.length_function(current_text) > self.chunk_size:
-                    chunk = current_text[:self.chunk_size]
-                    chunks.append(chunk)
-                    current_text = current_text[self.chunk_size - self.chunk_overlap:]
-                else:
-                    chunks.append(current_text)
-                    break
+            # Если не удалось разбить, берем chunk_size символов
+            if self.length_function(current_text) > self.chunk_size:
+                chunks.append(current_text[:self.chunk_size])
+                current_text = current_text[max(1, self.chunk_size - self.chunk_overlap):]
             else:
-                current_text = remaining
+                chunks.append(current_text)
+                break
         
         # Объединяем маленькие чанки
         return self._merge_small_chunks(chunks)
@@ -126,11 +124,16 @@ class RecursiveCharacterTextSplitter:
                         remaining = separator.join(splits[i:])
                         return current_chunk, remaining
                     else:
-                        # Даже один split слишком большой, рекурсивно разбиваем
-                        return self._split_text_recursive(
+                        # Даже один split слишком большой, рекурсивно разбиваем,
+                        # не теряя следующие за ним части текста
+                        chunk, rest = self._split_text_recursive(
                             split,
                             remaining_separators
                         )
+                        tail = separator.join(splits[i + 1:])
+                        if i < len(splits) - 1:
+                            rest = rest + separator + tail
+                        return chunk, rest
             
             # Весь текст поместился в один чанк
             return current_chunk, ""
@@ -0,0 +1,312 @@
+"""
+WEEEK Bulk Operations
+Пакетное выполнение операций WEEEK (создание проектов и задач, смена
+статусов, завершение задач) поверх weeek_helper.
+
+- операции выполняются параллельно, не более WEEEK_BULK_CONCURRENCY одновременно
+- операция может зависеть от другой (after) и брать из ее результата
+  значения (WeeekRef), например задача - id созданного проекта
+- все HTTP запросы идут через одну сессию RetryingSession: общий для
+  процесса token bucket (WEEEK_RATE_LIMIT запросов/с, запас WEEEK_RATE_BURST)
+  и повтор с экспоненциальной задержкой со случайным разбросом при 429/5xx
+  и сетевых ошибках (учитывается Retry-After); POST/PATCH (создание,
+  изменение) повторяются только при 429 и ошибке соединения - иначе
+  WEEEK мог уже выполнить запрос, и повтор создал бы дубликат
+- возвращается результат каждой операции в порядке входного списка
+"""
+import os
+import time
+import random
+import asyncio
+import inspect
+import logging
+import threading
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import aiohttp
+
+from services.helpers import weeek_helper
+from services.helpers.rate_limit import TokenBucket
+
+log = logging.getLogger()
+
+WEEEK_BULK_CONCURRENCY = int(os.getenv("WEEEK_BULK_CONCURRENCY", "4"))
+WEEEK_RATE_LIMIT = float(os.getenv("WEEEK_RATE_LIMIT", "2"))  # Запросов в секунду
+WEEEK_RATE_BURST = int(os.getenv("WEEEK_RATE_BURST", "10"))
+WEEEK_RETRY_ATTEMPTS = int(os.getenv("WEEEK_RETRY_ATTEMPTS", "4"))
+WEEEK_RETRY_BASE_DELAY = float(os.getenv("WEEEK_RETRY_BASE_DELAY", "0.5"))  # Секунды
+WEEEK_RETRY_MAX_DELAY = float(os.getenv("WEEEK_RETRY_MAX_DELAY", "10"))
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Запрос не выполнен сервером - можно повторить и неидемпотентный метод
+NON_IDEMPOTENT_RETRY_STATUSES = frozenset({429})
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+
+# ===================== RETRIES =====================
+
+def backoff_delay(attempt: int, base: float = WEEEK_RETRY_BASE_DELAY, cap: float = WEEEK_RETRY_MAX_DELAY,
+                  retry_after: Optional[float] = None) -> float:
+    """Задержка перед повтором: full jitter, не меньше Retry-After"""
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, cap))
+    return delay
+
+
+def _retry_after(response) -> Optional[float]:
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+class _RetryingRequest:
+    """async with для одного запроса с повторами"""
+
+    def __init__(self, owner: "RetryingSession", method: str, url: str, kwargs: Dict[str, Any]):
+        self.owner = owner
+        self.method = method
+        self.url = url
+        self.kwargs = kwargs
+        self._response = None
+
+    async def __aenter__(self):
+        owner = self.owner
+        if self.method.upper() in IDEMPOTENT_METHODS:
+            retry_statuses, retry_errors = RETRY_STATUSES, (aiohttp.ClientError, asyncio.TimeoutError)
+        else:
+            # Таймаут или 5xx после отправки POST: задача могла быть уже создана
+            retry_statuses, retry_errors = NON_IDEMPOTENT_RETRY_STATUSES, (aiohttp.ClientConnectorError,)
+        for attempt in range(owner.attempts):
+            last_attempt = attempt == owner.attempts - 1
+            await owner.bucket.acquire()
+            try:
+                response = await owner.session.request(self.method, self.url, **self.kwargs)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if last_attempt or not isinstance(e, retry_errors):
+                    raise
+                log.warning(f"⚠️ [WEEEK] {self.method} {self.url}: {e}, повтор {attempt + 1}/{owner.attempts - 1}")
+                await asyncio.sleep(backoff_delay(attempt, owner.base_delay, owner.max_delay))
+                continue
+            if response.status in retry_statuses and not last_attempt:
+                owner.retries += 1
+                delay = backoff_delay(attempt, owner.base_delay, owner.max_delay, _retry_after(response))
+                response.release()
+                log.warning(f"⚠️ [WEEEK] {self.method} {self.url}: HTTP {response.status}, повтор через {delay:.1f} с")
+                await asyncio.sleep(delay)
+                continue
+            self._response = response
+            return response
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self._response is not None:
+            self._response.release()
+        return False
+
+
+class RetryingSession:
+    """
+    Обертка aiohttp.ClientSession для функций weeek_helper (параметр session)
+
+    Каждый запрос ждет токен из TokenBucket; ответы 429/5xx и сетевые
+    ошибки повторяются до attempts раз с задержкой backoff_delay
+    (POST/PATCH - только 429 и ошибки соединения).
+    """
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        bucket: Optional[TokenBucket] = None,
+        attempts: int = WEEEK_RETRY_ATTEMPTS,
+        base_delay: float = WEEEK_RETRY_BASE_DELAY,
+        max_delay: float = WEEEK_RETRY_MAX_DELAY
+    ):
+        self.session = session
+        self.bucket = bucket or get_rate_limiter()
+        self.attempts = max(attempts, 1)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+
+    def request(self, method: str, url: str, **kwargs) -> _RetryingRequest:
+        return _RetryingRequest(self, method, url, kwargs)
+
+    def get(self, url: str, **kwargs) -> _RetryingRequest:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> _RetryingRequest:
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url: str, **kwargs) -> _RetryingRequest:
+        return self.request("PUT", url, **kwargs)
+
+    def patch(self, url: str, **kwargs) -> _RetryingRequest:
+        return self.request("PATCH", url, **kwargs)
+
+    def delete(self, url: str, **kwargs) -> _RetryingRequest:
+        return self.request("DELETE", url, **kwargs)
+
+
+_rate_limiter: Optional[TokenBucket] = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> TokenBucket:
+    """Общий token bucket запросов к WEEEK (Singleton)"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                _rate_limiter = TokenBucket(rate=WEEEK_RATE_LIMIT, capacity=WEEEK_RATE_BURST)
+    return _rate_limiter
+
+
+@asynccontextmanager
+async def rate_limited_session(**kwargs):
+    """Новая aiohttp сессия с ограничением частоты и повторами"""
+    async with aiohttp.ClientSession() as session:
+        yield RetryingSession(session, **kwargs)
+
+
+# ===================== BULK =====================
+
+@dataclass
+class WeeekRef:
+    """Значение из результата другой операции (например id созданного проекта)"""
+    key: str
+    field: str = "id"
+    transform: Callable[[Any], Any] = str
+
+
+@dataclass
+class WeeekOperation:
+    """
+    Операция пакета
+
+    Args:
+        action: Имя функции weeek_helper ("create_task") или сама функция
+        args / kwargs: Аргументы (значения WeeekRef подставляются из результата after)
+        key: Имя операции для ссылок и результатов (по умолчанию "op<номер>")
+        after: Ключ операции, которая должна успешно завершиться раньше
+    """
+    action: Union[str, Callable]
+    args: Tuple = ()
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+    key: Optional[str] = None
+    after: Optional[str] = None
+
+
+@dataclass
+class WeeekOperationResult:
+    key: str
+    action: str
+    ok: bool
+    result: Any = None
+    error: Optional[str] = None
+    duration_ms: float = 0.0
+
+
+def _resolve_action(action: Union[str, Callable]) -> Callable:
+    if callable(action):
+        return action
+    func = getattr(weeek_helper, action, None)
+    if func is None or not asyncio.iscoroutinefunction(func):
+        raise ValueError(f"Неизвестная операция WEEEK: {action}")
+    return func
+
+
+def _accepts_session(func: Callable) -> bool:
+    try:
+        return "session" in inspect.signature(func).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+def _resolve_refs(value: Any, results: Dict[str, WeeekOperationResult]) -> Any:
+    if not isinstance(value, WeeekRef):
+        return value
+    result = results[value.key].result
+    resolved = result.get(value.field) if isinstance(result, dict) else None
+    if resolved is None:
+        raise ValueError(f"В результате {value.key} нет поля {value.field}")
+    return value.transform(resolved)
+
+
+async def run_bulk(
+    operations: List[WeeekOperation],
+    concurrency: int = WEEEK_BULK_CONCURRENCY,
+    session=None
+) -> List[WeeekOperationResult]:
+    """
+    Выполнить операции WEEEK параллельно
+
+    Args:
+        operations: Операции; after может ссылаться только на операцию выше по списку
+        concurrency: Максимум одновременных операций
+        session: Сессия (по умолчанию - новая rate_limited_session на пакет)
+
+    Returns:
+        Результаты в порядке operations (ok=False при ошибке, None/False от
+        функции или неудаче зависимости)
+    """
+    keys: List[str] = []
+    for index, operation in enumerate(operations):
+        key = operation.key or f"op{index}"
+        if key in keys:
+            raise ValueError(f"Повторяющийся ключ операции: {key}")
+        if operation.after is not None and operation.after not in keys:
+            raise ValueError(f"Операция {key} зависит от неизвестной или более поздней операции {operation.after}")
+        keys.append(key)
+    funcs = [_resolve_action(operation.action) for operation in operations]
+
+    if session is None:
+        async with rate_limited_session() as own_session:
+            return await run_bulk(operations, concurrency, own_session)
+
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+    results: Dict[str, WeeekOperationResult] = {}
+    done: Dict[str, asyncio.Event] = {key: asyncio.Event() for key in keys}
+
+    async def execute(key: str, operation: WeeekOperation, func: Callable) -> None:
+        name = getattr(func, "__name__", str(operation.action))
+        try:
+            if operation.after is not None:
+                await done[operation.after].wait()
+                if not results[operation.after].ok:
+                    results[key] = WeeekOperationResult(key, name, ok=False, error=f"операция {operation.after} не выполнена")
+                    return
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    args = [_resolve_refs(value, results) for value in operation.args]
+                    kwargs = {name_: _resolve_refs(value, results) for name_, value in operation.kwargs.items()}
+                    if _accepts_session(func):
+                        kwargs["session"] = session
+                    result = await func(*args, **kwargs)
+                    ok = result is not None and result is not False
+                    results[key] = WeeekOperationResult(
+                        key, name, ok=ok, result=result, error=None if ok else "WEEEK вернул ошибку",
+                        duration_ms=(time.perf_counter() - started) * 1000
+                    )
+                except Exception as e:
+                    log.error(f"❌ [WEEEK Bulk] {key} ({name}): {e}")
+                    results[key] = WeeekOperationResult(
+                        key, name, ok=False, error=str(e), duration_ms=(time.perf_counter() - started) * 1000
+                    )
+        finally:
+            done[key].set()
+
+    started = time.perf_counter()
+    await asyncio.gather(*[
+        execute(key, operation, func) for key, operation, func in zip(keys, operations, funcs)
+    ])
+    ordered = [results[key] for key in keys]
+    failed = sum(1 for result in ordered if not result.ok)
+    log.info(
+        f"✅ [WEEEK Bulk] Операций: {len(ordered)}, ошибок: {failed}, "
+        f"{(time.perf_counter() - started) * 1000:.0f} мс"
+    )
+    return ordered
@@ -7,6 +7,7 @@ import os
 import logging
 import aiohttp
 import asyncio
+from contextlib import asynccontextmanager
 from typing import Dict, List, Optional
 from datetime import datetime, timedelta
 
@@ -39,13 +40,41 @@ def get_headers() -> Dict[str, str]:
         "Content-Type": "application/json"
     }
 
+
+@asynccontextmanager
+async def _client_session(session: Optional[aiohttp.ClientSession] = None):
+    """Переданная сессия (без закрытия) или новая на время запроса"""
+    if session is not None:
+        yield session
+        return
+    async with aiohttp.ClientSession() as own_session:
+        yield own_session
+
+
+def _update_mirror(task: Optional[Dict] = None, removed_task_id: Optional[str] = None, stale: bool = False) -> None:
+    """Обновить локальное зеркало задач после изменения (если зеркало уже используется)"""
+    try:
+        from services.helpers.weeek_mirror import peek_weeek_mirror
+        mirror = peek_weeek_mirror()
+        if mirror is None:
+            return
+        if isinstance(task, dict) and task.get("id") is not None:
+            mirror.store.upsert_task(task)
+        if removed_task_id is not None:
+            mirror.store.remove_task(removed_task_id)
+        if stale:
+            mirror.invalidate()
+    except Exception as e:
+        log.debug(f"Зеркало WEEEK не обновлено: {e}")
+
 # ===================== PROJECT OPERATIONS =====================
 
 async def create_project(
     name: str,
     description: str = "",
     color: Optional[str] = None,
-    is_private: bool = False
+    is_private: bool = False,
+    session: Optional[aiohttp.ClientSession] = None
 ) -> Optional[Dict]:
     """
     Создать новый проект в WEEEK
@@ -56,6 +85,7 @@ async def create_project(
         description: Описание проекта
         color: Цвет проекта (hex, например "#FF5733")
         is_private: Приватный проект (обязательное поле!)
+        session: Общая aiohttp сессия (по умолчанию - новая на запрос)
     
     Returns:
         Словарь с данными созданного проекта или None при ошибке
@@ -83,7 +113,7 @@ async def create_project(
         log.info(f"📤 [WEEEK] Создаю проект: {name}")
         log.debug(f"📤 Данные: {data}")
         
-        async with aiohttp.ClientSession() as session:
+        async with _client_session(session) as session:
             async with session.post(url, json=data, headers=headers, timeout=aiohttp.ClientTimeout(total=30)) as response:
                 response_text = await response.text()
                 
@@ -113,13 +143,14 @@ async def create_project(
         log.error(f"❌ Traceback: {traceback.format_exc()}")
         return None
 
-async def update_project_status(project_id: str, status: str) -> bool:
+async def update_project_status(project_id: str, status: str, session: Optional[aiohttp.ClientSession] = None) -> bool:
     """
     Обновить статус проекта
     
     Args:
         project_id: ID проекта
         status: Новый статус (new, in_progress, completed, rejected)
+        session: Общая aiohttp сессия (по умолчанию - новая на запрос)
     
     Returns:
         True при успехе, False при ошибке
@@ -133,7 +164,7 @@ async def update_project_status(project_id: str, status: str) -> bool:
     data = {"status": status}
     
     try:
-        async with aiohttp.ClientSession() as session:
+        async with _client_session(session) as session:
             async with session.patch(url, json=data, headers=headers, timeout=aiohttp.ClientTimeout(total=30)) as response:
                 if response.status >= 400:
                     error_text = await response.text()
@@ -208,13 +239,17 @@ async def get_workspace_info() -> Optional[Dict]:
         log.error(f"❌ Traceback: {traceback.format_exc()}")
         return None
 
-async def get_projects(workspace_id: Optional[str] = None) -> List[Dict]:
+async def get_projects(
+    workspace_id: Optional[str] = None,
+    session: Optional[aiohttp.ClientSession] = None
+) -> List[Dict]:
     """
     Получить список всех проектов
     API: GET /tm/projects (НЕ /pm/projects!)
     
     Args:
         workspace_id: ID workspace (опционально, для совместимости)
+        session: Общая aiohttp сессия (по умолчанию - новая на запрос)
     
     Returns:
         Список словарей с данными проектов
@@ -230,7 +265,7 @@ async def get_projects(workspace_id: Optional[str] = None) -> List[Dict]:
     try:
         log.info(f"📤 [WEEEK] Запрос проектов: {url}")
         
-        async with aiohttp.ClientSession() as session:
+        async with _client_session(session) as session:
             async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=30)) as response:
                 if response.status >= 400:
                     error_text = await response.text()
@@ -264,7 +299,8 @@ async def create_task(
     user_id: Optional[str] = None,
     priority: Optional[int] = None,
     task_type: str = "action",
-    name: Optional[str] = None  # Для обратной совместимости
+    name: Optional[str] = None,  # Для обратной совместимости
+    session: Optional[aiohttp.ClientSession] = None
 ) -> Optional[Dict]:
     """
     Создать задачу
@@ -279,6 +315,7 @@ async def create_task(
         priority: Приоритет (0=Low, 1=Medium, 2=High, 3=Hold)
         task_type: Тип задачи (action, meet, call)
         name: Альтернативное название (для обратной совместимости)
+        session: Общая aiohttp сессия (по умолчанию - новая на запрос)
     
     Returns:
         Словарь с данными созданной задачи или None при ошибке
@@ -321,7 +358,7 @@ async def create_task(
         )
         log.debug(f"📤 Данные запроса: {data}")
         
-        async with aiohttp.ClientSession() as session:
+        async with _client_session(session) as session:
             async with session.post(url, json=data, headers=headers, timeout=aiohttp.ClientTimeout(total=30)) as response:
                 response_text = await response.text()
                 
@@ -344,6 +381,7 @@ async def create_task(
                     )
                     if day:
                         log.info("[WEEEK] action=add_date task_id=%s day=%s (set on create)", task_id, day)
+                    _update_mirror(task=task)
                     return task
                 else:
                     log.warning("[WEEEK] action=create_task status=ok response_format=unexpected")
@@ -364,7 +402,8 @@ async def update_task(
     start_date: Optional[str] = None,
     due_date: Optional[str] = None,
     duration: Optional[int] = None,
-    tags: Optional[List[int]] = None
+    tags: Optional[List[int]] = None,
+    session: Optional[aiohttp.ClientSession] = None
 ) -> Optional[Dict]:
     """
     Обновить задачу
@@ -380,6 +419,7 @@ async def update_task(
         due_date: Дата окончания (Y-m-d format)
         duration: Оценка времени в минутах
         tags: Список ID тегов
+        session: Общая aiohttp сессия (по умолчанию - новая на запрос)
     
     Returns:
         Обновленная задача или None при ошибке
@@ -423,7 +463,7 @@ async def update_task(
         if due_date is not None:
             log.info("[WEEEK] action=add_date task_id=%s due_date=%s (update)", task_id, due_date)
         
-        async with aiohttp.ClientSession() as session:
+        async with _client_session(session) as session:
             async with session.put(url, json=data, headers=headers, timeout=aiohttp.ClientTimeout(total=30)) as response:
                 response_text = await response.text()
                 
@@ -439,6 +479,7 @@ async def update_task(
                 if isinstance(result, dict) and "task" in result:
                     task = result["task"]
                     log.info("[WEEEK] action=update_task status=ok task_id=%s fields=%s", task_id, fields)
+                    _update_mirror(task=task)
                     return task
                 else:
                     log.warning("[WEEEK] action=update_task status=ok task_id=%s response_format=unexpected", task_id)
@@ -450,7 +491,7 @@ async def update_task(
         log.error(f"❌ Traceback: {traceback.format_exc()}")
         return None
 
-async def complete_task(task_id: str) -> bool:
+async def complete_task(task_id: str, session: Optional[aiohttp.ClientSession] = None) -> bool:
     """
     Отметить задачу как выполненную
     API: POST /tm/tasks/{id}/complete
@@ -464,10 +505,11 @@ async def complete_task(task_id: str) -> bool:
     try:
         log.info(f"📤 [WEEEK] Завершаю задачу {task_id}")
         
-        async with aiohttp.ClientSession() as session:
+        async with _client_session(session) as session:
             async with session.post(url, headers=headers, timeout=aiohttp.ClientTimeout(total=30)) as response:
                 if response.status < 400:
                     log.info(f"✅ [WEEEK] Задача {task_id} завершена")
+                    _update_mirror(removed_task_id=task_id)
                     return True
                 else:
                     response_text = await response.text()
@@ -477,7 +519,7 @@ async def complete_task(task_id: str) -> bool:
         log.error(f"❌ [WEEEK] Ошибка завершения задачи: {e}")
         return False
 
-async def uncomplete_task(task_id: str) -> bool:
+async def uncomplete_task(task_id: str, session: Optional[aiohttp.ClientSession] = None) -> bool:
     """
     Отменить завершение задачи
     API: POST /tm/tasks/{id}/un-complete
@@ -491,10 +533,11 @@ async def uncomplete_task(task_id: str) -> bool:
     try:
         log.info(f"📤 [WEEEK] Возобновляю задачу {task_id}")
         
-        async with aiohttp.ClientSession() as session:
+        async with _client_session(session) as session:
             async with session.post(url, headers=headers, timeout=aiohttp.ClientTimeout(total=30)) as response:
                 if response.status < 400:
                     log.info(f"✅ [WEEEK] Задача {task_id} возобновлена")
+                    _update_mirror(stale=True)
                     return True
                 else:
                     response_text = await response.text()
@@ -504,7 +547,7 @@ async def uncomplete_task(task_id: str) -> bool:
         log.error(f"❌ [WEEEK] Ошибка возобновления задачи: {e}")
         return False
 
-async def delete_task(task_id: str) -> bool:
+async def delete_task(task_id: str, session: Optional[aiohttp.ClientSession] = None) -> bool:
     """
     Удалить задачу
     API: DELETE /tm/tasks/{id}
@@ -518,10 +561,11 @@ async def delete_task(task_id: str) -> bool:
     try:
         log.info(f"📤 [WEEEK] Удаляю задачу {task_id}")
         
-        async with aiohttp.ClientSession() as session:
+        async with _client_session(session) as session:
             async with session.delete(url, headers=headers, timeout=aiohttp.ClientTimeout(total=30)) as response:
                 if response.status < 400:
                     log.info(f"✅ [WEEEK] Задача {task_id} удалена")
+                    _update_mirror(removed_task_id=task_id)
                     return True
                 else:
                     response_text = await response.text()
@@ -531,7 +575,7 @@ async def delete_task(task_id: str) -> bool:
         log.error(f"❌ [WEEEK] Ошибка удаления задачи: {e}")
         return False
 
-async def get_task(task_id: str) -> Optional[Dict]:
+async def get_task(task_id: str, session: Optional[aiohttp.ClientSession] = None) -> Optional[Dict]:
     """
     Получить информацию об одной задаче
     API: GET /tm/tasks/{id}
@@ -545,7 +589,7 @@ async def get_task(task_id: str) -> Optional[Dict]:
     try:
         log.info(f"📤 [WEEEK] Получаю задачу {task_id}")
         
-        async with aiohttp.ClientSession() as session:
+        async with _client_session(session) as session:
             async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=30)) as response:
                 if response.status >= 400:
                     response_text = await response.text()
@@ -578,7 +622,8 @@ async def get_tasks(
     sort_by: Optional[str] = None,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    all_tasks: bool = False
+    all_tasks: bool = False,
+    session: Optional[aiohttp.ClientSession] = None
 ) -> Dict[str, any]:
     """
     Получить задачи из WEEEK
@@ -601,6 +646,7 @@ async def get_tasks(
         start_date: Начальная дата в формате dd.mm.yyyy (требуется с endDate)
         end_date: Конечная дата в формате dd.mm.yyyy (требуется с startDate)
         all_tasks: Показать все задачи включая удаленные и завершенные
+        session: Общая aiohttp сессия (по умолчанию - новая на запрос)
     
     Returns:
         Dict с ключами: success, tasks (список), hasMore (bool)
@@ -649,7 +695,7 @@ async def get_tasks(
     try:
         log.info(f"📤 [WEEEK] Запрос задач с параметрами: {params}")
         
-        async with aiohttp.ClientSession() as session:
+        async with _client_session(session) as session:
             async with session.get(url, headers=headers, params=params, timeout=aiohttp.ClientTimeout(total=30)) as response:
                 response_text = await response.text()
                 
@@ -680,10 +726,24 @@ async def get_tasks(
         log.error(f"❌ Traceback: {traceback.format_exc()}")
         return {"success": False, "tasks": [], "hasMore": False}
 
+def format_deadline_task(task: Dict) -> Dict:
+    """Задача WEEEK в формате get_project_deadlines (обратная совместимость)"""
+    return {
+        "id": task.get("id"),
+        "name": task.get("title", task.get("name", "Без названия")),
+        "project_id": task.get("projectId"),
+        "due_date": task.get("dueDate", task.get("day")),
+        "status": "completed" if task.get("completed") else "active"
+    }
+
+
 async def get_project_deadlines(days_ahead: int = 7) -> List[Dict]:
     """
-    Получить задачи с ближайшими дедлайнами (упрощенная версия)
-    Использует get_tasks() с фильтром по датам
+    Получить задачи с ближайшими дедлайнами
+    
+    Задачи берутся из локального зеркала (weeek_mirror), которое
+    обновляется инкрементально в фоне. Если зеркало еще ни разу не
+    синхронизировано, выполняется прямой запрос get_tasks() с фильтром по датам.
     
     Args:
         days_ahead: Количество дней вперед для проверки
@@ -691,6 +751,15 @@ async def get_project_deadlines(days_ahead: int = 7) -> List[Dict]:
     Returns:
         Список задач с дедлайнами
     """
+    if WEEEK_API_KEY:
+        try:
+            from services.helpers.weeek_mirror import get_weeek_mirror
+            tasks = await get_weeek_mirror().get_deadlines(days_ahead=days_ahead)
+            if tasks is not None:
+                return tasks
+        except Exception as e:
+            log.warning(f"⚠️ [WEEEK] Зеркало задач недоступно: {e}")
+    
     # Вычисляем даты в формате dd.mm.yyyy
     start_date = datetime.now().strftime("%d.%m.%Y")
     end_date = (datetime.now() + timedelta(days=days_ahead)).strftime("%d.%m.%Y")
@@ -707,19 +776,6 @@ async def get_project_deadlines(days_ahead: int = 7) -> List[Dict]:
     if result["success"]:
         tasks = result["tasks"]
         log.info(f"✅ [WEEEK] Найдено задач с дедлайнами: {len(tasks)}")
-        
-        # Форматируем для обратной совместимости
-        formatted_tasks = []
-        for task in tasks:
-            formatted_tasks.append({
-                "id": task.get("id"),
-                "name": task.get("title", task.get("name", "Без названия")),
-                "project_id": task.get("projectId"),
-                "due_date": task.get("dueDate", task.get("day")),
-                "status": "completed" if task.get("completed") else "active"
-            })
-        
-        return formatted_tasks
+        return [format_deadline_task(task) for task in tasks]
     else:
         return []
-
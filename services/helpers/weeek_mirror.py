@@ -0,0 +1,391 @@
+"""
+WEEEK Mirror
+Локальное зеркало задач и проектов WEEEK (sqlite).
+
+Запросы дедлайнов и календаря (get_project_deadlines, calendar_helper,
+scenario_workflows) читают задачи из индекса по дате дедлайна вместо
+запроса к WEEEK API на каждый вызов.
+
+- синхронизация проходит все страницы /tm/tasks (до hasMore=false) пачками
+  по WEEEK_SYNC_CONCURRENCY параллельных запросов в одной сессии
+  weeek_bulk.rate_limited_session (общий лимит частоты, повтор при 429/5xx);
+  проекты загружаются параллельно с задачами
+- в базу пишутся только задачи, у которых изменился updatedAt (курсор -
+  максимальный updatedAt в зеркале); пропавшие задачи удаляются только
+  после полного успешного прохода
+- устаревшее зеркало (старше WEEEK_MIRROR_TTL) отдается сразу, обновление
+  идет в фоне, одно на event loop
+- create_task / update_task / complete_task / delete_task обновляют зеркало сразу
+"""
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from services.helpers import weeek_helper
+from services.helpers.weeek_bulk import rate_limited_session
+
+log = logging.getLogger()
+
+WEEEK_MIRROR_DB = os.getenv("WEEEK_MIRROR_DB", "data/weeek_mirror.sqlite3")
+WEEEK_MIRROR_TTL = float(os.getenv("WEEEK_MIRROR_TTL", "300"))  # Секунды
+WEEEK_MIRROR_RETRY = float(os.getenv("WEEEK_MIRROR_RETRY", "60"))  # Пауза после неудачной первой синхронизации
+WEEEK_SYNC_CONCURRENCY = int(os.getenv("WEEEK_SYNC_CONCURRENCY", "4"))
+WEEEK_SYNC_PAGE_SIZE = int(os.getenv("WEEEK_SYNC_PAGE_SIZE", "100"))
+
+DATE_FIELDS = ("dueDate", "day", "date")
+
+
+# ===================== DATES =====================
+
+def parse_task_date(value: Any) -> Optional[date]:
+    """Дата задачи: ISO (2024-02-15, 2024-02-15T10:00:00Z) или dd.mm.yyyy"""
+    if not value or not isinstance(value, str):
+        return None
+    value = value.strip()
+    try:
+        if "T" in value:
+            return datetime.fromisoformat(value.replace("Z", "+00:00")).date()
+        if "." in value:
+            return datetime.strptime(value, "%d.%m.%Y").date()
+        return datetime.strptime(value[:10], "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
+def task_due_date(task: Dict) -> Optional[date]:
+    for name in DATE_FIELDS:
+        parsed = parse_task_date(task.get(name))
+        if parsed is not None:
+            return parsed
+    return None
+
+
+# ===================== STORE =====================
+
+class WeeekMirrorStore:
+    """Задачи и проекты WEEEK в sqlite с индексом по дате дедлайна"""
+
+    def __init__(self, db_path: str = WEEEK_MIRROR_DB):
+        self.db_path = db_path
+        if db_path != ":memory:":
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    id TEXT PRIMARY KEY,
+                    project_id TEXT,
+                    due_date TEXT,
+                    completed INTEGER NOT NULL DEFAULT 0,
+                    updated_at TEXT NOT NULL DEFAULT '',
+                    data TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_tasks_due ON tasks (completed, due_date);
+                CREATE TABLE IF NOT EXISTS projects (
+                    id TEXT PRIMARY KEY,
+                    updated_at TEXT NOT NULL DEFAULT '',
+                    data TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
+            """)
+
+    @staticmethod
+    def _task_row(task: Dict) -> Tuple:
+        due = task_due_date(task)
+        return (
+            str(task["id"]),
+            str(task.get("projectId") or ""),
+            due.isoformat() if due else None,
+            int(bool(task.get("completed"))),
+            str(task.get("updatedAt") or ""),
+            json.dumps(task, ensure_ascii=False)
+        )
+
+    def _upsert_locked(self, rows: List[Tuple]) -> None:
+        self._conn.executemany(
+            """INSERT INTO tasks (id, project_id, due_date, completed, updated_at, data)
+               VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT(id) DO UPDATE SET project_id=excluded.project_id, due_date=excluded.due_date,
+                   completed=excluded.completed, updated_at=excluded.updated_at, data=excluded.data""",
+            rows
+        )
+
+    def upsert_task(self, task: Dict) -> None:
+        with self._lock, self._conn:
+            self._upsert_locked([self._task_row(task)])
+
+    def remove_task(self, task_id: Any) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM tasks WHERE id = ?", (str(task_id),))
+
+    def apply_tasks(self, tasks: List[Dict], complete: bool) -> Dict[str, int]:
+        """
+        Применить задачи из WEEEK: пишутся только задачи с новым updatedAt
+
+        Args:
+            tasks: Задачи из /tm/tasks
+            complete: Пройдены все страницы (задачи, которых нет в tasks, удаляются)
+
+        Returns:
+            {"changed": n, "unchanged": n, "removed": n}
+        """
+        with self._lock, self._conn:
+            known = dict(self._conn.execute("SELECT id, updated_at FROM tasks").fetchall())
+            rows, seen = [], set()
+            for task in tasks:
+                if task.get("id") is None:
+                    continue
+                row = self._task_row(task)
+                seen.add(row[0])
+                # Без updatedAt изменение не определить - перезаписываем
+                if not row[4] or known.get(row[0]) != row[4]:
+                    rows.append(row)
+            if rows:
+                self._upsert_locked(rows)
+            removed = [task_id for task_id in known if task_id not in seen] if complete else []
+            if removed:
+                self._conn.executemany("DELETE FROM tasks WHERE id = ?", [(task_id,) for task_id in removed])
+            cursor = self._conn.execute("SELECT MAX(updated_at) FROM tasks").fetchone()[0] or ""
+            self._set_meta_locked("tasks_cursor", cursor)
+        return {"changed": len(rows), "unchanged": len(seen) - len(rows), "removed": len(removed)}
+
+    def apply_projects(self, projects: List[Dict]) -> None:
+        rows = [
+            (str(project["id"]), str(project.get("updatedAt") or ""), json.dumps(project, ensure_ascii=False))
+            for project in projects if project.get("id") is not None
+        ]
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM projects")
+            self._conn.executemany("INSERT INTO projects (id, updated_at, data) VALUES (?, ?, ?)", rows)
+
+    def deadlines(self, start: date, end: date) -> List[Dict]:
+        """Незавершенные задачи с дедлайном в [start, end], по дате"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM tasks WHERE completed = 0 AND due_date BETWEEN ? AND ? ORDER BY due_date, id",
+                (start.isoformat(), end.isoformat())
+            ).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def projects(self) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute("SELECT data FROM projects ORDER BY id").fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def task_count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+    def _set_meta_locked(self, key: str, value: Any) -> None:
+        self._conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+            (key, str(value))
+        )
+
+    def set_meta(self, key: str, value: Any) -> None:
+        with self._lock, self._conn:
+            self._set_meta_locked(key, value)
+
+    def get_meta(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def last_synced_at(self) -> Optional[float]:
+        value = self.get_meta("synced_at")
+        return float(value) if value else None
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+# ===================== PAGING =====================
+
+async def fetch_all_tasks(
+    fetch: Callable[..., Awaitable[Dict]],
+    session: Optional[aiohttp.ClientSession] = None,
+    page_size: int = WEEEK_SYNC_PAGE_SIZE,
+    concurrency: int = WEEEK_SYNC_CONCURRENCY
+) -> Tuple[List[Dict], bool]:
+    """
+    Все страницы /tm/tasks
+
+    Страницы запрашиваются пачками по concurrency штук, пока страница не
+    вернет hasMore=false (или неполную страницу).
+
+    Returns:
+        (задачи без дубликатов, пройдены ли все страницы без ошибок)
+    """
+    tasks: Dict[str, Dict] = {}
+    offset = 0
+    while True:
+        offsets = [offset + i * page_size for i in range(max(concurrency, 1))]
+        pages = await asyncio.gather(*[
+            fetch(per_page=page_size, offset=page_offset, session=session) for page_offset in offsets
+        ])
+        for page in pages:
+            if not page.get("success"):
+                return list(tasks.values()), False
+            for task in page.get("tasks") or []:
+                if task.get("id") is not None:
+                    tasks[str(task["id"])] = task
+            if not page.get("hasMore") or len(page.get("tasks") or []) < page_size:
+                return list(tasks.values()), True
+        offset = offsets[-1] + page_size
+
+
+# ===================== MIRROR =====================
+
+class WeeekMirror:
+    """Зеркало WEEEK: синхронизация и запросы дедлайнов"""
+
+    def __init__(
+        self,
+        store: WeeekMirrorStore,
+        fetch_tasks: Optional[Callable[..., Awaitable[Dict]]] = None,
+        fetch_projects: Optional[Callable[..., Awaitable[List[Dict]]]] = None,
+        ttl: float = WEEEK_MIRROR_TTL,
+        retry: float = WEEEK_MIRROR_RETRY,
+        page_size: int = WEEEK_SYNC_PAGE_SIZE,
+        concurrency: int = WEEEK_SYNC_CONCURRENCY
+    ):
+        self.store = store
+        self.fetch_tasks = fetch_tasks
+        self.fetch_projects = fetch_projects
+        self.ttl = ttl
+        self.retry = retry
+        self.page_size = page_size
+        self.concurrency = concurrency
+        self._stale = False
+        self._last_failure = 0.0
+        # Текущая синхронизация по event loop (бот и backend работают в разных loop)
+        self._refreshing: Dict[int, asyncio.Task] = {}
+        self.stats = {"syncs": 0, "failures": 0, "background": 0, "served": 0}
+
+    def invalidate(self) -> None:
+        """Следующий запрос запустит фоновую синхронизацию"""
+        self._stale = True
+
+    def is_stale(self) -> bool:
+        synced_at = self.store.last_synced_at()
+        return self._stale or synced_at is None or time.time() - synced_at > self.ttl
+
+    async def _sync(self) -> bool:
+        started = time.perf_counter()
+        fetch_tasks = self.fetch_tasks or weeek_helper.get_tasks
+        fetch_projects = self.fetch_projects or weeek_helper.get_projects
+        async with rate_limited_session() as session:
+            (tasks, complete), projects = await asyncio.gather(
+                fetch_all_tasks(fetch_tasks, session, self.page_size, self.concurrency),
+                fetch_projects(session=session)
+            )
+        self.stats["syncs"] += 1
+        if not complete:
+            self._last_failure = time.time()
+            self.stats["failures"] += 1
+            if not tasks:
+                log.warning("⚠️ [WEEEK Mirror] Не удалось получить задачи, зеркало не обновлено")
+                return False
+
+        # Неполный проход обновляет полученные задачи, но не удаляет остальные
+        changes = self.store.apply_tasks(tasks, complete=complete)
+        if projects:
+            self.store.apply_projects(projects)
+        if complete:
+            self._stale = False
+            self.store.set_meta("synced_at", time.time())
+        log.info(
+            f"✅ [WEEEK Mirror] Задач: {len(tasks)} (изменено {changes['changed']}, удалено {changes['removed']}), "
+            f"проектов: {len(projects)}, {(time.perf_counter() - started) * 1000:.0f} мс"
+        )
+        return complete
+
+    def _running_sync(self) -> Optional[asyncio.Task]:
+        task = self._refreshing.get(id(asyncio.get_running_loop()))
+        return task if task is not None and not task.done() else None
+
+    def _start_sync(self) -> asyncio.Task:
+        self._refreshing = {key: task for key, task in self._refreshing.items() if not task.done()}
+        task = self._refreshing[id(asyncio.get_running_loop())] = asyncio.ensure_future(self._sync())
+        task.add_done_callback(self._log_sync_error)
+        return task
+
+    def _log_sync_error(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            log.error(f"❌ [WEEEK Mirror] Ошибка синхронизации: {task.exception()}")
+            self._last_failure = time.time()
+
+    async def refresh(self) -> bool:
+        """Синхронизировать зеркало (параллельные вызовы в одном loop ждут одну синхронизацию)"""
+        task = self._running_sync() or self._start_sync()
+        try:
+            return await asyncio.shield(task)
+        except Exception:
+            return False
+
+    def _refresh_in_background(self) -> None:
+        if self._running_sync() is not None or time.time() - self._last_failure < self.retry:
+            return
+        self.stats["background"] += 1
+        self._start_sync()
+
+    async def get_deadlines(self, days_ahead: int = 7) -> Optional[List[Dict]]:
+        """
+        Задачи с дедлайном в ближайшие days_ahead дней (формат get_project_deadlines)
+
+        Returns:
+            Список задач или None, если зеркало ни разу не синхронизировано
+        """
+        if self.store.last_synced_at() is None:
+            if time.time() - self._last_failure < self.retry:
+                return None
+            if not await self.refresh():
+                return None
+        elif self.is_stale():
+            self._refresh_in_background()
+
+        today = datetime.now().date()
+        tasks = self.store.deadlines(today, today + timedelta(days=days_ahead))
+        self.stats["served"] += 1
+        return [weeek_helper.format_deadline_task(task) for task in tasks]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "tasks": self.store.task_count(),
+            "cursor": self.store.get_meta("tasks_cursor"),
+            "synced_at": self.store.last_synced_at(),
+            "stale": self.is_stale()
+        }
+
+
+_mirror: Optional[WeeekMirror] = None
+_mirror_lock = threading.Lock()
+
+
+def get_weeek_mirror() -> WeeekMirror:
+    """Зеркало WEEEK (Singleton)"""
+    global _mirror
+    if _mirror is None:
+        with _mirror_lock:
+            if _mirror is None:
+                _mirror = WeeekMirror(WeeekMirrorStore())
+    return _mirror
+
+
+def peek_weeek_mirror() -> Optional[WeeekMirror]:
+    """Зеркало, если оно уже создано (без открытия базы)"""
+    return _mirror
@@ -56,6 +56,7 @@ from services.rag.qdrant_helper import (
     COLLECTION_NAME,
     EMBEDDING_DIMENSION
 )
+from services.rag.retrieval_cache import invalidate_collection
 
 # ===================== DOCUMENT PARSING =====================
 
@@ -276,6 +277,7 @@ def index_document(
             collection_name=COLLECTION_NAME,
             points=points
         )
+        invalidate_collection(COLLECTION_NAME)
         log.info(f"✅ Индексировано {len(points)} чанков из {file_path.name}")
         return True
     except Exception as e:
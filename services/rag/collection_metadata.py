@@ -0,0 +1,168 @@
+"""
+Кэш метаданных коллекций Qdrant.
+
+Поиск не проверяет существование коллекции перед каждым запросом: размерность,
+payload индексы и наличие точек с source_type читаются один раз (ensure_collection
+при запуске или первый поиск) и хранятся в процессе. Кэш сбрасывается при
+изменении схемы (создание коллекции, индекса, индексация услуг), при ответе
+404 от Qdrant и по истечении QDRANT_METADATA_TTL (изменения из других процессов).
+"""
+
+import os
+import time
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+METADATA_TTL = float(os.getenv("QDRANT_METADATA_TTL", "600"))
+
+
+def is_not_found_error(error: Exception) -> bool:
+    """Ответ Qdrant 404 (коллекция не найдена)"""
+    if getattr(error, "status_code", None) == 404:
+        return True
+    text = str(error).lower()
+    return "404" in text or "not found" in text or "doesn't exist" in text
+
+
+@dataclass
+class CollectionMetadata:
+    """Метаданные коллекции, нужные для поиска"""
+    name: str
+    exists: bool
+    dimension: Optional[int] = None
+    payload_indexes: Dict[str, str] = field(default_factory=dict)  # поле -> тип индекса
+    has_source_type: bool = False  # Есть точки услуг с payload source_type
+    fetched_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.fetched_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "exists": self.exists,
+            "dimension": self.dimension,
+            "payload_indexes": dict(self.payload_indexes),
+            "has_source_type": self.has_source_type,
+            "age": round(self.age, 1)
+        }
+
+
+def _vector_size(info) -> Optional[int]:
+    metadata = getattr(info.config, "metadata", None) or {}
+    if metadata.get("embedding_dimension"):
+        return int(metadata["embedding_dimension"])
+    vectors = info.config.params.vectors
+    if isinstance(vectors, dict):
+        # Именованные векторы - берем первый
+        vectors = next(iter(vectors.values()), None)
+    return getattr(vectors, "size", None)
+
+
+def fetch_collection_metadata(client, collection_name: str) -> CollectionMetadata:
+    """
+    Метаданные коллекции из Qdrant (get_collection и, если в коллекции есть точки, count услуг)
+
+    Raises:
+        Exception: ошибки подключения (404 превращается в exists=False)
+    """
+    try:
+        info = client.get_collection(collection_name)
+    except Exception as e:
+        if is_not_found_error(e):
+            return CollectionMetadata(name=collection_name, exists=False)
+        raise
+
+    payload_indexes = {
+        name: str(getattr(schema, "data_type", schema))
+        for name, schema in (getattr(info, "payload_schema", None) or {}).items()
+    }
+    has_source_type = False
+    if (getattr(info, "points_count", None) or 0) > 0:
+        # Индекс source_type не означает, что точки услуг есть (коллекцию могли очистить
+        # или заполнить старыми данными без маркера) - решаем только по count
+        from qdrant_client.models import Filter, FieldCondition, MatchValue
+        counted = client.count(
+            collection_name=collection_name,
+            count_filter=Filter(must=[FieldCondition(key="source_type", match=MatchValue(value="service"))]),
+            exact=False
+        )
+        has_source_type = counted.count > 0
+
+    return CollectionMetadata(
+        name=collection_name,
+        exists=True,
+        dimension=_vector_size(info),
+        payload_indexes=payload_indexes,
+        has_source_type=has_source_type
+    )
+
+
+class CollectionMetadataCache:
+    """Метаданные коллекций в памяти процесса"""
+
+    def __init__(self, ttl: float = METADATA_TTL):
+        self.ttl = ttl
+        self._items: Dict[str, CollectionMetadata] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "fetches": 0, "invalidations": 0}
+
+    def get(self, collection_name: str) -> Optional[CollectionMetadata]:
+        with self._lock:
+            metadata = self._items.get(collection_name)
+            if metadata is None or (self.ttl and metadata.age > self.ttl):
+                return None
+            self.stats["hits"] += 1
+            return metadata
+
+    def set(self, metadata: CollectionMetadata) -> CollectionMetadata:
+        with self._lock:
+            self._items[metadata.name] = metadata
+        return metadata
+
+    def invalidate(self, collection_name: Optional[str] = None) -> None:
+        """Сбросить метаданные коллекции (или всех коллекций)"""
+        with self._lock:
+            if collection_name is None:
+                self._items.clear()
+            else:
+                self._items.pop(collection_name, None)
+            self.stats["invalidations"] += 1
+
+    def refresh(self, client, collection_name: str) -> CollectionMetadata:
+        """Перечитать метаданные из Qdrant"""
+        metadata = fetch_collection_metadata(client, collection_name)
+        with self._lock:
+            self.stats["fetches"] += 1
+        logger.info(
+            f"📐 [Qdrant] Метаданные '{collection_name}': exists={metadata.exists}, "
+            f"dimension={metadata.dimension}, indexes={sorted(metadata.payload_indexes)}, "
+            f"source_type={metadata.has_source_type}"
+        )
+        return self.set(metadata)
+
+    def get_or_fetch(self, client, collection_name: str) -> CollectionMetadata:
+        return self.get(collection_name) or self.refresh(client, collection_name)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, "collections": {name: item.to_dict() for name, item in self._items.items()}}
+
+
+_metadata_cache: Optional[CollectionMetadataCache] = None
+_metadata_cache_lock = threading.Lock()
+
+
+def get_collection_metadata_cache() -> CollectionMetadataCache:
+    """Получить кэш метаданных коллекций (Singleton)"""
+    global _metadata_cache
+    if _metadata_cache is None:
+        with _metadata_cache_lock:
+            if _metadata_cache is None:
+                _metadata_cache = CollectionMetadataCache()
+    return _metadata_cache
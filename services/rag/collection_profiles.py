@@ -0,0 +1,273 @@
+"""
+Профили хранения коллекций Qdrant.
+
+Профиль описывает, как хранить и искать векторы коллекции базы знаний:
+квантование (scalar/binary) с rescoring, хранение векторов на диске,
+параметры HNSW (m, ef_construct) и ef на этапе поиска.
+Профили задаются в config/qdrant.yaml (qdrant.collection_profiles),
+активный профиль - qdrant.collection_profile.
+"""
+
+import logging
+from typing import Any, Dict, Optional
+
+from config import load_config
+
+logger = logging.getLogger(__name__)
+
+try:
+    from qdrant_client.models import (
+        Distance,
+        VectorParams,
+        HnswConfigDiff,
+        ScalarQuantization,
+        ScalarQuantizationConfig,
+        ScalarType,
+        BinaryQuantization,
+        BinaryQuantizationConfig,
+        SearchParams,
+        QuantizationSearchParams,
+    )
+    QDRANT_MODELS_AVAILABLE = True
+except ImportError:
+    QDRANT_MODELS_AVAILABLE = False
+
+DEFAULT_PROFILE_NAME = "default"
+
+# Профиль по умолчанию повторяет прежнее поведение: float32 в памяти, HNSW по умолчанию
+DEFAULT_PROFILE: Dict[str, Any] = {
+    "on_disk": False,
+    "on_disk_payload": False,
+    "quantization": None,
+    "hnsw": {},
+    "search": {}
+}
+
+
+def get_profile_name() -> str:
+    """Имя активного профиля из config/qdrant.yaml"""
+    settings = load_config("qdrant").get("qdrant", {})
+    return settings.get("collection_profile") or DEFAULT_PROFILE_NAME
+
+
+def get_collection_profile(name: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Возвращает профиль коллекции по имени (по умолчанию - активный).
+
+    Args:
+        name: Имя профиля из qdrant.collection_profiles
+
+    Returns:
+        Словарь профиля (недостающие поля заполнены значениями по умолчанию)
+    """
+    name = name or get_profile_name()
+    settings = load_config("qdrant").get("qdrant", {})
+    profiles = settings.get("collection_profiles", {}) or {}
+
+    if name not in profiles:
+        if name != DEFAULT_PROFILE_NAME:
+            logger.warning(f"⚠️ Профиль коллекции '{name}' не найден, используется '{DEFAULT_PROFILE_NAME}'")
+        profile = {}
+        name = DEFAULT_PROFILE_NAME
+    else:
+        profile = profiles[name] or {}
+
+    return {**DEFAULT_PROFILE, **profile, "name": name}
+
+
+def _to_bool(value: Any) -> bool:
+    # Значения из YAML с подстановкой ${VAR} приходят строками
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+
+def build_collection_params(
+    profile: Dict[str, Any],
+    dimension: int,
+    metadata: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Формирует аргументы для client.create_collection по профилю.
+
+    Args:
+        profile: Профиль из get_collection_profile
+        dimension: Размерность векторов коллекции
+        metadata: Метаданные коллекции (модель и размерность эмбеддингов)
+
+    Returns:
+        kwargs для create_collection (без collection_name)
+    """
+    params: Dict[str, Any] = {
+        "vectors_config": VectorParams(
+            size=dimension,
+            distance=Distance.COSINE,
+            on_disk=_to_bool(profile.get("on_disk", False)) or None
+        )
+    }
+
+    if _to_bool(profile.get("on_disk_payload", False)):
+        params["on_disk_payload"] = True
+
+    hnsw = profile.get("hnsw") or {}
+    if hnsw:
+        params["hnsw_config"] = HnswConfigDiff(
+            m=hnsw.get("m"),
+            ef_construct=hnsw.get("ef_construct"),
+            on_disk=_to_bool(hnsw["on_disk"]) if "on_disk" in hnsw else None
+        )
+
+    quantization = profile.get("quantization") or {}
+    q_type = (quantization.get("type") or "").lower()
+    if q_type == "scalar":
+        params["quantization_config"] = ScalarQuantization(
+            scalar=ScalarQuantizationConfig(
+                type=ScalarType.INT8,
+                quantile=quantization.get("quantile"),
+                always_ram=_to_bool(quantization.get("always_ram", True))
+            )
+        )
+    elif q_type == "binary":
+        params["quantization_config"] = BinaryQuantization(
+            binary=BinaryQuantizationConfig(
+                always_ram=_to_bool(quantization.get("always_ram", True))
+            )
+        )
+    elif q_type:
+        logger.warning(f"⚠️ Неизвестный тип квантования '{q_type}' в профиле '{profile.get('name')}', квантование отключено")
+
+    if metadata:
+        params["metadata"] = {**metadata, "profile": profile.get("name")}
+
+    return params
+
+
+def build_search_params(profile: Optional[Dict[str, Any]] = None) -> Optional["SearchParams"]:
+    """
+    Формирует параметры поиска (hnsw_ef, rescoring квантованных векторов) по профилю.
+
+    Args:
+        profile: Профиль (по умолчанию - активный)
+
+    Returns:
+        SearchParams или None, если профиль не задает параметров поиска
+    """
+    if not QDRANT_MODELS_AVAILABLE:
+        return None
+
+    profile = profile or get_collection_profile()
+    search = profile.get("search") or {}
+    quantization = profile.get("quantization") or {}
+
+    hnsw_ef = search.get("ef")
+    exact = _to_bool(search.get("exact", False))
+    quantization_params = None
+    if quantization.get("type"):
+        quantization_params = QuantizationSearchParams(
+            ignore=False,
+            rescore=_to_bool(search.get("rescore", True)),
+            oversampling=search.get("oversampling")
+        )
+
+    if hnsw_ef is None and not exact and quantization_params is None:
+        return None
+
+    return SearchParams(
+        hnsw_ef=int(hnsw_ef) if hnsw_ef is not None else None,
+        exact=exact,
+        quantization=quantization_params
+    )
+
+
+_active_search_params = None
+_active_search_params_loaded = False
+
+
+def get_active_search_params() -> Optional["SearchParams"]:
+    """Параметры поиска активного профиля (вычисляются один раз на процесс)"""
+    global _active_search_params, _active_search_params_loaded
+    if not _active_search_params_loaded:
+        try:
+            _active_search_params = build_search_params()
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось построить параметры поиска профиля: {e}")
+            _active_search_params = None
+        _active_search_params_loaded = True
+    return _active_search_params
+
+
+def get_collection_dimension(client, collection_name: str) -> int:
+    """Размерность векторов существующей коллекции"""
+    info = client.get_collection(collection_name)
+    vectors = info.config.params.vectors
+    return vectors.size
+
+
+def copy_points(
+    client,
+    source: str,
+    target: str,
+    batch_size: int = 256,
+    transform_vector=None
+) -> int:
+    """
+    Копирует все точки (векторы + payload) из одной коллекции в другую.
+
+    Args:
+        client: QdrantClient
+        source: Исходная коллекция
+        target: Целевая коллекция
+        batch_size: Размер батча scroll/upsert
+        transform_vector: Опциональная функция преобразования вектора (например, усечение размерности)
+
+    Returns:
+        Количество скопированных точек
+    """
+    from qdrant_client.models import PointStruct
+
+    copied = 0
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=source,
+            limit=batch_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True
+        )
+        if not points:
+            break
+
+        batch = [
+            PointStruct(
+                id=point.id,
+                vector=transform_vector(point.vector) if transform_vector else point.vector,
+                payload=point.payload
+            )
+            for point in points
+        ]
+        client.upsert(collection_name=target, points=batch, wait=True)
+        copied += len(batch)
+        logger.info(f"📦 Скопировано {copied} точек: {source} → {target}")
+
+        if offset is None:
+            break
+
+    return copied
+
+
+def recreate_collection(
+    client,
+    collection_name: str,
+    profile: Dict[str, Any],
+    dimension: int,
+    metadata: Optional[Dict[str, Any]] = None
+) -> None:
+    """Удаляет (если есть) и создает коллекцию заново с указанным профилем"""
+    if client.collection_exists(collection_name):
+        client.delete_collection(collection_name)
+    client.create_collection(
+        collection_name=collection_name,
+        **build_collection_params(profile, dimension, metadata)
+    )
+    logger.info(f"✅ Коллекция '{collection_name}' создана (профиль: {profile['name']}, размерность: {dimension})")
@@ -0,0 +1,306 @@
+"""
+Упаковка найденных документов в контекст промпта с бюджетом токенов.
+
+Отбор документов выполняется через MMR (maximal marginal relevance) по уже
+полученным из Qdrant векторам, почти-дубликаты пропускаются, а соседние чанки
+одного источника склеиваются. Размер контекста ограничен бюджетом токенов,
+поэтому размер промпта и время ответа LLM не растут вместе с top_k и chunk_size.
+"""
+
+import math
+import re
+import logging
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+    TIKTOKEN_AVAILABLE = True
+except Exception:
+    _ENCODING = None
+    TIKTOKEN_AVAILABLE = False
+
+# Среднее количество символов на токен для приблизительного подсчета
+# (для русского текста токенизаторы дают ~3 символа на токен)
+CHARS_PER_TOKEN = 3.0
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def count_tokens(text: str) -> int:
+    """
+    Подсчитывает количество токенов в тексте.
+    Использует tiktoken если установлен, иначе - приблизительную оценку по символам.
+    """
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return int(math.ceil(len(text) / CHARS_PER_TOKEN))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Обрезает текст до max_tokens токенов (по границе слова, если возможно)"""
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+    if _ENCODING is not None:
+        truncated = _ENCODING.decode(_ENCODING.encode(text)[:max_tokens])
+    else:
+        truncated = text[:int(max_tokens * CHARS_PER_TOKEN)]
+    # Не обрываем слово посередине
+    cut = truncated.rfind(" ")
+    if cut > len(truncated) // 2:
+        truncated = truncated[:cut]
+    return truncated.rstrip() + "..."
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    """Косинусное сходство двух векторов"""
+    dot = 0.0
+    norm_a = 0.0
+    norm_b = 0.0
+    for x, y in zip(a, b):
+        dot += x * y
+        norm_a += x * x
+        norm_b += y * y
+    if norm_a == 0 or norm_b == 0:
+        return 0.0
+    return dot / math.sqrt(norm_a * norm_b)
+
+
+def _jaccard(a: set, b: set) -> float:
+    """Коэффициент Жаккара для множеств слов"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _doc_source(doc: Dict[str, Any]) -> str:
+    return doc.get("source_url") or doc.get("file_name") or doc.get("title") or ""
+
+
+def _join_overlapping(left: str, right: str, max_overlap: int = 200) -> str:
+    """Склеивает два соседних чанка, убирая перекрытие (chunk_overlap)"""
+    limit = min(max_overlap, len(left), len(right))
+    for size in range(limit, 0, -1):
+        if left.endswith(right[:size]):
+            return left + right[size:]
+    return left + "\n" + right
+
+
+class ContextPacker:
+    """
+    Собирает контекст для LLM из найденных документов в пределах бюджета токенов.
+
+    Алгоритм:
+    1. MMR-отбор: баланс между релевантностью (score) и новизной относительно уже
+       выбранных документов; документы со сходством выше duplicate_threshold пропускаются.
+    2. Соседние чанки одного источника (chunk_index подряд) объединяются.
+    3. Документы добавляются по порядку, пока не исчерпан бюджет max_tokens;
+       последний документ при необходимости обрезается.
+
+    Для сходства используется поле "vector" документа (если поиск вернул векторы),
+    иначе - пересечение множеств слов.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 1500,
+        mmr_lambda: float = 0.7,
+        duplicate_threshold: float = 0.95,
+        merge_adjacent: bool = True,
+        min_doc_tokens: int = 50
+    ):
+        """
+        Args:
+            max_tokens: Бюджет токенов на весь контекст
+            mmr_lambda: Вес релевантности в MMR (1.0 = только релевантность, 0.0 = только разнообразие)
+            duplicate_threshold: Порог сходства, выше которого документ считается дубликатом
+            merge_adjacent: Объединять ли соседние чанки одного источника
+            min_doc_tokens: Минимальный остаток бюджета, ради которого стоит обрезать документ
+        """
+        self.max_tokens = max_tokens
+        self.mmr_lambda = mmr_lambda
+        self.duplicate_threshold = duplicate_threshold
+        self.merge_adjacent = merge_adjacent
+        self.min_doc_tokens = min_doc_tokens
+
+    def _similarity(self, a: Dict[str, Any], b: Dict[str, Any]) -> float:
+        vec_a = a.get("vector")
+        vec_b = b.get("vector")
+        if vec_a and vec_b and len(vec_a) == len(vec_b):
+            return _cosine(vec_a, vec_b)
+        return _jaccard(a["_words"], b["_words"])
+
+    def select_mmr(self, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Упорядочивает документы по MMR и отбрасывает почти-дубликаты.
+
+        Args:
+            documents: Найденные документы (с полями text, score и опционально vector)
+
+        Returns:
+            Документы в порядке MMR без дубликатов
+        """
+        candidates = []
+        for doc in documents:
+            text = doc.get("text", "")
+            if not text:
+                continue
+            candidates.append({**doc, "_words": set(_WORD_RE.findall(text.lower()))})
+
+        if not candidates:
+            return []
+
+        # Нормализуем score в [0, 1], чтобы они были сопоставимы со сходством
+        scores = [float(c.get("score", 0.0) or 0.0) for c in candidates]
+        max_score, min_score = max(scores), min(scores)
+        score_range = max_score - min_score
+        for c, s in zip(candidates, scores):
+            c["_relevance"] = (s - min_score) / score_range if score_range > 0 else 1.0
+
+        selected: List[Dict[str, Any]] = []
+        remaining = candidates
+        while remaining:
+            best_idx = -1
+            best_value = -math.inf
+            duplicates = []
+            for idx, cand in enumerate(remaining):
+                max_sim = max((self._similarity(cand, s) for s in selected), default=0.0)
+                if max_sim >= self.duplicate_threshold:
+                    duplicates.append(idx)
+                    continue
+                value = self.mmr_lambda * cand["_relevance"] - (1 - self.mmr_lambda) * max_sim
+                if value > best_value:
+                    best_value = value
+                    best_idx = idx
+
+            for idx in duplicates:
+                logger.debug(f"Пропущен дубликат контекста: {_doc_source(remaining[idx])}")
+
+            if best_idx < 0:
+                break
+
+            selected.append(remaining[best_idx])
+            skip = set(duplicates) | {best_idx}
+            remaining = [c for i, c in enumerate(remaining) if i not in skip]
+
+        for doc in selected:
+            doc.pop("_words", None)
+            doc.pop("_relevance", None)
+        return selected
+
+    def merge_adjacent_chunks(self, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Объединяет соседние чанки одного источника в один документ.
+        Позиция объединенного документа - позиция его первого (по MMR) чанка.
+        """
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        order: List[str] = []
+        for doc in documents:
+            key = _doc_source(doc)
+            if key not in groups:
+                groups[key] = []
+                order.append(key)
+            groups[key].append(doc)
+
+        merged: List[Dict[str, Any]] = []
+        for key in order:
+            group = groups[key]
+            if not key or len(group) == 1 or any(d.get("chunk_index") is None for d in group):
+                merged.extend(group)
+                continue
+
+            group = sorted(group, key=lambda d: d["chunk_index"])
+            current = dict(group[0])
+            for doc in group[1:]:
+                if doc["chunk_index"] == current["chunk_index"] + 1:
+                    current["text"] = _join_overlapping(current["text"], doc["text"])
+                    current["chunk_index"] = doc["chunk_index"]
+                    current["score"] = max(current.get("score", 0.0), doc.get("score", 0.0))
+                    current["merged_chunks"] = current.get("merged_chunks", 1) + 1
+                else:
+                    merged.append(current)
+                    current = dict(doc)
+            merged.append(current)
+        return merged
+
+    def pack(self, documents: List[Dict[str, Any]], max_tokens: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Отбирает документы для контекста в пределах бюджета токенов.
+
+        Args:
+            documents: Найденные документы
+            max_tokens: Бюджет токенов (по умолчанию self.max_tokens)
+
+        Returns:
+            Список документов (без поля vector), суммарно не превышающий бюджет
+        """
+        budget = max_tokens if max_tokens is not None else self.max_tokens
+        selected = self.select_mmr(documents)
+        if self.merge_adjacent:
+            selected = self.merge_adjacent_chunks(selected)
+
+        packed: List[Dict[str, Any]] = []
+        used = 0
+        for doc in selected:
+            doc = {k: v for k, v in doc.items() if k != "vector"}
+            tokens = count_tokens(doc["text"])
+            remaining = budget - used
+            if tokens <= remaining:
+                doc["tokens"] = tokens
+                packed.append(doc)
+                used += tokens
+                continue
+            if remaining >= self.min_doc_tokens:
+                doc["text"] = truncate_to_tokens(doc["text"], remaining)
+                doc["tokens"] = count_tokens(doc["text"])
+                doc["truncated"] = True
+                packed.append(doc)
+                used += doc["tokens"]
+            break
+
+        logger.info(
+            f"📦 [Context] Упаковано {len(packed)} из {len(documents)} документов, "
+            f"{used}/{budget} токенов"
+        )
+        return packed
+
+
+def load_packer_config(config_path: str = "config.yaml") -> Dict[str, Any]:
+    """Загружает секцию rag.context_packing из config.yaml"""
+    path = Path(config_path)
+    if not path.is_absolute() and not path.exists():
+        path = Path(__file__).parent.parent.parent / config_path
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            config = yaml.safe_load(f) or {}
+        return config.get("rag", {}).get("context_packing", {}) or {}
+    except Exception as e:
+        logger.warning(f"Не удалось загрузить настройки упаковки контекста: {e}")
+        return {}
+
+
+_packer: Optional[ContextPacker] = None
+
+
+def get_context_packer() -> ContextPacker:
+    """Возвращает общий экземпляр ContextPacker с настройками из config.yaml"""
+    global _packer
+    if _packer is None:
+        config = load_packer_config()
+        _packer = ContextPacker(
+            max_tokens=config.get("max_tokens", 1500),
+            mmr_lambda=config.get("mmr_lambda", 0.7),
+            duplicate_threshold=config.get("duplicate_threshold", 0.95),
+            merge_adjacent=config.get("merge_adjacent", True),
+            min_doc_tokens=config.get("min_doc_tokens", 50)
+        )
+    return _packer
@@ -0,0 +1,130 @@
+"""
+Управление размерностью эмбеддингов.
+
+Модели с Matryoshka-обучением (qwen3-embedding, text-embedding-3) допускают
+усечение вектора до первых N координат без переобучения. Вместо дополнения
+нулями до размерности коллекции вектор усекается до целевой размерности и
+заново нормализуется (L2), а размерность и модель записываются в метаданные
+коллекции Qdrant. Upsert векторов другой размерности отклоняется.
+
+Настройки - config/llm.yaml (llm.embeddings): dimension, request_dimensions.
+"""
+
+import math
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from config import load_config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DIMENSION = 1536
+
+
+class EmbeddingDimensionError(ValueError):
+    """Размерность вектора не совпадает с размерностью коллекции"""
+
+
+def _to_bool(value: Any) -> bool:
+    # Значения из YAML с подстановкой ${VAR} приходят строками
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+
+def get_embedding_settings() -> Dict[str, Any]:
+    """
+    Настройки размерности эмбеддингов из config/llm.yaml.
+
+    Returns:
+        Словарь: model, dimension, request_dimensions
+    """
+    embeddings = load_config("llm").get("llm", {}).get("embeddings", {}) or {}
+    target = load_config("qdrant").get("qdrant", {}).get("target_dimension") or DEFAULT_DIMENSION
+    return {
+        "model": embeddings.get("model"),
+        "dimension": int(embeddings.get("dimension") or target),
+        "request_dimensions": _to_bool(embeddings.get("request_dimensions", False))
+    }
+
+
+def l2_normalize(vector: Sequence[float]) -> List[float]:
+    """Нормализует вектор к единичной длине (нулевой вектор возвращается как есть)"""
+    norm = math.sqrt(sum(x * x for x in vector))
+    if norm == 0:
+        return list(vector)
+    return [x / norm for x in vector]
+
+
+def reduce_dimension(embedding: Sequence[float], dimension: int) -> List[float]:
+    """
+    Приводит эмбеддинг к целевой размерности (Matryoshka-усечение).
+
+    Args:
+        embedding: Вектор от модели (нативная или уже усеченная API размерность)
+        dimension: Целевая размерность коллекции
+
+    Returns:
+        Усеченный и нормализованный вектор
+
+    Raises:
+        EmbeddingDimensionError: если вектор короче целевой размерности
+            (дополнение нулями не выполняется - коллекцию нужно создать под модель)
+    """
+    size = len(embedding)
+    if size < dimension:
+        raise EmbeddingDimensionError(
+            f"Модель вернула вектор размерности {size}, что меньше целевой {dimension}. "
+            f"Уменьшите llm.embeddings.dimension и переиндексируйте коллекцию "
+            f"(scripts/reindex_embedding_dimension.py)"
+        )
+    if size == dimension:
+        return list(embedding)
+    return l2_normalize(embedding[:dimension])
+
+
+def build_collection_metadata(dimension: int, model: Optional[str] = None) -> Dict[str, Any]:
+    """Метаданные коллекции Qdrant с информацией об эмбеддингах"""
+    metadata: Dict[str, Any] = {"embedding_dimension": dimension}
+    if model:
+        metadata["embedding_model"] = model
+    return metadata
+
+
+def get_recorded_dimension(client, collection_name: str) -> Optional[int]:
+    """
+    Размерность коллекции: из метаданных (embedding_dimension), иначе из параметров векторов.
+
+    Returns:
+        Размерность или None, если коллекция недоступна
+    """
+    try:
+        info = client.get_collection(collection_name)
+    except Exception as e:
+        logger.debug(f"Не удалось получить информацию о коллекции '{collection_name}': {e}")
+        return None
+
+    metadata = getattr(info.config, "metadata", None) or {}
+    if metadata.get("embedding_dimension"):
+        return int(metadata["embedding_dimension"])
+    return info.config.params.vectors.size
+
+
+def validate_vectors(vectors: Iterable[Sequence[float]], dimension: int, collection_name: str) -> None:
+    """
+    Проверяет размерность векторов перед upsert.
+
+    Raises:
+        EmbeddingDimensionError: если хотя бы один вектор другой размерности
+    """
+    for vector in vectors:
+        if len(vector) != dimension:
+            raise EmbeddingDimensionError(
+                f"Upsert в '{collection_name}' отклонен: размерность вектора {len(vector)}, "
+                f"коллекция ожидает {dimension}"
+            )
+
+
+def validate_points(points: Iterable[Any], dimension: int, collection_name: str) -> None:
+    """Проверяет размерность векторов PointStruct перед upsert"""
+    validate_vectors((point.vector for point in points), dimension, collection_name)
@@ -0,0 +1,235 @@
+"""
+Фоновая оценка RAG ответов метриками RAGAS.
+
+Ответ пользователю не ждет оценки: schedule_rag_evaluation ставит ответ в
+очередь и сразу возвращается.
+- в очередь попадает выборка ответов (RAGAS_SAMPLE_RATE, 0..1)
+- очередь ограничена (RAGAS_QUEUE_SIZE): при переполнении новые ответы
+  отбрасываются, а не копятся в памяти
+- RAGAS_EVAL_CONCURRENCY воркеров; сама оценка (вызовы LLM, Dataset, pandas)
+  выполняется в пуле потоков и не блокирует event loop
+- оценки пишутся в PostgreSQL (rag_evaluations) для графиков качества
+"""
+import os
+import time
+import random
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+log = logging.getLogger(__name__)
+
+RAGAS_SAMPLE_RATE = float(os.getenv("RAGAS_SAMPLE_RATE", "0.1"))
+RAGAS_QUEUE_SIZE = int(os.getenv("RAGAS_QUEUE_SIZE", "100"))
+RAGAS_EVAL_CONCURRENCY = int(os.getenv("RAGAS_EVAL_CONCURRENCY", "2"))
+
+
+@dataclass
+class EvaluationJob:
+    """Ответ, ожидающий оценки"""
+    question: str
+    answer: str
+    contexts: List[str]
+    user_id: Optional[int] = None
+    platform: str = "telegram"
+    ground_truth: Optional[str] = None
+    answered_at: datetime = field(default_factory=datetime.utcnow)
+
+
+async def _evaluate(job: EvaluationJob):
+    from services.rag.rag_evaluator import evaluate_rag_response
+    return await evaluate_rag_response(job.question, job.answer, job.contexts, job.ground_truth)
+
+
+def _persist(job: EvaluationJob, evaluation, evaluation_ms: int) -> Optional[int]:
+    from backend.database.evaluation_storage import save_rag_evaluation
+    return save_rag_evaluation(
+        question=job.question,
+        answer=job.answer,
+        scores={
+            "faithfulness": evaluation.faithfulness,
+            "answer_relevancy": evaluation.answer_relevancy,
+            "context_precision": evaluation.context_precision,
+            "context_recall": evaluation.context_recall if job.ground_truth else None,
+            "average_score": evaluation.average_score,
+            "details": evaluation.details
+        },
+        answered_at=job.answered_at,
+        contexts_count=len(job.contexts),
+        user_id=job.user_id,
+        platform=job.platform,
+        evaluation_ms=evaluation_ms
+    )
+
+
+class RAGEvaluationQueue:
+    """Очередь оценки RAG ответов с ограниченным числом воркеров"""
+
+    def __init__(
+        self,
+        sample_rate: float = RAGAS_SAMPLE_RATE,
+        max_size: int = RAGAS_QUEUE_SIZE,
+        concurrency: int = RAGAS_EVAL_CONCURRENCY,
+        evaluate: Callable = _evaluate,
+        persist: Callable = _persist,
+        rng: Callable[[], float] = random.random
+    ):
+        self.sample_rate = sample_rate
+        self.max_size = max_size
+        self.concurrency = concurrency
+        self.evaluate = evaluate
+        self.persist = persist
+        self.rng = rng
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stats = {
+            "submitted": 0, "sampled_out": 0, "enqueued": 0, "dropped": 0,
+            "evaluated": 0, "failed": 0, "persisted": 0
+        }
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers) and not all(worker.done() for worker in self._workers)
+
+    @property
+    def loop(self) -> Optional[asyncio.AbstractEventLoop]:
+        return self._loop
+
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self.running and self._loop is loop:
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._workers = [
+            self._loop.create_task(self._run(), name=f"ragas-eval-{i}") for i in range(self.concurrency)
+        ]
+        log.info(
+            f"✅ Очередь оценки RAGAS запущена (выборка {self.sample_rate:.0%}, "
+            f"воркеров: {self.concurrency}, очередь: {self.max_size})"
+        )
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Дождаться текущих оценок (не дольше timeout) и остановить"""
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            log.warning(f"⚠️ Не оценено ответов при остановке: {self.pending()}")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, job: EvaluationJob) -> bool:
+        """
+        Поставить ответ в очередь (не ждет оценки)
+
+        Returns:
+            True, если ответ попал в выборку и в очередь
+        """
+        self.stats["submitted"] += 1
+        if self.rng() >= self.sample_rate:
+            self.stats["sampled_out"] += 1
+            return False
+        self.start()
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            log.warning(f"⚠️ [RAGAS] Очередь оценки заполнена ({self.max_size}), ответ пропущен")
+            return False
+        self.stats["enqueued"] += 1
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._process(job)
+            finally:
+                self._queue.task_done()
+
+    async def _process(self, job: EvaluationJob) -> None:
+        started = time.perf_counter()
+        try:
+            evaluation = await self.evaluate(job)
+        except Exception as e:
+            self.stats["failed"] += 1
+            log.warning(f"⚠️ [RAGAS] Ошибка при оценке ответа: {e}")
+            return
+        if evaluation is None:
+            self.stats["failed"] += 1
+            log.warning("⚠️ [RAGAS] Не удалось выполнить оценку (возможно, библиотека не установлена)")
+            return
+        evaluation_ms = int((time.perf_counter() - started) * 1000)
+        self.stats["evaluated"] += 1
+
+        from services.rag.rag_evaluator import log_evaluation
+        log_evaluation(evaluation)
+
+        try:
+            from services.helpers.blocking_io import run_blocking
+            if await run_blocking("postgres", self.persist, job, evaluation, evaluation_ms) is not None:
+                self.stats["persisted"] += 1
+        except Exception as e:
+            log.warning(f"⚠️ [RAGAS] Не удалось сохранить оценку в PostgreSQL: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "pending": self.pending(), "sample_rate": self.sample_rate, "running": self.running}
+
+
+_evaluation_queue: Optional[RAGEvaluationQueue] = None
+
+
+def get_evaluation_queue() -> RAGEvaluationQueue:
+    """Очередь оценки RAG ответов (Singleton)"""
+    global _evaluation_queue
+    if _evaluation_queue is None:
+        _evaluation_queue = RAGEvaluationQueue()
+    return _evaluation_queue
+
+
+def start_evaluation_queue() -> RAGEvaluationQueue:
+    """Запустить воркеры в текущем event loop (при старте бота)"""
+    queue = get_evaluation_queue()
+    queue.start()
+    return queue
+
+
+async def stop_evaluation_queue(timeout: float = 10.0) -> None:
+    if _evaluation_queue is not None:
+        await _evaluation_queue.stop(timeout)
+
+
+def schedule_rag_evaluation(
+    question: str,
+    answer: str,
+    contexts: List[str],
+    user_id: Optional[int] = None,
+    platform: str = "telegram",
+    ground_truth: Optional[str] = None
+) -> bool:
+    """
+    Поставить RAG ответ в очередь оценки RAGAS (вызывать из event loop, не ждет оценки)
+
+    Returns:
+        True, если ответ будет оценен
+    """
+    if not answer or not contexts:
+        return False
+    return get_evaluation_queue().submit(EvaluationJob(
+        question=question,
+        answer=answer,
+        contexts=list(contexts),
+        user_id=user_id,
+        platform=platform,
+        ground_truth=ground_truth
+    ))
@@ -28,6 +28,24 @@ except ImportError:
 
 # Импортируем config loader
 from config import load_config
+from services.rag.retrieval_cache import get_retrieval_cache, invalidate_collection
+from services.rag.collection_profiles import (
+    get_collection_profile,
+    build_collection_params,
+    get_active_search_params
+)
+from services.rag.collection_metadata import (
+    CollectionMetadata,
+    get_collection_metadata_cache,
+    is_not_found_error
+)
+from services.rag.embedding_dimensions import (
+    EmbeddingDimensionError,
+    reduce_dimension,
+    build_collection_metadata,
+    validate_points,
+    validate_vectors
+)
 
 # Получаем логгер, но не используем до настройки логирования в основном приложении
 def get_logger():
@@ -66,11 +84,15 @@ TARGET_DIMENSION = _qdrant_settings.get("target_dimension", 1536)  # Разме
 # Определяем URL и модель из конфига
 EMBEDDING_API_URL = _embeddings_config.get("api_url") or os.getenv("EMBEDDING_API_URL", "https://openrouter.ai/api/v1/embeddings")
 EMBEDDING_MODEL = _embeddings_config.get("model") or os.getenv("EMBEDDING_MODEL", "qwen/qwen3-embedding-8b")
-EMBEDDING_DIMENSION = _embeddings_config.get("dimension") or int(os.getenv("EMBEDDING_DIMENSION", str(TARGET_DIMENSION)))
+EMBEDDING_DIMENSION = int(_embeddings_config.get("dimension") or os.getenv("EMBEDDING_DIMENSION", str(TARGET_DIMENSION)))
+# Передавать ли целевую размерность в API (параметр dimensions, Matryoshka-усечение на стороне модели)
+EMBEDDING_REQUEST_DIMENSIONS = str(_embeddings_config.get("request_dimensions", "false")).lower() in ("1", "true", "yes", "on")
+# Сколько текстов отправлять в API эмбеддингов одним запросом
+EMBEDDING_BATCH_SIZE = int(_embeddings_config.get("batch_size") or os.getenv("EMBEDDING_BATCH_SIZE", "64"))
 
 if OPENROUTER_API_KEY:
     log.info(f"🔧 Используется OpenRouter (модель: {EMBEDDING_MODEL})")
-    log.info(f"🔧 Вектора будут дополнены до {TARGET_DIMENSION} для совместимости с Qdrant")
+    log.info(f"🔧 Вектора будут усечены до {EMBEDDING_DIMENSION} (Matryoshka) и нормализованы")
 elif OPENAI_API_KEY:
     log.info(f"🔧 Используется OpenAI API для эмбеддингов (модель: {EMBEDDING_MODEL}, размерность: {EMBEDDING_DIMENSION})")
 else:
@@ -132,6 +154,7 @@ COLLECTION_NAME = _qdrant_settings.get("collection_name", "hr2137_bot_knowledge_
 _qdrant_client = None
 _collection_initialized = False
 _embedding_dimension = EMBEDDING_DIMENSION
+_request_dimensions = EMBEDDING_REQUEST_DIMENSIONS
 
 def get_qdrant_client():
     """Получить клиент Qdrant"""
@@ -233,14 +256,25 @@ async def generate_embedding_async(text: str) -> Optional[List[float]]:
         headers["HTTP-Referer"] = app_url
         headers["X-Title"] = "HR2137_bot"
     
+    global _request_dimensions
+    
     data = {
         "model": EMBEDDING_MODEL,
         "input": text[:8000]  # Ограничение для API
     }
+    if _request_dimensions:
+        # Просим модель сразу вернуть усеченный (Matryoshka) вектор
+        data["dimensions"] = _embedding_dimension
     
     try:
         async with aiohttp.ClientSession() as session:
             async with session.post(url, json=data, headers=headers, timeout=aiohttp.ClientTimeout(total=30)) as response:
+                if response.status == 400 and "dimensions" in data:
+                    # Модель/провайдер не поддерживает параметр dimensions - усекаем на клиенте
+                    log.warning("⚠️ API эмбеддингов не поддерживает параметр dimensions, усечение выполняется локально")
+                    _request_dimensions = False
+                    return await generate_embedding_async(text)
+                
                 if response.status >= 400:
                     error_text = await response.text()
                     log.error(f"❌ Ошибка API эмбеддингов {response.status}: {error_text}")
@@ -251,26 +285,18 @@ async def generate_embedding_async(text: str) -> Optional[List[float]]:
                     embedding = result["data"][0]["embedding"]
                     embedding_size = len(embedding)
                     
-                    # КРИТИЧНО: Всегда приводим к целевой размерности
+                    # Matryoshka-усечение до размерности коллекции с повторной нормализацией
+                    try:
+                        embedding = reduce_dimension(embedding, _embedding_dimension)
+                    except EmbeddingDimensionError as e:
+                        log.error(f"❌ {e}")
+                        return None
+                    
                     if embedding_size != _embedding_dimension:
-                        log.warning(f"⚠️ Размерность эмбеддинга ({embedding_size}) != целевой ({_embedding_dimension})")
-                        if embedding_size > _embedding_dimension:
-                            # Обрезаем до нужной размерности
-                            embedding = embedding[:_embedding_dimension]
-                            log.info(f"✂️ Эмбеддинг обрезан: {embedding_size} → {_embedding_dimension}")
-                        else:
-                            # Дополняем нулями если меньше
-                            padding_size = _embedding_dimension - embedding_size
-                            embedding = embedding + [0.0] * padding_size
-                            log.info(f"📌 Эмбеддинг дополнен: {embedding_size} → {_embedding_dimension} (+{padding_size} нулей)")
+                        log.debug(f"✂️ Эмбеддинг усечен: {embedding_size} → {_embedding_dimension}")
                     else:
                         log.debug(f"✅ Эмбеддинг сгенерирован (размерность: {embedding_size})")
                     
-                    # Финальная проверка
-                    if len(embedding) != _embedding_dimension:
-                        log.error(f"❌ КРИТИЧЕСКАЯ ОШИБКА: размерность {len(embedding)} != {_embedding_dimension}")
-                        return None
-                    
                     return embedding
                 else:
                     log.error(f"❌ Неожиданный формат ответа от API: {result}")
@@ -313,6 +339,74 @@ def generate_embedding(text: str) -> Optional[List[float]]:
         log.error(f"❌ Ошибка синхронной обертки: {e}")
         return None
 
+async def generate_embeddings_batch_async(texts: List[str], batch_size: int = EMBEDDING_BATCH_SIZE) -> List[Optional[List[float]]]:
+    """
+    Генерирует эмбеддинги для списка текстов пачками (один запрос к API на пачку)
+    
+    Args:
+        texts: Тексты для генерации эмбеддингов
+        batch_size: Размер пачки
+    
+    Returns:
+        Эмбеддинги в порядке текстов (None для текстов, по которым не удалось получить вектор)
+    """
+    if not texts:
+        return []
+    if not EMBEDDING_API_KEY:
+        log.error("❌ OPENAI_API_KEY или OPENROUTER_API_KEY не установлен для эмбеддингов")
+        return [None] * len(texts)
+    
+    headers = {
+        "Authorization": f"Bearer {EMBEDDING_API_KEY}",
+        "Content-Type": "application/json"
+    }
+    if "openrouter" in EMBEDDING_API_URL.lower():
+        headers["HTTP-Referer"] = os.getenv("APP_URL", "https://github.com/HR2137_bot").strip()
+        headers["X-Title"] = "HR2137_bot"
+    
+    embeddings: List[Optional[List[float]]] = []
+    async with aiohttp.ClientSession() as session:
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start:start + batch_size]
+            data = {"model": EMBEDDING_MODEL, "input": [text[:8000] for text in batch]}
+            if _request_dimensions:
+                data["dimensions"] = _embedding_dimension
+            vectors: List[Optional[List[float]]] = []
+            try:
+                async with session.post(EMBEDDING_API_URL, json=data, headers=headers, timeout=aiohttp.ClientTimeout(total=60)) as response:
+                    if response.status >= 400:
+                        log.warning(f"⚠️ Ошибка пакетного запроса эмбеддингов {response.status}: {(await response.text())[:200]}")
+                    else:
+                        result = await response.json()
+                        items = sorted(result.get("data") or [], key=lambda item: item.get("index", 0))
+                        if len(items) == len(batch):
+                            vectors = [reduce_dimension(item["embedding"], _embedding_dimension) for item in items]
+            except Exception as e:
+                log.warning(f"⚠️ Ошибка пакетной генерации эмбеддингов: {e}")
+            
+            if not vectors:
+                # Провайдер не поддерживает пакетный ввод - запрашиваем по одному тексту
+                vectors = list(await asyncio.gather(*(generate_embedding_async(text) for text in batch)))
+            embeddings.extend(vectors)
+    return embeddings
+
+def generate_embeddings_batch(texts: List[str], batch_size: int = EMBEDDING_BATCH_SIZE) -> List[Optional[List[float]]]:
+    """Пакетная генерация эмбеддингов (синхронная обертка)"""
+    try:
+        try:
+            loop = asyncio.get_event_loop()
+            if loop.is_running():
+                import concurrent.futures
+                with concurrent.futures.ThreadPoolExecutor() as executor:
+                    future = executor.submit(asyncio.run, generate_embeddings_batch_async(texts, batch_size))
+                    return future.result(timeout=300)
+            return loop.run_until_complete(generate_embeddings_batch_async(texts, batch_size))
+        except RuntimeError:
+            return asyncio.run(generate_embeddings_batch_async(texts, batch_size))
+    except Exception as e:
+        log.error(f"❌ Ошибка пакетной генерации эмбеддингов: {e}")
+        return [None] * len(texts)
+
 def ensure_collection():
     """Создать коллекцию в Qdrant если её нет"""
     global _collection_initialized, _embedding_dimension
@@ -329,20 +423,37 @@ def ensure_collection():
     
     # Быстрая проверка с одним таймаутом
     try:
-        # Проверяем, существует ли коллекция (с коротким таймаутом)
-        collections = client.get_collections()
-        collection_exists = any(col.name == COLLECTION_NAME for col in collections.collections)
+        # Метаданные коллекции (существование, размерность, индексы) - в кэш для поиска
+        metadata = get_collection_metadata_cache().refresh(client, COLLECTION_NAME)
         
-        if not collection_exists:
-            # Создаем коллекцию с фиксированной размерностью
+        if not metadata.exists:
+            # Создаем коллекцию с фиксированной размерностью и активным профилем хранения
+            profile = get_collection_profile()
             client.create_collection(
                 collection_name=COLLECTION_NAME,
-                vectors_config=VectorParams(size=_embedding_dimension, distance=Distance.COSINE),
+                **build_collection_params(
+                    profile,
+                    _embedding_dimension,
+                    build_collection_metadata(_embedding_dimension, EMBEDDING_MODEL)
+                )
+            )
+            log.info(f"✅ Создана коллекция '{COLLECTION_NAME}' в Qdrant (размерность: {_embedding_dimension}, профиль: {profile['name']})")
+            metadata = get_collection_metadata_cache().set(
+                CollectionMetadata(name=COLLECTION_NAME, exists=True, dimension=_embedding_dimension)
             )
-            log.info(f"✅ Создана коллекция '{COLLECTION_NAME}' в Qdrant (размерность: {_embedding_dimension})")
         else:
             log.info(f"✅ Коллекция '{COLLECTION_NAME}' уже существует, пропускаем создание")
+            recorded_dimension = metadata.dimension
+            if recorded_dimension and recorded_dimension != _embedding_dimension:
+                # Запросы и upsert должны совпадать с коллекцией - усекаем эмбеддинги до ее размерности
+                log.warning(
+                    f"⚠️ Размерность коллекции '{COLLECTION_NAME}' ({recorded_dimension}) отличается от "
+                    f"настроенной ({_embedding_dimension}). Используется размерность коллекции; "
+                    f"для смены запустите scripts/reindex_embedding_dimension.py"
+                )
+                _embedding_dimension = recorded_dimension
         
+        _ensure_source_type_index(client, metadata)
         _collection_initialized = True
         return True
     except Exception as e:
@@ -367,111 +478,110 @@ def ensure_collection():
         _collection_initialized = True
         return True
 
+def _ensure_source_type_index(client, metadata: CollectionMetadata) -> None:
+    """Keyword индекс source_type: фильтр услуг в поиске не сканирует всю коллекцию"""
+    if "source_type" in metadata.payload_indexes:
+        return
+    try:
+        from qdrant_client.models import PayloadSchemaType
+        client.create_payload_index(
+            collection_name=COLLECTION_NAME,
+            field_name="source_type",
+            field_schema=PayloadSchemaType.KEYWORD
+        )
+        log.info(f"✅ Создан payload индекс source_type в коллекции '{COLLECTION_NAME}'")
+        # Схема изменилась - перечитываем метаданные при следующем поиске
+        get_collection_metadata_cache().invalidate(COLLECTION_NAME)
+    except Exception as e:
+        log.warning(f"⚠️ Не удалось создать payload индекс source_type: {str(e)[:200]}")
+
+
+def get_collection_metadata(client=None) -> Optional[CollectionMetadata]:
+    """
+    Метаданные коллекции из кэша (запрос к Qdrant только при промахе)
+    
+    Returns:
+        Метаданные или None, если Qdrant недоступен
+    """
+    client = client or get_qdrant_client()
+    if not client:
+        return None
+    try:
+        return get_collection_metadata_cache().get_or_fetch(client, COLLECTION_NAME)
+    except Exception as e:
+        log.error(f"❌ Не удалось получить метаданные коллекции '{COLLECTION_NAME}': {e}")
+        return None
+
+
+def invalidate_collection_metadata() -> None:
+    """Сбросить кэш метаданных (коллекция удалена, пересоздана или изменена схема)"""
+    global _collection_initialized
+    _collection_initialized = False
+    get_collection_metadata_cache().invalidate(COLLECTION_NAME)
+
+
 def generate_service_id(service: Dict) -> str:
     """Генерирует уникальный ID для услуги на основе её данных"""
     service_str = f"{service.get('title', '')}_{service.get('master', '')}_{service.get('price', 0)}"
     return hashlib.md5(service_str.encode()).hexdigest()
 
-def index_services(services: List[Dict]) -> bool:
+def build_service_text(service: Dict) -> str:
+    """Текстовое представление услуги для эмбеддинга"""
+    return f"{service.get('title', '')} {service.get('master', '')} {service.get('price_str', '')} {service.get('duration', 0)}"
+
+def build_service_payload(service: Dict) -> Dict[str, Any]:
+    """Payload точки услуги в Qdrant (без indexed_at)"""
+    return {
+        "id": service.get("id"),
+        "title": service.get("title", ""),
+        "price": service.get("price", 0),
+        "price_str": service.get("price_str", ""),
+        "duration": service.get("duration", 0),
+        "master": service.get("master", ""),
+        "master1": service.get("master1", ""),
+        "master2": service.get("master2", ""),
+        "type": service.get("type", ""),
+        "additional_services": service.get("additional_services", ""),
+        "row_number": service.get("row_number", 0),
+        "source_type": "service"  # Маркер для фильтрации услуг
+    }
+
+def index_services(services: List[Dict], force: bool = False) -> bool:
     """
-    Индексировать услуги в Qdrant (старая функция, оставлена для обратной совместимости)
-    В новой версии эта функция будет использоваться для индексации документов базы знаний
+    Индексировать услуги в Qdrant
+    
+    Индексация инкрементальная: эмбеддинги считаются только для новых и
+    измененных строк, точки удаленных строк удаляются
+    (см. services/rag/service_index_sync.py).
+    
+    Args:
+        services: Услуги из Google Sheets
+        force: Переиндексировать все строки
     """
-    """Индексировать услуги в Qdrant"""
     if not QDRANT_AVAILABLE:
         log.warning("⚠️ Qdrant библиотеки не установлены. Установите: pip install qdrant-client")
         return False
     
-    client = get_qdrant_client()
-    
-    if not client:
-        log.error(f"❌ Qdrant клиент не доступен. Проверьте подключение к {QDRANT_URL}")
-        log.error(f"❌ Запустите Qdrant: docker run -d -p 6333:6333 -p 6334:6334 qdrant/qdrant")
-        return False
-    
-    # Проверяем доступность API эмбеддингов
-    if not EMBEDDING_API_KEY:
-        log.error("❌ API ключ для эмбеддингов не установлен. Установите OPENAI_API_KEY или OPENROUTER_API_KEY")
-        return False
-    
-    if not ensure_collection():
-        log.error("❌ Не удалось создать коллекцию")
-        return False
-    
-    try:
-        points = []
-        
-        for service in services:
-            # Создаем текстовое представление услуги для поиска
-            service_text = f"{service.get('title', '')} {service.get('master', '')} {service.get('price_str', '')} {service.get('duration', 0)}"
-            
-            # Генерируем эмбеддинг через API
-            embedding = generate_embedding(service_text)
-            if embedding is None:
-                log.warning(f"⚠️ Не удалось сгенерировать эмбеддинг для услуги: {service.get('title', '')}")
-                continue
-            
-            # Создаем payload с полной информацией об услуге
-            payload = {
-                "id": service.get("id"),
-                "title": service.get("title", ""),
-                "price": service.get("price", 0),
-                "price_str": service.get("price_str", ""),
-                "duration": service.get("duration", 0),
-                "master": service.get("master", ""),
-                "master1": service.get("master1", ""),
-                "master2": service.get("master2", ""),
-                "type": service.get("type", ""),
-                "additional_services": service.get("additional_services", ""),
-                "row_number": service.get("row_number", 0),
-                "indexed_at": datetime.now().isoformat(),
-                "source_type": "service"  # Маркер для фильтрации услуг
-            }
-            
-            # Генерируем ID
-            service_id = generate_service_id(service)
-            
-            points.append(PointStruct(
-                id=int(service_id[:8], 16),  # Конвертируем hex в int для Qdrant
-                vector=embedding,
-                payload=payload
-            ))
-        
-        # Проверяем, что есть точки для вставки
-        if not points:
-            log.warning("⚠️ Нет точек для индексации (все эмбеддинги не удалось сгенерировать)")
-            return False
-        
-        # НЕ удаляем коллекцию - используем upsert для обновления существующих данных
-        # Это сохраняет все существующие данные в коллекции
-        if not ensure_collection():
-            log.error("❌ Не удалось создать/проверить коллекцию")
-            return False
-        
-        # Вставляем/обновляем точки (upsert не удаляет существующие данные)
-        client.upsert(
-            collection_name=COLLECTION_NAME,
-            points=points
-        )
-        
-        log.info(f"✅ Индексировано {len(points)} услуг в Qdrant")
-        return True
-        
-    except Exception as e:
-        log.error(f"❌ Ошибка индексации услуг в Qdrant: {e}")
-        import traceback
-        log.error(f"❌ Traceback: {traceback.format_exc()}")
-        return False
+    from services.rag.service_index_sync import sync_services_index
+    return sync_services_index(services, force=force).ok
 
 def search_service(query: str, limit: Optional[int] = None) -> List[Dict]:
     """
     Поиск в базе знаний по семантическому запросу в Qdrant
-    (обновлено для работы с базой знаний консультанта)
+    (обновлено для работы с базой знаний консультанта).
+    Результаты кэшируются до следующего изменения коллекции.
     """
     # Используем дефолтный limit из конфига если не указан
     if limit is None:
         limit = _qdrant_settings.get("default_limit", 3)
     
+    cache = get_retrieval_cache()
+    cache_key = cache.make_key(COLLECTION_NAME, query, "service", top_k=limit)
+    return cache.get_or_compute(cache_key, lambda: _search_service_uncached(query, limit))
+
+
+def _search_service_uncached(query: str, limit: int) -> List[Dict]:
+    """Поиск услуг в Qdrant без кэша"""
     client = get_qdrant_client()
     
     if not client:
@@ -479,19 +589,13 @@ def search_service(query: str, limit: Optional[int] = None) -> List[Dict]:
         return []
     
     try:
-        # Проверяем, что коллекция существует (с обработкой таймаутов)
-        try:
-            collections = client.get_collections()
-            collection_exists = any(col.name == COLLECTION_NAME for col in collections.collections)
-            if not collection_exists:
-                log.warning(f"⚠️ Коллекция '{COLLECTION_NAME}' не существует в Qdrant")
-                return []
-        except (TimeoutError, ConnectionError, Exception) as e:
-            error_str = str(e).lower()
-            if "timeout" in error_str or "timed out" in error_str or "connect" in error_str:
-                log.error(f"❌ Таймаут подключения к Qdrant при проверке коллекций: {e}")
-                return []
-            raise  # Пробрасываем другие ошибки
+        # Существование коллекции и наличие source_type - из кэша метаданных, без запроса к Qdrant
+        metadata = get_collection_metadata(client)
+        if metadata is None:
+            return []
+        if not metadata.exists:
+            log.warning(f"⚠️ Коллекция '{COLLECTION_NAME}' не существует в Qdrant")
+            return []
         
         # Генерируем эмбеддинг для запроса через API
         query_embedding = generate_embedding(query)
@@ -500,13 +604,13 @@ def search_service(query: str, limit: Optional[int] = None) -> List[Dict]:
             return []
         
         # Ищем в Qdrant - используем правильный метод query_points
-        # Фильтруем только услуги (source_type="service" или есть поле id)
+        # Фильтруем только услуги (source_type="service"); в старых данных без source_type - без фильтра
         from qdrant_client.models import Filter, FieldCondition, MatchValue
         
         log.info(f"🔍 [RAG] Поиск в коллекции '{COLLECTION_NAME}' для запроса: '{query[:100]}' (limit={limit})")
         
-        # Фильтр: только услуги (source_type="service")
-        try:
+        service_filter = None
+        if metadata.has_source_type:
             service_filter = Filter(
                 must=[
                     FieldCondition(
@@ -515,38 +619,27 @@ def search_service(query: str, limit: Optional[int] = None) -> List[Dict]:
                     )
                 ]
             )
-            
-            # Ищем с фильтром (с обработкой таймаутов)
-            try:
-                search_results = client.query_points(
-                    collection_name=COLLECTION_NAME,
-                    query=query_embedding,
-                    limit=limit * 2,  # Берем больше, чтобы после фильтрации осталось достаточно
-                    query_filter=service_filter
-                )
-                log.debug(f"🔍 [RAG] Поиск выполнен в коллекции '{COLLECTION_NAME}' с фильтром source_type=service")
-            except (TimeoutError, ConnectionError, Exception) as e:
-                error_str = str(e).lower()
-                if "timeout" in error_str or "timed out" in error_str or "connect" in error_str:
-                    log.error(f"❌ Таймаут при поиске в Qdrant: {e}")
-                    return []
-                raise  # Пробрасываем другие ошибки
-        except Exception as e:
-            # Если фильтр не работает (старые данные без source_type), ищем без фильтра
-            log.debug(f"⚠️ Фильтр не применился, используем поиск без фильтра в коллекции '{COLLECTION_NAME}': {e}")
-            try:
-                search_results = client.query_points(
-                    collection_name=COLLECTION_NAME,
-                    query=query_embedding,
-                    limit=limit * 2
-                )
-                log.debug(f"🔍 [RAG] Поиск выполнен в коллекции '{COLLECTION_NAME}' без фильтра")
-            except (TimeoutError, ConnectionError, Exception) as e:
-                error_str = str(e).lower()
-                if "timeout" in error_str or "timed out" in error_str or "connect" in error_str:
-                    log.error(f"❌ Таймаут при поиске в Qdrant (без фильтра): {e}")
-                    return []
-                raise  # Пробрасываем другие ошибки
+        
+        # Один запрос к Qdrant (с обработкой таймаутов и 404)
+        try:
+            search_results = client.query_points(
+                collection_name=COLLECTION_NAME,
+                query=query_embedding,
+                limit=limit * 2,  # Берем больше, чтобы после фильтрации осталось достаточно
+                query_filter=service_filter,
+                search_params=get_active_search_params()
+            )
+            log.debug(f"🔍 [RAG] Поиск выполнен в коллекции '{COLLECTION_NAME}' (фильтр source_type: {service_filter is not None})")
+        except (TimeoutError, ConnectionError, Exception) as e:
+            error_str = str(e).lower()
+            if "timeout" in error_str or "timed out" in error_str or "connect" in error_str:
+                log.error(f"❌ Таймаут при поиске в Qdrant: {e}")
+                return []
+            if is_not_found_error(e):
+                log.warning(f"⚠️ Коллекция '{COLLECTION_NAME}' не найдена в Qdrant, метаданные будут перечитаны")
+                invalidate_collection_metadata()
+                return []
+            raise  # Пробрасываем другие ошибки
         
         results = []
         # QueryResponse содержит points
@@ -561,6 +654,10 @@ def search_service(query: str, limit: Optional[int] = None) -> List[Dict]:
             if not payload.get("id") and not payload.get("title"):
                 continue
             
+            if service_filter is None and payload.get("source_type") == "service":
+                # Услуги уже размечены, а метаданные устарели - следующий поиск пойдет с фильтром
+                get_collection_metadata_cache().invalidate(COLLECTION_NAME)
+            
             # Пропускаем документы базы знаний (если есть file_name или text, но нет source_type="service")
             if payload.get("file_name") or payload.get("text"):
                 if payload.get("source_type") != "service":
@@ -686,10 +783,9 @@ async def get_collection_stats() -> Dict:
         }
     
     try:
-        collections = client.get_collections()
-        collection_exists = any(col.name == COLLECTION_NAME for col in collections.collections)
+        metadata = get_collection_metadata_cache().get_or_fetch(client, COLLECTION_NAME)
         
-        if not collection_exists:
+        if not metadata.exists:
             return {
                 "collection_name": COLLECTION_NAME,
                 "exists": False,
@@ -731,10 +827,9 @@ async def list_documents(limit: int = 50) -> List[Dict]:
         return []
     
     try:
-        collections = client.get_collections()
-        collection_exists = any(col.name == COLLECTION_NAME for col in collections.collections)
+        metadata = get_collection_metadata_cache().get_or_fetch(client, COLLECTION_NAME)
         
-        if not collection_exists:
+        if not metadata.exists:
             return []
         
         # Получаем точки из коллекции (scroll)
@@ -812,6 +907,7 @@ def index_message_to_qdrant(text: str, metadata: Optional[Dict[str, Any]] = None
         point_id = int(text_hash[:8], 16)
         
         # Добавляем точку в Qdrant
+        validate_vectors([embedding], _embedding_dimension, COLLECTION_NAME)
         client.upsert(
             collection_name=COLLECTION_NAME,
             points=[
@@ -822,6 +918,7 @@ def index_message_to_qdrant(text: str, metadata: Optional[Dict[str, Any]] = None
                 )
             ]
         )
+        invalidate_collection(COLLECTION_NAME)
         
         log.info(f"✅ Сообщение индексировано в Qdrant (point_id={point_id})")
         return True
@@ -885,6 +982,7 @@ def index_qa_to_qdrant(question: str, answer: str, metadata: Optional[Dict[str,
         point_id = int(text_hash[:8], 16)
         
         # Добавляем точку в Qdrant
+        validate_vectors([embedding], _embedding_dimension, COLLECTION_NAME)
         client.upsert(
             collection_name=COLLECTION_NAME,
             points=[
@@ -895,6 +993,7 @@ def index_qa_to_qdrant(question: str, answer: str, metadata: Optional[Dict[str,
                 )
             ]
         )
+        invalidate_collection(COLLECTION_NAME)
         
         log.info(f"✅ Q&A пара индексирована в Qdrant (point_id={point_id})")
         return True
@@ -40,6 +40,19 @@ try:
 except ImportError:
     from whitelist import WhitelistManager
 
+from services.rag.retrieval_cache import get_retrieval_cache, invalidate_collection
+from services.rag.collection_profiles import (
+    get_collection_profile,
+    build_collection_params,
+    get_active_search_params
+)
+from services.rag.embedding_dimensions import (
+    build_collection_metadata,
+    get_recorded_dimension,
+    get_embedding_settings,
+    validate_points
+)
+
 # Загружаем переменные окружения из .env файла
 try:
     from dotenv import load_dotenv
@@ -293,23 +306,32 @@ class QdrantLoader:
         return results
     
     def _ensure_collection(self) -> None:
-        """Создает коллекцию если она не существует"""
+        """Создает коллекцию если она не существует (с активным профилем из config/qdrant.yaml)"""
         try:
             collections = self.client.get_collections().collections
             collection_names = [c.name for c in collections]
             
             if self.collection_name not in collection_names:
-                logger.info(f"Creating collection: {self.collection_name}")
+                profile = get_collection_profile()
+                logger.info(f"Creating collection: {self.collection_name} (profile: {profile['name']})")
                 self.client.create_collection(
                     collection_name=self.collection_name,
-                    vectors_config=VectorParams(
-                        size=self.embedding_dim,
-                        distance=Distance.COSINE
+                    **build_collection_params(
+                        profile,
+                        self.embedding_dim,
+                        build_collection_metadata(self.embedding_dim, get_embedding_settings()["model"])
                     )
                 )
                 logger.info(f"Collection {self.collection_name} created")
             else:
                 logger.info(f"Collection {self.collection_name} already exists")
+                recorded_dimension = get_recorded_dimension(self.client, self.collection_name)
+                if recorded_dimension and recorded_dimension != self.embedding_dim:
+                    logger.warning(
+                        f"Collection {self.collection_name} has dimension {recorded_dimension}, "
+                        f"configured {self.embedding_dim}; using collection dimension"
+                    )
+                    self.embedding_dim = recorded_dimension
                 
         except Exception as e:
             logger.error(f"Error ensuring collection: {str(e)}")
@@ -410,7 +432,8 @@ class QdrantLoader:
                 )
             )
         
-        # Вставляем в Qdrant
+        # Вставляем в Qdrant (векторы другой размерности отклоняются)
+        validate_points(points, self.embedding_dim, self.collection_name)
         try:
             self.client.upsert(
                 collection_name=self.collection_name,
@@ -418,8 +441,8 @@ class QdrantLoader:
             )
             logger.info(f"Inserted {len(points)} points into {self.collection_name}")
             
-            # Помечаем BM25 индекс для перестроения
-            self._bm25_needs_rebuild = True
+            # Помечаем BM25 индекс для перестроения и сбрасываем кэш поиска
+            self.mark_index_changed()
             
             return len(points)
         except Exception as e:
@@ -608,7 +631,8 @@ class QdrantLoader:
         filter_by_whitelist: bool = True,
         search_strategy: str = "hybrid",
         dense_weight: float = 0.4,
-        bm25_weight: float = 0.6
+        bm25_weight: float = 0.6,
+        with_vectors: bool = False
     ) -> List[Dict[str, Any]]:
         """
         Поиск с поддержкой BM25 и hybrid search.
@@ -621,7 +645,42 @@ class QdrantLoader:
             search_strategy: "dense", "bm25", или "hybrid"
             dense_weight: Вес для dense search (для hybrid)
             bm25_weight: Вес для BM25 search (для hybrid)
+            with_vectors: Возвращать векторы найденных точек в поле "vector" (для MMR)
+        
+        Результаты кэшируются (rag.retrieval_cache в config.yaml) до следующего
+        изменения индекса коллекции.
         """
+        cache = get_retrieval_cache()
+        cache_key = cache.make_key(
+            self.collection_name,
+            query,
+            search_strategy,
+            weights=(dense_weight, bm25_weight),
+            top_k=top_k,
+            score_threshold=score_threshold,
+            filter_by_whitelist=filter_by_whitelist,
+            with_vectors=with_vectors
+        )
+        return cache.get_or_compute(
+            cache_key,
+            lambda: self._search_uncached(
+                query, top_k, score_threshold, filter_by_whitelist,
+                search_strategy, dense_weight, bm25_weight, with_vectors
+            )
+        )
+    
+    def _search_uncached(
+        self,
+        query: str,
+        top_k: int,
+        score_threshold: float,
+        filter_by_whitelist: bool,
+        search_strategy: str,
+        dense_weight: float,
+        bm25_weight: float,
+        with_vectors: bool
+    ) -> List[Dict[str, Any]]:
+        """Поиск без кэша (эмбеддинг запроса, dense, BM25 и fusion)"""
         if search_strategy == "bm25":
             return self._bm25_search(query, top_k, filter_by_whitelist)
         
@@ -667,7 +726,9 @@ class QdrantLoader:
                     collection_name=self.collection_name,
                     query=query_embedding,  # Простой вектор
                     limit=top_k * 2 if search_strategy == "hybrid" else top_k,
-                    score_threshold=score_threshold
+                    score_threshold=score_threshold,
+                    with_vectors=with_vectors,
+                    search_params=get_active_search_params()
                 )
                 
                 # Фильтруем результаты по whitelist если нужно
@@ -686,6 +747,8 @@ class QdrantLoader:
                         "search_method": "dense",
                         **{k: v for k, v in point.payload.items() if k not in ["text", "source_url"]}
                     }
+                    if with_vectors and point.vector is not None:
+                        doc["vector"] = point.vector
                     dense_results.append(doc)
                     
             except (TypeError, AttributeError, ValueError) as e:
@@ -760,10 +823,19 @@ class QdrantLoader:
         # Приоритеты уже применены в search(), но применяем еще раз для надежности
         return filtered[:top_k]
     
+    def mark_index_changed(self) -> None:
+        """
+        Отмечает изменение коллекции (upsert/delete): BM25 индекс будет перестроен,
+        а закэшированные результаты поиска перестают использоваться.
+        """
+        self._bm25_needs_rebuild = True
+        invalidate_collection(self.collection_name)
+    
     def delete_collection(self) -> None:
         """Удаляет коллекцию"""
         try:
             self.client.delete_collection(self.collection_name)
+            self.mark_index_changed()
             logger.info(f"Collection {self.collection_name} deleted")
         except Exception as e:
             logger.error(f"Error deleting collection: {str(e)}")
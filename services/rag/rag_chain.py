@@ -4,9 +4,13 @@ RAG цепочка для генерации ответов на основе п
 """
 
 import logging
-from typing import List, Dict, Any, Optional
+from contextlib import aclosing
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
 from services.rag.qdrant_loader import QdrantLoader
 from services.helpers.llm_api import LLMClient, LLMResponse
+from services.rag.context_packer import ContextPacker
+from services.helpers.intent_rules import get_intent_rules
+from services.helpers.blocking_io import run_blocking
 import yaml
 
 logger = logging.getLogger(__name__)
@@ -107,6 +111,17 @@ class RAGChain:
         self.pricing_min_score = pricing_search.get("min_score", 0.8)
         self.pricing_top_k = pricing_search.get("top_k", 10)
         
+        # Упаковка контекста: бюджет токенов, MMR и склейка соседних чанков
+        packing_config = rag_config.get("context_packing", {})
+        self.context_packing_enabled = packing_config.get("enabled", True)
+        self.context_packer = ContextPacker(
+            max_tokens=packing_config.get("max_tokens", 1500),
+            mmr_lambda=packing_config.get("mmr_lambda", 0.7),
+            duplicate_threshold=packing_config.get("duplicate_threshold", 0.95),
+            merge_adjacent=packing_config.get("merge_adjacent", True),
+            min_doc_tokens=packing_config.get("min_doc_tokens", 50)
+        )
+        
         # Системный промпт для RAG (HR консалтинг)
         self.system_prompt = """Ты - интеллектуальный ассистент HR консультанта.
 Твоя задача - помогать с вопросами о HR консалтинге, управлении персоналом и бизнес-процессах.
@@ -138,29 +153,14 @@ class RAGChain:
             logger.error(f"Error loading config: {str(e)}")
             return {}
     
-    async def query(
+    def _search_context(
         self,
         user_query: str,
-        use_rag: bool = True,
-        top_k: Optional[int] = None,
-        min_score: Optional[float] = None
-    ) -> Dict[str, Any]:
-        """
-        Обрабатывает пользовательский запрос с использованием RAG.
-        
-        Args:
-            user_query: Вопрос пользователя
-            use_rag: Использовать ли RAG поиск
-            top_k: Количество результатов поиска
-            min_score: Минимальный score для результатов
-        
-        Returns:
-            Словарь с ответом, источниками и метаданными
-        """
-        top_k = top_k or self.top_k
-        min_score = min_score or self.min_score
-        
-        # Шаг 1: Поиск релевантных документов
+        use_rag: bool,
+        top_k: int,
+        min_score: float
+    ) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """Шаг 1: поиск релевантных документов и их уникальных источников"""
         context_docs = []
         sources = []
         
@@ -198,7 +198,8 @@ class RAGChain:
                 filter_by_whitelist=True,
                 search_strategy=search_strategy,
                 dense_weight=search_dense_weight,
-                bm25_weight=search_bm25_weight
+                bm25_weight=search_bm25_weight,
+                with_vectors=self.context_packing_enabled
             )
             
             logger.info(f"🔍 [RAG] Найдено документов: {len(context_docs)}")
@@ -220,7 +221,8 @@ class RAGChain:
                     filter_by_whitelist=False,  # Без фильтра
                     search_strategy=search_strategy,
                     dense_weight=search_dense_weight,
-                    bm25_weight=search_bm25_weight
+                    bm25_weight=search_bm25_weight,
+                    with_vectors=self.context_packing_enabled
                 )
                 logger.info(f"🔍 [RAG] Повторный поиск нашел документов: {len(context_docs)}")
             
@@ -232,7 +234,10 @@ class RAGChain:
                     sources.append(url)
                     seen_urls.add(url)
         
-        # Шаг 2: Формируем промпт с контекстом
+        return context_docs, sources
+    
+    def _build_prompt(self, user_query: str, context_docs: List[Dict[str, Any]], use_rag: bool) -> str:
+        """Шаг 2: промпт с контекстом из базы знаний"""
         if context_docs:
             context_text = self._format_context(context_docs)
             logger.info(f"📝 [RAG] Формирование промпта с контекстом из {len(context_docs)} документов")
@@ -256,12 +261,71 @@ class RAGChain:
 Ответь на вопрос, используя свои знания о HR консалтинге, управлении персоналом и бизнес-процессах. 
 Будь полезным и информативным."""
         
+        return enhanced_prompt
+    
+    def _generation_params(self) -> Tuple[float, int]:
+        """Температура и max_tokens (временные параметры экспериментов, если установлены)"""
+        temperature = self._temp_temperature if self._temp_temperature is not None else 0.7
+        max_tokens = self._temp_max_tokens if self._temp_max_tokens is not None else 2048
+        return temperature, max_tokens
+    
+    def _with_fallback_sources(self, sources: List[str], use_rag: bool) -> List[str]:
+        """Шаг 4: если нет источников, добавляем общие источники из whitelist"""
+        if not sources and use_rag:
+            # Если не нашли конкретные источники, показываем общие источники из whitelist
+            allowed_urls = self.qdrant_loader.whitelist.get_allowed_urls()
+            # Фильтруем только HTTP/HTTPS URL (не file://)
+            web_urls = [url for url in allowed_urls if url.startswith("http")]
+            if web_urls:
+                sources = web_urls
+                logger.info(f"Using whitelist URLs as general sources: {len(sources)} URLs")
+        
+        return sources
+    
+    @staticmethod
+    def _result(llm_response: LLMResponse, sources: List[str], context_docs: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Шаг 5: итоговый результат запроса"""
+        return {
+            "answer": llm_response.content,
+            "sources": sources,
+            "provider": llm_response.provider,
+            "model": llm_response.model,
+            "confidence": llm_response.confidence,
+            "context_count": len(context_docs),
+            "tokens_used": llm_response.tokens_used,
+            "error": llm_response.error
+        }
+    
+    async def query(
+        self,
+        user_query: str,
+        use_rag: bool = True,
+        top_k: Optional[int] = None,
+        min_score: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Обрабатывает пользовательский запрос с использованием RAG.
+        
+        Args:
+            user_query: Вопрос пользователя
+            use_rag: Использовать ли RAG поиск
+            top_k: Количество результатов поиска
+            min_score: Минимальный score для результатов
+        
+        Returns:
+            Словарь с ответом, источниками и метаданными
+        """
+        top_k = top_k or self.top_k
+        min_score = min_score or self.min_score
+        
+        # Поиск синхронный (HTTP к Qdrant + эмбеддинг) - выполняем в пуле, не блокируя event loop
+        context_docs, sources = await run_blocking("qdrant", self._search_context, user_query, use_rag, top_k, min_score)
+        enhanced_prompt = self._build_prompt(user_query, context_docs, use_rag)
+        
         # Шаг 3: Генерируем ответ через LLM
         logger.info(f"🤖 [RAG] Генерация ответа через LLM")
         logger.info(f"🤖 [RAG] Промпт для LLM (первые 500 символов): {enhanced_prompt[:500]}...")
-        # Используем временные параметры, если они установлены
-        temperature = self._temp_temperature if self._temp_temperature is not None else 0.7
-        max_tokens = self._temp_max_tokens if self._temp_max_tokens is not None else 2048
+        temperature, max_tokens = self._generation_params()
         logger.info(f"🤖 [RAG] Параметры LLM: temperature={temperature}, max_tokens={max_tokens}")
         
         llm_response = await self.llm_client.generate(
@@ -276,35 +340,73 @@ class RAGChain:
         if llm_response.error:
             logger.error(f"❌ [RAG] Ошибка LLM: {llm_response.error}")
         
-        # Шаг 4: Если нет источников, добавляем общие источники из whitelist
-        if not sources and use_rag:
-            # Если не нашли конкретные источники, показываем общие источники из whitelist
-            allowed_urls = self.qdrant_loader.whitelist.get_allowed_urls()
-            # Фильтруем только HTTP/HTTPS URL (не file://)
-            web_urls = [url for url in allowed_urls if url.startswith("http")]
-            if web_urls:
-                sources = web_urls
-                logger.info(f"Using whitelist URLs as general sources: {len(sources)} URLs")
+        sources = self._with_fallback_sources(sources, use_rag)
         
-        # Шаг 5: Форматируем результат
         logger.info(f"📊 [RAG] Формирование финального результата")
         logger.info(f"📊 [RAG] Источников: {len(sources)}, Контекстных документов: {len(context_docs)}")
-        result = {
-            "answer": llm_response.content,
+        return self._result(llm_response, sources, context_docs)
+    
+    async def query_stream(
+        self,
+        user_query: str,
+        use_rag: bool = True,
+        top_k: Optional[int] = None,
+        min_score: Optional[float] = None
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Потоковый вариант query: события (имя, данные)
+        
+        - "retrieval": найденные документы и источники (до вызова LLM)
+        - "delta": фрагмент ответа {"content": str}
+        - "done": итог в формате результата query
+        
+        Закрытие генератора (клиент отключился) прерывает генерацию LLM.
+        """
+        top_k = top_k or self.top_k
+        min_score = min_score or self.min_score
+        
+        # Поиск синхронный (HTTP к Qdrant + эмбеддинг) - выполняем в пуле, не блокируя event loop
+        context_docs, sources = await run_blocking("qdrant", self._search_context, user_query, use_rag, top_k, min_score)
+        sources = self._with_fallback_sources(sources, use_rag)
+        yield "retrieval", {
             "sources": sources,
-            "provider": llm_response.provider,
-            "model": llm_response.model,
-            "confidence": llm_response.confidence,
             "context_count": len(context_docs),
-            "tokens_used": llm_response.tokens_used,
-            "error": llm_response.error
+            "documents": [
+                {
+                    "title": doc.get("title", ""),
+                    "source_url": doc.get("source_url", ""),
+                    "score": doc.get("score", 0.0)
+                }
+                for doc in context_docs
+            ]
         }
         
-        return result
+        enhanced_prompt = self._build_prompt(user_query, context_docs, use_rag)
+        temperature, max_tokens = self._generation_params()
+        logger.info(f"🤖 [RAG] Потоковая генерация ответа: temperature={temperature}, max_tokens={max_tokens}")
+        
+        llm_response = None
+        async with aclosing(self.llm_client.generate_stream(
+            prompt=enhanced_prompt,
+            system_prompt=self.system_prompt,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )) as chunks:
+            async for chunk in chunks:
+                if chunk.response is not None:
+                    llm_response = chunk.response
+                else:
+                    yield "delta", {"content": chunk.delta}
+        
+        if llm_response.error:
+            logger.error(f"❌ [RAG] Ошибка LLM: {llm_response.error}")
+        yield "done", self._result(llm_response, sources, context_docs)
     
     def _format_context(self, documents: List[Dict[str, Any]]) -> str:
         """
         Форматирует найденные документы в контекст для промпта.
+        Если включена упаковка контекста - документы отбираются через MMR
+        и укладываются в бюджет токенов (rag.context_packing в config.yaml).
         
         Args:
             documents: Список найденных документов
@@ -312,6 +414,9 @@ class RAGChain:
         Returns:
             Отформатированный текст контекста
         """
+        if self.context_packing_enabled:
+            documents = self.context_packer.pack(documents)
+        
         context_parts = []
         
         for i, doc in enumerate(documents, 1):
@@ -330,13 +435,7 @@ class RAGChain:
     
     def _is_pricing_query(self, query: str) -> bool:
         """Определяет, является ли запрос запросом о ценах/коммерческих предложениях"""
-        pricing_keywords = [
-            "цена", "стоимость", "стоит", "рублей", "руб", "прайс", "price", "cost",
-            "сколько", "купить", "продажа", "прайс-лист", "pricelist", "коммерческое предложение",
-            "кп", "коммерческий", "предложение", "расценки", "тарифы"
-        ]
-        query_lower = query.lower()
-        return any(keyword in query_lower for keyword in pricing_keywords)
+        return get_intent_rules().matches(query, "pricing")
     
     async def close(self):
         """Закрывает ресурсы"""
@@ -8,17 +8,21 @@ Evaluates RAG system using Ground-Truth QA pairs with metrics:
 """
 
 import json
+import math
 import logging
 from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
 from dataclasses import dataclass, asdict
 from datetime import datetime
 import asyncio
+import os
 from services.rag.rag_chain import RAGChain
 from services.rag.qdrant_loader import QdrantLoader
 
 logger = logging.getLogger(__name__)
 
+RAGAS_EVAL_TIMEOUT = float(os.getenv("RAGAS_EVAL_TIMEOUT", "180"))  # Оценка одного ответа (несколько вызовов LLM)
+
 
 @dataclass
 class GroundTruthQA:
@@ -484,13 +488,22 @@ class RAGEvaluator:
 
 @dataclass
 class RAGEvaluationResult:
-    """Результат оценки RAG ответа с помощью RAGAS"""
-    faithfulness: float  # Верность ответа контексту (0-1)
-    answer_relevancy: float  # Релевантность ответа вопросу (0-1)
-    context_precision: float  # Точность контекста (0-1)
-    context_recall: float  # Полнота контекста (0-1)
-    average_score: float  # Средняя оценка
-    details: Dict[str, Any]  # Дополнительные детали
+    """Результат оценки RAG ответа с помощью RAGAS (None - метрика не посчитана)"""
+    faithfulness: Optional[float]  # Верность ответа контексту (0-1)
+    answer_relevancy: Optional[float]  # Релевантность ответа вопросу (0-1)
+    context_precision: Optional[float]  # Точность контекста (0-1)
+    context_recall: Optional[float]  # Полнота контекста (0-1)
+    average_score: Optional[float]  # Средняя оценка посчитанных метрик
+    details: Dict[str, Optional[float]]  # Значения метрик RAGAS (только числа, JSON-совместимо)
+
+
+def metric_value(value: Any) -> Optional[float]:
+    """Значение метрики RAGAS как float (NaN и нечисловые значения -> None)"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) or math.isinf(value) else value
 
 
 async def evaluate_rag_response(
@@ -501,7 +514,26 @@ async def evaluate_rag_response(
 ) -> Optional[RAGEvaluationResult]:
     """
     Оценивает качество RAG ответа с помощью RAGAS метрик
-    Используется для логирования в реальном времени при ответах бота
+    
+    RAGAS evaluate() синхронный (несколько вызовов LLM, Dataset, pandas),
+    поэтому выполняется в пуле потоков и не блокирует event loop.
+    Ответы бота оцениваются в фоне - см. services/rag/evaluation_queue.py.
+    """
+    from services.helpers.blocking_io import run_blocking
+    return await run_blocking(
+        "ragas", evaluate_rag_response_sync, question, answer, contexts, ground_truth,
+        timeout=RAGAS_EVAL_TIMEOUT
+    )
+
+
+def evaluate_rag_response_sync(
+    question: str,
+    answer: str,
+    contexts: List[str],
+    ground_truth: Optional[str] = None
+) -> Optional[RAGEvaluationResult]:
+    """
+    Оценивает качество RAG ответа с помощью RAGAS метрик (синхронно)
     
     Args:
         question: Вопрос пользователя
@@ -550,21 +582,19 @@ async def evaluate_rag_response(
         # Выполняем оценку
         result = evaluate(dataset, metrics=metrics)
         
-        # Извлекаем результаты
-        scores = result.to_pandas().iloc[0].to_dict()
+        # Извлекаем результаты: строка pandas содержит еще вопрос, контексты и numpy значения,
+        # поэтому сохраняем только метрики (NaN - метрика не посчитана - превращается в None)
+        row = result.to_pandas().iloc[0].to_dict()
+        scores = {metric.name: metric_value(row.get(metric.name)) for metric in metrics}
+        computed = [value for value in scores.values() if value is not None]
         
         # Формируем результат
         evaluation = RAGEvaluationResult(
-            faithfulness=scores.get('faithfulness', 0.0),
-            answer_relevancy=scores.get('answer_relevancy', 0.0),
-            context_precision=scores.get('context_precision', 0.0),
-            context_recall=scores.get('context_recall', 0.0) if ground_truth else 0.0,
-            average_score=(
-                scores.get('faithfulness', 0.0) +
-                scores.get('answer_relevancy', 0.0) +
-                scores.get('context_precision', 0.0) +
-                (scores.get('context_recall', 0.0) if ground_truth else 0.0)
-            ) / (4 if ground_truth else 3),
+            faithfulness=scores.get('faithfulness'),
+            answer_relevancy=scores.get('answer_relevancy'),
+            context_precision=scores.get('context_precision'),
+            context_recall=scores.get('context_recall'),
+            average_score=sum(computed) / len(computed) if computed else None,
             details=scores
         )
         
@@ -581,6 +611,27 @@ async def evaluate_rag_response(
         return None
 
 
+def log_evaluation(evaluation: RAGEvaluationResult) -> None:
+    """Пишет оценку в лог с предупреждениями о низких метриках"""
+    logger.info(format_evaluation_log(evaluation))
+    
+    if evaluation.faithfulness is not None and evaluation.faithfulness < 0.5:
+        logger.warning(f"⚠️ [RAGAS] Низкая верность ответа ({evaluation.faithfulness:.3f}) - ответ может содержать информацию не из контекста")
+    if evaluation.answer_relevancy is not None and evaluation.answer_relevancy < 0.5:
+        logger.warning(f"⚠️ [RAGAS] Низкая релевантность ответа ({evaluation.answer_relevancy:.3f}) - ответ может не соответствовать вопросу")
+    if evaluation.context_precision is not None and evaluation.context_precision < 0.5:
+        logger.warning(f"⚠️ [RAGAS] Низкая точность контекста ({evaluation.context_precision:.3f}) - возможно, использованы нерелевантные документы")
+    
+    if evaluation.average_score is None:
+        logger.warning("⚠️ [RAGAS] Ни одна метрика не посчитана")
+    elif evaluation.average_score >= 0.7:
+        logger.info(f"✅ [RAGAS] Высокое качество ответа (средняя оценка: {evaluation.average_score:.3f})")
+    elif evaluation.average_score >= 0.5:
+        logger.info(f"ℹ️ [RAGAS] Среднее качество ответа (средняя оценка: {evaluation.average_score:.3f})")
+    else:
+        logger.warning(f"⚠️ [RAGAS] Низкое качество ответа (средняя оценка: {evaluation.average_score:.3f})")
+
+
 def format_evaluation_log(evaluation: RAGEvaluationResult) -> str:
     """
     Форматирует результат оценки для логирования
@@ -591,11 +642,14 @@ def format_evaluation_log(evaluation: RAGEvaluationResult) -> str:
     Returns:
         Отформатированная строка для логов
     """
+    def fmt(value: Optional[float]) -> str:
+        return "н/д" if value is None else f"{value:.3f}"
+    
     return (
         f"📊 [RAGAS Evaluation]\n"
-        f"  Faithfulness (верность): {evaluation.faithfulness:.3f}\n"
-        f"  Answer Relevancy (релевантность): {evaluation.answer_relevancy:.3f}\n"
-        f"  Context Precision (точность контекста): {evaluation.context_precision:.3f}\n"
-        f"  Context Recall (полнота контекста): {evaluation.context_recall:.3f}\n"
-        f"  Average Score (средняя оценка): {evaluation.average_score:.3f}"
+        f"  Faithfulness (верность): {fmt(evaluation.faithfulness)}\n"
+        f"  Answer Relevancy (релевантность): {fmt(evaluation.answer_relevancy)}\n"
+        f"  Context Precision (точность контекста): {fmt(evaluation.context_precision)}\n"
+        f"  Context Recall (полнота контекста): {fmt(evaluation.context_recall)}\n"
+        f"  Average Score (средняя оценка): {fmt(evaluation.average_score)}"
     )
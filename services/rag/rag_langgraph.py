@@ -11,9 +11,13 @@ import operator
 
 from services.rag.qdrant_helper import search_service
 from services.helpers.llm_api import LLMClient
+from services.helpers.intent_rules import get_intent_rules
+from services.helpers.graph_runtime import add_timed_node, compile_graph
 
 logger = logging.getLogger(__name__)
 
+RAG_GRAPH_NAME = "rag"
+
 # Определение состояния для LangGraph
 class RAGState(TypedDict):
     """Состояние RAG обработки"""
@@ -37,28 +41,10 @@ def classify_query(state: RAGState) -> RAGState:
     query = state["user_query"]
     logger.info(f"🔍 [LANGGRAPH] Классификация запроса: '{query}'")
     
-    query_lower = query.lower()
-    
-    pricing_keywords = [
-        "цена", "стоимость", "стоит", "рублей", "руб", "прайс", "price", "cost",
-        "сколько", "купить", "продажа", "прайс-лист", "pricelist", "коммерческое предложение",
-        "кп", "коммерческий", "предложение", "расценки", "тарифы", "от"
-    ]
-    
-    service_keywords = [
-        "услуга", "консультация", "тренинг", "сессия", "коучинг", "аудит",
-        "разработка", "внедрение", "автоматизация", "оптимизация"
-    ]
-    
-    if any(kw in query_lower for kw in pricing_keywords):
-        query_type = "pricing"
-        logger.info(f"🔍 [LANGGRAPH] Запрос классифицирован как: PRICING")
-    elif any(kw in query_lower for kw in service_keywords):
-        query_type = "service_info"
-        logger.info(f"🔍 [LANGGRAPH] Запрос классифицирован как: SERVICE_INFO")
-    else:
-        query_type = "general"
-        logger.info(f"🔍 [LANGGRAPH] Запрос классифицирован как: GENERAL")
+    # Правила из config/rag.yaml (rag.intent_rules)
+    match = get_intent_rules().first(query, ("pricing", "service_info"))
+    query_type = match.intent if match else "general"
+    logger.info(f"🔍 [LANGGRAPH] Запрос классифицирован как: {query_type.upper()}")
     
     state["query_type"] = query_type
     return state
@@ -424,15 +410,15 @@ def create_rag_graph():
     """Создает граф LangGraph для RAG обработки"""
     workflow = StateGraph(RAGState)
     
-    # Добавляем узлы
-    workflow.add_node("classify", classify_query)
-    workflow.add_node("search", search_rag)
-    workflow.add_node("extract_pricing", extract_pricing_info)
-    workflow.add_node("format", format_context)
-    workflow.add_node("generate", generate_response)
-    workflow.add_node("validate", validate_prices)
-    workflow.add_node("increment_retry", increment_retry)
-    workflow.add_node("finalize", finalize_answer)
+    # Добавляем узлы (синхронные узлы выполняются в пуле потоков graph_runtime)
+    add_timed_node(workflow, RAG_GRAPH_NAME, "classify", classify_query)
+    add_timed_node(workflow, RAG_GRAPH_NAME, "search", search_rag)
+    add_timed_node(workflow, RAG_GRAPH_NAME, "extract_pricing", extract_pricing_info)
+    add_timed_node(workflow, RAG_GRAPH_NAME, "format", format_context)
+    add_timed_node(workflow, RAG_GRAPH_NAME, "generate", generate_response)
+    add_timed_node(workflow, RAG_GRAPH_NAME, "validate", validate_prices)
+    add_timed_node(workflow, RAG_GRAPH_NAME, "increment_retry", increment_retry)
+    add_timed_node(workflow, RAG_GRAPH_NAME, "finalize", finalize_answer)
     
     # Определяем поток
     workflow.set_entry_point("classify")
@@ -463,15 +449,9 @@ def create_rag_graph():
     return app
 
 
-# Singleton для графа
-_rag_graph_app = None
-
 def get_rag_graph():
-    """Получить экземпляр графа LangGraph (Singleton)"""
-    global _rag_graph_app
-    if _rag_graph_app is None:
-        _rag_graph_app = create_rag_graph()
-    return _rag_graph_app
+    """Получить скомпилированный граф LangGraph (один раз на процесс)"""
+    return compile_graph(RAG_GRAPH_NAME, create_rag_graph)
 
 
 async def query_with_langgraph(
@@ -0,0 +1,392 @@
+"""
+Кэш результатов поиска в RAG базе знаний.
+
+Ключ кэша: (нормализованный запрос, стратегия, веса, top_k, поколение индекса).
+Поколение индекса увеличивается при каждом upsert/delete в коллекции, поэтому
+устаревшие результаты после переиндексации никогда не отдаются.
+
+Поддерживаются два бэкенда:
+- memory: LRU в памяти процесса
+- redis: общий кэш для всех воркеров (через services.helpers.redis_helper)
+
+По умолчанию (backend: auto) используется Redis, если он настроен. Поколение
+в памяти видно только своему процессу: переиндексация в другом процессе (бот,
+backend, воркеры uvicorn) его не увеличит. Поэтому для memory время жизни
+записей ограничено memory_max_ttl (по умолчанию 60 секунд).
+
+Stale-while-revalidate: запись старше fresh_ttl (но моложе stale_ttl) отдается
+сразу, а обновление выполняется в фоне.
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY_PREFIX = "rag_cache"
+MEMORY_MAX_TTL = 60  # Сек: предел fresh_ttl/stale_ttl для кэша в памяти процесса
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_TRAILING_PUNCT_RE = re.compile(r"[\s?!.,;:]+$")
+
+
+def normalize_query(query: str) -> str:
+    """Нормализует запрос: регистр, пробелы, ё→е, завершающая пунктуация"""
+    text = (query or "").lower().replace("ё", "е")
+    text = _WHITESPACE_RE.sub(" ", text).strip()
+    return _TRAILING_PUNCT_RE.sub("", text)
+
+
+class MemoryCacheBackend:
+    """LRU кэш в памяти процесса"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Tuple[float, Any, float]]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            created_at, value, expires_at = entry
+            if time.time() > expires_at:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return created_at, value
+
+    def set(self, key: str, value: Any, ttl: int) -> None:
+        with self._lock:
+            now = time.time()
+            self._data[key] = (now, value, now + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def get_generation(self, namespace: str) -> int:
+        with self._lock:
+            return self._generations.get(namespace, 0)
+
+    def bump_generation(self, namespace: str) -> int:
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            # Записи старых поколений больше недоступны по ключу - освобождаем память
+            prefix = f"{namespace}:"
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                del self._data[key]
+            return self._generations[namespace]
+
+    def size(self) -> int:
+        return len(self._data)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class RedisCacheBackend:
+    """Кэш в Redis, общий для всех воркеров и сервисов"""
+
+    name = "redis"
+
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        raw = self.client.get(f"{REDIS_KEY_PREFIX}:entry:{key}")
+        if not raw:
+            return None
+        data = json.loads(raw)
+        return data["created_at"], data["value"]
+
+    def set(self, key: str, value: Any, ttl: int) -> None:
+        payload = json.dumps({"created_at": time.time(), "value": value}, ensure_ascii=False)
+        self.client.setex(f"{REDIS_KEY_PREFIX}:entry:{key}", ttl, payload)
+
+    def get_generation(self, namespace: str) -> int:
+        value = self.client.get(f"{REDIS_KEY_PREFIX}:generation:{namespace}")
+        return int(value) if value else 0
+
+    def bump_generation(self, namespace: str) -> int:
+        # Старые записи истекут сами по TTL
+        return int(self.client.incr(f"{REDIS_KEY_PREFIX}:generation:{namespace}"))
+
+    def size(self) -> int:
+        return -1  # Не считаем ключи в Redis (SCAN слишком дорогой для /health)
+
+    def clear(self) -> None:
+        for key in self.client.scan_iter(f"{REDIS_KEY_PREFIX}:entry:*"):
+            self.client.delete(key)
+
+
+class RetrievalCache:
+    """Кэш результатов поиска с поколениями индекса и stale-while-revalidate"""
+
+    def __init__(
+        self,
+        backend=None,
+        enabled: bool = True,
+        fresh_ttl: int = 300,
+        stale_ttl: int = 3600,
+        memory_max_ttl: int = MEMORY_MAX_TTL
+    ):
+        """
+        Args:
+            backend: MemoryCacheBackend или RedisCacheBackend
+            enabled: Включен ли кэш
+            fresh_ttl: Время (сек), в течение которого запись считается свежей
+            stale_ttl: Время (сек), в течение которого устаревшая запись отдается с фоновым обновлением
+            memory_max_ttl: Предел fresh_ttl и stale_ttl для кэша в памяти (поколение не общее между процессами)
+        """
+        self.backend = backend or MemoryCacheBackend()
+        self.enabled = enabled
+        if self.backend.name == MemoryCacheBackend.name:
+            fresh_ttl = min(fresh_ttl, memory_max_ttl)
+            stale_ttl = min(stale_ttl, memory_max_ttl)
+        self.fresh_ttl = fresh_ttl
+        self.stale_ttl = max(stale_ttl, fresh_ttl)
+
+        self._stats_lock = threading.Lock()
+        self._refreshing: set = set()
+        self.stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "refreshes": 0,
+            "errors": 0,
+            "invalidations": 0
+        }
+
+    def _incr(self, name: str) -> None:
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def get_generation(self, namespace: str) -> int:
+        """Текущее поколение индекса для коллекции"""
+        try:
+            return self.backend.get_generation(namespace)
+        except Exception as e:
+            logger.warning(f"⚠️ [RAG Cache] Не удалось получить поколение индекса: {e}")
+            self._incr("errors")
+            return -1
+
+    def bump_generation(self, namespace: str) -> int:
+        """
+        Увеличивает поколение индекса коллекции.
+        Вызывается после каждого upsert/delete - все ранее закэшированные результаты становятся недоступны.
+        """
+        try:
+            generation = self.backend.bump_generation(namespace)
+            self._incr("invalidations")
+            logger.debug(f"🔄 [RAG Cache] Поколение индекса '{namespace}': {generation}")
+            return generation
+        except Exception as e:
+            logger.warning(f"⚠️ [RAG Cache] Не удалось обновить поколение индекса: {e}")
+            self._incr("errors")
+            return -1
+
+    def make_key(
+        self,
+        namespace: str,
+        query: str,
+        strategy: str,
+        weights: Tuple[float, ...] = (),
+        top_k: int = 0,
+        **params: Any
+    ) -> Optional[str]:
+        """
+        Формирует ключ кэша. Возвращает None, если поколение индекса недоступно
+        (в этом случае кэш не используется, чтобы не отдать устаревшие данные).
+        """
+        generation = self.get_generation(namespace)
+        if generation < 0:
+            return None
+        key_data = {
+            "q": normalize_query(query),
+            "s": strategy,
+            "w": [round(float(w), 4) for w in weights],
+            "k": top_k,
+            "p": params
+        }
+        digest = hashlib.sha1(json.dumps(key_data, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+        return f"{namespace}:{generation}:{digest}"
+
+    def _store(self, key: str, value: Any) -> None:
+        try:
+            self.backend.set(key, value, self.stale_ttl)
+        except Exception as e:
+            logger.warning(f"⚠️ [RAG Cache] Не удалось сохранить результат: {e}")
+            self._incr("errors")
+
+    def _refresh_in_background(self, key: str, compute: Callable[[], List[Dict[str, Any]]]) -> None:
+        with self._stats_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def worker():
+            try:
+                value = compute()
+                if value:
+                    self._store(key, value)
+                self._incr("refreshes")
+            except Exception as e:
+                logger.warning(f"⚠️ [RAG Cache] Ошибка фонового обновления: {e}")
+                self._incr("errors")
+            finally:
+                with self._stats_lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=worker, daemon=True, name="rag-cache-refresh").start()
+
+    def get_or_compute(
+        self,
+        key: Optional[str],
+        compute: Callable[[], List[Dict[str, Any]]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Возвращает результат из кэша или вычисляет его.
+
+        Args:
+            key: Ключ из make_key (None - кэш не используется)
+            compute: Функция поиска без кэша
+
+        Returns:
+            Результаты поиска
+        """
+        if not self.enabled or key is None:
+            return compute()
+
+        entry = None
+        try:
+            entry = self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"⚠️ [RAG Cache] Ошибка чтения кэша: {e}")
+            self._incr("errors")
+
+        if entry is not None:
+            created_at, value = entry
+            age = time.time() - created_at
+            if age <= self.fresh_ttl:
+                self._incr("hits")
+                return value
+            if age <= self.stale_ttl:
+                self._incr("stale_hits")
+                self._refresh_in_background(key, compute)
+                return value
+
+        self._incr("misses")
+        value = compute()
+        # Пустые результаты не кэшируем: они часто означают временную ошибку (эмбеддинги, таймаут)
+        if value:
+            self._store(key, value)
+        return value
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика кэша (для /health)"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        lookups = stats["hits"] + stats["stale_hits"] + stats["misses"]
+        stats["lookups"] = lookups
+        stats["hit_rate"] = round((stats["hits"] + stats["stale_hits"]) / lookups, 4) if lookups else 0.0
+        stats["enabled"] = self.enabled
+        stats["backend"] = self.backend.name
+        stats["size"] = self.backend.size()
+        return stats
+
+    def clear(self) -> None:
+        """Очищает кэш (для тестирования)"""
+        self.backend.clear()
+
+
+def _load_cache_config() -> Dict[str, Any]:
+    """Загружает секцию rag.retrieval_cache из config.yaml"""
+    config_path = Path(__file__).parent.parent.parent / "config.yaml"
+    try:
+        with open(config_path, "r", encoding="utf-8") as f:
+            config = yaml.safe_load(f) or {}
+        return config.get("rag", {}).get("retrieval_cache", {}) or {}
+    except Exception as e:
+        logger.warning(f"Не удалось загрузить настройки кэша поиска: {e}")
+        return {}
+
+
+def _worker_count() -> int:
+    """Число воркеров веб-сервера (WEB_CONCURRENCY читают uvicorn и gunicorn)"""
+    try:
+        return int(os.getenv("WEB_CONCURRENCY", "1"))
+    except ValueError:
+        return 1
+
+
+_retrieval_cache: Optional[RetrievalCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_retrieval_cache() -> RetrievalCache:
+    """Возвращает общий экземпляр RetrievalCache с настройками из config.yaml"""
+    global _retrieval_cache
+    if _retrieval_cache is not None:
+        return _retrieval_cache
+
+    with _cache_lock:
+        if _retrieval_cache is not None:
+            return _retrieval_cache
+
+        config = _load_cache_config()
+        backend_name = config.get("backend", "auto")
+        backend = None
+        if backend_name in ("redis", "auto"):
+            try:
+                from services.helpers.redis_helper import get_redis_client
+                client = get_redis_client()
+                if client is not None:
+                    backend = RedisCacheBackend(client)
+                elif backend_name == "redis":
+                    logger.warning("⚠️ [RAG Cache] Redis недоступен, используется кэш в памяти")
+            except Exception as e:
+                logger.warning(f"⚠️ [RAG Cache] Ошибка подключения к Redis: {e}, используется кэш в памяти")
+        if backend is None:
+            backend = MemoryCacheBackend(max_entries=config.get("max_entries", 1000))
+            if _worker_count() > 1:
+                logger.warning(
+                    f"⚠️ [RAG Cache] Кэш в памяти при {_worker_count()} воркерах: переиндексация в другом "
+                    f"процессе не сбрасывает его, записи живут до {config.get('memory_max_ttl', MEMORY_MAX_TTL)} с. "
+                    f"Настройте Redis (rag.retrieval_cache.backend: redis)"
+                )
+
+        _retrieval_cache = RetrievalCache(
+            backend=backend,
+            enabled=config.get("enabled", True),
+            fresh_ttl=config.get("fresh_ttl", 300),
+            stale_ttl=config.get("stale_ttl", 3600),
+            memory_max_ttl=config.get("memory_max_ttl", MEMORY_MAX_TTL)
+        )
+        logger.info(f"✅ [RAG Cache] Кэш поиска инициализирован (backend={backend.name})")
+        return _retrieval_cache
+
+
+def invalidate_collection(collection_name: str) -> None:
+    """
+    Помечает индекс коллекции как измененный (upsert/delete).
+    Безопасна для вызова из любого места: ошибки кэша не прерывают индексацию.
+    """
+    try:
+        get_retrieval_cache().bump_generation(collection_name)
+    except Exception as e:
+        logger.warning(f"⚠️ [RAG Cache] Не удалось инвалидировать кэш '{collection_name}': {e}")
@@ -0,0 +1,380 @@
+"""
+Service Index Sync
+Инкрементальная индексация услуг из Google Sheets ("Ценник") в Qdrant.
+
+Для каждой строки считается отпечаток (хеш текста для эмбеддинга и хеш
+payload). Манифест строка -> (хеши, point id) хранится в Redis (или в JSON
+файле, если Redis недоступен), поэтому при обновлении кэша услуг:
+- эмбеддинги считаются пачкой только для новых строк и строк с измененным текстом
+- для строк, где изменился только payload (номер строки, доп. услуги), вызывается set_payload
+- точки удаленных строк удаляются из коллекции
+
+Манифест сверяется с числом точек услуг в коллекции: если они расходятся
+(коллекцию пересоздали или очистили), выполняется полная переиндексация.
+При полной переиндексации старые точки не удаляются заранее - сначала
+записываются новые, затем удаляются только точки, которых нет в новом наборе.
+
+Повторные обновления кэша объединяются ServiceReindexDebouncer, поэтому
+параллельные полные переиндексации не запускаются.
+"""
+import os
+import json
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from services.rag import qdrant_helper
+
+log = logging.getLogger(__name__)
+
+try:
+    from services.helpers.redis_helper import get_redis_client
+    REDIS_HELPER_AVAILABLE = True
+except ImportError:
+    REDIS_HELPER_AVAILABLE = False
+
+MANIFEST_FILE = os.getenv("SERVICES_INDEX_MANIFEST_FILE", "data/services_index_manifest.json")
+REINDEX_DEBOUNCE = float(os.getenv("SERVICES_REINDEX_DEBOUNCE", "5"))  # Секунды
+
+REDIS_MANIFEST_KEY = "qdrant:services_manifest"
+
+
+# ===================== FINGERPRINTS =====================
+
+def service_row_key(service: Dict) -> str:
+    """Ключ строки: услуга не меняет ключ при изменении цены или длительности"""
+    return "|".join(
+        str(service.get(name) or "").strip().lower() for name in ("type", "title", "master")
+    )
+
+
+def _hash(value: Any) -> str:
+    return hashlib.md5(json.dumps(value, ensure_ascii=False, sort_keys=True).encode()).hexdigest()
+
+
+def service_point_id(row_key: str) -> int:
+    return int(hashlib.md5(f"service:{row_key}".encode()).hexdigest()[:8], 16)
+
+
+@dataclass
+class ServiceRow:
+    key: str
+    service: Dict
+    text: str
+    text_hash: str
+    payload: Dict[str, Any]
+    payload_hash: str
+    point_id: int
+
+
+def fingerprint_services(services: List[Dict]) -> Dict[str, ServiceRow]:
+    """Отпечатки строк (одинаковые ключи получают суффикс #n)"""
+    rows: Dict[str, ServiceRow] = {}
+    for service in services:
+        base_key = service_row_key(service)
+        key, suffix = base_key, 1
+        while key in rows:
+            suffix += 1
+            key = f"{base_key}#{suffix}"
+        text = qdrant_helper.build_service_text(service)
+        payload = qdrant_helper.build_service_payload(service)
+        rows[key] = ServiceRow(
+            key=key,
+            service=service,
+            text=text,
+            text_hash=_hash(text),
+            payload=payload,
+            payload_hash=_hash(payload),
+            point_id=service_point_id(key)
+        )
+    return rows
+
+
+@dataclass
+class ServiceIndexDiff:
+    """Изменения строк относительно манифеста"""
+    to_embed: List[ServiceRow] = field(default_factory=list)  # Новые и с измененным текстом
+    payload_only: List[ServiceRow] = field(default_factory=list)
+    removed: List[Tuple[str, int]] = field(default_factory=list)  # (ключ, point id)
+    unchanged: int = 0
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.to_embed or self.payload_only or self.removed)
+
+
+def diff_services(rows: Dict[str, ServiceRow], manifest_rows: Dict[str, Dict]) -> ServiceIndexDiff:
+    diff = ServiceIndexDiff()
+    for key, row in rows.items():
+        entry = manifest_rows.get(key)
+        if entry is None or entry.get("text_hash") != row.text_hash:
+            diff.to_embed.append(row)
+        elif entry.get("payload_hash") != row.payload_hash:
+            diff.payload_only.append(row)
+        else:
+            diff.unchanged += 1
+    for key, entry in manifest_rows.items():
+        if key not in rows:
+            diff.removed.append((key, int(entry["point_id"])))
+    return diff
+
+
+# ===================== MANIFEST =====================
+
+class ServiceIndexManifest:
+    """Манифест проиндексированных строк: Redis или JSON файл"""
+
+    def __init__(self, redis_client=None, manifest_file: str = MANIFEST_FILE):
+        self.redis = redis_client
+        self.manifest_file = Path(manifest_file)
+
+    def load(self, collection: str, dimension: int) -> Dict[str, Dict]:
+        """Строки манифеста (пусто, если сменились коллекция или размерность)"""
+        try:
+            raw = None
+            if self.redis is not None:
+                raw = self.redis.get(REDIS_MANIFEST_KEY)
+            elif self.manifest_file.exists():
+                raw = self.manifest_file.read_text(encoding="utf-8")
+            if raw:
+                state = json.loads(raw)
+                if state.get("collection") == collection and state.get("dimension") == dimension:
+                    return state.get("rows") or {}
+        except Exception as e:
+            log.warning(f"⚠️ [Services Index] Не удалось загрузить манифест: {e}")
+        return {}
+
+    def save(self, collection: str, dimension: int, rows: Dict[str, Dict]) -> None:
+        payload = json.dumps({
+            "collection": collection,
+            "dimension": dimension,
+            "updated_at": datetime.now().isoformat(),
+            "rows": rows
+        }, ensure_ascii=False)
+        try:
+            if self.redis is not None:
+                self.redis.set(REDIS_MANIFEST_KEY, payload)
+                return
+            self.manifest_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.manifest_file.with_suffix(".tmp")
+            tmp_file.write_text(payload, encoding="utf-8")
+            tmp_file.replace(self.manifest_file)
+        except Exception as e:
+            log.warning(f"⚠️ [Services Index] Не удалось сохранить манифест: {e}")
+
+
+_manifest: Optional[ServiceIndexManifest] = None
+
+
+def get_manifest() -> ServiceIndexManifest:
+    """Манифест индекса услуг (Singleton)"""
+    global _manifest
+    if _manifest is None:
+        redis_client = None
+        if REDIS_HELPER_AVAILABLE:
+            try:
+                redis_client = get_redis_client()
+            except Exception as e:
+                log.debug(f"Redis недоступен для манифеста услуг: {e}")
+        _manifest = ServiceIndexManifest(redis_client=redis_client)
+    return _manifest
+
+
+# ===================== SYNC =====================
+
+@dataclass
+class ServiceIndexResult:
+    ok: bool
+    embedded: int = 0
+    payload_updated: int = 0
+    deleted: int = 0
+    unchanged: int = 0
+    failed: int = 0
+
+
+# Синхронизации выполняются по одной (фоновая и явная из telegram_bot/app.py)
+_sync_lock = threading.Lock()
+
+
+def _manifest_entry(row: ServiceRow) -> Dict[str, Any]:
+    return {"text_hash": row.text_hash, "payload_hash": row.payload_hash, "point_id": row.point_id}
+
+
+def _service_filter(**kwargs):
+    from qdrant_client.models import Filter, FieldCondition, MatchValue
+    return Filter(must=[FieldCondition(key="source_type", match=MatchValue(value="service"))], **kwargs)
+
+
+def _manifest_matches_collection(client, collection: str, manifest_rows: Dict[str, Dict]) -> bool:
+    """Число точек услуг в Qdrant совпадает с манифестом"""
+    counted = client.count(collection_name=collection, count_filter=_service_filter(), exact=True).count
+    if counted != len(manifest_rows):
+        log.warning(
+            f"⚠️ [Services Index] В Qdrant {counted} точек услуг, в манифесте {len(manifest_rows)} - "
+            f"полная переиндексация"
+        )
+        return False
+    return True
+
+
+def sync_services_index(
+    services: List[Dict],
+    force: bool = False,
+    client=None,
+    manifest: Optional[ServiceIndexManifest] = None
+) -> ServiceIndexResult:
+    """
+    Привести точки услуг в Qdrant к текущему списку услуг
+
+    Args:
+        services: Услуги из Google Sheets
+        force: Переиндексировать все строки, игнорируя манифест
+        client: Клиент Qdrant (по умолчанию qdrant_helper.get_qdrant_client())
+        manifest: Манифест (по умолчанию get_manifest())
+    """
+    client = client or qdrant_helper.get_qdrant_client()
+    if not client:
+        log.error(f"❌ Qdrant клиент не доступен. Проверьте подключение к {qdrant_helper.QDRANT_URL}")
+        return ServiceIndexResult(ok=False)
+    if not qdrant_helper.ensure_collection():
+        log.error("❌ Не удалось создать коллекцию")
+        return ServiceIndexResult(ok=False)
+    manifest = manifest or get_manifest()
+    collection = qdrant_helper.COLLECTION_NAME
+
+    with _sync_lock:
+        dimension = qdrant_helper._embedding_dimension
+        manifest_rows = {} if force else manifest.load(collection, dimension)
+        try:
+            if manifest_rows and not _manifest_matches_collection(client, collection, manifest_rows):
+                manifest_rows = {}
+        except Exception as e:
+            log.error(f"❌ [Services Index] Не удалось проверить точки услуг в Qdrant: {e}")
+            return ServiceIndexResult(ok=False)
+        rows = fingerprint_services(services)
+        diff = diff_services(rows, manifest_rows)
+        result = ServiceIndexResult(ok=True, unchanged=diff.unchanged)
+
+        if diff.is_empty:
+            log.info(f"✅ [Services Index] Услуги не изменились ({diff.unchanged} строк), индексация не нужна")
+            return result
+
+        from qdrant_client.models import PointStruct, PointIdsList, HasIdCondition
+
+        try:
+            new_manifest = {key: entry for key, entry in manifest_rows.items() if key in rows}
+
+            if diff.to_embed:
+                embeddings = qdrant_helper.generate_embeddings_batch([row.text for row in diff.to_embed])
+                points = []
+                indexed_at = datetime.now().isoformat()
+                for row, embedding in zip(diff.to_embed, embeddings):
+                    if embedding is None:
+                        log.warning(f"⚠️ Не удалось сгенерировать эмбеддинг для услуги: {row.service.get('title', '')}")
+                        result.failed += 1
+                        continue
+                    points.append(PointStruct(id=row.point_id, vector=embedding, payload={**row.payload, "indexed_at": indexed_at}))
+                    new_manifest[row.key] = _manifest_entry(row)
+                if points:
+                    qdrant_helper.validate_points(points, dimension, collection)
+                    client.upsert(collection_name=collection, points=points)
+                result.embedded = len(points)
+
+            for row in diff.payload_only:
+                client.set_payload(collection_name=collection, payload=row.payload, points=[row.point_id])
+                new_manifest[row.key] = _manifest_entry(row)
+            result.payload_updated = len(diff.payload_only)
+
+            if not manifest_rows:
+                # Полная переиндексация: после записи новых точек удаляем точки услуг,
+                # которых нет среди текущих строк (созданные без манифеста, удаленные строки)
+                current_ids = [row.point_id for row in rows.values()]
+                client.delete(
+                    collection_name=collection,
+                    points_selector=_service_filter(must_not=[HasIdCondition(has_id=current_ids)])
+                )
+            elif diff.removed:
+                client.delete(
+                    collection_name=collection,
+                    points_selector=PointIdsList(points=[point_id for _, point_id in diff.removed])
+                )
+            result.deleted = len(diff.removed)
+        except Exception as e:
+            log.error(f"❌ [Services Index] Ошибка синхронизации услуг с Qdrant: {e}", exc_info=True)
+            return ServiceIndexResult(ok=False)
+
+        manifest.save(collection, dimension, new_manifest)
+        qdrant_helper.invalidate_collection(collection)
+        if result.embedded and not manifest_rows:
+            # Первая индексация услуг: появились точки с source_type - поиск должен включить фильтр
+            qdrant_helper.get_collection_metadata_cache().invalidate(collection)
+        result.ok = result.embedded > 0 or not diff.to_embed
+        log.info(
+            f"✅ [Services Index] Эмбеддингов: {result.embedded}, payload: {result.payload_updated}, "
+            f"удалено: {result.deleted}, без изменений: {result.unchanged}, ошибок: {result.failed}"
+        )
+        return result
+
+
+# ===================== DEBOUNCE =====================
+
+class ServiceReindexDebouncer:
+    """
+    Объединяет частые запросы на переиндексацию
+
+    Запускается одна синхронизация с последним списком услуг через delay
+    секунд после первого запроса; запросы во время синхронизации
+    выполняются одной синхронизацией после ее завершения.
+    """
+
+    def __init__(self, sync: Callable[[List[Dict]], Any] = sync_services_index, delay: float = REINDEX_DEBOUNCE):
+        self.sync = sync
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._pending: Optional[List[Dict]] = None
+        self._timer: Optional[threading.Timer] = None
+        self._running = False
+
+    def schedule(self, services: List[Dict]) -> None:
+        with self._lock:
+            self._pending = list(services)
+            if self._timer is None and not self._running:
+                self._start_timer()
+
+    def _start_timer(self) -> None:
+        self._timer = threading.Timer(self.delay, self._run)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _run(self) -> None:
+        with self._lock:
+            services, self._pending = self._pending, None
+            self._timer = None
+            self._running = True
+        try:
+            if services is not None:
+                self.sync(services)
+        except Exception as e:
+            log.warning(f"⚠️ Не удалось обновить индекс Qdrant: {e}")
+        finally:
+            with self._lock:
+                self._running = False
+                if self._pending is not None:
+                    self._start_timer()
+
+
+_debouncer: Optional[ServiceReindexDebouncer] = None
+_debouncer_lock = threading.Lock()
+
+
+def schedule_services_reindex(services: List[Dict]) -> None:
+    """Запланировать инкрементальную переиндексацию услуг в фоне"""
+    global _debouncer
+    with _debouncer_lock:
+        if _debouncer is None:
+            _debouncer = ServiceReindexDebouncer()
+    _debouncer.schedule(services)
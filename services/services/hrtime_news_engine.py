@@ -0,0 +1,273 @@
+"""
+Движок разбора и оценки новостей HR Time
+
+Все словари (ключевые слова HR, статусы авторов, категории, типы контента)
+объединены в один набор терминов, а шаблоны (метрики, автор, вопросы)
+скомпилированы заранее. Текст разбирается один раз: парсер и оценщик получают
+общий результат NewsHits из кэша, вместо повторных проверок `in` и re.search
+в HRTimeNewsScorer и HRTimeNewsParser.
+
+Термины ищутся автоматом Aho–Corasick (pyahocorasick), если пакет установлен,
+иначе - проверкой подстрок по словарю без повторов. Семантика совпадает
+с прежними проверками: ключевые слова ищутся как подстроки (в том числе
+перекрывающиеся), для метрик и автора берется совпадение шаблона
+с наивысшим приоритетом.
+"""
+import os
+import re
+import logging
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Optional, Set, Tuple
+
+log = logging.getLogger(__name__)
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+SCAN_CACHE_SIZE = int(os.getenv("HRTIME_NEWS_SCAN_CACHE_SIZE", "4096"))
+
+# Ключевые слова для определения релевантности
+HR_KEYWORDS = [
+    "рекрутинг", "подбор", "управление", "мотивация", "hr-процессы",
+    "hr", "персонал", "кадры", "сотрудники", "найм", "отбор",
+    "интервью", "оценка", "развитие", "обучение", "адаптация",
+    "компенсация", "бонусы", "kpi", "цели", "проект", "заказ"
+]
+
+# Статусы авторов в тексте новости (порядок - приоритет)
+STATUS_KEYWORDS = {
+    "топ-30": ["топ-30", "top-30", "top30"],
+    "топ-100": ["топ-100", "top-100", "top100"],
+    "спецназ": ["спецназ", "spetsnaz"],
+    "hr-клуб": ["hr-клуб", "hr-club", "hr клуб"],
+    "pro": ["pro", "про"]
+}
+
+# Категории новостей (порядок - приоритет)
+CATEGORY_KEYWORDS = {
+    "Вопросы и ответы": ["вопрос", "ответ", "q&a", "qa"],
+    "HR-КЛУБ": ["клуб", "club", "материал", "статья"],
+    "Отзывы": ["отзыв", "review", "рейтинг"],
+    "Запросы": ["запрос", "заказ", "request", "order", "проект"]
+}
+
+# Типы контента (порядок - приоритет)
+CONTENT_TYPE_KEYWORDS = {
+    "discussion": ["вопрос", "ответ"],
+    "material": ["материал", "статья"],
+    "review": ["отзыв", "review"],
+    "request": ["запрос", "заказ", "проект"]
+}
+
+# Шаблоны метрик и автора (порядок внутри группы - приоритет)
+METRIC_PATTERNS = {
+    "views": [r'просмотр[ов]*[:\s]*(\d+)', r'👁[️\s]*(\d+)', r'views?[:\s]*(\d+)'],
+    "comments": [r'комментари[евя]*[:\s]*(\d+)', r'💬[️\s]*(\d+)', r'comments?[:\s]*(\d+)'],
+    "rating": [r'рейтинг[:\s]*([\d.]+)', r'⭐[️\s]*([\d.]+)', r'rating[:\s]*([\d.]+)']
+}
+AUTHOR_PATTERNS = [r'автор[:\s]+([^\n]+)', r'от[:\s]+([^\n]+)', r'👤\s*([^\n]+)']
+QUESTION_PATTERNS = [
+    r'\?',
+    r'как\s+', r'что\s+', r'где\s+', r'когда\s+', r'почему\s+',
+    r'помогите', r'подскажите', r'нужна\s+помощь'
+]
+
+KIND_KEYWORD = "keyword"
+KIND_STATUS = "status"
+KIND_CATEGORY = "category"
+KIND_CONTENT_TYPE = "content_type"
+
+
+def _is_number(value: str) -> bool:
+    try:
+        float(value)
+        return True
+    except ValueError:
+        return False
+
+
+@dataclass
+class NewsHits:
+    """Совпадения одного прохода по тексту"""
+    keywords: Set[str] = field(default_factory=set)
+    statuses: Set[str] = field(default_factory=set)
+    categories: Set[str] = field(default_factory=set)
+    content_types: Set[str] = field(default_factory=set)
+    has_questions: bool = False
+    # (группа, приоритет шаблона) -> первое совпадение шаблона
+    captures: Dict[Tuple[str, int], str] = field(default_factory=dict)
+
+    def first_capture(self, group: str, count: int) -> List[str]:
+        """Значения шаблонов группы в порядке приоритета"""
+        return [self.captures[(group, i)] for i in range(count) if (group, i) in self.captures]
+
+
+class NewsScoringEngine:
+    """Один проход по тексту для парсера и оценщика новостей"""
+
+    def __init__(self, hr_keywords: Optional[List[str]] = None, cache_size: int = SCAN_CACHE_SIZE):
+        keywords = hr_keywords if hr_keywords is not None else HR_KEYWORDS
+
+        # Термин -> (вид, метка) для всех словарей. Термины, которые встречаются
+        # в нескольких словарях ("вопрос", "заказ", "проект"), проверяются один раз
+        self._term_labels: Dict[str, Set[Tuple[str, str]]] = {}
+        for keyword in keywords:
+            self._add_term(keyword, KIND_KEYWORD, keyword)
+        for kind, table in (
+            (KIND_STATUS, STATUS_KEYWORDS),
+            (KIND_CATEGORY, CATEGORY_KEYWORDS),
+            (KIND_CONTENT_TYPE, CONTENT_TYPE_KEYWORDS)
+        ):
+            for label, terms in table.items():
+                for term in terms:
+                    self._add_term(term, kind, label)
+        self._terms = tuple(self._term_labels)
+        self._keywords = tuple(keywords)
+
+        self._automaton = None
+        if AHOCORASICK_AVAILABLE:
+            self._automaton = ahocorasick.Automaton()
+            for term in self._terms:
+                self._automaton.add_word(term, term)
+            self._automaton.make_automaton()
+
+        # Шаблоны компилируются один раз, внутри группы - в порядке приоритета
+        self._capture_patterns = {
+            group: [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+            for group, patterns in [*METRIC_PATTERNS.items(), ("author", AUTHOR_PATTERNS)]
+        }
+        self._question_regex = re.compile("|".join(QUESTION_PATTERNS))
+
+        # Парсер и оценщик разбирают один и тот же текст: повторный проход берется из кэша
+        self._scan_cached = lru_cache(maxsize=cache_size)(self._scan)
+
+    def _add_term(self, term: str, kind: str, label: str) -> None:
+        self._term_labels.setdefault(term.lower(), set()).add((kind, label))
+
+    def _find_terms(self, text_lower: str) -> Set[str]:
+        if self._automaton is not None:
+            return {term for _, term in self._automaton.iter(text_lower)}
+        return {term for term in self._terms if term in text_lower}
+
+    def scan(self, text: str) -> NewsHits:
+        """
+        Собирает все совпадения в тексте (результат кэшируется, изменять его нельзя)
+        """
+        if not text:
+            return NewsHits()
+        return self._scan_cached(text)
+
+    def _scan(self, text: str) -> NewsHits:
+        text_lower = text.lower()
+        hits = NewsHits(has_questions=self._question_regex.search(text_lower) is not None)
+
+        for term in self._find_terms(text_lower):
+            for kind, label in self._term_labels[term]:
+                if kind == KIND_KEYWORD:
+                    hits.keywords.add(label)
+                elif kind == KIND_STATUS:
+                    hits.statuses.add(label)
+                elif kind == KIND_CATEGORY:
+                    hits.categories.add(label)
+                else:
+                    hits.content_types.add(label)
+
+        for group, patterns in self._capture_patterns.items():
+            for index, pattern in enumerate(patterns):
+                match = pattern.search(text)
+                if match:
+                    hits.captures[(group, index)] = match.group(1)
+                    # Метрики могут не преобразоваться в число - тогда нужен следующий шаблон
+                    if group == "author" or _is_number(match.group(1)):
+                        break
+        return hits
+
+    def clear_cache(self) -> None:
+        self._scan_cached.cache_clear()
+
+    # ===================== PARSING =====================
+
+    def extract_metrics(self, hits: NewsHits) -> Dict:
+        """Метрики (views, comments, rating) из совпадений"""
+        metrics = {"views": 0, "comments": 0, "rating": 0}
+        for group, convert in (("views", int), ("comments", int), ("rating", float)):
+            for value in hits.first_capture(group, len(METRIC_PATTERNS[group])):
+                try:
+                    metrics[group] = convert(value)
+                    break
+                except ValueError:
+                    continue
+        return metrics
+
+    def extract_author_name(self, hits: NewsHits) -> Optional[str]:
+        values = hits.first_capture("author", len(AUTHOR_PATTERNS))
+        return values[0].strip() if values else None
+
+    def extract_author_status(self, hits: NewsHits, author_name: str = "") -> str:
+        statuses = hits.statuses | (self.scan(author_name).statuses if author_name else set())
+        for status in STATUS_KEYWORDS:
+            if status in statuses:
+                return status
+        return ""
+
+    def extract_category(self, hits: NewsHits) -> str:
+        for category in CATEGORY_KEYWORDS:
+            if category in hits.categories:
+                return category
+        return "Общее"
+
+    def extract_content_type(self, hits: NewsHits) -> str:
+        for content_type in CONTENT_TYPE_KEYWORDS:
+            if content_type in hits.content_types:
+                return content_type
+        return "general"
+
+    # ===================== SCORING =====================
+
+    @staticmethod
+    def relevance_from_count(keyword_count: int) -> float:
+        """Релевантность по количеству найденных ключевых слов (как в HRTimeNewsScorer)"""
+        relevance = min(keyword_count / 10.0, 1.0)
+        if keyword_count >= 5:
+            relevance = min(relevance + 0.2, 1.0)
+        elif keyword_count >= 3:
+            relevance = min(relevance + 0.1, 1.0)
+        return relevance
+
+    def text_features(self, text: str, title: str = "") -> Tuple[int, bool]:
+        """
+        Признаки текста для оценки за один проход по тексту и заголовку
+
+        Returns:
+            (количество ключевых слов HR в заголовке и тексте, есть ли вопросы в тексте)
+        """
+        text_hits = self.scan(text)
+        keywords = text_hits.keywords
+        if title:
+            # Для заголовка нужны только ключевые слова HR, без шаблонов
+            title_lower = title.lower()
+            keywords = keywords | {keyword for keyword in self._keywords if keyword.lower() in title_lower}
+        return len(keywords), text_hits.has_questions
+
+    @staticmethod
+    def interactivity_from(has_questions: bool, metrics: Dict) -> float:
+        """Интерактивность по наличию вопросов и комментариям (как в HRTimeNewsScorer)"""
+        question_score = 0.5 if has_questions else 0.0
+        comments = metrics.get("comments", 0)
+        comments_score = min(comments / 10.0, 1.0) if comments else 0.0
+        return min(question_score * 0.6 + comments_score * 0.4, 1.0)
+
+
+_engine: Optional[NewsScoringEngine] = None
+
+
+def get_news_engine() -> NewsScoringEngine:
+    """Получить скомпилированный движок (Singleton)"""
+    global _engine
+    if _engine is None:
+        _engine = NewsScoringEngine()
+    return _engine
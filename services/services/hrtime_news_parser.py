@@ -7,6 +7,8 @@ import re
 from typing import Dict, Optional
 from datetime import datetime
 
+from services.services.hrtime_news_engine import CATEGORY_KEYWORDS, NewsHits, get_news_engine
+
 log = logging.getLogger(__name__)
 
 
@@ -15,12 +17,8 @@ class HRTimeNewsParser:
     
     def __init__(self):
         # Паттерны для извлечения данных
-        self.category_patterns = {
-            "Вопросы и ответы": ["вопрос", "ответ", "q&a", "qa"],
-            "HR-КЛУБ": ["клуб", "club", "материал", "статья"],
-            "Отзывы": ["отзыв", "review", "рейтинг"],
-            "Запросы": ["запрос", "заказ", "request", "order", "проект"]
-        }
+        self.category_patterns = CATEGORY_KEYWORDS
+        self.engine = get_news_engine()
     
     def parse_news(self, text: str, raw_data: Optional[Dict] = None) -> Dict:
         """
@@ -36,17 +34,20 @@ class HRTimeNewsParser:
         if not raw_data:
             raw_data = {}
         
+        # Ключевые слова, статусы, метрики и автор - за один проход по тексту
+        hits = self.engine.scan(text)
+        
         # Извлекаем заголовок (первая строка или до первого переноса)
         title = self._extract_title(text)
         
         # Извлекаем автора
-        author = self._extract_author(text, raw_data)
+        author = self._extract_author(text, raw_data, hits)
         
         # Определяем категорию
-        category = self._extract_category(text)
+        category = self._extract_category(text, hits)
         
         # Извлекаем метрики
-        metrics = self._extract_metrics(text)
+        metrics = self._extract_metrics(text, hits)
         
         # Извлекаем дату
         date = self._extract_date(raw_data.get("date"))
@@ -55,7 +56,7 @@ class HRTimeNewsParser:
         url = self._extract_url(text, raw_data)
         
         # Определяем тип контента
-        content_type = self._determine_content_type(text, category)
+        content_type = self._determine_content_type(text, category, hits)
         
         return {
             "id": raw_data.get("message_id", ""),
@@ -106,26 +107,17 @@ class HRTimeNewsParser:
         
         return content
     
-    def _extract_author(self, text: str, raw_data: Dict) -> Dict:
+    def _extract_author(self, text: str, raw_data: Dict, hits: Optional[NewsHits] = None) -> Dict:
         """Извлекает информацию об авторе"""
-        author_name = raw_data.get("chat_username", "HR Time")
+        hits = hits or self.engine.scan(text)
         
-        # Пытаемся найти имя автора в тексте
-        author_patterns = [
-            r'автор[:\s]+([^\n]+)',
-            r'от[:\s]+([^\n]+)',
-            r'👤\s*([^\n]+)',
-            r'Автор[:\s]+([^\n]+)'
-        ]
-        
-        for pattern in author_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                author_name = match.group(1).strip()
-                break
+        # Пытаемся найти имя автора в тексте ("Автор:", "от", 👤)
+        author_name = self.engine.extract_author_name(hits)
+        if author_name is None:
+            author_name = raw_data.get("chat_username", "HR Time")
         
         # Пытаемся определить статус автора
-        status = self._extract_author_status(text, author_name)
+        status = self._extract_author_status(text, author_name, hits)
         
         return {
             "name": author_name,
@@ -133,89 +125,17 @@ class HRTimeNewsParser:
             "reviews_count": 0  # По умолчанию, можно улучшить
         }
     
-    def _extract_author_status(self, text: str, author_name: str) -> str:
+    def _extract_author_status(self, text: str, author_name: str, hits: Optional[NewsHits] = None) -> str:
         """Извлекает статус автора"""
-        text_lower = text.lower()
-        author_lower = author_name.lower()
-        
-        status_keywords = {
-            "топ-30": ["топ-30", "top-30", "top30"],
-            "топ-100": ["топ-100", "top-100", "top100"],
-            "спецназ": ["спецназ", "spetsnaz"],
-            "hr-клуб": ["hr-клуб", "hr-club", "hr клуб"],
-            "pro": ["pro", "про"]
-        }
-        
-        for status, keywords in status_keywords.items():
-            if any(keyword in text_lower or keyword in author_lower for keyword in keywords):
-                return status
-        
-        return ""
+        return self.engine.extract_author_status(hits or self.engine.scan(text), author_name or "")
     
-    def _extract_category(self, text: str) -> str:
+    def _extract_category(self, text: str, hits: Optional[NewsHits] = None) -> str:
         """Определяет категорию новости"""
-        text_lower = text.lower()
-        
-        for category, keywords in self.category_patterns.items():
-            if any(keyword in text_lower for keyword in keywords):
-                return category
-        
-        return "Общее"
+        return self.engine.extract_category(hits or self.engine.scan(text))
     
-    def _extract_metrics(self, text: str) -> Dict:
+    def _extract_metrics(self, text: str, hits: Optional[NewsHits] = None) -> Dict:
         """Извлекает метрики из текста"""
-        metrics = {
-            "views": 0,
-            "comments": 0,
-            "rating": 0
-        }
-        
-        # Просмотры
-        views_patterns = [
-            r'просмотр[ов]*[:\s]*(\d+)',
-            r'👁[️\s]*(\d+)',
-            r'views?[:\s]*(\d+)'
-        ]
-        for pattern in views_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                try:
-                    metrics["views"] = int(match.group(1))
-                    break
-                except:
-                    pass
-        
-        # Комментарии
-        comments_patterns = [
-            r'комментари[евя]*[:\s]*(\d+)',
-            r'💬[️\s]*(\d+)',
-            r'comments?[:\s]*(\d+)'
-        ]
-        for pattern in comments_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                try:
-                    metrics["comments"] = int(match.group(1))
-                    break
-                except:
-                    pass
-        
-        # Рейтинг
-        rating_patterns = [
-            r'рейтинг[:\s]*([\d.]+)',
-            r'⭐[️\s]*([\d.]+)',
-            r'rating[:\s]*([\d.]+)'
-        ]
-        for pattern in rating_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                try:
-                    metrics["rating"] = float(match.group(1))
-                    break
-                except:
-                    pass
-        
-        return metrics
+        return self.engine.extract_metrics(hits or self.engine.scan(text))
     
     def _extract_date(self, date_value) -> Optional[datetime]:
         """Извлекает и парсит дату"""
@@ -268,17 +188,6 @@ class HRTimeNewsParser:
         
         return ""
     
-    def _determine_content_type(self, text: str, category: str) -> str:
+    def _determine_content_type(self, text: str, category: str, hits: Optional[NewsHits] = None) -> str:
         """Определяет тип контента"""
-        text_lower = text.lower()
-        
-        if "вопрос" in text_lower or "ответ" in text_lower:
-            return "discussion"
-        elif "материал" in text_lower or "статья" in text_lower:
-            return "material"
-        elif "отзыв" in text_lower or "review" in text_lower:
-            return "review"
-        elif "запрос" in text_lower or "заказ" in text_lower or "проект" in text_lower:
-            return "request"
-        else:
-            return "general"
+        return self.engine.extract_content_type(hits or self.engine.scan(text))
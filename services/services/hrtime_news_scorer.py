@@ -3,19 +3,18 @@
 Оценивает новости от 1 до 5 звезд на основе 5 критериев
 """
 import logging
-import re
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 from datetime import datetime, timedelta
 
+import numpy as np
+
+from services.services.hrtime_news_engine import HR_KEYWORDS, get_news_engine
+
 log = logging.getLogger(__name__)
 
-# Ключевые слова для определения релевантности
-HR_KEYWORDS = [
-    "рекрутинг", "подбор", "управление", "мотивация", "hr-процессы",
-    "hr", "персонал", "кадры", "сотрудники", "найм", "отбор",
-    "интервью", "оценка", "развитие", "обучение", "адаптация",
-    "компенсация", "бонусы", "kpi", "цели", "проект", "заказ"
-]
+CRITERIA = ("relevance", "popularity", "freshness", "authority", "interactivity")
+# Нижние границы оценки для 2, 3, 4 и 5 звезд
+STAR_THRESHOLDS = np.array([0.3, 0.5, 0.7, 0.9])
 
 # Статусы авторов (приоритет)
 AUTHOR_STATUSES = {
@@ -43,6 +42,7 @@ class HRTimeNewsScorer:
             "authority": 0.15,      # Авторитет источника (15%)
             "interactivity": 0.10   # Интерактивность (10%)
         }
+        self.engine = get_news_engine()
     
     def calculate_relevance_score(self, text: str, title: str = "") -> float:
         """
@@ -52,21 +52,8 @@ class HRTimeNewsScorer:
         - Наличие ключевых слов HR/рекрутинга
         - Соответствие профилю пользователя
         """
-        full_text = f"{title} {text}".lower()
-        
-        # Подсчитываем количество ключевых слов
-        keyword_count = sum(1 for keyword in HR_KEYWORDS if keyword in full_text)
-        
-        # Нормализуем (максимум 10 ключевых слов = 1.0)
-        relevance = min(keyword_count / 10.0, 1.0)
-        
-        # Бонус за наличие нескольких ключевых слов
-        if keyword_count >= 5:
-            relevance = min(relevance + 0.2, 1.0)
-        elif keyword_count >= 3:
-            relevance = min(relevance + 0.1, 1.0)
-        
-        return relevance
+        keyword_count, _ = self.engine.text_features(text, title)
+        return self.engine.relevance_from_count(keyword_count)
     
     def calculate_popularity_score(self, metrics: Dict) -> float:
         """
@@ -175,24 +162,7 @@ class HRTimeNewsScorer:
         - Количество комментариев
         - Активность дискуссии
         """
-        # Проверяем наличие вопросов в тексте
-        question_patterns = [
-            r'\?',  # Вопросительный знак
-            r'как\s+', r'что\s+', r'где\s+', r'когда\s+', r'почему\s+',
-            r'помогите', r'подскажите', r'нужна\s+помощь'
-        ]
-        
-        has_questions = any(re.search(pattern, text.lower()) for pattern in question_patterns)
-        question_score = 0.5 if has_questions else 0.0
-        
-        # Оценка по комментариям
-        comments = metrics.get("comments", 0)
-        comments_score = min(comments / 10.0, 1.0) if comments else 0.0
-        
-        # Комбинированная оценка
-        interactivity = question_score * 0.6 + comments_score * 0.4
-        
-        return min(interactivity, 1.0)
+        return self.engine.interactivity_from(self.engine.scan(text).has_questions, metrics)
     
     def calculate_total_score(self, news_data: Dict) -> Dict:
         """
@@ -213,46 +183,53 @@ class HRTimeNewsScorer:
                 - urgency: уровень срочности
                 - breakdown: детализация по критериям
         """
+        return self.score_batch([news_data])[0]
+    
+    def _criteria(self, news_data: Dict) -> List[float]:
+        """Оценки новости по критериям в порядке CRITERIA"""
         text = news_data.get("text", "")
         title = news_data.get("title", "")
-        date = news_data.get("date")
-        author = news_data.get("author", {})
         metrics = news_data.get("metrics", {})
         
-        # Рассчитываем оценки по каждому критерию
-        relevance = self.calculate_relevance_score(text, title)
-        popularity = self.calculate_popularity_score(metrics)
-        freshness = self.calculate_freshness_score(date)
-        authority = self.calculate_authority_score(author)
-        interactivity = self.calculate_interactivity_score(metrics, text)
-        
-        # Взвешенная сумма
-        total_score = (
-            relevance * self.weights["relevance"] +
-            popularity * self.weights["popularity"] +
-            freshness * self.weights["freshness"] +
-            authority * self.weights["authority"] +
-            interactivity * self.weights["interactivity"]
-        )
-        
-        # Преобразуем в звезды (1-5)
-        stars = self._score_to_stars(total_score)
+        # Ключевые слова и вопросы собираются одним проходом скомпилированного движка
+        keyword_count, has_questions = self.engine.text_features(text, title)
+        return [
+            self.engine.relevance_from_count(keyword_count),
+            self.calculate_popularity_score(metrics),
+            self.calculate_freshness_score(news_data.get("date")),
+            self.calculate_authority_score(news_data.get("author", {})),
+            self.engine.interactivity_from(has_questions, metrics)
+        ]
+    
+    def score_batch(self, news_list: List[Dict]) -> List[Dict]:
+        """
+        Оценка списка новостей (для мониторинга канала и переоценки архива)
         
-        # Определяем уровень срочности
-        urgency = self._get_urgency_level(stars)
+        Args:
+            news_list: Список новостей в формате calculate_total_score
         
-        return {
-            "total_score": total_score,
-            "stars": stars,
-            "urgency": urgency,
-            "breakdown": {
-                "relevance": relevance,
-                "popularity": popularity,
-                "freshness": freshness,
-                "authority": authority,
-                "interactivity": interactivity
+        Returns:
+            Список результатов в формате calculate_total_score, в том же порядке
+        """
+        if not news_list:
+            return []
+        
+        matrix = np.array([self._criteria(news) for news in news_list], dtype=float)
+        # Поэлементно по столбцам, в том же порядке сложения, что и для одной новости
+        totals = np.zeros(len(news_list))
+        for column, name in enumerate(CRITERIA):
+            totals = totals + matrix[:, column] * self.weights[name]
+        stars = np.searchsorted(STAR_THRESHOLDS, totals, side="right") + 1
+        
+        return [
+            {
+                "total_score": float(total),
+                "stars": int(star),
+                "urgency": self._get_urgency_level(int(star)),
+                "breakdown": dict(zip(CRITERIA, (float(value) for value in row)))
             }
-        }
+            for total, star, row in zip(totals, stars, matrix)
+        ]
     
     def _score_to_stars(self, score: float) -> int:
         """Преобразует оценку (0.0-1.0) в звезды (1-5)"""
@@ -278,18 +255,20 @@ class HRTimeNewsScorer:
         }
         return urgency_map.get(stars, "НОРМАЛЬНО")
     
-    def should_publish(self, news_data: Dict, min_stars: int = 2) -> bool:
+    def should_publish(self, news_data: Dict, min_stars: int = 2, score_result: Optional[Dict] = None) -> bool:
         """
         Определяет, нужно ли публиковать новость
         
         Args:
             news_data: Данные новости
             min_stars: Минимальное количество звезд для публикации
+            score_result: Уже рассчитанная оценка (например, из score_batch)
         
         Returns:
             True если новость нужно опубликовать
         """
-        score_result = self.calculate_total_score(news_data)
+        if score_result is None:
+            score_result = self.calculate_total_score(news_data)
         stars = score_result["stars"]
         
         # Проверяем минимальный порог
@@ -2,18 +2,94 @@
 RAG Intent Classifier Service
 Сервис для определения необходимости использования RAG поиска на основе намерения пользователя
 """
+import os
+import re
+import time
+import hashlib
 import logging
+from collections import OrderedDict, deque
 from typing import Dict, Optional
 import asyncio
 
+import numpy as np
+
+from services.helpers.intent_rules import get_intent_rules
+
 log = logging.getLogger(__name__)
 
+# Намерения из config/rag.yaml, которые решаются без LLM (в порядке приоритета)
+QUICK_CHECK_INTENTS = ("greeting", "simple_response", "knowledge_question", "service_question")
+
+# Кэш решений: точный (хэш нормализованного сообщения) и семантический (эмбеддинги)
+INTENT_CACHE_SIZE = int(os.getenv("RAG_INTENT_CACHE_SIZE", "2048"))
+INTENT_CACHE_TTL = int(os.getenv("RAG_INTENT_CACHE_TTL", "3600"))
+INTENT_FALLBACK_TTL = int(os.getenv("RAG_INTENT_FALLBACK_TTL", "60"))  # Решение без LLM - ненадолго
+SEMANTIC_CACHE_ENABLED = os.getenv("RAG_INTENT_SEMANTIC_CACHE", "true").lower() == "true"
+SEMANTIC_CACHE_SIZE = int(os.getenv("RAG_INTENT_SEMANTIC_CACHE_SIZE", "512"))
+SEMANTIC_THRESHOLD = float(os.getenv("RAG_INTENT_SEMANTIC_THRESHOLD", "0.92"))
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _normalize(message: str) -> str:
+    return _WHITESPACE_RE.sub(" ", message or "").strip().lower()
+
+
+def _cache_key(message: str) -> str:
+    return hashlib.sha256(_normalize(message).encode("utf-8")).hexdigest()
+
+
+class SemanticIntentCache:
+    """
+    Решения LLM для перефразированных сообщений: сообщение с косинусным
+    сходством не ниже порога получает сохраненное решение без запроса к LLM
+    """
+    
+    def __init__(self, size: int = SEMANTIC_CACHE_SIZE, threshold: float = SEMANTIC_THRESHOLD,
+                 ttl: int = INTENT_CACHE_TTL):
+        self.threshold = threshold
+        self.ttl = ttl
+        self._entries = deque(maxlen=size)  # (created_at, vector, result)
+        self._matrix: Optional[np.ndarray] = None
+    
+    def lookup(self, vector: np.ndarray) -> Optional[Dict]:
+        now = time.time()
+        while self._entries and now - self._entries[0][0] >= self.ttl:
+            self._entries.popleft()
+            self._matrix = None
+        if not self._entries:
+            return None
+        if self._matrix is None:
+            self._matrix = np.ascontiguousarray(np.stack([entry[1] for entry in self._entries]))
+        
+        similarities = self._matrix @ vector
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            return None
+        return self._entries[best][2]
+    
+    def add(self, vector: np.ndarray, result: Dict) -> None:
+        self._entries.append((time.time(), vector, result))
+        self._matrix = None
+    
+    def clear(self) -> None:
+        self._entries.clear()
+        self._matrix = None
+
 
 class RAGIntentClassifier:
     """Сервис для классификации намерений и определения необходимости RAG"""
     
-    def __init__(self):
-        self._cache = {}  # Простой кэш для часто используемых запросов
+    def __init__(self, cache_size: int = INTENT_CACHE_SIZE, cache_ttl: int = INTENT_CACHE_TTL,
+                 semantic_cache: Optional[bool] = None):
+        # key -> (expires_at, result), LRU по порядку доступа
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        use_semantic = SEMANTIC_CACHE_ENABLED if semantic_cache is None else semantic_cache
+        self._semantic = SemanticIntentCache(ttl=cache_ttl) if use_semantic else None
+        self._stats = {"requests": 0, "exact_hits": 0, "semantic_hits": 0, "quick": 0, "llm": 0, "fallback": 0}
     
     async def _generate_with_llm(self, prompt: str, system_prompt: str = "", max_tokens: int = 150, temperature: float = 0.3) -> Optional[str]:
         """Генерация ответа через LLM"""
@@ -49,99 +125,125 @@ class RAGIntentClassifier:
             - intent: str - тип намерения (greeting, question, command, etc.)
         """
         message_lower = message.lower().strip()
+        self._stats["requests"] += 1
         
         # Проверяем кэш
-        cache_key = message_lower[:50]  # Первые 50 символов как ключ
-        if cache_key in self._cache:
-            cached_result = self._cache[cache_key]
+        key = _cache_key(message)
+        cached_result = self._cache_get(key)
+        if cached_result is not None:
+            self._stats["exact_hits"] += 1
             log.debug(f"📦 [RAG Intent] Использован кэш для: '{message[:50]}'")
-            return cached_result
+            return dict(cached_result)
         
         # Быстрая проверка очевидных случаев (без LLM)
         quick_check = self._quick_check(message_lower)
         if quick_check is not None:
-            result = quick_check
-            self._cache[cache_key] = result
-            return result
+            self._stats["quick"] += 1
+            self._cache_put(key, quick_check, self.cache_ttl)
+            return dict(quick_check)
+        
+        # Одинаковые сообщения, пришедшие одновременно, ждут одну классификацию
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self._stats["exact_hits"] += 1
+            return dict(await asyncio.shield(inflight))
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._classify_novel(key, message, message_lower, context)
+            future.set_result(result)
+            return dict(result)
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+    
+    async def _classify_novel(self, key: str, message: str, message_lower: str,
+                              context: Optional[Dict]) -> Dict:
+        """Классификация сообщения, которого нет в точном кэше"""
+        # Перефразированное сообщение получает сохраненное решение LLM
+        semantic = self._semantic
+        vector = await self._embed(message) if semantic is not None else None
+        if vector is not None:
+            similar_result = semantic.lookup(vector)
+            if similar_result is not None:
+                self._stats["semantic_hits"] += 1
+                log.debug(f"📦 [RAG Intent] Использован семантический кэш для: '{message[:50]}'")
+                self._cache_put(key, similar_result, self.cache_ttl)
+                return similar_result
         
         # Для неочевидных случаев используем LLM классификацию
         try:
+            self._stats["llm"] += 1
             llm_result = await self._classify_with_llm(message, context)
             if llm_result:
-                self._cache[cache_key] = llm_result
+                self._cache_put(key, llm_result, self.cache_ttl)
+                if vector is not None:
+                    semantic.add(vector, llm_result)
                 return llm_result
         except Exception as e:
             log.warning(f"⚠️ [RAG Intent] Ошибка LLM классификации: {e}")
         
-        # Fallback на простую логику
+        # Fallback на простую логику (кэшируется ненадолго, чтобы повторить LLM позже)
+        self._stats["fallback"] += 1
         fallback_result = self._fallback_classification(message_lower)
-        self._cache[cache_key] = fallback_result
+        self._cache_put(key, fallback_result, INTENT_FALLBACK_TTL)
         return fallback_result
     
+    async def _embed(self, message: str) -> Optional[np.ndarray]:
+        """Эмбеддинг сообщения для семантического кэша (None, если модель недоступна)"""
+        try:
+            from services.agents.intent_classifier import encode_texts
+            
+            vectors = await asyncio.to_thread(encode_texts, [_normalize(message)])
+        except ImportError as e:
+            log.warning(f"⚠️ [RAG Intent] Семантический кэш недоступен: {e}")
+            vectors = None
+        except Exception as e:
+            # Разовая ошибка кодирования - промах для этого сообщения, уровень остается включенным
+            log.warning(f"⚠️ [RAG Intent] Ошибка эмбеддинга для семантического кэша: {e}")
+            return None
+        if vectors is None:
+            # Модели нет - не пытаемся на каждом сообщении
+            self._semantic = None
+            return None
+        return vectors[0]
+    
+    def _cache_get(self, key: str) -> Optional[Dict]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if time.time() >= expires_at:
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return result
+    
+    def _cache_put(self, key: str, result: Dict, ttl: int) -> None:
+        self._cache[key] = (time.time() + ttl, result)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+    
+    def get_cache_stats(self) -> Dict:
+        """Статистика кэша: запросы, попадания по уровням, вызовы LLM и доля попаданий"""
+        stats = dict(self._stats)
+        hits = stats["exact_hits"] + stats["semantic_hits"]
+        stats["hit_rate"] = hits / stats["requests"] if stats["requests"] else 0.0
+        stats["cache_size"] = len(self._cache)
+        stats["semantic_enabled"] = self._semantic is not None
+        return stats
+    
     def _quick_check(self, message_lower: str) -> Optional[Dict]:
-        """Быстрая проверка очевидных случаев без LLM"""
-        words = message_lower.split()
-        
-        # Очевидные приветствия - не используем RAG
-        obvious_greetings = [
-            "привет", "здравствуй", "здравствуйте", "добрый день", "добрый вечер", 
-            "доброе утро", "hi", "hello", "hey", "приветик", "салют"
-        ]
-        
-        if any(greeting in message_lower for greeting in obvious_greetings):
-            # Но если после приветствия есть вопрос - проверяем дальше
-            if len(words) <= 3:
-                return {
-                    "use_rag": False,
-                    "confidence": 0.95,
-                    "reason": "Очевидное приветствие без вопроса",
-                    "intent": "greeting"
-                }
-        
-        # Очевидные простые ответы - не используем RAG
-        simple_responses = [
-            "спасибо", "благодарю", "ок", "окей", "понял", "ясно", 
-            "хорошо", "ладно", "да", "нет", "пока", "до свидания"
-        ]
-        
-        if any(response in message_lower for response in simple_responses) and len(words) <= 2:
-            return {
-                "use_rag": False,
-                "confidence": 0.9,
-                "reason": "Простой ответ без вопроса",
-                "intent": "simple_response"
-            }
-        
-        # Очевидные вопросы о знаниях - используем RAG
-        knowledge_questions = [
-            "что такое", "что это", "расскажи о", "расскажи про", 
-            "информация о", "как работает", "как сделать", "методика",
-            "кейс", "пример", "опыт", "проект"
-        ]
-        
-        if any(question in message_lower for question in knowledge_questions):
-            return {
-                "use_rag": True,
-                "confidence": 0.95,
-                "reason": "Вопрос о знаниях/методиках",
-                "intent": "knowledge_question"
-            }
-        
-        # Очевидные вопросы о услугах/ценах - используем RAG
-        service_questions = [
-            "цена", "стоимость", "сколько стоит", "прайс", "расценки",
-            "услуга", "услуги", "что предлагаете", "консультация"
-        ]
-        
-        if any(question in message_lower for question in service_questions):
-            return {
-                "use_rag": True,
-                "confidence": 0.9,
-                "reason": "Вопрос об услугах/ценах",
-                "intent": "service_question"
-            }
-        
-        return None  # Неочевидный случай - нужна LLM классификация
+        """Быстрая проверка очевидных случаев без LLM (правила из config/rag.yaml)"""
+        match = get_intent_rules().first(message_lower, QUICK_CHECK_INTENTS)
+        if match is None:
+            return None  # Неочевидный случай - нужна LLM классификация
+        return match.as_rag_decision()
     
     async def _classify_with_llm(self, message: str, context: Optional[Dict] = None) -> Optional[Dict]:
         """Классификация намерения с помощью LLM"""
@@ -244,6 +346,8 @@ class RAGIntentClassifier:
     def clear_cache(self):
         """Очистка кэша"""
         self._cache.clear()
+        if self._semantic is not None:
+            self._semantic.clear()
         log.info("🧹 [RAG Intent] Кэш очищен")
 
 
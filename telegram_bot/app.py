@@ -364,6 +364,14 @@ def main():
             
             log.info(f"✅ Webhook установлен: {full_webhook_url}")
             
+            # Очередь исходящих сообщений (лимиты Telegram) - до фоновых задач
+            from services.helpers.telegram_outbox import start_outbound_scheduler, stop_outbound_scheduler
+            start_outbound_scheduler(app.bot)
+            
+            # Фоновая оценка RAG ответов (RAGAS) - ответы ставятся в очередь и не ждут оценки
+            from services.rag.evaluation_queue import start_evaluation_queue, stop_evaluation_queue
+            start_evaluation_queue()
+            
             # Запускаем фоновые задачи
             try:
                 from services.agents.integrate_scenarios import start_background_tasks
@@ -413,6 +421,8 @@ def main():
                 await asyncio.Event().wait()
             except (asyncio.CancelledError, KeyboardInterrupt):
                 log.info("⏹️  Получен сигнал остановки...")
+                await stop_outbound_scheduler()
+                await stop_evaluation_queue()
                 await app.updater.stop()
                 await app.stop()
                 await app.shutdown()
@@ -429,6 +439,14 @@ def main():
             # Устанавливаем grid menu
             await setup_bot_commands()
             
+            # Очередь исходящих сообщений (лимиты Telegram) - до фоновых задач
+            from services.helpers.telegram_outbox import start_outbound_scheduler, stop_outbound_scheduler
+            start_outbound_scheduler(app.bot)
+            
+            # Фоновая оценка RAG ответов (RAGAS) - ответы ставятся в очередь и не ждут оценки
+            from services.rag.evaluation_queue import start_evaluation_queue, stop_evaluation_queue
+            start_evaluation_queue()
+            
             try:
                 from services.agents.integrate_scenarios import start_background_tasks
                 start_background_tasks(
@@ -483,7 +501,8 @@ def main():
             try:
                 await asyncio.Event().wait()
             except asyncio.CancelledError:
-                pass
+                await stop_outbound_scheduler()
+                await stop_evaluation_queue()
     
     # Запускаем бота
     log.info("🚀 Запуск Telegram Bot...")
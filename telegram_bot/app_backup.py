@@ -1278,7 +1278,7 @@ def create_real_booking(user_id: int, service_name: str, master_name: str, date_
         date_part = date_time.split()[0] if " " in date_time else date_time
         time_part = date_time.split()[1] if " " in date_time else ""
         
-        if not check_slot_available(master_name, date_part, time_part):
+        if not check_slot_available(master_name, date_part, time_part, service.get("duration")):
             raise Exception(f"Время {date_time} недоступно, выберите другое время")
         
         # Создаем запись в Google Sheets
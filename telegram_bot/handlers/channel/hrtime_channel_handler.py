@@ -14,6 +14,8 @@ try:
     from services.services.telegram_channel_parser import TelegramChannelParser
     from services.agents.scenario_workflows import process_hrtime_order
     from services.services.hrtime_sync import HRTimeSync
+    from services.adapters.telegram_channel_adapter import channel_post_to_message
+    from services.adapters.channel_ingestion import get_channel_ingestor, MODE_QUEUE
     CHANNEL_HANDLER_AVAILABLE = True
 except ImportError as e:
     CHANNEL_HANDLER_AVAILABLE = False
@@ -76,22 +78,16 @@ async def handle_channel_post(update: Update, context: ContextTypes.DEFAULT_TYPE
         log.info(f"📢 [Channel Handler] Получено сообщение из канала @HRTime_bot: {message_id}")
         
         # Формируем данные сообщения
-        message_data = {
-            "message_id": message_id,
-            "text": post.text or post.caption or "",
-            "date": post.date,
-            "chat_id": chat_id,
-            "chat_username": chat_username,
-            "raw": post.to_dict() if hasattr(post, 'to_dict') else {}
-        }
+        message_data = channel_post_to_message(post)
         
-        # Отправляем все новости в канал лидов с классификацией
+        # Новости обрабатываются пачками в hrtime_news_monitor_task:
+        # передаем сообщение в очередь приема (без отдельного getUpdates)
         try:
-            from telegram_bot.services.hrtime_news_monitor import send_news_notification
-            await send_news_notification(context.bot, message_data)
-            log.info(f"✅ [Channel Handler] Новость отправлена в канал лидов")
+            ingestor = get_channel_ingestor()
+            if ingestor.mode == MODE_QUEUE and ingestor.submit(message_data):
+                log.info(f"✅ [Channel Handler] Новость {message_id} передана в очередь обработки новостей")
         except Exception as e:
-            log.warning(f"⚠️ [Channel Handler] Ошибка отправки новости в канал лидов: {e}")
+            log.warning(f"⚠️ [Channel Handler] Ошибка передачи новости в очередь: {e}")
         
         # Парсим сообщение
         parsed_order = await channel_parser.parse_channel_message(message_data)
@@ -163,10 +163,13 @@ async def upload_to_qdrant(text_content: str, file_name: str, user_id: int, user
         
         # Загружаем в Qdrant
         if points:
+            from services.rag.embedding_dimensions import validate_points
+            validate_points(points, loader.embedding_dim, loader.collection_name)
             loader.client.upsert(
                 collection_name=loader.collection_name,
                 points=points
             )
+            loader.mark_index_changed()
             log.info(f"✅ Загружено {len(points)} чанков в Qdrant")
             
             return {
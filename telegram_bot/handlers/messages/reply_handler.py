@@ -141,6 +141,8 @@ from telegram_bot.integrations.google_sheets import (
     get_services_with_prices
 )
 from telegram_bot.integrations.qdrant import search_service
+from services.helpers.blocking_io import run_blocking
+from services.helpers.sheets_repository import FETCH_TIMEOUT as SHEETS_FETCH_TIMEOUT
 from telegram_bot.storage.email_subscribers import load_email_subscribers, add_email_subscriber
 from telegram_bot.config import (
     CONSULTING_PROMPT,
@@ -770,16 +772,23 @@ async def reply(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 return
         
         # Проверяем, является ли это запросом на запись
-        if is_booking(text):
+        # is_booking / парсер / создание записи читают Google Sheets синхронно -
+        # в пуле группы sheets, чтобы холодный кэш не блокировал event loop
+        # (таймаут не короче загрузки снимка: после invalidate() он читается заново)
+        if await run_blocking("sheets", is_booking, text, timeout=SHEETS_FETCH_TIMEOUT):
             log.info(f"🔍 Обнаружен запрос на запись: {text}")
             
             # Парсим данные из сообщения
-            parsed_data = parse_booking_message(text, history)
+            parsed_data = await run_blocking("sheets", parse_booking_message, text, history, timeout=SHEETS_FETCH_TIMEOUT)
             
             if parsed_data:
                 try:
                     # Создаем запись
-                    result = create_booking_from_parsed_data(user_id, parsed_data)
+                    # Запись: чтение снимка и добавление строки, ответ об ошибке не должен опережать запись
+                    result = await run_blocking(
+                        "sheets", create_booking_from_parsed_data, user_id, parsed_data,
+                        timeout=2 * SHEETS_FETCH_TIMEOUT
+                    )
                     if result:
                         # Сохраняем ответ бота
                         try:
@@ -894,6 +903,7 @@ async def reply(update: Update, context: ContextTypes.DEFAULT_TYPE):
             log.info(f"🔍 [RAG] Запрос требует поиска в базе знаний: '{text[:100]}'")
             try:
                 from services.rag.qdrant_helper import get_qdrant_client, generate_embedding_async
+                from services.rag.collection_profiles import get_active_search_params
                 
                 log.info(f"🔍 [RAG] Поиск в базе знаний для запроса: '{text[:100]}'")
                 
@@ -910,7 +920,9 @@ async def reply(update: Update, context: ContextTypes.DEFAULT_TYPE):
                             search_results = client.query_points(
                                 collection_name=collection_name,
                                 query=query_embedding,
-                                limit=5
+                                limit=5,
+                                with_vectors=True,
+                                search_params=get_active_search_params()
                             )
                             
                             if search_results.points:
@@ -930,30 +942,32 @@ async def reply(update: Update, context: ContextTypes.DEFAULT_TYPE):
                                         results.append({
                                             "file_name": file_name,
                                             "text": text_content,
-                                            "score": score
+                                            "score": score,
+                                            "source_url": payload.get("source_url", ""),
+                                            "chunk_index": payload.get("chunk_index"),
+                                            "vector": point.vector if isinstance(point.vector, list) else None
                                         })
                                 
-                                # Сортируем по score и берем топ-3
-                                results_sorted = sorted(results, key=lambda x: x.get('score', 0), reverse=True)[:3]
+                                # Отбираем документы через MMR в пределах бюджета токенов
+                                from services.rag.context_packer import get_context_packer
+                                results_sorted = get_context_packer().pack(results)
                                 
                                 if results_sorted:
                                     rag_context = "\n\n📚 Релевантная информация из базы знаний:\n\n"
                                     for i, result in enumerate(results_sorted, 1):
                                         file_name = result.get('file_name', 'Документ')
-                                        text_snippet = result.get('text', '')[:300]  # Первые 300 символов
                                         score = result.get('score', 0)
-                                        rag_context += f"{i}. {file_name} (релевантность: {score:.2f}):\n{text_snippet}...\n\n"
-                                        
-                                        # Сохраняем полные тексты документов для RAGAS оценки
-                                        rag_documents = [r.get('text', '') for r in results_sorted]
-                                        
-                                        # Детальное логирование найденных документов
-                                        log.info(f"✅ [RAG] Сформирован контекст из {len(results_sorted)} документов:")
-                                        for i, result in enumerate(results_sorted, 1):
-                                            file_name = result.get('file_name', 'Документ')
-                                            score = result.get('score', 0)
-                                            text_length = len(result.get('text', ''))
-                                            log.info(f"  📄 Документ {i}: {file_name} | Релевантность: {score:.3f} | Длина: {text_length} символов")
+                                        rag_context += f"{i}. {file_name} (релевантность: {score:.2f}):\n{result.get('text', '')}\n\n"
+                                    
+                                    # Сохраняем тексты документов для RAGAS оценки
+                                    rag_documents = [r.get('text', '') for r in results_sorted]
+                                    
+                                    # Детальное логирование найденных документов
+                                    log.info(f"✅ [RAG] Сформирован контекст из {len(results_sorted)} документов:")
+                                    for i, result in enumerate(results_sorted, 1):
+                                        file_name = result.get('file_name', 'Документ')
+                                        score = result.get('score', 0)
+                                        log.info(f"  📄 Документ {i}: {file_name} | Релевантность: {score:.3f} | Токенов: {result.get('tokens', 0)}")
                                 else:
                                     log.info(f"ℹ️ [RAG] Результаты найдены, но не прошли порог релевантности")
                             else:
@@ -1091,41 +1105,14 @@ async def reply(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 influence_score = len(common_words) / max(len(doc_words), 1) if doc_words else 0
                 log.info(f"  📄 Документ {i}: Влияние на ответ ~{influence_score:.1%} (общих слов: {len(common_words)})")
         
-        # Оценка ответа с помощью RAGAS (если использовался RAG)
+        # Оценка ответа с помощью RAGAS (если использовался RAG) - в фоне, ответ ее не ждет
         if use_rag and rag_documents and response:
             try:
-                from services.rag.rag_evaluator import evaluate_rag_response, format_evaluation_log
-                
-                log.info(f"🔍 [RAGAS] Запуск оценки качества RAG ответа...")
-                evaluation = await evaluate_rag_response(
-                    question=text,
-                    answer=response,
-                    contexts=rag_documents
-                )
-                
-                if evaluation:
-                    log.info(format_evaluation_log(evaluation))
-                    
-                    # Дополнительный анализ оценок
-                    if evaluation.faithfulness < 0.5:
-                        log.warning(f"⚠️ [RAGAS] Низкая верность ответа ({evaluation.faithfulness:.3f}) - ответ может содержать информацию не из контекста")
-                    if evaluation.answer_relevancy < 0.5:
-                        log.warning(f"⚠️ [RAGAS] Низкая релевантность ответа ({evaluation.answer_relevancy:.3f}) - ответ может не соответствовать вопросу")
-                    if evaluation.context_precision < 0.5:
-                        log.warning(f"⚠️ [RAGAS] Низкая точность контекста ({evaluation.context_precision:.3f}) - возможно, использованы нерелевантные документы")
-                    
-                    if evaluation.average_score >= 0.7:
-                        log.info(f"✅ [RAGAS] Высокое качество ответа (средняя оценка: {evaluation.average_score:.3f})")
-                    elif evaluation.average_score >= 0.5:
-                        log.info(f"ℹ️ [RAGAS] Среднее качество ответа (средняя оценка: {evaluation.average_score:.3f})")
-                    else:
-                        log.warning(f"⚠️ [RAGAS] Низкое качество ответа (средняя оценка: {evaluation.average_score:.3f})")
-                else:
-                    log.warning(f"⚠️ [RAGAS] Не удалось выполнить оценку (возможно, библиотека не установлена)")
+                from services.rag.evaluation_queue import schedule_rag_evaluation
+                if schedule_rag_evaluation(question=text, answer=response, contexts=rag_documents, user_id=user_id):
+                    log.info(f"🔍 [RAGAS] Ответ поставлен в очередь оценки качества")
             except Exception as e:
-                log.warning(f"⚠️ [RAGAS] Ошибка при оценке ответа: {e}")
-                import traceback
-                log.debug(traceback.format_exc())
+                log.warning(f"⚠️ [RAGAS] Не удалось поставить ответ в очередь оценки: {e}")
         
         # Убираем Markdown форматирование из ответа (звездочки, решетки и т.д.)
         response_clean = remove_markdown(response)
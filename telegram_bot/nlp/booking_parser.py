@@ -16,17 +16,18 @@ def find_service_advanced(message: str) -> str:
     """Продвинутый поиск услуги с regex и нечетким поиском"""
     message_lower = message.lower()
     
-    # Сначала пытаемся найти в реальных услугах из Google Sheets
+    # Сначала пытаемся найти в реальных услугах из Google Sheets (один снимок на сообщение)
     try:
         all_services = get_services()
-        for service in all_services:
-            service_title = service.get("title", "").lower()
-            # Проверяем точное совпадение или частичное
-            if service_title in message_lower or any(word in service_title for word in message_lower.split() if len(word) > 3):
-                log.info(f"🔍 Найдена услуга в реальных данных: {service.get('title')}")
-                return service.get("title")
     except Exception as e:
         log.debug(f"Не удалось получить услуги для поиска: {e}")
+        all_services = []
+    for service in all_services:
+        service_title = service.get("title", "").lower()
+        # Проверяем точное совпадение или частичное
+        if service_title in message_lower or any(word in service_title for word in message_lower.split() if len(word) > 3):
+            log.info(f"🔍 Найдена услуга в реальных данных: {service.get('title')}")
+            return service.get("title")
     
     # Расширенные варианты услуг с regex паттернами (fallback)
     service_patterns = {
@@ -57,13 +58,9 @@ def find_service_advanced(message: str) -> str:
         for pattern in patterns:
             if re.search(pattern, message_lower):
                 # Пытаемся найти полное название услуги в реальных данных
-                try:
-                    all_services = get_services()
-                    for real_service in all_services:
-                        if service_key in real_service.get("title", "").lower():
-                            return real_service.get("title")
-                except:
-                    pass
+                for real_service in all_services:
+                    if service_key in real_service.get("title", "").lower():
+                        return real_service.get("title")
                 return service_key
     
     return None
@@ -52,6 +52,7 @@ if not log.handlers:
 try:
     from services.agents.scenario_workflows import classify_email_type, send_lead_to_channel
     import services.agents.scenario_workflows as sw_module
+    from services.helpers.telegram_outbox import SEND_QUEUED
     SCENARIO_WORKFLOWS_AVAILABLE = True
 except ImportError as e:
     log.warning(f"⚠️ Не удалось импортировать scenario_workflows: {e}")
@@ -198,7 +199,10 @@ async def send_email_notification(bot, email_data: Dict):
                 result = await send_lead_to_channel(bot, lead_info)
                 if result:
                     log.info("=" * 80)
-                    log.info(f"✅ ПИСЬМО УСПЕШНО ОТПРАВЛЕНО В КАНАЛ {LEADS_CHANNEL_URL}")
+                    if result == SEND_QUEUED:
+                        log.info(f"✅ ПИСЬМО ПОСТАВЛЕНО В ОЧЕРЕДЬ КАНАЛА {LEADS_CHANNEL_URL}")
+                    else:
+                        log.info(f"✅ ПИСЬМО УСПЕШНО ОТПРАВЛЕНО В КАНАЛ {LEADS_CHANNEL_URL}")
                     log.info(f"   🏷️  Категория: {category_name}")
                     log.info(f"   📊 Уверенность: {confidence:.2f}")
                     log.info("=" * 80)
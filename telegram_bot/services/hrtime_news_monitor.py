@@ -5,7 +5,7 @@
 import os
 import asyncio
 import logging
-from typing import Dict, Set
+from typing import Dict, List, Optional, Set
 from datetime import datetime
 
 # Цветное логирование для Railway (поддерживает ANSI цвета)
@@ -48,6 +48,8 @@ if not log.handlers:
     log.addHandler(handler)
     log.setLevel(logging.INFO)
 
+from services.helpers.telegram_outbox import PRIORITY_NEWS, SEND_QUEUED, queue_message
+
 # Импорт функции классификации и отправки в канал
 try:
     from services.agents.scenario_workflows import classify_email_type, send_lead_to_channel
@@ -81,6 +83,7 @@ if NEWS_SCORER_AVAILABLE:
 # Импорт адаптера для получения сообщений из канала
 try:
     from services.adapters.telegram_channel_adapter import TelegramChannelAdapter
+    from services.adapters.channel_ingestion import get_channel_ingestor, MODE_POLLING
     CHANNEL_ADAPTER_AVAILABLE = True
 except ImportError as e:
     log.warning(f"⚠️ Не удалось импортировать TelegramChannelAdapter: {e}")
@@ -96,7 +99,7 @@ HRTIME_CHANNEL_USERNAME = "@HRTime_bot"
 # Глобальное состояние для отслеживания обработанных новостей
 processed_news_ids: Set[int] = set()
 
-# Интервал проверки новостей (в секундах)
+# Пауза перед повтором после ошибки обработки пачки (в секундах)
 news_check_interval = int(os.getenv("HRTIME_NEWS_CHECK_INTERVAL", "30"))  # 30 секунд по умолчанию
 
 
@@ -225,11 +228,19 @@ def format_news_message(parsed_news: Dict, score_result: Dict) -> str:
     return "\n".join(message_parts)
 
 
-async def send_news_notification(bot, news_data: Dict):
+async def send_news_notification(
+    bot,
+    news_data: Dict,
+    parsed_news: Optional[Dict] = None,
+    score_result: Optional[Dict] = None
+):
     """Отправка новой новости в канал лидов с классификацией и оценкой
     
     Все новые новости автоматически отправляются в канал https://t.me/HRAI_ANovoselova_Leads
     с оценкой от 1 до 5 звезд и метриками.
+    
+    parsed_news и score_result передаются, если новость уже разобрана и оценена
+    в составе пачки (process_news_batch).
     """
     try:
         log.info("=" * 80)
@@ -252,8 +263,7 @@ async def send_news_notification(bot, news_data: Dict):
             return
         
         # Парсим новость
-        parsed_news = None
-        if news_parser:
+        if parsed_news is None and news_parser:
             try:
                 parsed_news = news_parser.parse_news(text, news_data)
                 log.info(f"✅ Новость распарсена: {parsed_news.get('title', 'Без заголовка')}")
@@ -270,7 +280,7 @@ async def send_news_notification(bot, news_data: Dict):
                     "category": "Общее",
                     "metrics": {}
                 }
-        else:
+        elif parsed_news is None:
             # Базовый парсинг без парсера
             parsed_news = {
                 "id": message_id,
@@ -285,16 +295,16 @@ async def send_news_notification(bot, news_data: Dict):
             }
         
         # Оцениваем новость
-        score_result = None
         if news_scorer:
             try:
-                score_result = news_scorer.calculate_total_score(parsed_news)
+                if score_result is None:
+                    score_result = news_scorer.calculate_total_score(parsed_news)
                 stars = score_result.get("stars", 3)
                 urgency = score_result.get("urgency", "НОРМАЛЬНО")
                 log.info(f"✅ Новость оценена: ⭐{stars} ({urgency})")
                 
                 # Проверяем, нужно ли публиковать
-                if not news_scorer.should_publish(parsed_news, min_stars=2):
+                if not news_scorer.should_publish(parsed_news, min_stars=2, score_result=score_result):
                     log.info(f"⏭️  Новость не соответствует критериям публикации (минимум 2 звезды)")
                     return
             except Exception as e:
@@ -359,25 +369,39 @@ async def send_news_notification(bot, news_data: Dict):
         # Отправляем в канал
         if sw_module and sw_module.TELEGRAM_LEADS_CHANNEL_ID:
             try:
-                await bot.send_message(
-                    chat_id=sw_module.TELEGRAM_LEADS_CHANNEL_ID,
-                    text=formatted_message,
+                def mark_sent():
+                    # Помечаем как отправленное после доставки
+                    try:
+                        from services.helpers.channel_deduplicator import mark_as_sent
+                        mark_as_sent(check_lead_info)
+                    except Exception as e:
+                        log.warning(f"⚠️ Ошибка пометки новости как отправленной: {e}")
+                
+                # Новости идут в очередь после лидов и не задерживают обработку пачки;
+                # пока новость ждет отправки, повторная (перезапуск, повтор пачки) не ставится
+                from services.helpers.channel_deduplicator import generate_message_id
+                status = await queue_message(
+                    bot,
+                    sw_module.TELEGRAM_LEADS_CHANNEL_ID,
+                    formatted_message,
+                    priority=PRIORITY_NEWS,
+                    on_sent=mark_sent,
+                    dedup_key=generate_message_id(check_lead_info),
                     parse_mode="Markdown",
                     disable_web_page_preview=False
                 )
+                if status is None:
+                    log.info(f"⏭️  ПРОПУСК ДУБЛИКАТА: новость уже в очереди отправки")
+                    return
                 log.info("=" * 80)
-                log.info(f"✅ НОВОСТЬ УСПЕШНО ОТПРАВЛЕНА В КАНАЛ {LEADS_CHANNEL_URL}")
+                if status == SEND_QUEUED:
+                    log.info(f"✅ НОВОСТЬ ПОСТАВЛЕНА В ОЧЕРЕДЬ КАНАЛА {LEADS_CHANNEL_URL}")
+                else:
+                    log.info(f"✅ НОВОСТЬ УСПЕШНО ОТПРАВЛЕНА В КАНАЛ {LEADS_CHANNEL_URL}")
                 log.info(f"   ⭐ Оценка: {score_result.get('stars', 3)} звезд")
                 log.info(f"   🏷️  Категория: {news_category}")
                 log.info(f"   📊 Уверенность: {confidence:.2f}")
                 log.info("=" * 80)
-                
-                # Помечаем как отправленное
-                try:
-                    from services.helpers.channel_deduplicator import mark_as_sent
-                    mark_as_sent(check_lead_info)
-                except Exception as e:
-                    log.warning(f"⚠️ Ошибка пометки новости как отправленной: {e}")
             except Exception as e:
                 log.error("=" * 80)
                 log.error(f"❌ ОШИБКА ОТПРАВКИ НОВОСТИ В КАНАЛ:")
@@ -401,22 +425,47 @@ async def send_news_notification(bot, news_data: Dict):
         log.error("=" * 80)
 
 
+async def process_news_batch(bot, batch: List[Dict]) -> None:
+    """Обработка пачки новых сообщений канала: парсинг, оценка и отправка в канал лидов"""
+    # Разбираем и оцениваем всю пачку сразу, новость с ошибкой разбирается в send_news_notification
+    parsed_batch: List[Optional[Dict]] = []
+    for news in batch:
+        parsed = None
+        if news_parser:
+            try:
+                parsed = news_parser.parse_news(news.get("text", ""), news)
+            except Exception as e:
+                log.warning(f"⚠️ Ошибка парсинга новости {news.get('message_id')}: {e}")
+        parsed_batch.append(parsed)
+    
+    scores: Dict[int, Dict] = {}
+    if news_scorer:
+        scored = [i for i, parsed in enumerate(parsed_batch) if parsed is not None]
+        try:
+            scores = dict(zip(scored, news_scorer.score_batch([parsed_batch[i] for i in scored])))
+        except Exception as e:
+            log.warning(f"⚠️ Ошибка оценки пачки новостей: {e}")
+    
+    for i, news in enumerate(batch):
+        message_id = news.get("message_id", 0)
+        log.info(f"📰 Обработка новости ID: {message_id}")
+        await send_news_notification(bot, news, parsed_news=parsed_batch[i], score_result=scores.get(i))
+        processed_news_ids.add(message_id)
+
+
 async def hrtime_news_monitor_task(bot):
     """
     Фоновая задача для мониторинга новых новостей из HR Time
     
-    Получает новости из Telegram канала @HRTime_bot и отправляет их в канал лидов
-    с классификацией через LLM.
+    Получает пачки новых сообщений канала @HRTime_bot от ChannelIngestor
+    (очередь channel_post основного Application или long-polling с сохраненным offset)
+    и отправляет их в канал лидов с оценкой и классификацией через LLM.
     
     Args:
         bot: Telegram Bot instance
     """
-    global processed_news_ids
-    
     log.info("=" * 80)
     log.info(f"🚀 ЗАПУСК ФОНОВОЙ ЗАДАЧИ МОНИТОРИНГА НОВОСТЕЙ HR TIME")
-    log.info(f"📰 Интервал проверки: {news_check_interval} секунд")
-    log.info(f"📊 Обработано новостей: {len(processed_news_ids)}")
     log.info(f"📤 Канал для отправки: {LEADS_CHANNEL_URL}")
     log.info(f"📢 Источник новостей: {HRTIME_CHANNEL_USERNAME}")
     
@@ -428,75 +477,33 @@ async def hrtime_news_monitor_task(bot):
         else:
             log.warning(f"⚠️ ID канала не установлен, будет попытка получить автоматически при первой новости")
     
-    # Инициализируем адаптер для получения сообщений из канала
-    channel_adapter = None
-    if CHANNEL_ADAPTER_AVAILABLE:
-        try:
-            channel_adapter = TelegramChannelAdapter()
-            log.info(f"✅ Адаптер канала инициализирован")
-        except Exception as e:
-            log.error(f"❌ Ошибка инициализации адаптера канала: {e}")
-    else:
-        log.warning(f"⚠️ Адаптер канала недоступен")
+    if not CHANNEL_ADAPTER_AVAILABLE:
+        log.warning(f"⚠️ Адаптер канала недоступен, мониторинг новостей не запущен")
+        return
     
-    log.info("=" * 80)
+    try:
+        channel_adapter = TelegramChannelAdapter()
+        ingestor = get_channel_ingestor(channel_adapter)
+        log.info(f"✅ Прием сообщений канала: режим {ingestor.mode}")
+    except Exception as e:
+        log.error(f"❌ Ошибка инициализации приема сообщений канала: {e}")
+        return
+    
+    if ingestor.mode == MODE_POLLING and not channel_adapter.bot:
+        log.warning(f"⚠️ Режим polling требует TELEGRAM_BOT_TOKEN, мониторинг новостей не запущен")
+        return
     
-    iteration = 0
+    log.info("=" * 80)
     
     while True:
-        iteration += 1
         try:
-            current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            log.info(f"\n🔄 Итерация #{iteration} | {current_time}")
-            log.info(f"📬 Проверка новых новостей из {HRTIME_CHANNEL_USERNAME}...")
-            
-            if not channel_adapter:
-                log.warning("⚠️ Адаптер канала недоступен, пропускаю проверку")
-                await asyncio.sleep(news_check_interval)
-                continue
-            
-            # Получаем обновления из канала
-            # Используем get_channel_updates для получения новых сообщений
-            updates = await channel_adapter.get_channel_updates(limit=50)
-            
-            if updates:
-                log.info(f"📰 Найдено {len(updates)} сообщений из канала")
-                
-                # Фильтруем только новые сообщения
-                new_news = []
-                for news in updates:
-                    message_id = news.get("message_id", 0)
-                    if message_id and message_id not in processed_news_ids:
-                        # Проверяем, что это сообщение из нужного канала
-                        if channel_adapter.is_channel_message(news):
-                            new_news.append(news)
-                
-                if new_news:
-                    log.info(f"✅ Найдено {len(new_news)} новых новостей!")
-                    
-                    # Обрабатываем каждую новость
-                    for news in new_news:
-                        message_id = news.get("message_id", 0)
-                        if message_id:
-                            log.info(f"📰 Обработка новости ID: {message_id}")
-                            await send_news_notification(bot, news)
-                            processed_news_ids.add(message_id)
-                            log.info(f"✅ Новость обработана и добавлена в список обработанных")
-                            
-                            # Небольшая задержка между обработкой новостей
-                            await asyncio.sleep(1)
-                    
-                    log.info(f"📊 Всего обработано: {len(processed_news_ids)}")
-                else:
-                    log.info(f"📭 Новых новостей не найдено")
-            else:
-                log.info(f"📭 Сообщений из канала не получено")
-            
-            log.info(f"⏳ Ожидание {news_check_interval} секунд до следующей проверки...")
-            
-            # Ждем перед следующей проверкой
-            await asyncio.sleep(news_check_interval)
-            
+            batch = await ingestor.next_batch()
+            log.info(f"📰 Получено {len(batch)} новых новостей из {HRTIME_CHANNEL_USERNAME}")
+            await process_news_batch(bot, batch)
+            ingestor.commit(batch)
+            log.info(f"📊 Всего обработано: {len(processed_news_ids)}")
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             log.error("=" * 80)
             log.error(f"❌ КРИТИЧЕСКАЯ ОШИБКА в мониторинге новостей HR Time!")
@@ -506,5 +513,4 @@ async def hrtime_news_monitor_task(bot):
             log.error(traceback.format_exc())
             log.error("=" * 80)
             log.info(f"⏳ Повторная попытка через {news_check_interval} секунд...")
-            # При ошибке ждем перед следующей попыткой
             await asyncio.sleep(news_check_interval)
@@ -0,0 +1,88 @@
+"""
+Тесты выполнения синхронных вызовов в пуле (services.helpers.blocking_io)
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from services.helpers.blocking_io import (
+    BlockingCallTimeout,
+    configure_route,
+    get_blocking_stats,
+    run_blocking,
+)
+
+
+@pytest.mark.asyncio
+async def test_slow_call_does_not_block_event_loop():
+    configure_route("test-slow", limit=2, timeout=5)
+    ticks = []
+
+    async def ticker():
+        for _ in range(5):
+            ticks.append(time.perf_counter())
+            await asyncio.sleep(0.01)
+
+    result, _ = await asyncio.gather(run_blocking("test-slow", time.sleep, 0.2), ticker())
+
+    assert result is None
+    assert len(ticks) == 5 and ticks[-1] - ticks[0] < 0.15
+
+
+@pytest.mark.asyncio
+async def test_route_limit_bounds_concurrency():
+    configure_route("test-limit", limit=2, timeout=5)
+    lock = threading.Lock()
+    state = {"running": 0, "peak": 0}
+
+    def work(value):
+        with lock:
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+        time.sleep(0.05)
+        with lock:
+            state["running"] -= 1
+        return value * 2
+
+    results = await asyncio.gather(*[run_blocking("test-limit", work, i) for i in range(6)])
+
+    assert results == [0, 2, 4, 6, 8, 10]
+    assert state["peak"] == 2
+    stats = get_blocking_stats()["test-limit"]
+    assert stats["calls"] == 6 and stats["in_flight"] == 0 and stats["waiting"] == 0
+
+
+@pytest.mark.asyncio
+async def test_timeout_keeps_slot_until_thread_finishes():
+    configure_route("test-timeout", limit=1, timeout=5)
+    release = threading.Event()
+
+    with pytest.raises(BlockingCallTimeout) as error:
+        await run_blocking("test-timeout", release.wait, 5, timeout=0.05)
+    assert error.value.route == "test-timeout"
+
+    # Поток еще работает: слот занят, следующий вызов не дождется его
+    with pytest.raises(BlockingCallTimeout):
+        await run_blocking("test-timeout", lambda: "next", timeout=0.05)
+    assert get_blocking_stats()["test-timeout"]["in_flight"] == 1
+
+    release.set()
+    assert await run_blocking("test-timeout", lambda: "next") == "next"
+    stats = get_blocking_stats()["test-timeout"]
+    assert stats["timeouts"] == 2 and stats["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_errors_propagate_and_are_counted():
+    configure_route("test-error", limit=1, timeout=5)
+
+    def fail():
+        raise ValueError("Sheets API недоступен")
+
+    with pytest.raises(ValueError):
+        await run_blocking("test-error", fail)
+
+    assert get_blocking_stats()["test-error"]["errors"] == 1
+    assert await run_blocking("test-error", lambda: "ok") == "ok"  # Слот освобожден после ошибки
@@ -0,0 +1,97 @@
+"""
+Тесты приема сообщений канала HR Time: очередь, long-polling, сохранение offset
+"""
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, Mock, patch
+
+from services.adapters.channel_ingestion import ChannelIngestor, ChannelOffsetStore
+
+
+def _message(message_id: int, chat_id: int = -100) -> dict:
+    return {"message_id": message_id, "chat_id": chat_id, "text": f"Новость {message_id}"}
+
+
+@pytest.mark.asyncio
+async def test_queue_mode_batches_and_skips_processed(tmp_path):
+    """Очередь отдает пачку без дубликатов; после commit сообщения не принимаются повторно"""
+    store = ChannelOffsetStore(state_file=str(tmp_path / "state.json"))
+    ingestor = ChannelIngestor(store=store, mode="queue", batch_size=10, batch_wait=0.05)
+
+    for message_id in (2, 1, 2, 3):
+        ingestor.submit(_message(message_id))
+
+    batch = await asyncio.wait_for(ingestor.next_batch(), timeout=1)
+    assert [m["message_id"] for m in batch] == [1, 2, 3]
+
+    ingestor.commit(batch)
+    assert ingestor.submit(_message(3)) is False
+    assert ingestor.submit(_message(4)) is True
+
+
+def test_offset_store_survives_restart(tmp_path):
+    """Offset и последний message_id сохраняются между перезапусками"""
+    state_file = str(tmp_path / "state.json")
+    store = ChannelOffsetStore(state_file=state_file)
+    store.set_update_offset(501)
+    store.commit_messages([_message(7), _message(5)])
+
+    restored = ChannelOffsetStore(state_file=state_file)
+    assert restored.update_offset == 501
+    assert restored.last_message_id(-100) == 7
+    assert restored.last_message_id(-200) == 0
+
+
+@pytest.mark.asyncio
+async def test_polling_mode_persists_offset_and_backs_off(tmp_path):
+    """Polling передает сохраненный offset и делает паузу после ошибки"""
+    store = ChannelOffsetStore(state_file=str(tmp_path / "state.json"))
+    store.set_update_offset(10)
+    adapter = Mock()
+    adapter.fetch_channel_updates = AsyncMock(side_effect=[
+        Exception("Conflict"),
+        ([], 12),
+        ([_message(1)], 13)
+    ])
+    ingestor = ChannelIngestor(adapter=adapter, store=store, mode="polling", poll_timeout=25)
+
+    with patch('services.adapters.channel_ingestion.asyncio.sleep', new_callable=AsyncMock) as mock_sleep:
+        batch = await ingestor.next_batch()
+
+    assert [m["message_id"] for m in batch] == [1]
+    assert mock_sleep.await_count == 1
+    offsets = [call.kwargs["offset"] for call in adapter.fetch_channel_updates.call_args_list]
+    assert offsets == [10, 10, 12]
+    assert adapter.fetch_channel_updates.call_args.kwargs["timeout"] == 25
+    # Пустой ответ сдвигает offset сразу, пачка с сообщениями - только после commit
+    assert ChannelOffsetStore(state_file=str(tmp_path / "state.json")).update_offset == 12
+
+    ingestor.commit(batch)
+    assert ChannelOffsetStore(state_file=str(tmp_path / "state.json")).update_offset == 13
+
+
+@pytest.mark.asyncio
+async def test_uncommitted_batch_is_returned_again(tmp_path):
+    """Пачка, обработка которой упала до commit, не теряется ни в очереди, ни в polling"""
+    state_file = str(tmp_path / "state.json")
+    ingestor = ChannelIngestor(store=ChannelOffsetStore(state_file=state_file), mode="queue", batch_wait=0.01)
+    ingestor.submit(_message(1))
+
+    first = await asyncio.wait_for(ingestor.next_batch(), timeout=1)
+    retried = await asyncio.wait_for(ingestor.next_batch(), timeout=1)
+    assert [m["message_id"] for m in retried] == [m["message_id"] for m in first] == [1]
+    ingestor.commit(retried)
+    assert ChannelOffsetStore(state_file=state_file).last_message_id(-100) == 1
+
+    store = ChannelOffsetStore(state_file=str(tmp_path / "polling.json"))
+    store.set_update_offset(10)
+    adapter = Mock()
+    adapter.fetch_channel_updates = AsyncMock(return_value=([_message(5)], 11))
+    ingestor = ChannelIngestor(adapter=adapter, store=store, mode="polling")
+
+    await ingestor.next_batch()
+    # Процесс упал до commit: после перезапуска getUpdates вернет ту же пачку
+    restarted = ChannelIngestor(adapter=adapter, store=ChannelOffsetStore(state_file=str(tmp_path / "polling.json")), mode="polling")
+    batch = await restarted.next_batch()
+    assert [m["message_id"] for m in batch] == [5]
+    assert [call.kwargs["offset"] for call in adapter.fetch_channel_updates.call_args_list] == [10, 10]
@@ -0,0 +1,143 @@
+"""
+Тесты кэша метаданных коллекции Qdrant и поиска услуг за один запрос
+"""
+from types import SimpleNamespace
+
+import pytest
+
+from services.rag import qdrant_helper
+from services.rag.collection_metadata import CollectionMetadataCache, fetch_collection_metadata
+
+
+class NotFound(Exception):
+    status_code = 404
+
+
+class FakeQdrant:
+    """Клиент Qdrant, записывающий вызовы"""
+
+    def __init__(self, exists=True, indexes=(), service_points=0, points_count=10, size=1536):
+        self.exists = exists
+        self.indexes = {name: SimpleNamespace(data_type="keyword") for name in indexes}
+        self.service_points = service_points
+        self.points_count = points_count
+        self.size = size
+        self.calls = []
+
+    def get_collection(self, name):
+        self.calls.append("get_collection")
+        if not self.exists:
+            raise NotFound("Not found: Collection doesn't exist!")
+        return SimpleNamespace(
+            points_count=self.points_count,
+            payload_schema=dict(self.indexes),
+            config=SimpleNamespace(metadata={}, params=SimpleNamespace(vectors=SimpleNamespace(size=self.size)))
+        )
+
+    def count(self, collection_name, count_filter, exact):
+        self.calls.append("count")
+        return SimpleNamespace(count=self.service_points)
+
+    def create_collection(self, collection_name, **kwargs):
+        self.calls.append("create_collection")
+        self.exists = True
+
+    def create_payload_index(self, collection_name, field_name, field_schema):
+        self.calls.append("create_payload_index")
+        self.indexes[field_name] = SimpleNamespace(data_type="keyword")
+
+    def query_points(self, collection_name, query, limit, query_filter=None, search_params=None):
+        self.calls.append(("query_points", query_filter is not None))
+        if not self.exists:
+            raise NotFound("Not found: Collection doesn't exist!")
+        payload = {"id": "s1", "title": "Оценка персонала", "price": 50000, "source_type": "service"}
+        return SimpleNamespace(points=[SimpleNamespace(payload=payload, score=0.9)])
+
+
+@pytest.fixture
+def search_env(monkeypatch):
+    cache = CollectionMetadataCache(ttl=0)
+    monkeypatch.setattr(qdrant_helper, "get_collection_metadata_cache", lambda: cache)
+    monkeypatch.setattr(qdrant_helper, "generate_embedding", lambda text: [0.1] * 4)
+    monkeypatch.setattr(qdrant_helper, "_collection_initialized", False)
+
+    def use(client):
+        monkeypatch.setattr(qdrant_helper, "get_qdrant_client", lambda: client)
+        return cache
+
+    return use
+
+
+def test_fetch_metadata_reads_dimension_indexes_and_source_type():
+    client = FakeQdrant(indexes=["source_type"], service_points=3, size=768)
+    metadata = fetch_collection_metadata(client, "kb")
+
+    assert metadata.exists and metadata.dimension == 768
+    assert metadata.payload_indexes == {"source_type": "keyword"}
+    assert metadata.has_source_type
+    assert client.calls == ["get_collection", "count"]
+
+    empty = FakeQdrant(points_count=0)
+    assert not fetch_collection_metadata(empty, "kb").has_source_type
+    assert empty.calls == ["get_collection"]  # Точек нет - count не нужен
+
+    legacy = FakeQdrant(service_points=0)
+    assert not fetch_collection_metadata(legacy, "kb").has_source_type
+    assert legacy.calls == ["get_collection", "count"]
+
+    assert not fetch_collection_metadata(FakeQdrant(exists=False), "kb").exists
+
+
+def test_index_without_service_points_disables_filter():
+    # Индекс source_type создан, но точек услуг нет - фильтр вернул бы пустой результат
+    client = FakeQdrant(indexes=["source_type"], service_points=0)
+    assert not fetch_collection_metadata(client, "kb").has_source_type
+    assert client.calls == ["get_collection", "count"]
+
+
+def test_ensure_collection_populates_cache_and_creates_index(search_env):
+    client = FakeQdrant(service_points=3)
+    cache = search_env(client)
+
+    assert qdrant_helper.ensure_collection()
+
+    assert client.calls == ["get_collection", "count", "create_payload_index"]
+    assert cache.get(qdrant_helper.COLLECTION_NAME) is None  # Схема изменилась - перечитать
+
+
+def test_search_makes_one_round_trip_with_warm_cache(search_env):
+    client = FakeQdrant(indexes=["source_type"], service_points=3)
+    search_env(client)
+    qdrant_helper.ensure_collection()
+    client.calls.clear()
+
+    for _ in range(3):
+        results = qdrant_helper._search_service_uncached("оценка персонала", limit=3)
+        assert [r["title"] for r in results] == ["Оценка персонала"]
+
+    assert client.calls == [("query_points", True)] * 3
+
+
+def test_search_without_source_type_skips_filter_and_refreshes(search_env):
+    client = FakeQdrant(service_points=0)
+    cache = search_env(client)
+
+    qdrant_helper._search_service_uncached("оценка", limit=3)
+    assert client.calls == ["get_collection", "count", ("query_points", False)]
+    # В ответе нашлась услуга с source_type - метаданные сброшены
+    assert cache.get(qdrant_helper.COLLECTION_NAME) is None
+
+
+def test_search_404_invalidates_metadata(search_env):
+    client = FakeQdrant(indexes=["source_type"], service_points=3)
+    cache = search_env(client)
+    qdrant_helper.ensure_collection()
+    client.exists = False
+
+    assert qdrant_helper._search_service_uncached("оценка", limit=3) == []
+    assert cache.get(qdrant_helper.COLLECTION_NAME) is None
+    assert qdrant_helper._collection_initialized is False
+
+    client.calls.clear()
+    assert qdrant_helper._search_service_uncached("оценка", limit=3) == []
+    assert client.calls == ["get_collection"]  # Коллекции нет - поиск не выполняется
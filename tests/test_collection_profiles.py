@@ -0,0 +1,53 @@
+"""
+Тесты для профилей хранения коллекций Qdrant
+"""
+from qdrant_client.models import ScalarQuantization, BinaryQuantization
+
+from services.rag.collection_profiles import (
+    build_collection_params,
+    build_search_params,
+    DEFAULT_PROFILE
+)
+
+
+def test_default_profile_keeps_plain_collection():
+    """Профиль по умолчанию не включает квантование и параметры поиска"""
+    profile = {**DEFAULT_PROFILE, "name": "default"}
+    params = build_collection_params(profile, 1536)
+
+    assert params["vectors_config"].size == 1536
+    assert not params["vectors_config"].on_disk
+    assert "quantization_config" not in params
+    assert build_search_params(profile) is None
+
+
+def test_scalar_profile_with_rescoring():
+    """Scalar профиль: int8 квантование, векторы на диске, rescoring с oversampling"""
+    profile = {
+        **DEFAULT_PROFILE,
+        "name": "scalar",
+        "on_disk": "true",
+        "quantization": {"type": "scalar", "quantile": 0.99},
+        "hnsw": {"m": 16, "ef_construct": 128},
+        "search": {"ef": 128, "rescore": True, "oversampling": 2.0}
+    }
+    params = build_collection_params(profile, 512)
+
+    assert params["vectors_config"].on_disk is True
+    assert isinstance(params["quantization_config"], ScalarQuantization)
+    assert params["quantization_config"].scalar.quantile == 0.99
+    assert params["hnsw_config"].m == 16
+
+    search = build_search_params(profile)
+    assert search.hnsw_ef == 128
+    assert search.quantization.rescore is True
+    assert search.quantization.oversampling == 2.0
+
+
+def test_binary_profile():
+    """Binary профиль создает BinaryQuantization"""
+    profile = {**DEFAULT_PROFILE, "name": "binary", "quantization": {"type": "binary"}}
+    params = build_collection_params(profile, 1536)
+
+    assert isinstance(params["quantization_config"], BinaryQuantization)
+    assert build_search_params(profile).quantization.rescore is True
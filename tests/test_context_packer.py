@@ -0,0 +1,84 @@
+"""
+Тесты для упаковки RAG контекста (бюджет токенов, MMR, склейка чанков)
+"""
+import pytest
+from services.rag.context_packer import ContextPacker, count_tokens
+
+
+def test_pack_respects_token_budget():
+    """Контекст не превышает бюджет токенов"""
+    packer = ContextPacker(max_tokens=100, min_doc_tokens=10)
+    documents = [
+        {"text": f"Документ номер {i} " + "слово " * 200, "score": 1.0 - i * 0.1, "source_url": f"doc{i}"}
+        for i in range(5)
+    ]
+
+    packed = packer.pack(documents)
+
+    assert packed
+    assert sum(count_tokens(d["text"]) for d in packed) <= 100 + 1
+    assert packed[-1].get("truncated")
+
+
+def test_mmr_skips_near_duplicates_by_vector():
+    """Почти одинаковые векторы считаются дубликатами"""
+    packer = ContextPacker(max_tokens=1000, duplicate_threshold=0.95, merge_adjacent=False)
+    documents = [
+        {"text": "Подбор персонала", "score": 0.9, "vector": [1.0, 0.0, 0.0], "source_url": "a"},
+        {"text": "Подбор сотрудников", "score": 0.85, "vector": [0.99, 0.01, 0.0], "source_url": "b"},
+        {"text": "Оценка персонала", "score": 0.8, "vector": [0.0, 1.0, 0.0], "source_url": "c"},
+    ]
+
+    packed = packer.pack(documents)
+
+    assert [d["source_url"] for d in packed] == ["a", "c"]
+    assert all("vector" not in d for d in packed)
+
+
+def test_mmr_prefers_diverse_documents():
+    """MMR поднимает менее релевантный, но более разнообразный документ"""
+    packer = ContextPacker(max_tokens=1000, mmr_lambda=0.5, duplicate_threshold=0.999, merge_adjacent=False)
+    documents = [
+        {"text": "a", "score": 0.9, "vector": [1.0, 0.0], "source_url": "a"},
+        {"text": "b", "score": 0.88, "vector": [0.9, 0.1], "source_url": "b"},
+        {"text": "c", "score": 0.7, "vector": [0.0, 1.0], "source_url": "c"},
+    ]
+
+    packed = packer.pack(documents)
+
+    assert [d["source_url"] for d in packed] == ["a", "c", "b"]
+
+
+def test_mmr_uses_word_overlap_without_vectors():
+    """Без векторов дубликаты определяются по словам"""
+    packer = ContextPacker(max_tokens=1000, duplicate_threshold=0.9, merge_adjacent=False)
+    documents = [
+        {"text": "Стоимость аудита HR процессов", "score": 0.9, "source_url": "a"},
+        {"text": "стоимость аудита HR процессов", "score": 0.8, "source_url": "b"},
+    ]
+
+    packed = packer.pack(documents)
+
+    assert len(packed) == 1
+
+
+def test_merge_adjacent_chunks_removes_overlap():
+    """Соседние чанки одного источника склеиваются без дублирования перекрытия"""
+    packer = ContextPacker(max_tokens=1000, duplicate_threshold=1.1)
+    documents = [
+        {"text": "конец первого чанка общий", "score": 0.7, "source_url": "doc", "chunk_index": 1},
+        {"text": "начало документа конец первого", "score": 0.9, "source_url": "doc", "chunk_index": 0},
+        {"text": "другой источник", "score": 0.8, "source_url": "other", "chunk_index": 5},
+    ]
+
+    packed = packer.pack(documents)
+
+    assert len(packed) == 2
+    assert packed[0]["text"] == "начало документа конец первого чанка общий"
+    assert packed[0]["merged_chunks"] == 2
+    assert packed[0]["score"] == pytest.approx(0.9)
+
+
+def test_pack_empty():
+    """Пустой список документов"""
+    assert ContextPacker().pack([]) == []
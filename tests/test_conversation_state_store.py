@@ -0,0 +1,125 @@
+"""
+Тесты хранилища истории диалогов LangGraph Conversation Workflow
+"""
+import time
+import pytest
+from unittest.mock import patch
+
+from backend.api.services.conversation_state_store import (
+    InMemoryConversationStore,
+    RedisConversationStore,
+    to_compact_list
+)
+from backend.api.services.langgraph_conversation_workflow import (
+    LangGraphConversationWorkflow,
+    LANGCHAIN_MESSAGES_AVAILABLE
+)
+
+
+class FakeRedis:
+    """Минимальный Redis со списками для RedisConversationStore"""
+
+    def __init__(self):
+        self.lists = {}
+        self.ttls = {}
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def rpush(self, key, *values):
+        self.lists.setdefault(key, []).extend(values)
+
+    def ltrim(self, key, start, end):
+        items = self.lists.get(key, [])
+        self.lists[key] = items[start:] if end == -1 else items[start:end + 1]
+
+    def lrange(self, key, start, end):
+        items = self.lists.get(key, [])
+        return items[start:] if end == -1 else items[start:end + 1]
+
+    def expire(self, key, ttl):
+        self.ttls[key] = ttl
+
+    def delete(self, key):
+        self.lists.pop(key, None)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args: self.calls.append((name, args))
+
+    def execute(self):
+        return [getattr(self.client, name)(*args) for name, args in self.calls]
+
+
+def message(role, content):
+    return {"role": role, "content": content}
+
+
+def test_memory_store_bounds_history_and_threads():
+    store = InMemoryConversationStore(max_messages=3, max_threads=2)
+    store.append("u1_telegram", [message("user", f"m{i}") for i in range(5)])
+    store.append("u2_telegram", [message("user", "привет")])
+
+    assert [m["content"] for m in store.get_messages("u1_telegram")] == ["m2", "m3", "m4"]
+
+    # u2 - самый давний по обращению и вытесняется третьим потоком
+    store.append("u3_telegram", [message("user", "вопрос")])
+    assert store.get_messages("u2_telegram") == []
+    assert store.stats()["threads"] == 2
+
+
+def test_memory_store_ttl():
+    store = InMemoryConversationStore(max_messages=10, ttl=60)
+    store.append("u1_web", [message("user", "вопрос")])
+
+    with patch("backend.api.services.conversation_state_store.time.time", return_value=time.time() + 61):
+        assert store.get_messages("u1_web") == []
+        store.append("u2_web", [message("user", "новый")])
+        assert store.stats()["threads"] == 1
+
+
+def test_redis_store_appends_and_trims():
+    redis_client = FakeRedis()
+    store = RedisConversationStore(redis_client, max_messages=2, ttl=100)
+    store.append("u1_telegram", [message("user", "один"), message("assistant", "два")])
+    store.append("u1_telegram", [message("user", "три")])
+
+    assert store.get_messages("u1_telegram") == [message("assistant", "два"), message("user", "три")]
+    assert redis_client.ttls["conversation_state:u1_telegram"] == 100
+    store.clear("u1_telegram")
+    assert store.get_messages("u1_telegram") == []
+    assert store.stats() == {"backend": "redis", "max_messages": 2, "ttl": 100}
+
+
+@pytest.mark.skipif(not LANGCHAIN_MESSAGES_AVAILABLE, reason="langchain_core недоступен")
+def test_compact_form_from_langchain_messages():
+    from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+    assert to_compact_list([
+        HumanMessage(content="вопрос"), AIMessage(content="ответ"), SystemMessage(content="инструкция"),
+        {"role": "user", "text": "из dict"}, {"role": "assistant", "content": ""}
+    ]) == [message("user", "вопрос"), message("assistant", "ответ"), message("user", "из dict")]
+
+
+@pytest.mark.asyncio
+async def test_workflow_nodes_append_incrementally():
+    store = InMemoryConversationStore(max_messages=4)
+    workflow = LangGraphConversationWorkflow(max_history_messages=4, state_store=store)
+    state = {"user_id": "42", "platform": "web", "messages": [message("user", "ранее")],
+             "current_message": "сколько стоит коучинг?", "system_prompt": ""}
+
+    state = await workflow._trim_history_node(state)
+    state = await workflow._format_messages_node(state)
+    workflow._save_message(state, "assistant", "от 90 000 рублей")
+
+    assert state["messages"] == [message("user", "ранее")]
+    assert state["formatted_messages"][-1] == message("user", "сколько стоит коучинг?")
+    assert [m["content"] for m in store.get_messages("42_web")] == ["ранее", "сколько стоит коучинг?", "от 90 000 рублей"]
+
+    next_state = await workflow._trim_history_node({"user_id": "42", "platform": "web", "messages": []})
+    assert len(next_state["messages"]) == 3
@@ -0,0 +1,61 @@
+"""
+Тесты для управления размерностью эмбеддингов (Matryoshka-усечение)
+"""
+import math
+
+import pytest
+from qdrant_client import QdrantClient
+from qdrant_client.models import PointStruct
+
+from services.rag.collection_profiles import recreate_collection, DEFAULT_PROFILE
+from services.rag.embedding_dimensions import (
+    EmbeddingDimensionError,
+    reduce_dimension,
+    build_collection_metadata,
+    get_recorded_dimension,
+    validate_points
+)
+
+
+def test_reduce_dimension_truncates_and_normalizes():
+    """Вектор усекается до первых N координат и нормализуется"""
+    reduced = reduce_dimension([3.0, 4.0, 100.0, 100.0], 2)
+
+    assert reduced == pytest.approx([0.6, 0.8])
+    assert math.sqrt(sum(x * x for x in reduced)) == pytest.approx(1.0)
+
+
+def test_reduce_dimension_keeps_native_vector():
+    """Вектор нужной размерности не изменяется"""
+    assert reduce_dimension([0.1, 0.2], 2) == [0.1, 0.2]
+
+
+def test_reduce_dimension_refuses_padding():
+    """Короткий вектор не дополняется нулями"""
+    with pytest.raises(EmbeddingDimensionError):
+        reduce_dimension([0.1, 0.2], 4)
+
+
+def test_dimension_recorded_in_collection_metadata():
+    """Размерность и модель записываются в метаданные коллекции"""
+    client = QdrantClient(":memory:")
+    profile = {**DEFAULT_PROFILE, "name": "default"}
+    recreate_collection(client, "kb", profile, 4, build_collection_metadata(4, "test-model"))
+
+    metadata = client.get_collection("kb").config.metadata
+    assert metadata["embedding_dimension"] == 4
+    assert metadata["embedding_model"] == "test-model"
+    assert get_recorded_dimension(client, "kb") == 4
+    assert get_recorded_dimension(client, "missing") is None
+
+
+def test_mismatched_upsert_is_refused():
+    """Upsert векторов другой размерности отклоняется"""
+    points = [
+        PointStruct(id=1, vector=[0.1, 0.2, 0.3, 0.4], payload={}),
+        PointStruct(id=2, vector=[0.1, 0.2], payload={})
+    ]
+
+    validate_points(points[:1], 4, "kb")
+    with pytest.raises(EmbeddingDimensionError):
+        validate_points(points, 4, "kb")
@@ -0,0 +1,121 @@
+"""
+Тесты фоновой очереди оценки RAG ответов (RAGAS)
+"""
+import asyncio
+
+import pytest
+
+from services.rag import evaluation_queue
+from services.rag.evaluation_queue import EvaluationJob, RAGEvaluationQueue, schedule_rag_evaluation
+from services.rag.rag_evaluator import RAGEvaluationResult
+
+
+def result(score=0.8):
+    return RAGEvaluationResult(
+        faithfulness=score, answer_relevancy=score, context_precision=score,
+        context_recall=0.0, average_score=score, details={"faithfulness": score}
+    )
+
+
+def job(index=0):
+    return EvaluationJob(question=f"Вопрос {index}", answer="Ответ", contexts=["Контекст"], user_id=42)
+
+
+@pytest.mark.asyncio
+async def test_submit_returns_before_evaluation_and_persists():
+    release = asyncio.Event()
+    persisted = []
+
+    async def evaluate(job):
+        await release.wait()
+        return result()
+
+    queue = RAGEvaluationQueue(sample_rate=1.0, evaluate=evaluate,
+                               persist=lambda job, evaluation, ms: persisted.append((job.question, evaluation.average_score)) or 1)
+
+    assert queue.submit(job(1)) is True
+    await asyncio.sleep(0.01)
+    assert persisted == []  # Оценка еще идет, а submit уже вернулся
+
+    release.set()
+    await queue.stop(timeout=1)
+
+    assert persisted == [("Вопрос 1", 0.8)]
+    assert queue.stats["evaluated"] == 1 and queue.stats["persisted"] == 1
+
+
+@pytest.mark.asyncio
+async def test_sampling_skips_answers():
+    values = iter([0.05, 0.5, 0.09, 0.95])
+    evaluated = []
+
+    async def evaluate(job):
+        evaluated.append(job.question)
+        return result()
+
+    queue = RAGEvaluationQueue(sample_rate=0.1, evaluate=evaluate, persist=lambda *args: 1, rng=lambda: next(values))
+
+    assert [queue.submit(job(i)) for i in range(4)] == [True, False, True, False]
+    await queue.stop(timeout=1)
+
+    assert evaluated == ["Вопрос 0", "Вопрос 2"]
+    assert queue.stats["sampled_out"] == 2
+
+
+@pytest.mark.asyncio
+async def test_bounded_concurrency_and_full_queue_drops():
+    release = asyncio.Event()
+    state = {"running": 0, "peak": 0}
+
+    async def evaluate(job):
+        state["running"] += 1
+        state["peak"] = max(state["peak"], state["running"])
+        await release.wait()
+        state["running"] -= 1
+        return result()
+
+    queue = RAGEvaluationQueue(sample_rate=1.0, max_size=3, concurrency=2, evaluate=evaluate, persist=lambda *args: 1)
+    accepted = [queue.submit(job(i)) for i in range(3)]
+    await asyncio.sleep(0.01)  # Два воркера забрали задачи, в очереди осталась одна
+    accepted += [queue.submit(job(i)) for i in range(3, 6)]
+
+    assert accepted == [True] * 5 + [False]
+    assert queue.stats["dropped"] == 1
+
+    release.set()
+    await queue.stop(timeout=1)
+    assert state["peak"] == 2
+    assert queue.stats["evaluated"] == 5
+
+
+@pytest.mark.asyncio
+async def test_failures_do_not_stop_workers():
+    outcomes = iter([RuntimeError("LLM недоступна"), None, result()])
+
+    async def evaluate(job):
+        outcome = next(outcomes)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    def persist(job, evaluation, ms):
+        raise ConnectionError("PostgreSQL недоступен")
+
+    queue = RAGEvaluationQueue(sample_rate=1.0, concurrency=1, evaluate=evaluate, persist=persist)
+    for i in range(3):
+        queue.submit(job(i))
+    await queue.stop(timeout=1)
+
+    assert queue.stats["failed"] == 2
+    assert queue.stats["evaluated"] == 1 and queue.stats["persisted"] == 0
+
+
+@pytest.mark.asyncio
+async def test_schedule_skips_answers_without_context(monkeypatch):
+    queue = RAGEvaluationQueue(sample_rate=1.0, evaluate=lambda job: asyncio.sleep(0, result()), persist=lambda *args: 1)
+    monkeypatch.setattr(evaluation_queue, "_evaluation_queue", queue)
+
+    assert schedule_rag_evaluation("Вопрос", "Ответ", contexts=[]) is False
+    assert schedule_rag_evaluation("Вопрос", "Ответ", contexts=["Контекст"], user_id=42) is True
+    await queue.stop(timeout=1)
+    assert queue.stats["submitted"] == 1 and queue.stats["evaluated"] == 1
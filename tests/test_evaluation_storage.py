@@ -0,0 +1,58 @@
+"""
+Тесты сохранения оценок RAGAS (rag_evaluations)
+"""
+import math
+from datetime import datetime
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.database import evaluation_storage
+from backend.database.models_sqlalchemy import RAGEvaluation
+
+
+@pytest.fixture
+def session_factory(monkeypatch):
+    engine = create_engine("sqlite://")
+    RAGEvaluation.__table__.create(engine)
+    factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(evaluation_storage, "_session_factory", factory)
+    return factory
+
+
+def test_save_rag_evaluation_stores_only_metric_floats(session_factory):
+    # Строка result.to_pandas(): вопрос, контексты, numpy значения и NaN для непосчитанной метрики
+    row = {
+        "question": "Сколько стоит аудит?",
+        "contexts": ["Аудит HR - 50000 ₽"],
+        "answer": "50000 ₽",
+        "faithfulness": np.float64(0.9),
+        "answer_relevancy": np.float32(0.75),
+        "context_precision": float("nan")
+    }
+    evaluation_id = evaluation_storage.save_rag_evaluation(
+        question="Сколько стоит аудит?",
+        answer="50000 ₽",
+        scores={
+            "faithfulness": row["faithfulness"],
+            "answer_relevancy": row["answer_relevancy"],
+            "context_precision": row["context_precision"],
+            "context_recall": None,
+            "average_score": np.float64(0.825),
+            "details": row
+        },
+        answered_at=datetime(2026, 1, 1)
+    )
+
+    assert evaluation_id is not None
+    session = session_factory()
+    stored = session.get(RAGEvaluation, evaluation_id)
+    assert stored.faithfulness == pytest.approx(0.9)
+    assert stored.context_precision is None
+    assert stored.average_score == pytest.approx(0.825)
+    assert set(stored.details_json) == {"faithfulness", "answer_relevancy", "context_precision"}
+    assert stored.details_json["context_precision"] is None
+    assert not any(isinstance(value, float) and math.isnan(value) for value in stored.details_json.values())
+    session.close()
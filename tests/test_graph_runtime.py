@@ -0,0 +1,96 @@
+"""
+Тесты выполнения графов LangGraph с замером времени узлов
+"""
+import asyncio
+import threading
+import time
+from typing import TypedDict
+
+import pytest
+
+from langgraph.graph import StateGraph, END
+
+from services.helpers import graph_runtime
+from services.helpers.graph_runtime import add_timed_node, compile_graph, get_graph_metrics, LatencyHistogram
+
+
+class CounterState(TypedDict):
+    value: int
+    thread: str
+
+
+def build_graph(calls):
+    def sync_step(state):
+        time.sleep(0.05)
+        return {"value": state["value"] + 1, "thread": threading.current_thread().name}
+
+    async def async_step(state):
+        return {"value": state["value"] * 10}
+
+    def build():
+        calls.append(1)
+        workflow = StateGraph(CounterState)
+        add_timed_node(workflow, "test_graph", "sync_step", sync_step)
+        add_timed_node(workflow, "test_graph", "async_step", async_step)
+        workflow.set_entry_point("sync_step")
+        workflow.add_edge("sync_step", "async_step")
+        workflow.add_edge("async_step", END)
+        return workflow.compile()
+
+    return build
+
+
+def test_histogram_buckets():
+    histogram = LatencyHistogram(buckets=(10, 100))
+    for duration in (5, 50, 500):
+        histogram.observe(duration)
+    histogram.observe(7, error=True)
+
+    data = histogram.to_dict()
+    assert data["buckets"] == {"10": 2, "100": 1, "+Inf": 1}
+    assert data["count"] == 4 and data["errors"] == 1
+    assert data["max_ms"] == 500
+
+
+@pytest.mark.asyncio
+async def test_graph_compiled_once_and_timed():
+    calls = []
+    graph_runtime._compiled.pop("test_graph", None)
+    get_graph_metrics().reset()
+
+    app = compile_graph("test_graph", build_graph(calls))
+    assert compile_graph("test_graph", build_graph(calls)) is app
+    assert len(calls) == 1
+
+    # Синхронный узел не блокирует event loop: два запуска идут параллельно
+    started = time.perf_counter()
+    results = await asyncio.gather(app.ainvoke({"value": 1}), app.ainvoke({"value": 2}))
+    elapsed = time.perf_counter() - started
+
+    assert [r["value"] for r in results] == [20, 30]
+    assert all(r["thread"].startswith("graph-node") for r in results)
+    assert elapsed < 0.095
+
+    nodes = graph_runtime.get_graph_metrics_snapshot()["graphs"]["test_graph"]
+    assert nodes["sync_step"]["count"] == 2
+    assert nodes["sync_step"]["avg_ms"] >= 50
+    assert nodes["async_step"]["count"] == 2
+
+    text = graph_runtime.render_prometheus()
+    assert 'langgraph_node_duration_ms_count{graph="test_graph",node="sync_step"} 2' in text
+    assert 'langgraph_node_duration_ms_bucket{graph="test_graph",node="sync_step",le="+Inf"} 2' in text
+    graph_runtime._compiled.pop("test_graph", None)
+
+
+@pytest.mark.asyncio
+async def test_failed_node_recorded_as_error():
+    get_graph_metrics().reset()
+
+    def broken(state):
+        raise ValueError("boom")
+
+    wrapped = graph_runtime.timed_node("test_graph", "broken", broken)
+    with pytest.raises(ValueError):
+        await wrapped({})
+
+    assert get_graph_metrics().snapshot()["test_graph"]["broken"]["errors"] == 1
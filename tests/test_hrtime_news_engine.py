@@ -0,0 +1,88 @@
+"""
+Тесты движка разбора новостей HR Time и пакетной оценки
+"""
+import unittest
+from datetime import datetime, timedelta
+from services.services.hrtime_news_engine import NewsScoringEngine
+from services.services.hrtime_news_scorer import HRTimeNewsScorer
+from services.services.hrtime_news_parser import HRTimeNewsParser
+
+
+class TestNewsScoringEngine(unittest.TestCase):
+    """Тесты движка разбора новостей"""
+
+    def setUp(self):
+        self.engine = NewsScoringEngine()
+
+    def test_overlapping_keywords(self):
+        """Перекрывающиеся термины засчитываются как подстроки"""
+        hits = self.engine.scan("Автоматизация: HR-процессы и проект HR-клуба")
+
+        self.assertTrue({"hr", "hr-процессы", "проект"} <= hits.keywords)
+        self.assertIn("hr-клуб", hits.statuses)
+        # "про" внутри "процессы" и "проект"
+        self.assertIn("pro", hits.statuses)
+        self.assertIn("Запросы", hits.categories)
+        self.assertIn("request", hits.content_types)
+
+    def test_metric_pattern_priority(self):
+        """Для метрик берется шаблон с наивысшим приоритетом, а не первое совпадение в тексте"""
+        hits = self.engine.scan("views: 10\n👁 20\nПросмотров: 30\n⭐ 4.5.\nрейтинг: 4.8")
+        metrics = self.engine.extract_metrics(hits)
+
+        self.assertEqual(metrics["views"], 30)
+        self.assertEqual(metrics["comments"], 0)
+        self.assertEqual(metrics["rating"], 4.8)
+
+    def test_author_status_from_author_name(self):
+        """Статус автора ищется и в тексте, и в имени автора"""
+        hits = self.engine.scan("Автор: Мария Иванова (СПЕЦНАЗ)")
+        author = self.engine.extract_author_name(hits)
+
+        self.assertEqual(author, "Мария Иванова (СПЕЦНАЗ)")
+        self.assertEqual(self.engine.extract_author_status(hits, author), "спецназ")
+        self.assertEqual(self.engine.extract_author_status(self.engine.scan("Новость"), "TOP-30 эксперт"), "топ-30")
+
+    def test_text_features(self):
+        count, has_questions = self.engine.text_features("Как организовать адаптация новичков", "Найм и KPI")
+
+        self.assertEqual(count, 3)
+        self.assertTrue(has_questions)
+        self.assertEqual(self.engine.text_features(""), (0, False))
+
+
+class TestScoreBatch(unittest.TestCase):
+    """Тесты пакетной оценки новостей"""
+
+    def setUp(self):
+        self.scorer = HRTimeNewsScorer()
+        self.parser = HRTimeNewsParser()
+
+    def test_batch_matches_single(self):
+        """score_batch дает те же результаты, что и calculate_total_score"""
+        texts = [
+            "Вопрос по подбору персонала. Как провести интервью?\nПросмотров: 1200 💬 25 ⭐ 4.9",
+            "Автор: Иван Петров, ТОП-100\nМатериал про мотивацию сотрудников",
+            "Обычное сообщение",
+            "",
+        ]
+        news_list = []
+        for i, text in enumerate(texts):
+            parsed = self.parser.parse_news(text, {"message_id": i, "date": datetime.now() - timedelta(hours=i * 30)})
+            news_list.append({**parsed, "text": text})
+
+        batch = self.scorer.score_batch(news_list)
+
+        self.assertEqual(len(batch), len(news_list))
+        for news, result in zip(news_list, batch):
+            single = self.scorer.calculate_total_score(news)
+            self.assertEqual(result["total_score"], single["total_score"])
+            self.assertEqual(result["stars"], self.scorer._score_to_stars(result["total_score"]))
+            self.assertEqual(result["urgency"], single["urgency"])
+            self.assertEqual(result["breakdown"], single["breakdown"])
+        self.assertGreater(batch[0]["stars"], batch[2]["stars"])
+        self.assertEqual(self.scorer.score_batch([]), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
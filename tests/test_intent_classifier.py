@@ -0,0 +1,104 @@
+"""
+Тесты классификатора намерений: эталонные эмбеддинги и пакетная классификация
+"""
+import zlib
+import numpy as np
+import pytest
+from unittest.mock import patch
+
+from services.agents import intent_classifier
+from services.agents.intent_classifier import (
+    classify_intent_with_embeddings,
+    classify_many,
+    classify_many_with_embeddings,
+    get_reference_store,
+    BOOKING_EXAMPLES
+)
+
+
+class FakeEncoder:
+    """Детерминированный энкодер (мешок символьных биграмм), считает закодированные тексты"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        vectors = np.zeros((len(texts), 64), dtype=np.float32)
+        for row, text in enumerate(texts):
+            text = text.lower()
+            for i in range(len(text) - 1):
+                vectors[row, zlib.crc32(text[i:i + 2].encode()) % 64] += 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+@pytest.fixture
+def encoder():
+    fake = FakeEncoder()
+    with patch.object(intent_classifier, "_get_encoder", return_value=fake), \
+            patch.object(intent_classifier, "_reference_store", None):
+        yield fake
+
+
+SERVICES = [{"title": "Консультация HR"}, {"title": "Оценка персонала"}]
+
+
+def test_reference_embeddings_computed_once(encoder):
+    """Примеры кодируются один раз, услуги - только при изменении списка"""
+    classify_intent_with_embeddings("хочу записаться", SERVICES, [])
+    classify_intent_with_embeddings("запись на завтра", SERVICES, [])
+    classify_intent_with_embeddings("привет", list(SERVICES), [])
+
+    assert encoder.calls[0] == list(BOOKING_EXAMPLES)
+    assert encoder.calls[1] == ["хочу записаться"]
+    assert encoder.calls[2] == ["Консультация HR", "Оценка персонала"]
+    # Дальше кодируется только текст пользователя
+    assert encoder.calls[3:] == [["запись на завтра"], ["привет"]]
+
+    classify_intent_with_embeddings("привет", SERVICES + [{"title": "Подбор"}], [])
+    # Кодируется только новое название услуги
+    assert encoder.calls[-1] == ["Подбор"]
+
+    store = get_reference_store()
+    assert store.examples.dtype == np.float32
+    assert store.examples.flags["C_CONTIGUOUS"]
+    assert np.allclose(np.linalg.norm(store.examples, axis=1), 1.0)
+
+
+def test_exact_example_has_full_similarity(encoder):
+    confidence, details = classify_intent_with_embeddings("хочу записаться", [], [])
+
+    assert details["method"] == "embedding"
+    assert details["service_similarity"] == 0.0
+    assert confidence == pytest.approx(1.0, abs=1e-5)
+
+
+def test_classify_many_matches_single(encoder):
+    """Пакетная классификация совпадает с поштучной и кодирует тексты одним вызовом"""
+    texts = ["хочу записаться на консультацию", "привет, как дела", "оценка персонала завтра"]
+
+    batch = classify_many_with_embeddings(texts, SERVICES, [])
+    calls_before = len(encoder.calls)
+    single = [classify_intent_with_embeddings(text, SERVICES, []) for text in texts]
+
+    # Пакет - один вызов модели, поштучно - по вызову на текст
+    assert texts in encoder.calls[:calls_before]
+    assert len(encoder.calls) - calls_before == len(texts)
+    for (batch_score, batch_details), (single_score, single_details) in zip(batch, single):
+        assert batch_score == pytest.approx(single_score, abs=1e-6)
+        assert batch_details["booking_similarity"] == pytest.approx(single_details["booking_similarity"], abs=1e-6)
+
+    decisions = classify_many(texts, SERVICES, [], threshold=0.4)
+    assert [is_booking for is_booking, _ in decisions] == [True, False, True]
+    assert all(details["method"] == "hybrid" for _, details in decisions)
+
+
+def test_no_model_fallback():
+    with patch.object(intent_classifier, "_get_encoder", return_value=None), \
+            patch.object(intent_classifier, "_reference_store", None):
+        results = classify_many_with_embeddings(["хочу записаться", "привет"], SERVICES, [])
+
+    assert [score for score, _ in results] == [0.0, 0.0]
+    assert all(details["method"] == "fallback" for _, details in results)
@@ -0,0 +1,63 @@
+"""
+Тесты движка правил намерений (config/rag.yaml) и его потребителей
+"""
+import pytest
+
+from services.helpers.intent_rules import IntentRuleEngine, get_intent_rules
+from services.helpers.email_helper import classify_email
+from services.services.rag_intent_classifier import RAGIntentClassifier
+
+
+def test_rules_loaded_from_config():
+    engine = get_intent_rules()
+    intents = [rule.intent for rule in engine.rules]
+
+    for intent in ("greeting", "simple_response", "knowledge_question", "service_question",
+                   "pricing", "booking", "service_info", "email_followup", "email_new_lead"):
+        assert intent in intents
+
+
+def test_all_intents_in_one_pass():
+    """Один проход возвращает все сработавшие намерения с уверенностью"""
+    matches = get_intent_rules().classify("Сколько стоит консультация по внедрению? Хочу записаться")
+    by_intent = {match.intent: match for match in matches}
+
+    assert {"pricing", "service_question", "service_info", "booking", "email_new_lead"} <= set(by_intent)
+    assert by_intent["pricing"].confidence == 0.9
+    assert "сколько" in by_intent["pricing"].keywords
+    assert get_intent_rules().first("Хочу записаться, сколько стоит?", ("booking", "pricing")).intent == "booking"
+    assert get_intent_rules().classify("") == []
+
+
+def test_max_words_and_overlapping_keywords():
+    engine = IntentRuleEngine.from_config([
+        {"intent": "greeting", "keywords": ["привет"], "max_words": 2},
+        {"intent": "club", "keywords": ["hr-клуб", "клуб"], "confidence": 0.7},
+        {"keywords": ["без намерения"]},
+    ])
+
+    assert len(engine.rules) == 2
+    assert engine.matches("Привет!", "greeting")
+    assert not engine.matches("Привет, расскажи про методику", "greeting")
+    assert engine.first("Материал HR-клуба", ("club",)).keywords == ["hr-клуб", "клуб"]
+
+
+def test_quick_check_decisions():
+    classifier = RAGIntentClassifier(semantic_cache=False)
+
+    assert classifier._quick_check("привет")["intent"] == "greeting"
+    assert classifier._quick_check("спасибо")["use_rag"] is False
+    assert classifier._quick_check("что такое оценка 360")["intent"] == "knowledge_question"
+    assert classifier._quick_check("сколько стоит консультация") == {
+        "use_rag": True, "confidence": 0.9, "reason": "Вопрос об услугах/ценах", "intent": "service_question"
+    }
+    assert classifier._quick_check("нужен ли испытательный срок удаленщикам") is None
+
+
+@pytest.mark.asyncio
+async def test_classify_email_rules():
+    assert await classify_email({"subject": "Re: предложение", "body": "Добрый день"}) == "followup"
+    assert await classify_email({"subject": "Консультация", "body": "Нужна помощь с наймом"}) == "new_lead"
+    assert await classify_email({"subject": "Счет", "body": "Во вложении акт"}) == "service"
+    # Учитываются только первые 200 символов письма
+    assert await classify_email({"subject": "Счет", "body": "x" * 200 + " запрос"}) == "service"
@@ -0,0 +1,123 @@
+"""
+Тесты единого анализа лида: один запрос к LLM, исправление по схеме, кэш
+"""
+import asyncio
+import json
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from services.agents import lead_processor
+from services.agents.lead_processor import (
+    analyze_lead,
+    classify_request,
+    extract_lead_info,
+    clear_lead_analysis_cache,
+    LeadAnalysisError
+)
+
+ANALYSIS_RESPONSE = json.dumps({
+    "category": "автоматизация",
+    "confidence": 0.8,
+    "keywords": ["HR", "автоматизация"],
+    "is_lead": True,
+    "score": 0.9,
+    "status": "warm",
+    "reason": "Запрос на внедрение",
+    "email_type": "new_lead",
+    "email_type_confidence": 0.95,
+    "email_type_reason": "Первое обращение",
+    "contacts": {"full_name": "Иван Петров", "email": "ivan@example.com", "phone": None},
+    "service_type": "автоматизация",
+    "industry": "IT",
+    "budget": "500 000 ₽",
+    "deadline": "март",
+    "summary": "Компании нужна автоматизация HR"
+}, ensure_ascii=False)
+
+
+@pytest.fixture(autouse=True)
+def clean_cache():
+    clear_lead_analysis_cache()
+    yield
+    clear_lead_analysis_cache()
+
+
+@pytest.mark.asyncio
+async def test_views_share_one_llm_call():
+    """classify_request и extract_lead_info используют один ответ LLM"""
+    with patch('services.agents.lead_processor.generate_with_fallback', new_callable=AsyncMock) as mock_llm:
+        mock_llm.return_value = ANALYSIS_RESPONSE
+
+        classification = await classify_request("Нужна автоматизация  HR")
+        info = await extract_lead_info("нужна автоматизация HR")
+        analysis = await analyze_lead("Нужна автоматизация HR")
+
+        assert mock_llm.call_count == 1
+        assert classification == {"category": "автоматизация", "confidence": 0.8, "keywords": ["HR", "автоматизация"]}
+        assert info["budget"] == "500 000 ₽"
+        assert info["deadline"] == "март"
+        assert set(info) == set(lead_processor.LEAD_INFO_FIELDS)
+        assert analysis.status == "warm"
+        assert analysis.contacts.phone == ""
+
+
+@pytest.mark.asyncio
+async def test_schema_repair():
+    """Невалидный ответ исправляется одним дополнительным запросом"""
+    with patch('services.agents.lead_processor.generate_with_fallback', new_callable=AsyncMock) as mock_llm:
+        mock_llm.side_effect = ['{"status": "горячий", "score": "много"}', ANALYSIS_RESPONSE]
+
+        analysis = await analyze_lead("Запрос на автоматизацию")
+
+        assert mock_llm.call_count == 2
+        assert analysis.status == "warm"
+        assert "Ошибки" in mock_llm.call_args_list[1].args[0][0]["content"]
+
+
+@pytest.mark.asyncio
+async def test_schema_repair_keeps_valid_fields():
+    """Если исправление не помогло, сохраняются валидные поля"""
+    with patch('services.agents.lead_processor.generate_with_fallback', new_callable=AsyncMock) as mock_llm:
+        bad = '{"category": "бизнес-анализ", "email_type": "unknown", "budget": "100к"}'
+        mock_llm.side_effect = [bad, bad]
+
+        analysis = await analyze_lead("Запрос")
+
+        assert analysis.category == "бизнес-анализ"
+        assert analysis.budget == "100к"
+        assert analysis.email_type == "service"
+
+
+@pytest.mark.asyncio
+async def test_errors_not_cached():
+    """Ошибки LLM не кэшируются"""
+    with patch('services.agents.lead_processor.generate_with_fallback', new_callable=AsyncMock) as mock_llm:
+        mock_llm.side_effect = ["нет json", "тоже нет", ANALYSIS_RESPONSE]
+
+        with pytest.raises(LeadAnalysisError):
+            await analyze_lead("Запрос")
+        analysis = await analyze_lead("Запрос")
+
+        assert analysis.category == "автоматизация"
+        assert mock_llm.call_count == 3
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_single_flight():
+    """Параллельные вызовы с одним текстом ждут один запрос"""
+    async def slow_response(*args, **kwargs):
+        await asyncio.sleep(0.05)
+        return ANALYSIS_RESPONSE
+
+    with patch('services.agents.lead_processor.generate_with_fallback', new_callable=AsyncMock) as mock_llm:
+        mock_llm.side_effect = slow_response
+
+        results = await asyncio.gather(
+            classify_request("Запрос лида"),
+            extract_lead_info("Запрос лида"),
+            analyze_lead("Запрос лида")
+        )
+
+        assert mock_llm.call_count == 1
+        assert results[0]["category"] == "автоматизация"
+        assert results[1]["industry"] == "IT"
@@ -0,0 +1,175 @@
+"""
+Тесты потоковых ответов: LLMClient.generate_stream, RAGChain.query_stream, SSE
+"""
+import json
+
+import httpx
+import pytest
+
+from services.helpers.llm_api import LLMClient, LLMResponse, LLMStreamChunk
+from services.helpers.sse import sse_event, sse_stream
+from services.rag.rag_chain import RAGChain
+
+
+def sse_body(*chunks, done=True):
+    lines = [": OPENROUTER PROCESSING\n\n"]
+    lines += [f"data: {json.dumps(chunk)}\n\n" for chunk in chunks]
+    if done:
+        lines.append("data: [DONE]\n\n")
+    return "".join(lines)
+
+
+def delta(text):
+    return {"choices": [{"delta": {"content": text}}]}
+
+
+def make_client(handler, fallback_chain=None):
+    client = LLMClient(primary_model="primary", fallback_chain=fallback_chain or [])
+    client.openrouter_api_key = "test-key"
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return client
+
+
+async def collect(stream):
+    deltas, response = [], None
+    async for chunk in stream:
+        if chunk.response is None:
+            deltas.append(chunk.delta)
+        else:
+            response = chunk.response
+    return deltas, response
+
+
+@pytest.mark.asyncio
+async def test_generate_stream_yields_deltas_then_response():
+    requests = []
+
+    def handler(request):
+        requests.append(json.loads(request.content))
+        body = sse_body(delta("Здравствуйте"), delta(", чем помочь?"), {"choices": [], "usage": {"total_tokens": 42}})
+        return httpx.Response(200, text=body)
+
+    client = make_client(handler)
+    deltas, response = await collect(client.generate_stream("Привет", system_prompt="Ты ассистент"))
+
+    assert deltas == ["Здравствуйте", ", чем помочь?"]
+    assert response.content == "Здравствуйте, чем помочь?"
+    assert response.tokens_used == 42
+    assert response.error is None
+    assert requests[0]["stream"] is True
+    assert [m["role"] for m in requests[0]["messages"]] == ["system", "user"]
+
+
+@pytest.mark.asyncio
+async def test_generate_stream_falls_back_before_first_token():
+    models = []
+
+    def handler(request):
+        model = json.loads(request.content)["model"]
+        models.append(model)
+        if model == "primary":
+            return httpx.Response(503, text="overloaded")
+        return httpx.Response(200, text=sse_body(delta("ответ")))
+
+    client = make_client(handler, fallback_chain=[{"provider": "openrouter", "model": "backup"}])
+    deltas, response = await collect(client.generate_stream("Привет"))
+
+    assert models == ["primary", "backup"]
+    assert deltas == ["ответ"]
+    assert response.model == "backup" and response.error is None
+
+
+@pytest.mark.asyncio
+async def test_generate_stream_keeps_partial_answer_on_midstream_error():
+    def handler(request):
+        return httpx.Response(200, text=sse_body(delta("Начало"), {"error": {"message": "quota"}}, done=False))
+
+    client = make_client(handler, fallback_chain=[{"provider": "openrouter", "model": "backup"}])
+    deltas, response = await collect(client.generate_stream("Привет"))
+
+    assert deltas == ["Начало"]  # Fallback не запускается - текст уже отправлен
+    assert response.content == "Начало"
+    assert response.error == "quota"
+
+
+@pytest.mark.asyncio
+async def test_closing_stream_closes_http_response():
+    state = {"closed": False, "sent": 0}
+
+    class Body(httpx.AsyncByteStream):
+        async def __aiter__(self):
+            for i in range(100):
+                state["sent"] += 1
+                yield f"data: {json.dumps(delta(str(i)))}\n\n".encode()
+
+        async def aclose(self):
+            state["closed"] = True
+
+    client = make_client(lambda request: httpx.Response(200, stream=Body()))
+    stream = client.generate_stream("Привет")
+    assert (await stream.__anext__()).delta == "0"
+    await stream.aclose()
+
+    assert state["closed"]
+    assert state["sent"] < 100
+
+
+class FakeLoader:
+    def search(self, **kwargs):
+        return [{"text": "Оценка персонала", "title": "Оценка", "source_url": "https://hr/a", "score": 0.9}]
+
+
+class FakeLLM:
+    async def generate_stream(self, prompt, system_prompt=None, temperature=0.7, max_tokens=2048):
+        assert "Оценка персонала" in prompt
+        for text in ("Оценка ", "стоит 50000"):
+            yield LLMStreamChunk(delta=text)
+        yield LLMStreamChunk(response=LLMResponse(content="Оценка стоит 50000", provider="openrouter", model="m", tokens_used=7))
+
+
+@pytest.mark.asyncio
+async def test_rag_query_stream_emits_retrieval_before_tokens():
+    chain = RAGChain(qdrant_loader=FakeLoader(), llm_client=FakeLLM(), force_new=True)
+    chain.context_packing_enabled = False
+
+    events = [event async for event in chain.query_stream("Сколько стоит оценка?")]
+
+    assert [name for name, _ in events] == ["retrieval", "delta", "delta", "done"]
+    assert events[0][1]["sources"] == ["https://hr/a"]
+    assert events[0][1]["documents"][0]["title"] == "Оценка"
+    assert events[-1][1]["answer"] == "Оценка стоит 50000"
+    assert events[-1][1]["context_count"] == 1
+    assert events[-1][1]["tokens_used"] == 7
+
+
+@pytest.mark.asyncio
+async def test_sse_stream_stops_and_closes_source_on_disconnect():
+    closed = []
+
+    async def events():
+        try:
+            for i in range(10):
+                yield "delta", {"content": str(i)}
+        finally:
+            closed.append(True)
+
+    checks = iter([False, False, True])
+
+    async def is_disconnected():
+        return next(checks)
+
+    sent = [chunk async for chunk in sse_stream(events(), is_disconnected)]
+
+    assert sent == [sse_event("delta", {"content": "0"}), sse_event("delta", {"content": "1"})]
+    assert closed == [True]
+
+
+@pytest.mark.asyncio
+async def test_sse_stream_reports_source_error():
+    async def events():
+        yield "retrieval", {"sources": []}
+        raise RuntimeError("LLM недоступна")
+
+    sent = [chunk async for chunk in sse_stream(events())]
+
+    assert sent[-1] == 'event: error\ndata: {"error": "LLM недоступна"}\n\n'
@@ -0,0 +1,222 @@
+"""
+Тесты хранилища уведомлений Mini App
+"""
+import asyncio
+import threading
+
+import pytest
+
+from backend.api.services.notification_store import (
+    InMemoryNotificationStore,
+    RedisNotificationStore,
+    notification_events,
+)
+
+
+class FakeRedis:
+    """Минимальный Redis с sorted sets и hash для RedisNotificationStore"""
+
+    def __init__(self):
+        self.zsets = {}
+        self.hashes = {}
+        self.values = {}
+        self.ttls = {}
+        self.published = []
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def _sorted(self, key):
+        return [member for member, _ in sorted(self.zsets.get(key, {}).items(), key=lambda item: (item[1], item[0]))]
+
+    def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    def zrem(self, key, *members):
+        zset = self.zsets.get(key, {})
+        return sum(1 for member in members if zset.pop(member, None) is not None)
+
+    def zrange(self, key, start, end):
+        members = self._sorted(key)
+        stop = end + 1 if end >= 0 else max(len(members) + end + 1, 0)
+        return members[start:stop]
+
+    def zrevrange(self, key, start, end):
+        return list(reversed(self._sorted(key)))[start:end + 1]
+
+    def zcard(self, key):
+        return len(self.zsets.get(key, {}))
+
+    def zscore(self, key, member):
+        return self.zsets.get(key, {}).get(member)
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        values = dict(mapping or {})
+        if field is not None:
+            values[field] = value
+        self.hashes.setdefault(key, {}).update(values)
+
+    def hmget(self, key, fields):
+        return [self.hashes.get(key, {}).get(field) for field in fields]
+
+    def hdel(self, key, *fields):
+        for field in fields:
+            self.hashes.get(key, {}).pop(field, None)
+
+    def incr(self, key):
+        self.values[key] = int(self.values.get(key, 0)) + 1
+        return self.values[key]
+
+    def get(self, key):
+        value = self.values.get(key)
+        return None if value is None else str(value)
+
+    def expire(self, key, ttl):
+        self.ttls[key] = ttl
+
+    def publish(self, channel, message):
+        self.published.append((channel, message))
+
+    def eval(self, script, numkeys, *args):
+        # TRIM_SCRIPT: уведомления сверх лимита удаляются из всех структур
+        (index, unread, items, read), (max_per_user,) = args[:numkeys], args[numkeys:]
+        overflow = self.zrange(index, 0, -(int(max_per_user) + 1))
+        for member in overflow:
+            self.zrem(index, member)
+            self.zrem(unread, member)
+            self.hdel(items, member)
+            self.hdel(read, member)
+        return len(overflow)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+    def execute(self):
+        return [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+
+def notification(index, **extra):
+    return {"id": f"n{index}", "type": "system", "title": f"Уведомление {index}",
+            "created_at": f"2026-01-01T10:00:{index:02d}", **extra}
+
+
+@pytest.fixture(params=["memory", "redis"])
+def store(request):
+    if request.param == "memory":
+        return InMemoryNotificationStore(max_per_user=5)
+    return RedisNotificationStore(FakeRedis(), max_per_user=5)
+
+
+def test_add_fills_defaults(store):
+    added = store.add("42", {"type": "email", "title": "Письмо"})
+
+    assert added["id"].startswith("42_")
+    assert added["read"] is False
+    assert store.list("42") == [added]
+    assert store.unread_count("42") == 1
+
+
+def test_list_pages_newest_first_and_trims(store):
+    for index in (3, 1, 7, 5, 2, 6, 4):
+        store.add("42", notification(index))
+
+    assert [n["id"] for n in store.list("42", limit=3)] == ["n7", "n6", "n5"]
+    assert [n["id"] for n in store.list("42", limit=3, offset=3)] == ["n4", "n3"]
+    assert store.total("42") == 5
+    assert store.unread_count("42") == 5
+    assert store.list("other") == []
+
+
+def test_mark_read_updates_counter(store):
+    for index in range(1, 4):
+        store.add("42", notification(index))
+    version = store.version("42")
+
+    assert store.mark_read("42", "n2") == 1
+    assert store.mark_read("42", "n2") == 0  # Повторная отметка не уменьшает счетчик
+    assert store.mark_read("42", "missing") == 0
+    assert store.unread_count("42") == 2
+    assert store.version("42") == version + 1
+
+    read = {n["id"]: n for n in store.list("42")}["n2"]
+    assert read["read"] is True and read["read_at"]
+
+    assert store.mark_read("42") == 2
+    assert store.unread_count("42") == 0
+    assert all(n["read"] for n in store.list("42"))
+
+
+def test_redis_trim_removes_overflow_everywhere():
+    redis = FakeRedis()
+    store = RedisNotificationStore(redis, max_per_user=2)
+    pipelines = []
+    original_pipeline = redis.pipeline
+    redis.pipeline = lambda: pipelines.append(original_pipeline()) or pipelines[-1]
+    for index in range(1, 4):
+        store.add("42", notification(index))
+    # Добавление и удаление лишних уведомлений - одна транзакция
+    assert len(pipelines) == 3
+    assert [name for name, _, _ in pipelines[-1].calls][-2:] == ["eval", "publish"]
+    store.mark_read("42")
+
+    assert redis.zrange("notifications:42:index", 0, -1) == ["n2", "n3"]
+    assert set(redis.hashes["notifications:42:items"]) == {"n2", "n3"}
+    assert set(redis.hashes["notifications:42:read"]) == {"n2", "n3"}
+    assert redis.ttls["notifications:42:index"] == store.ttl
+    assert redis.published[-1] == ("notifications:changes", "42")
+
+
+@pytest.mark.asyncio
+async def test_redis_calls_run_off_the_event_loop():
+    store = RedisNotificationStore(FakeRedis())
+    store.add("42", notification(1))
+    loop_thread = threading.get_ident()
+    threads = []
+    original_version = store.version
+    store.version = lambda user_id: threads.append(threading.get_ident()) or original_version(user_id)
+
+    assert await store.wait_for_change("42", None, timeout=1) == 1
+    assert await store.call("summary", "42") == {"unread_count": 1, "total": 1}
+    assert threads and loop_thread not in threads
+
+
+@pytest.mark.asyncio
+async def test_wait_for_change_wakes_on_add(store):
+    version = store.version("42")
+    waiter = asyncio.ensure_future(store.wait_for_change("42", version, timeout=5))
+    await asyncio.sleep(0.01)
+    assert not waiter.done()
+
+    store.add("42", notification(1))
+
+    assert await asyncio.wait_for(waiter, 1) == version + 1
+    assert await store.wait_for_change("42", version + 1, timeout=0.01) == version + 1
+    assert store.stats()["waiters"] == 0
+
+
+@pytest.mark.asyncio
+async def test_notification_events_stream_unread_count():
+    store = InMemoryNotificationStore()
+    store.add("42", notification(1))
+    disconnected = asyncio.Event()
+
+    async def is_disconnected():
+        return disconnected.is_set()
+
+    events = notification_events(store, "42", is_disconnected, heartbeat=0.05)
+    first = await events.__anext__()
+    assert first.startswith("event: unread\n") and '"unread_count": 1' in first
+
+    assert await events.__anext__() == ": keepalive\n\n"
+
+    store.mark_read("42")
+    assert '"unread_count": 0' in await events.__anext__()
+    disconnected.set()
+    with pytest.raises(StopAsyncIteration):
+        await events.__anext__()
@@ -0,0 +1,125 @@
+"""
+Тесты кэша RAGIntentClassifier: LRU+TTL по хэшу сообщения, семантический уровень, статистика
+"""
+import asyncio
+import numpy as np
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from services.services.rag_intent_classifier import RAGIntentClassifier
+
+LLM_RESULT = {"use_rag": True, "confidence": 0.8, "reason": "Вопрос о подборе", "intent": "question"}
+NOVEL_A = "Нужен ли испытательный срок для удаленщиков в нашей компании"
+NOVEL_B = "Нужен ли испытательный срок для удаленщиков в нашей компании при найме"
+
+
+@pytest.mark.asyncio
+async def test_full_message_key_and_lru():
+    """Сообщения с общим префиксом не делят решение, кэш ограничен по размеру"""
+    classifier = RAGIntentClassifier(cache_size=2, semantic_cache=False)
+    with patch.object(classifier, "_classify_with_llm", new_callable=AsyncMock) as mock_llm:
+        mock_llm.return_value = LLM_RESULT
+
+        await classifier.should_use_rag(NOVEL_A)
+        await classifier.should_use_rag("  " + NOVEL_A.upper() + " ")
+        await classifier.should_use_rag(NOVEL_B)
+        assert mock_llm.call_count == 2
+
+        await classifier.should_use_rag("Третий новый вопрос про стажеров и сроки найма")
+        assert len(classifier._cache) == 2
+        # Самая старая запись вытеснена
+        await classifier.should_use_rag(NOVEL_A)
+        assert mock_llm.call_count == 4
+
+    stats = classifier.get_cache_stats()
+    assert stats["requests"] == 5
+    assert stats["exact_hits"] == 1
+    assert stats["llm"] == 4
+    assert stats["hit_rate"] == pytest.approx(0.2)
+
+
+@pytest.mark.asyncio
+async def test_ttl_and_fallback():
+    """Просроченные записи не используются, fallback-решение кэшируется ненадолго"""
+    classifier = RAGIntentClassifier(cache_ttl=0, semantic_cache=False)
+    with patch.object(classifier, "_classify_with_llm", new_callable=AsyncMock) as mock_llm:
+        mock_llm.return_value = LLM_RESULT
+        await classifier.should_use_rag(NOVEL_A)
+        await classifier.should_use_rag(NOVEL_A)
+        assert mock_llm.call_count == 2
+
+    classifier = RAGIntentClassifier(semantic_cache=False)
+    with patch.object(classifier, "_classify_with_llm", new_callable=AsyncMock) as mock_llm:
+        mock_llm.return_value = None
+        with patch("services.services.rag_intent_classifier.INTENT_FALLBACK_TTL", 0):
+            result = await classifier.should_use_rag(NOVEL_A)
+            await classifier.should_use_rag(NOVEL_A)
+        assert result["intent"] == "long_message"
+        assert mock_llm.call_count == 2
+        assert classifier.get_cache_stats()["fallback"] == 2
+
+
+@pytest.mark.asyncio
+async def test_semantic_tier_reuses_paraphrase():
+    """Перефразированное сообщение получает решение LLM без нового запроса"""
+    vectors = {
+        NOVEL_A.lower(): [1.0, 0.0, 0.0],
+        NOVEL_B.lower(): [0.98, 0.2, 0.0],
+        "совсем другой вопрос о корпоративной культуре и ценностях": [0.0, 0.0, 1.0],
+    }
+
+    def fake_encode(texts):
+        matrix = np.array([vectors[text] for text in texts], dtype=np.float32)
+        return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+    classifier = RAGIntentClassifier(semantic_cache=True)
+    with patch("services.agents.intent_classifier.encode_texts", side_effect=fake_encode), \
+            patch.object(classifier, "_classify_with_llm", new_callable=AsyncMock) as mock_llm:
+        mock_llm.return_value = LLM_RESULT
+
+        await classifier.should_use_rag(NOVEL_A)
+        paraphrase = await classifier.should_use_rag(NOVEL_B)
+        await classifier.should_use_rag("Совсем другой вопрос о корпоративной культуре и ценностях")
+
+        assert paraphrase == LLM_RESULT
+        assert mock_llm.call_count == 2
+        assert classifier.get_cache_stats()["semantic_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_semantic_tier_disabled_without_model():
+    classifier = RAGIntentClassifier(semantic_cache=True)
+    with patch("services.agents.intent_classifier.encode_texts", return_value=None), \
+            patch.object(classifier, "_classify_with_llm", new_callable=AsyncMock) as mock_llm:
+        mock_llm.return_value = LLM_RESULT
+        await classifier.should_use_rag(NOVEL_A)
+
+    assert classifier.get_cache_stats()["semantic_enabled"] is False
+
+
+@pytest.mark.asyncio
+async def test_semantic_tier_survives_encoding_error():
+    """Ошибка кодирования одного сообщения не отключает семантический кэш"""
+    classifier = RAGIntentClassifier(semantic_cache=True)
+    with patch("services.agents.intent_classifier.encode_texts", side_effect=RuntimeError("CUDA OOM")), \
+            patch.object(classifier, "_classify_with_llm", new_callable=AsyncMock) as mock_llm:
+        mock_llm.return_value = LLM_RESULT
+        result = await classifier.should_use_rag(NOVEL_A)
+
+    assert result == LLM_RESULT
+    assert classifier.get_cache_stats()["semantic_enabled"] is True
+
+
+@pytest.mark.asyncio
+async def test_concurrent_novel_messages_single_llm_call():
+    async def slow_llm(*args, **kwargs):
+        await asyncio.sleep(0.05)
+        return LLM_RESULT
+
+    classifier = RAGIntentClassifier(semantic_cache=False)
+    with patch.object(classifier, "_classify_with_llm", new_callable=AsyncMock) as mock_llm:
+        mock_llm.side_effect = slow_llm
+        results = await asyncio.gather(*(classifier.should_use_rag(NOVEL_A) for _ in range(3)))
+
+    assert mock_llm.call_count == 1
+    assert all(result == LLM_RESULT for result in results)
@@ -0,0 +1,166 @@
+"""
+Тесты для кэша результатов поиска RAG
+"""
+import time
+from unittest.mock import Mock, patch
+
+from services.rag import retrieval_cache
+from services.rag.retrieval_cache import (
+    RetrievalCache,
+    MemoryCacheBackend,
+    RedisCacheBackend,
+    normalize_query
+)
+
+
+def _make_cache(**kwargs):
+    return RetrievalCache(backend=MemoryCacheBackend(max_entries=10), **kwargs)
+
+
+def test_normalize_query():
+    """Регистр, пробелы и пунктуация в конце не влияют на ключ"""
+    assert normalize_query("  Сколько  стоит Аудит?? ") == "сколько стоит аудит"
+    assert normalize_query("Ёлка") == "елка"
+
+
+def test_cache_hit_for_same_normalized_query():
+    """Повторный запрос отдается из кэша"""
+    cache = _make_cache()
+    compute = Mock(return_value=[{"text": "doc", "score": 0.9}])
+
+    key1 = cache.make_key("kb", "Подбор персонала?", "hybrid", (0.5, 0.5), 5)
+    key2 = cache.make_key("kb", "подбор  персонала", "hybrid", (0.5, 0.5), 5)
+    assert key1 == key2
+
+    assert cache.get_or_compute(key1, compute) == [{"text": "doc", "score": 0.9}]
+    assert cache.get_or_compute(key2, compute) == [{"text": "doc", "score": 0.9}]
+    assert compute.call_count == 1
+
+    stats = cache.get_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+
+def test_different_params_use_different_keys():
+    """Стратегия, веса и top_k входят в ключ"""
+    cache = _make_cache()
+    base = cache.make_key("kb", "вопрос", "hybrid", (0.5, 0.5), 5)
+    assert base != cache.make_key("kb", "вопрос", "dense", (0.5, 0.5), 5)
+    assert base != cache.make_key("kb", "вопрос", "hybrid", (0.3, 0.7), 5)
+    assert base != cache.make_key("kb", "вопрос", "hybrid", (0.5, 0.5), 10)
+
+
+def test_bump_generation_invalidates_results():
+    """После upsert/delete старые результаты не используются"""
+    cache = _make_cache()
+    compute = Mock(side_effect=[[{"text": "old"}], [{"text": "new"}]])
+
+    key = cache.make_key("kb", "вопрос", "hybrid")
+    assert cache.get_or_compute(key, compute) == [{"text": "old"}]
+
+    cache.bump_generation("kb")
+    new_key = cache.make_key("kb", "вопрос", "hybrid")
+    assert new_key != key
+    assert cache.get_or_compute(new_key, compute) == [{"text": "new"}]
+    assert cache.get_stats()["invalidations"] == 1
+
+
+def test_empty_results_are_not_cached():
+    """Пустой результат (ошибка эмбеддинга/таймаут) не кэшируется"""
+    cache = _make_cache()
+    compute = Mock(return_value=[])
+    key = cache.make_key("kb", "вопрос", "dense")
+
+    cache.get_or_compute(key, compute)
+    cache.get_or_compute(key, compute)
+
+    assert compute.call_count == 2
+
+
+def test_stale_while_revalidate():
+    """Устаревшая запись отдается сразу, обновление идет в фоне"""
+    cache = _make_cache(fresh_ttl=0, stale_ttl=60)
+    key = cache.make_key("kb", "вопрос", "dense")
+    cache.get_or_compute(key, lambda: [{"text": "v1"}])
+    time.sleep(0.01)
+
+    result = cache.get_or_compute(key, lambda: [{"text": "v2"}])
+    assert result == [{"text": "v1"}]
+
+    for _ in range(100):
+        if cache.get_stats()["refreshes"]:
+            break
+        time.sleep(0.01)
+    assert cache.backend.get(key)[1] == [{"text": "v2"}]
+    assert cache.get_stats()["stale_hits"] == 1
+
+
+def test_disabled_cache_always_computes():
+    """Выключенный кэш не сохраняет результаты"""
+    cache = _make_cache(enabled=False)
+    compute = Mock(return_value=[{"text": "doc"}])
+    key = cache.make_key("kb", "вопрос", "dense")
+
+    cache.get_or_compute(key, compute)
+    cache.get_or_compute(key, compute)
+
+    assert compute.call_count == 2
+
+
+def test_redis_backend_roundtrip():
+    """Redis бэкенд хранит записи в JSON и поколение через INCR"""
+    storage = {}
+    client = Mock()
+    client.get.side_effect = storage.get
+    client.setex.side_effect = lambda key, ttl, value: storage.__setitem__(key, value)
+    client.incr.side_effect = lambda key: storage.__setitem__(key, str(int(storage.get(key, 0)) + 1)) or int(storage[key])
+
+    cache = RetrievalCache(backend=RedisCacheBackend(client))
+    key = cache.make_key("kb", "вопрос", "dense")
+    assert key.startswith("kb:0:")
+
+    cache.get_or_compute(key, lambda: [{"text": "doc"}])
+    assert cache.get_or_compute(key, lambda: []) == [{"text": "doc"}]
+
+    cache.bump_generation("kb")
+    assert cache.make_key("kb", "вопрос", "dense").startswith("kb:1:")
+
+
+def test_backend_errors_fall_back_to_compute():
+    """Ошибка бэкенда не ломает поиск"""
+    backend = Mock()
+    backend.get_generation.side_effect = ConnectionError("redis down")
+    cache = RetrievalCache(backend=backend)
+
+    key = cache.make_key("kb", "вопрос", "dense")
+
+    assert key is None
+    assert cache.get_or_compute(key, lambda: [{"text": "doc"}]) == [{"text": "doc"}]
+    assert cache.get_stats()["errors"] == 1
+
+
+def test_memory_backend_ttl_is_capped_and_entries_expire():
+    """Поколение в памяти не общее между процессами - записи живут недолго"""
+    cache = _make_cache(fresh_ttl=300, stale_ttl=3600, memory_max_ttl=60)
+    assert (cache.fresh_ttl, cache.stale_ttl) == (60, 60)
+
+    backend = MemoryCacheBackend()
+    backend.set("kb:0:key", [{"text": "doc"}], ttl=0)
+    time.sleep(0.01)
+    assert backend.get("kb:0:key") is None
+
+
+def test_auto_backend_prefers_redis_and_warns_for_memory_with_workers(monkeypatch, caplog):
+    """backend: auto выбирает Redis; кэш в памяти при нескольких воркерах - предупреждение"""
+    monkeypatch.setattr(retrieval_cache, "_retrieval_cache", None)
+    monkeypatch.setattr(retrieval_cache, "_load_cache_config", lambda: {"backend": "auto"})
+    with patch("services.helpers.redis_helper.get_redis_client", return_value=Mock()):
+        assert retrieval_cache.get_retrieval_cache().backend.name == "redis"
+
+    monkeypatch.setattr(retrieval_cache, "_retrieval_cache", None)
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    with patch("services.helpers.redis_helper.get_redis_client", return_value=None):
+        cache = retrieval_cache.get_retrieval_cache()
+    assert cache.backend.name == "memory" and cache.stale_ttl == retrieval_cache.MEMORY_MAX_TTL
+    assert "воркерах" in caplog.text
@@ -847,8 +847,8 @@ async def test_send_lead_to_channel_mock():
         # Выполняем отправку
         result = await send_lead_to_channel(mock_telegram_bot, mock_lead_info)
         
-        # Проверяем, что функция вернула True (успешная отправка)
-        assert result is True, "Функция должна вернуть True при успешной отправке"
+        # Планировщик не запущен - сообщение отправлено сразу
+        assert result == "sent", "Функция должна вернуть 'sent' при отправке без очереди"
         
         # Проверяем, что send_message был вызван
         assert mock_telegram_bot.send_message.called, "send_message должен быть вызван"
@@ -0,0 +1,128 @@
+"""
+Тесты инкрементальной индексации услуг в Qdrant
+"""
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from services.rag import qdrant_helper
+from services.rag.service_index_sync import (
+    ServiceIndexManifest,
+    ServiceReindexDebouncer,
+    service_point_id,
+    service_row_key,
+    sync_services_index
+)
+
+
+def make_service(title, price, row_number, master="Анастасия"):
+    return {
+        "title": title, "price": price, "price_str": f"{price} ₽", "duration": 60,
+        "master": master, "type": "women", "row_number": row_number
+    }
+
+
+@pytest.fixture
+def env(tmp_path):
+    embedded = []
+
+    def fake_batch(texts):
+        embedded.append(list(texts))
+        return [[0.1] * qdrant_helper._embedding_dimension for _ in texts]
+
+    client = MagicMock()
+    manifest = ServiceIndexManifest(manifest_file=str(tmp_path / "manifest.json"))
+    # По умолчанию точки услуг в Qdrant совпадают с манифестом
+    client.count.side_effect = lambda **kwargs: SimpleNamespace(
+        count=len(manifest.load(qdrant_helper.COLLECTION_NAME, qdrant_helper._embedding_dimension))
+    )
+    with patch.object(qdrant_helper, "ensure_collection", return_value=True), \
+         patch.object(qdrant_helper, "generate_embeddings_batch", side_effect=fake_batch):
+        yield client, manifest, embedded
+
+
+def run(services, client, manifest):
+    return sync_services_index(services, client=client, manifest=manifest)
+
+
+def test_only_changed_rows_are_embedded(env):
+    client, manifest, embedded = env
+    services = [make_service("Коучинг", 90000, 2), make_service("Аудит HR", 50000, 3), make_service("Найм", 30000, 4)]
+
+    first = run(services, client, manifest)
+    assert first.ok and first.embedded == 3
+    # Первая синхронизация сначала записывает точки, затем удаляет точки услуг не из нового набора
+    assert [call[0] for call in client.method_calls if call[0] in ("upsert", "delete")] == ["upsert", "delete"]
+    kept = client.delete.call_args.kwargs["points_selector"].must_not[0].has_id
+    assert sorted(kept) == sorted(service_point_id(service_row_key(service)) for service in services)
+
+    client.reset_mock()
+    unchanged = run(services, client, manifest)
+    assert unchanged.ok and unchanged.unchanged == 3
+    assert len(embedded) == 1
+    client.upsert.assert_not_called()
+
+    changed = [
+        make_service("Коучинг", 95000, 2),   # Цена изменилась - новый эмбеддинг
+        make_service("Аудит HR", 50000, 5),  # Изменился только номер строки
+        make_service("Оценка персонала", 40000, 6)
+    ]
+    result = run(changed, client, manifest)
+
+    assert (result.embedded, result.payload_updated, result.deleted) == (2, 1, 1)
+    assert len(embedded[-1]) == 2
+    upserted_ids = {point.id for point in client.upsert.call_args.kwargs["points"]}
+    assert upserted_ids == {service_point_id(service_row_key(changed[0])), service_point_id(service_row_key(changed[2]))}
+    client.set_payload.assert_called_once()
+    deleted = client.delete.call_args.kwargs["points_selector"].points
+    assert deleted == [service_point_id(service_row_key(services[2]))]
+
+
+def test_failed_embedding_retried_next_time(env):
+    client, manifest, embedded = env
+    services = [make_service("Коучинг", 90000, 2)]
+
+    with patch.object(qdrant_helper, "generate_embeddings_batch", return_value=[None]):
+        assert not run(services, client, manifest).ok
+
+    assert run(services, client, manifest).embedded == 1
+
+
+def test_debouncer_coalesces_refreshes():
+    calls = []
+    started = threading.Event()
+
+    def slow_sync(services):
+        calls.append(len(services))
+        started.set()
+        time.sleep(0.1)
+
+    debouncer = ServiceReindexDebouncer(sync=slow_sync, delay=0.05)
+    for size in range(1, 4):
+        debouncer.schedule([{}] * size)
+    started.wait(1)
+    # Во время синхронизации - еще два обновления, они объединяются в одно
+    debouncer.schedule([{}] * 4)
+    debouncer.schedule([{}] * 5)
+    time.sleep(0.35)
+
+    assert calls == [3, 5]
+
+
+def test_manifest_out_of_sync_with_collection_triggers_full_reindex(env):
+    client, manifest, embedded = env
+    services = [make_service("Коучинг", 90000, 2), make_service("Аудит HR", 50000, 3)]
+    run(services, client, manifest)
+
+    # Коллекцию пересоздали: манифест есть, а точек услуг нет
+    client.reset_mock()
+    client.count.side_effect = None
+    client.count.return_value = SimpleNamespace(count=0)
+    result = run(services, client, manifest)
+
+    assert result.ok and result.embedded == 2
+    assert len(embedded) == 2
+    client.count.assert_called_once()
@@ -0,0 +1,120 @@
+"""
+Тесты кэшированного слоя данных Google Sheets
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from services.helpers.sheets_repository import SheetsRepository, SheetsSnapshot
+
+PRICE_VALUES = [
+    ["Женский зал", "Услуга название", "Мастер 1", "Мастер 2", "Цена", "Время", "Доп. услуги"],
+    ["", "Коучинг", "Анастасия Новосёлова", "", "90000", "60", ""],
+    ["", "Аудит HR", "Анастасия Новосёлова", "Мария", "50000", "120", ""],
+]
+BOOKING_VALUES = [
+    ["Дата создания", "ID записи", "Дата", "Время", "Мастер", "Услуга", "Имя клиента", "Телефон", "Цена", "Статус", "Комментарий"],
+    ["2026-01-01 10:00:00", "b1", "2026-02-01", "10:00", "Анастасия Новосёлова", "Коучинг", "Иван", "", "90000", "confirmed", "Запись через Telegram бот (user_id: 7)"],
+    ["2026-01-02 10:00:00", "b2", "2026-02-01", "11:00", "Анастасия Новосёлова", "Коучинг", "Петр", "", "90000", "отменена", "Запись через Telegram бот (user_id: 7)"],
+]
+
+
+class CountingFetch:
+    def __init__(self, delay=0.0):
+        self.calls = 0
+        self.delay = delay
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return PRICE_VALUES, BOOKING_VALUES
+
+
+def test_snapshot_indexes():
+    snapshot = SheetsSnapshot.from_values(PRICE_VALUES, BOOKING_VALUES)
+
+    assert [s["title"] for s in snapshot.services_for_master("мария")] == ["Аудит HR"]
+    assert len(snapshot.services_for_master("Анастасия")) == 2
+    assert [m["name"] for m in snapshot.masters] == ["Анастасия Новосёлова", "Мария"]
+    # Отмененная запись не попадает в записи пользователя
+    assert [b["id"] for b in snapshot.user_bookings(7)] == ["b1"]
+    assert snapshot.service_durations()["аудит hr"] == 120
+
+
+@pytest.mark.asyncio
+async def test_concurrent_refreshes_single_flight():
+    fetch = CountingFetch(delay=0.05)
+    repository = SheetsRepository(fetch=fetch, ttl=60)
+
+    results = await asyncio.gather(*(repository.get_services() for _ in range(10)))
+
+    assert fetch.calls == 1
+    assert all(len(services) == 2 for services in results)
+    assert len(repository.get_snapshot_sync().services) == 2
+    assert fetch.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_stale_while_revalidate():
+    fetch = CountingFetch(delay=0.05)
+    repository = SheetsRepository(fetch=fetch, ttl=60, stale_ttl=600)
+    await repository.get_snapshot()
+    repository._snapshot.fetched_at -= 61
+
+    started = time.perf_counter()
+    stale = await repository.get_snapshot()
+    assert time.perf_counter() - started < 0.03
+    assert stale.age > 60
+
+    await asyncio.wrap_future(repository.refresh())
+    assert fetch.calls == 2
+    assert repository._snapshot.age < 1
+
+    # Индекс слотов сверяется с листом в фоне, проверка не ждет загрузки
+    repository._snapshot.fetched_at -= 61
+    assert not await repository.check_slot_available("Анастасия Новосёлова", "2026-02-01", "10:00")
+    await asyncio.wrap_future(repository.refresh())
+    assert fetch.calls == 3
+
+
+@pytest.mark.asyncio
+async def test_record_booking_and_free_slots():
+    repository = SheetsRepository(fetch=CountingFetch(), ttl=60)
+    await repository.get_snapshot()
+
+    repository.record_booking([
+        "2026-01-03 10:00:00", "b3", "2026-02-01", "12:00", "Мария", "Аудит HR",
+        "Ольга", "", 50000, "confirmed", "Запись через Telegram бот (user_id: 9)"
+    ])
+
+    assert not await repository.check_slot_available("мария", "2026-02-01", "12:00")
+    assert [b["id"] for b in await repository.get_user_bookings(9)] == ["b3"]
+    slots = await repository.get_available_slots("Анастасия Новосёлова", "2026-02-01")
+    assert "10:00" not in slots and "11:00" in slots and slots[0] == "09:00"
+
+
+def test_previous_snapshot_kept_on_error():
+    fetch = CountingFetch()
+    repository = SheetsRepository(fetch=fetch, ttl=60, stale_ttl=0)
+    repository.get_snapshot_sync()
+    repository.invalidate()
+    repository.fetch = lambda: (_ for _ in ()).throw(RuntimeError("quota"))
+
+    assert len(repository.get_snapshot_sync().services) == 2
+    assert repository.stats["errors"] == 1
+
+
+def test_check_slot_available_uses_service_duration(monkeypatch):
+    from services.helpers import google_sheets_helper, sheets_repository
+
+    repository = SheetsRepository(fetch=CountingFetch(), ttl=60)
+    monkeypatch.setattr(google_sheets_helper, "get_sheets_client", lambda: object())
+    monkeypatch.setattr(sheets_repository, "get_sheets_repository", lambda: repository)
+
+    # b1: 10:00-11:00. Часовая услуга в 09:00 помещается, двухчасовая - нет
+    assert google_sheets_helper.check_slot_available("Анастасия Новосёлова", "2026-02-01", "09:00")
+    assert not google_sheets_helper.check_slot_available("Анастасия Новосёлова", "2026-02-01", "09:00", duration=120)
@@ -0,0 +1,72 @@
+"""
+Тесты индекса занятости слотов записи
+"""
+from services.helpers.slot_availability import AvailabilityIndex, IntervalSet
+
+
+def booking(booking_id, start, master="Анастасия", date="2026-02-01", service="Коучинг", cancelled=False):
+    return {"id": booking_id, "master": master, "date": date, "time": start, "service": service, "cancelled": cancelled}
+
+
+def test_interval_overlaps():
+    intervals = IntervalSet()
+    intervals.add(600, 720, "a")  # 10:00-12:00
+    intervals.add(780, 840, "b")  # 13:00-14:00
+
+    assert intervals.overlaps(660, 720)
+    assert not intervals.overlaps(720, 780)
+    assert intervals.overlaps(770, 790)
+    assert not intervals.overlaps(840, 900)
+    assert intervals.remove("a") and not intervals.overlaps(600, 660)
+
+
+def test_sync_applies_differences():
+    index = AvailabilityIndex()
+    durations = {"аудит hr": 120}
+    result = index.sync([
+        booking("b1", "10:00", service="Аудит HR"),
+        booking("b2", "15:00"),
+        booking("b3", "16:00", cancelled=True)
+    ], durations)
+
+    assert result == {"added": 2, "removed": 0}
+    assert not index.is_available("анастасия", "2026-02-01", "11:00")
+    assert index.is_available("Анастасия", "2026-02-01", "12:00")
+    assert index.is_available("Анастасия", "2026-02-01", "16:00")
+    assert index.is_available("Мария", "2026-02-01", "10:00")
+
+    # b2 удалена из листа, b4 добавлена
+    result = index.sync([booking("b1", "10:00", service="Аудит HR"), booking("b4", "18:00")], durations)
+    assert result == {"added": 1, "removed": 1}
+    assert index.free_slots("Анастасия", "2026-02-01", "09:00", "20:00") == [
+        "09:00", "12:00", "13:00", "14:00", "15:00", "16:00", "17:00", "19:00"
+    ]
+
+
+def test_optimistic_changes_survive_stale_sync():
+    index = AvailabilityIndex(grace=60)
+    index.sync([booking("b1", "10:00")])
+
+    index.book(booking("new", "12:00"), duration=90)
+    index.cancel("b1")
+    # Снимок прочитан до записи в лист: в нем еще b1 и нет новой записи
+    index.sync([booking("b1", "10:00")])
+
+    assert index.is_available("Анастасия", "2026-02-01", "10:00")
+    assert not index.is_available("Анастасия", "2026-02-01", "13:00")
+
+    # Лист догнал изменения
+    index.sync([booking("new", "12:00")])
+    assert len(index) == 1
+
+
+def test_sync_updates_interval_when_duration_changes():
+    index = AvailabilityIndex()
+    index.sync([booking("b1", "10:00")], {"коучинг": 60})
+    assert index.is_available("Анастасия", "2026-02-01", "11:00")
+
+    # В прайсе увеличили длительность услуги - запись занимает больше времени
+    assert index.sync([booking("b1", "10:00")], {"коучинг": 120}) == {"added": 1, "removed": 0}
+    assert not index.is_available("Анастасия", "2026-02-01", "11:00")
+    assert not index.is_available("Анастасия", "2026-02-01", "09:30", duration=45)
+    assert index.sync([booking("b1", "10:00")], {"коучинг": 120}) == {"added": 0, "removed": 0}
@@ -0,0 +1,102 @@
+"""
+Тесты для исполнителя графа шагов сценариев
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from services.agents.step_graph import StepGraph
+
+
+@pytest.mark.asyncio
+async def test_independent_steps_run_concurrently():
+    """Независимые шаги выполняются параллельно, зависимый - после них"""
+    async def slow(value):
+        await asyncio.sleep(0.1)
+        return value
+
+    async def step_a(_):
+        return await slow("a")
+
+    async def step_b(_):
+        return await slow("b")
+
+    async def step_c(results):
+        return results["a"] + results["b"]
+
+    graph = StepGraph(name="test")
+    graph.add("a", step_a)
+    graph.add("b", step_b)
+    graph.add("c", step_c, deps=("a", "b"))
+
+    started = time.perf_counter()
+    outcome = await graph.run()
+    elapsed = time.perf_counter() - started
+
+    assert outcome.get("c") == "ab"
+    assert elapsed < 0.19
+    assert outcome.timings["c"]["start_ms"] >= 100
+
+
+@pytest.mark.asyncio
+async def test_timeout_and_error_use_default():
+    """Таймаут или ошибка шага дают значение по умолчанию и не прерывают граф"""
+    async def hang(_):
+        await asyncio.sleep(1)
+
+    async def fail(_):
+        raise RuntimeError("boom")
+
+    graph = StepGraph(name="test")
+    graph.add("slow", hang, timeout=0.05, default="fallback")
+    graph.add("broken", fail, default={})
+    graph.add("after", lambda results: results["slow"], deps=("slow", "broken"))
+
+    outcome = await graph.run()
+
+    assert outcome.get("slow") == "fallback"
+    assert outcome.statuses["slow"] == "timeout"
+    assert outcome.statuses["broken"] == "error"
+    assert outcome.get("after") == "fallback"
+
+
+@pytest.mark.asyncio
+async def test_condition_skips_step():
+    """Шаг с невыполненным условием пропускается"""
+    graph = StepGraph(name="test")
+    graph.add("validation", lambda _: {"status": "cold"})
+    graph.add("proposal", lambda _: "КП", deps=("validation",), default=None,
+              when=lambda results: results["validation"]["status"] == "warm")
+
+    outcome = await graph.run()
+
+    assert outcome.get("proposal") is None
+    assert outcome.statuses["proposal"] == "skipped"
+    assert "validation" in outcome.latency_breakdown()["steps"]
+
+
+@pytest.mark.asyncio
+async def test_condition_error_fails_only_its_step():
+    """Исключение в условии - ошибка шага, а не всего графа; синхронные шаги идут в пул графов"""
+    graph = StepGraph(name="test")
+    graph.add("validation", lambda _: {})
+    graph.add("proposal", lambda _: "КП", deps=("validation",), default="нет КП",
+              when=lambda results: results["validation"]["status"] == "warm")
+    graph.add("thread", lambda _: threading.current_thread().name)
+    graph.add("notify", lambda results: results["proposal"], deps=("proposal",))
+
+    outcome = await graph.run()
+
+    assert outcome.statuses["proposal"] == "error"
+    assert "status" in outcome.errors["proposal"]
+    assert outcome.get("notify") == "нет КП"
+    assert outcome.get("thread").startswith("graph-node")
+
+
+def test_unknown_dependency_rejected():
+    """Зависимость должна быть добавлена раньше шага"""
+    graph = StepGraph()
+    with pytest.raises(ValueError):
+        graph.add("proposal", lambda _: None, deps=("retrieval",))
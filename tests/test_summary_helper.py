@@ -133,3 +133,118 @@ async def test_summarize_long_text_short():
         
         # Для короткого текста может вернуться как есть или суммаризация
         assert len(result) > 0
+
+
+SMALL_SETTINGS = {
+    "single_pass_tokens": 50,
+    "chunk_tokens": 40,
+    "chunk_overlap_tokens": 0,
+    "chunk_summary_tokens": 20,
+    "reduce_budget_tokens": 60,
+    "max_concurrency": 2,
+    "cache_size": 100
+}
+
+
+def _paragraphs(count: int, changed: int = -1) -> str:
+    return "\n\n".join(
+        f"Абзац {i}: {'обновленный текст' if i == changed else 'исходный текст'} о проекте. " * 3
+        for i in range(count)
+    )
+
+
+async def _fake_llm(messages, **kwargs):
+    content = messages[0]["content"]
+    if "Выжимки:" in content:
+        return "свертка групп"
+    if "Фрагмент:" in content:
+        return "выжимка"
+    return "Итоговая суммаризация"
+
+
+@pytest.mark.asyncio
+async def test_map_reduce_long_text():
+    """Длинный текст суммаризируется по чанкам, финальный запрос получает выжимки"""
+    from services.helpers.summary_helper import clear_summary_cache
+    clear_summary_cache()
+
+    with patch('services.helpers.summary_helper.get_summarization_settings', return_value=SMALL_SETTINGS), \
+         patch('services.helpers.summary_helper.generate_with_fallback', new_callable=AsyncMock) as mock_llm:
+        mock_llm.side_effect = _fake_llm
+
+        result = await summarize_long_text(_paragraphs(10), max_length=500)
+
+        prompts = [call.args[0][0]["content"] for call in mock_llm.call_args_list]
+        map_calls = [p for p in prompts if "Фрагмент:" in p]
+        assert result == "Итоговая суммаризация"
+        assert len(map_calls) > 1
+        assert "выжимка" in prompts[-1]
+        assert "Абзац" not in prompts[-1]
+
+
+@pytest.mark.asyncio
+async def test_map_reduce_reuses_unchanged_chunks():
+    """При изменении одного абзаца пересчитываются только измененные чанки"""
+    from services.helpers.summary_helper import clear_summary_cache
+    clear_summary_cache()
+
+    with patch('services.helpers.summary_helper.get_summarization_settings', return_value=SMALL_SETTINGS), \
+         patch('services.helpers.summary_helper.generate_with_fallback', new_callable=AsyncMock) as mock_llm:
+        mock_llm.side_effect = _fake_llm
+
+        await summarize_long_text(_paragraphs(10), max_length=500)
+        first_maps = sum("Фрагмент:" in c.args[0][0]["content"] for c in mock_llm.call_args_list)
+        mock_llm.reset_mock()
+
+        await summarize_long_text(_paragraphs(10, changed=9), max_length=500)
+        second_maps = sum("Фрагмент:" in c.args[0][0]["content"] for c in mock_llm.call_args_list)
+
+        assert first_maps > 1
+        assert second_maps == 1
+
+
+@pytest.mark.asyncio
+async def test_summarize_long_text_shortens_instead_of_cutting():
+    """Слишком длинная суммаризация сокращается запросом к LLM"""
+    with patch('services.helpers.summary_helper.generate_with_fallback', new_callable=AsyncMock) as mock_llm:
+        mock_llm.side_effect = ["Очень длинная выжимка. " * 20, "Короткая выжимка."]
+
+        result = await summarize_long_text("Текст письма для суммаризации", max_length=100)
+
+        assert result == "Короткая выжимка."
+        assert mock_llm.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_summarize_long_text_keeps_summary_when_shortening_fails():
+    """Заглушка LLM при сокращении не заменяет выжимку - она обрезается по границе предложения"""
+    from services.helpers.llm_helper import LLM_UNAVAILABLE_MESSAGE
+    long_summary = "Очень длинная выжимка. " * 20
+
+    with patch('services.helpers.summary_helper.generate_with_fallback', new_callable=AsyncMock) as mock_llm:
+        mock_llm.side_effect = [long_summary, LLM_UNAVAILABLE_MESSAGE]
+
+        result = await summarize_long_text("Текст письма для суммаризации", max_length=100)
+
+        assert result != LLM_UNAVAILABLE_MESSAGE
+        assert result.startswith("Очень длинная выжимка.")
+        assert len(result) <= 100
+        assert mock_llm.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_chunk_summary_is_not_cached():
+    """Ответ-заглушка LLM не кэшируется: часть заменяется началом текста, повтор идет в LLM"""
+    from services.helpers.llm_helper import LLM_UNAVAILABLE_MESSAGE
+    from services.helpers.summary_helper import _summarize_parts, clear_summary_cache
+    clear_summary_cache()
+
+    with patch('services.helpers.summary_helper.generate_with_fallback', new_callable=AsyncMock) as mock_llm:
+        mock_llm.side_effect = [LLM_UNAVAILABLE_MESSAGE, "выжимка"]
+
+        first = await _summarize_parts("Фрагмент: {{text}}", ["Абзац о проекте"], "", SMALL_SETTINGS)
+        second = await _summarize_parts("Фрагмент: {{text}}", ["Абзац о проекте"], "", SMALL_SETTINGS)
+
+        assert first == ["Абзац о проекте"]
+        assert second == ["выжимка"]
+        assert mock_llm.call_count == 2
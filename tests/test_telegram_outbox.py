@@ -0,0 +1,155 @@
+"""
+Тесты планировщика исходящих сообщений Telegram
+"""
+import asyncio
+from datetime import timedelta
+from unittest.mock import AsyncMock
+
+import pytest
+
+from services.helpers import telegram_outbox
+from services.helpers.telegram_outbox import (
+    PRIORITY_LEAD,
+    PRIORITY_NEWS,
+    OutboundMessageScheduler,
+    is_group_chat,
+    queue_message,
+    retry_after_seconds,
+)
+
+
+class FakeRetryAfter(Exception):
+    def __init__(self, seconds):
+        super().__init__(f"Flood control exceeded. Retry in {seconds} seconds")
+        self.retry_after = seconds
+
+
+class RecordingBot:
+    def __init__(self, failures=None):
+        self.sent = []
+        self.failures = list(failures or [])
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if self.failures:
+            error = self.failures.pop(0)
+            if error is not None:
+                raise error
+        self.sent.append((chat_id, text))
+        return {"chat_id": chat_id}
+
+
+def test_chat_kinds_and_retry_after():
+    assert is_group_chat(-1001234567890)
+    assert is_group_chat("@HRAI_ANovoselova_Leads")
+    assert not is_group_chat(12345)
+    assert retry_after_seconds(FakeRetryAfter(3)) == 3.0
+    assert retry_after_seconds(FakeRetryAfter(timedelta(seconds=2))) == 2.0
+    assert retry_after_seconds(ValueError("x")) is None
+
+
+@pytest.mark.asyncio
+async def test_leads_are_sent_before_news():
+    bot = RecordingBot()
+    scheduler = OutboundMessageScheduler(bot, group_burst=1, group_rate_per_min=6000)
+    scheduler.start()
+    futures = [scheduler.enqueue(-100, f"news {i}", priority=PRIORITY_NEWS) for i in range(3)]
+    futures.append(scheduler.enqueue(-100, "lead", priority=PRIORITY_LEAD))
+
+    assert await asyncio.wait_for(asyncio.gather(*futures), 2) == [True] * 4
+    await scheduler.stop()
+
+    assert [text for _, text in bot.sent] == ["lead", "news 0", "news 1", "news 2"]
+
+
+@pytest.mark.asyncio
+async def test_per_chat_bucket_does_not_block_other_chats():
+    bot = RecordingBot()
+    scheduler = OutboundMessageScheduler(bot, group_burst=1, group_rate_per_min=1)
+    scheduler.start()
+    scheduler.enqueue(-100, "channel 1")
+    blocked = scheduler.enqueue(-100, "channel 2")
+    private = scheduler.enqueue(42, "private")
+
+    assert await asyncio.wait_for(private, 1) is True
+    assert not blocked.done()  # Канал ждет токен (1 сообщение в минуту)
+    assert [text for _, text in bot.sent] == ["channel 1", "private"]
+    await scheduler.stop(timeout=0)
+    assert blocked.result() is False
+
+
+@pytest.mark.asyncio
+async def test_retry_after_pauses_chat_and_resends():
+    bot = RecordingBot(failures=[FakeRetryAfter(0.05)])
+    scheduler = OutboundMessageScheduler(bot, chat_rate=1000)
+    scheduler.start()
+    sent = []
+    future = scheduler.enqueue(42, "lead", priority=PRIORITY_LEAD, on_sent=lambda: sent.append(True))
+
+    assert await asyncio.wait_for(future, 2) is True
+    await scheduler.stop()
+
+    assert bot.sent == [(42, "lead")]
+    assert sent == [True]
+    assert scheduler.stats["retry_after"] == 1
+
+
+@pytest.mark.asyncio
+async def test_permanent_error_fails_message():
+    bot = RecordingBot(failures=[ValueError("Bad Request: can't parse entities")])
+    scheduler = OutboundMessageScheduler(bot)
+    scheduler.start()
+    sent = []
+
+    future = scheduler.enqueue(42, "*broken", on_sent=lambda: sent.append(True))
+    assert await asyncio.wait_for(future, 1) is False
+    await scheduler.stop()
+
+    assert sent == []
+    assert scheduler.stats["failed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_queue_message_does_not_wait_for_delivery(monkeypatch):
+    bot = RecordingBot()
+    scheduler = OutboundMessageScheduler(bot, group_burst=1, group_rate_per_min=1)
+    scheduler.start()
+    monkeypatch.setattr(telegram_outbox, "_scheduler", scheduler)
+
+    results = await asyncio.wait_for(
+        asyncio.gather(*[queue_message(bot, -100, f"lead {i}", priority=PRIORITY_LEAD) for i in range(5)]), 0.5
+    )
+
+    assert results == ["queued"] * 5
+    assert scheduler.pending() >= 4
+    await scheduler.stop(timeout=0)
+
+
+@pytest.mark.asyncio
+async def test_queue_message_sends_directly_without_scheduler(monkeypatch):
+    monkeypatch.setattr(telegram_outbox, "_scheduler", None)
+    bot = AsyncMock()
+    sent = []
+
+    assert await queue_message(bot, 42, "hi", on_sent=lambda: sent.append(True), parse_mode="Markdown")
+
+    bot.send_message.assert_awaited_once_with(chat_id=42, text="hi", parse_mode="Markdown")
+    assert sent == [True]
+
+
+@pytest.mark.asyncio
+async def test_dedup_key_skips_pending_duplicate_until_failure():
+    bot = RecordingBot(failures=[ValueError("Bad Request")])
+    scheduler = OutboundMessageScheduler(bot, group_burst=1, group_rate_per_min=6000)
+    scheduler.start()
+
+    first = scheduler.enqueue(-100, "news", priority=PRIORITY_NEWS, dedup_key="news:1")
+    assert scheduler.enqueue(-100, "news", priority=PRIORITY_NEWS, dedup_key="news:1") is None
+    assert await asyncio.wait_for(first, 1) is False
+
+    # После окончательной ошибки ключ освобождается - новость можно отправить снова
+    retry = scheduler.enqueue(-100, "news", priority=PRIORITY_NEWS, dedup_key="news:1")
+    assert await asyncio.wait_for(retry, 1) is True
+    await scheduler.stop()
+
+    assert bot.sent == [(-100, "news")]
+    assert scheduler.stats["deduplicated"] == 1
@@ -0,0 +1,195 @@
+"""
+Тесты пакетных операций WEEEK
+"""
+import asyncio
+
+import pytest
+
+from services.helpers.weeek_bulk import (
+    RetryingSession,
+    TokenBucket,
+    WeeekOperation,
+    WeeekRef,
+    backoff_delay,
+    run_bulk,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeResponse:
+    def __init__(self, status, headers=None):
+        self.status = status
+        self.headers = headers or {}
+        self.released = False
+
+    def release(self):
+        self.released = True
+
+
+class FakeHttp:
+    """aiohttp.ClientSession.request с заданной последовательностью статусов"""
+
+    def __init__(self, statuses):
+        self.responses = [FakeResponse(status, {"Retry-After": "0"} if status == 429 else None) for status in statuses]
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        response = self.responses[self.calls]
+        self.calls += 1
+
+        async def send():
+            return response
+        return send()
+
+
+def test_token_bucket_limits_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=3, clock=clock)
+
+    assert [bucket.try_acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.try_acquire() == pytest.approx(0.5)
+
+    clock.now = 1.0
+    assert bucket.try_acquire() == 0.0
+    assert bucket.try_acquire() == 0.0
+    assert bucket.try_acquire() > 0
+
+
+def test_backoff_delay_is_jittered_and_capped():
+    delays = [backoff_delay(5, base=1, cap=4) for _ in range(50)]
+
+    assert all(0 <= delay <= 4 for delay in delays)
+    assert len(set(delays)) > 1
+    assert backoff_delay(0, base=0.1, cap=10, retry_after=3) >= 3
+
+
+@pytest.mark.asyncio
+async def test_retrying_session_retries_429_and_5xx():
+    http = FakeHttp([503, 429, 200])
+    session = RetryingSession(http, bucket=TokenBucket(rate=1000, capacity=10), attempts=4, base_delay=0)
+
+    async with session.put("https://weeek/tm/tasks/1", json={}) as response:
+        assert response.status == 200
+
+    assert http.calls == 3
+    assert session.retries == 2
+    assert all(response.released for response in http.responses)
+
+
+@pytest.mark.asyncio
+async def test_retrying_session_does_not_repeat_post_after_5xx():
+    # 5xx на создание: задача могла быть создана, повтор дал бы дубликат
+    http = FakeHttp([429, 503, 200])
+    session = RetryingSession(http, bucket=TokenBucket(rate=1000, capacity=10), attempts=4, base_delay=0)
+
+    async with session.post("https://weeek/tm/tasks", json={}) as response:
+        assert response.status == 503
+
+    assert http.calls == 2
+    assert session.retries == 1
+
+
+@pytest.mark.asyncio
+async def test_retrying_session_does_not_repeat_post_after_timeout():
+    class TimeoutHttp:
+        calls = 0
+
+        def request(self, method, url, **kwargs):
+            self.calls += 1
+
+            async def send():
+                raise asyncio.TimeoutError()
+            return send()
+
+    http = TimeoutHttp()
+    session = RetryingSession(http, bucket=TokenBucket(rate=1000, capacity=10), attempts=4, base_delay=0)
+
+    with pytest.raises(asyncio.TimeoutError):
+        async with session.post("https://weeek/tm/tasks", json={}):
+            pass
+    assert http.calls == 1
+
+    with pytest.raises(asyncio.TimeoutError):
+        async with session.get("https://weeek/tm/tasks"):
+            pass
+    assert http.calls == 5
+
+
+@pytest.mark.asyncio
+async def test_retrying_session_returns_last_error_response():
+    http = FakeHttp([500, 500])
+    session = RetryingSession(http, bucket=TokenBucket(rate=1000, capacity=10), attempts=2, base_delay=0)
+
+    async with session.get("https://weeek/tm/tasks") as response:
+        assert response.status == 500
+    assert http.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_run_bulk_resolves_dependencies_in_parallel():
+    calls = []
+    in_flight = {"now": 0, "max": 0}
+
+    async def create_project(name, session=None):
+        calls.append(("project", name, session))
+        return {"id": 42, "name": name}
+
+    async def create_task(project_id, title, session=None):
+        in_flight["now"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        await asyncio.sleep(0.01)
+        in_flight["now"] -= 1
+        calls.append(("task", project_id, title))
+        return {"id": f"t-{title}"}
+
+    operations = [WeeekOperation(create_project, kwargs={"name": "Лид"}, key="project")] + [
+        WeeekOperation(create_task, kwargs={"project_id": WeeekRef("project"), "title": str(i)}, after="project")
+        for i in range(5)
+    ]
+    results = await run_bulk(operations, concurrency=3, session="shared")
+
+    assert [result.ok for result in results] == [True] * 6
+    assert [result.key for result in results] == ["project", "op1", "op2", "op3", "op4", "op5"]
+    assert calls[0] == ("project", "Лид", "shared")
+    assert {call[1] for call in calls[1:]} == {"42"}
+    assert in_flight["max"] == 3
+
+
+@pytest.mark.asyncio
+async def test_run_bulk_skips_operations_after_failed_dependency():
+    async def create_project(name):
+        return None
+
+    async def update_project_status(project_id, status):
+        raise AssertionError("не должна вызываться")
+
+    async def complete_task(task_id):
+        raise RuntimeError("boom")
+
+    results = await run_bulk([
+        WeeekOperation(create_project, kwargs={"name": "x"}, key="project"),
+        WeeekOperation(update_project_status, args=(WeeekRef("project"), "new"), after="project"),
+        WeeekOperation(complete_task, args=("7",))
+    ], session=object())
+
+    assert [result.ok for result in results] == [False, False, False]
+    assert "project" in results[1].error
+    assert results[2].error == "boom"
+
+
+@pytest.mark.asyncio
+async def test_run_bulk_validates_operations():
+    async def noop():
+        return True
+
+    with pytest.raises(ValueError):
+        await run_bulk([WeeekOperation(noop, after="later"), WeeekOperation(noop, key="later")], session=object())
+    with pytest.raises(ValueError):
+        await run_bulk([WeeekOperation("no_such_action")], session=object())
@@ -0,0 +1,157 @@
+"""
+Тесты локального зеркала задач WEEEK
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from services.helpers.weeek_mirror import WeeekMirror, WeeekMirrorStore, fetch_all_tasks, parse_task_date
+
+
+def _day(offset: int) -> str:
+    return (datetime.now().date() + timedelta(days=offset)).isoformat()
+
+
+def _task(task_id: int, due_offset=None, updated="2026-01-01T00:00:00Z", **extra):
+    task = {"id": task_id, "title": f"Задача {task_id}", "projectId": 1, "completed": False, "updatedAt": updated}
+    if due_offset is not None:
+        task["dueDate"] = _day(due_offset)
+    task.update(extra)
+    return task
+
+
+class FakeWeeek:
+    """Постраничный /tm/tasks с подсчетом запросов"""
+
+    def __init__(self, tasks, fail_offsets=()):
+        self.tasks = tasks
+        self.fail_offsets = set(fail_offsets)
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def get_tasks(self, per_page=50, offset=0, session=None, **kwargs):
+        self.calls.append(offset)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        if offset in self.fail_offsets:
+            return {"success": False, "tasks": [], "hasMore": False}
+        page = self.tasks[offset:offset + per_page]
+        return {"success": True, "tasks": page, "hasMore": offset + per_page < len(self.tasks)}
+
+    async def get_projects(self, session=None):
+        return [{"id": 1, "name": "Проект"}]
+
+
+def _mirror(fake, tmp_path, **kwargs):
+    store = WeeekMirrorStore(str(tmp_path / "weeek.sqlite3"))
+    return WeeekMirror(store, fetch_tasks=fake.get_tasks, fetch_projects=fake.get_projects, page_size=10, concurrency=3, **kwargs)
+
+
+def test_parse_task_date_formats():
+    assert parse_task_date("2026-02-15").isoformat() == "2026-02-15"
+    assert parse_task_date("2026-02-15T10:00:00Z").isoformat() == "2026-02-15"
+    assert parse_task_date("15.02.2026").isoformat() == "2026-02-15"
+    assert parse_task_date("завтра") is None
+    assert parse_task_date(None) is None
+
+
+@pytest.mark.asyncio
+async def test_fetch_all_tasks_follows_has_more_with_bounded_concurrency():
+    fake = FakeWeeek([_task(i) for i in range(45)])
+
+    tasks, complete = await fetch_all_tasks(fake.get_tasks, page_size=10, concurrency=3)
+
+    assert complete
+    assert len(tasks) == 45
+    assert sorted(fake.calls) == [0, 10, 20, 30, 40, 50]
+    assert fake.max_in_flight <= 3
+
+
+@pytest.mark.asyncio
+async def test_deadlines_served_from_mirror(tmp_path):
+    fake = FakeWeeek([
+        _task(1, due_offset=1),
+        _task(2, due_offset=3),
+        _task(3, due_offset=30),
+        _task(4, due_offset=2, completed=True),
+        _task(5)
+    ] + [_task(100 + i, due_offset=-5) for i in range(20)])
+    mirror = _mirror(fake, tmp_path)
+
+    deadlines = await mirror.get_deadlines(days_ahead=7)
+    calls = len(fake.calls)
+    again = await mirror.get_deadlines(days_ahead=7)
+
+    assert [task["id"] for task in deadlines] == [1, 2]
+    assert deadlines[0] == {"id": 1, "name": "Задача 1", "project_id": 1, "due_date": _day(1), "status": "active"}
+    assert again == deadlines
+    assert len(fake.calls) == calls  # Свежее зеркало - без запросов к API
+    assert mirror.store.projects() == [{"id": 1, "name": "Проект"}]
+
+
+@pytest.mark.asyncio
+async def test_incremental_refresh_writes_only_changed_tasks(tmp_path):
+    fake = FakeWeeek([_task(i, due_offset=1) for i in range(1, 6)])
+    mirror = _mirror(fake, tmp_path)
+    await mirror.refresh()
+
+    fake.tasks = [_task(i, due_offset=1) for i in range(1, 5)]
+    fake.tasks[0] = _task(1, due_offset=2, updated="2026-01-02T00:00:00Z")
+    changes = mirror.store.apply_tasks(fake.tasks, complete=True)
+
+    assert changes == {"changed": 1, "unchanged": 3, "removed": 1}
+    assert mirror.store.get_meta("tasks_cursor") == "2026-01-02T00:00:00Z"
+
+
+@pytest.mark.asyncio
+async def test_partial_sync_does_not_remove_tasks(tmp_path):
+    fake = FakeWeeek([_task(i, due_offset=1) for i in range(1, 26)])
+    mirror = _mirror(fake, tmp_path)
+    await mirror.refresh()
+
+    fake.fail_offsets = {10}
+    assert await mirror.refresh() is False
+    assert mirror.store.task_count() == 25
+
+
+@pytest.mark.asyncio
+async def test_stale_mirror_refreshes_in_background_once(tmp_path):
+    fake = FakeWeeek([_task(1, due_offset=1)])
+    mirror = _mirror(fake, tmp_path, ttl=0)
+    await mirror.get_deadlines()
+    calls = len(fake.calls)
+
+    fake.tasks = [_task(1, due_offset=1), _task(2, due_offset=2)]
+    results = await asyncio.gather(*[mirror.get_deadlines() for _ in range(5)])
+
+    assert all(len(result) == 1 for result in results)  # Отдано из зеркала, не дожидаясь API
+    await asyncio.sleep(0.1)
+    assert mirror.stats["background"] == 1
+    assert len(fake.calls) == calls + 3  # Одна синхронизация: одна пачка страниц
+    assert len(await mirror.get_deadlines()) == 2
+
+
+@pytest.mark.asyncio
+async def test_cold_mirror_failure_returns_none(tmp_path):
+    fake = FakeWeeek([_task(1, due_offset=1)], fail_offsets={0})
+    mirror = _mirror(fake, tmp_path)
+
+    assert await mirror.get_deadlines() is None
+    calls = len(fake.calls)
+    assert await mirror.get_deadlines() is None
+    assert len(fake.calls) == calls  # Повтор только после WEEEK_MIRROR_RETRY
+
+
+def test_local_writes_update_mirror(tmp_path):
+    store = WeeekMirrorStore(str(tmp_path / "weeek.sqlite3"))
+    today = datetime.now().date()
+
+    store.upsert_task(_task(7, due_offset=1))
+    assert [task["id"] for task in store.deadlines(today, today + timedelta(days=2))] == [7]
+
+    store.remove_task(7)
+    assert store.deadlines(today, today + timedelta(days=2)) == []
@@ -62,6 +62,7 @@ try:
         get_qdrant_client,
         generate_embedding_async
     )
+    from services.rag.retrieval_cache import invalidate_collection
     from services.helpers.text_splitter import RecursiveCharacterTextSplitter
     log.info("✅ Все модули импортированы")
 except ImportError as e:
@@ -275,6 +276,7 @@ async def index_document(
                 log.error(f"❌ Ошибка загрузки батча для {file_name}: {e}")
                 return False
         
+        invalidate_collection(QDRANT_COLLECTION)
         log.info(f"🎉 Файл {file_name} успешно проиндексирован ({len(points)} точек)")
         return True
         